@@ -8,11 +8,34 @@ from typing import Type
 from pydantic import BaseModel, Field
 from pydantic import BaseModel as StudioBaseTool  # Required for the tool to be recognized
 import argparse
+import hashlib
+import hmac
 import json
 
-import cml.data_v1 as cmldata
+try:
+    import cml.data_v1 as cmldata
+except ImportError:  # outside CML, e.g. loaded by the tool host with its stand-in backend
+    cmldata = None
 import pandas as pd
 import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Local tool host (cai-agent/CDW_Tool_Host) that keeps warm connections.
+TOOL_HOST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "CDW_Tool_Host")
+
+# Rows requested per fetchmany() round trip in guarded execution.
+FETCH_BATCH_SIZE = 500
+
+# Upper bound for the memory held by cached results.
+CACHE_MAX_BYTES = int(os.environ.get("CDW_QUERY_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Per-process key for the credential part of cache keys.
+_CREDENTIAL_KEY = os.urandom(32)
 
 class UserParameters(BaseModel):
     """
@@ -23,6 +46,14 @@ class UserParameters(BaseModel):
     workload_pass: str
     hive_cai_data_connection_name: str
     default_database: str
+    cache_ttl_seconds: int = 300
+    cache_validate_snapshots: bool = False
+    guarded_execution: bool = True
+    max_rows: int = 200
+    max_chars: int = 20000
+    summary_scan_rows: int = 100000
+    max_estimated_rows: int = 5000000
+    over_cost_action: str = "limit"
 
 
 class ToolParameters(BaseModel):
@@ -32,9 +63,347 @@ class ToolParameters(BaseModel):
     sql_query: str = Field(
         description="The SQL query to execute on the database."
     )
+    cache_ttl_seconds: Optional[int] = Field(
+        default=None,
+        description="Maximum age in seconds of a cached result for this query. Use 0 to force a fresh result."
+    )
+
+
+# --- Result cache ---
+
+_TOKEN_RE = re.compile(r"""
+    (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"[^"]*"|`[^`]*`)
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<word>[A-Za-z_][\w.]*)
+  | (?P<space>\s+)
+  | (?P<other>.)
+""", re.X | re.S)
+
+_CACHEABLE_RE = re.compile(r"^(select|with|show|describe|values)\b")
+_TABLE_RE = re.compile(r"\b(?:from|join)\s+([a-z_][\w.]*)")
+# Further tables of a comma-separated FROM list (FROM a, b x, c AS y); _TABLE_RE finds the first one.
+_ALIAS = r"(?:\s+(?:as\s+)?[a-z_]\w*)?"
+_FROM_LIST_RE = re.compile(rf"\bfrom\s+[a-z_][\w.]*{_ALIAS}((?:\s*,\s*[a-z_][\w.]*{_ALIAS})+)")
+_LIST_TABLE_RE = re.compile(r",\s*([a-z_][\w.]*)")
+_CTE_RE = re.compile(r"(?:\bwith|,)\s*([a-z_]\w*)\s+as\s*\(")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Canonical form of a query for cache lookups: whitespace collapsed, keywords and
+    identifiers lower-cased (string literals kept), trailing semicolons removed and
+    the literals of IN (...) lists sorted.
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        if kind == "space":
+            continue
+        value = match.group()
+        tokens.append(value if kind == "string" else value.lower())
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+
+    out: List[str] = []
+    i = 0
+    while i < len(tokens):
+        out.append(tokens[i])
+        if tokens[i] == "in" and i + 1 < len(tokens) and tokens[i + 1] == "(":
+            end = tokens.index(")", i + 1) if ")" in tokens[i + 1:] else -1
+            items = tokens[i + 2:end] if end > 0 else []
+            literals = items[0::2]
+            separators = items[1::2]
+            if literals and all(sep == "," for sep in separators) and \
+                    all(tok.startswith("'") or tok[0].isdigit() for tok in literals):
+                out.append("(" + ",".join(sorted(literals)) + ")")
+                i = end + 1
+                continue
+        i += 1
+    return " ".join(out)
+
+
+def referenced_tables(normalized_sql: str) -> List[str]:
+    """Tables named after FROM/JOIN and in FROM lists, without the query's own CTE names."""
+    ctes = set(_CTE_RE.findall(normalized_sql))
+    tables = set(_TABLE_RE.findall(normalized_sql))
+    for tail in _FROM_LIST_RE.findall(normalized_sql):
+        tables.update(_LIST_TABLE_RE.findall(tail))
+    return sorted(t for t in tables if t not in ctes)
+
+
+def table_snapshots(cursor, tables: List[str]) -> Tuple[Tuple[str, Optional[str]], ...]:
+    """Current Iceberg snapshot id per table (None for views and non-Iceberg tables)."""
+    versions = []
+    for table in tables:
+        try:
+            cursor.execute(f"DESCRIBE HISTORY {table}")
+            rows = cursor.fetchall()
+            columns = [desc[0].lower() for desc in cursor.description]
+            latest = max(rows, key=lambda row: str(row[columns.index("creation_time")])) if rows else None
+            versions.append((table, str(latest[columns.index("snapshot_id")]) if latest else None))
+        except Exception:
+            versions.append((table, None))
+    return tuple(versions)
+
+
+class ResultCache:
+    """
+    LRU cache of formatted query results bounded by total size in bytes.
+    Entries expire after the TTL of the lookup and are dropped when the
+    snapshot ids of the referenced Iceberg tables differ.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, Tuple[str, float, tuple]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple, ttl: int, versions: tuple = ()) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                output, stored_at, stored_versions = entry
+                if time.monotonic() - stored_at <= ttl and (not versions or versions == stored_versions):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return output
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, key: Tuple, output: str, versions: tuple = ()):
+        entry_size = len(output.encode("utf-8"))
+        if entry_size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (output, time.monotonic(), versions)
+            self.size += entry_size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Tuple):
+        output, _, _ = self._entries.pop(key)
+        self.size -= len(output.encode("utf-8"))
+
+    def metadata(self, status: str) -> str:
+        return (f"[cache {status}: hits={self.hits} misses={self.misses} "
+                f"entries={len(self._entries)} size_kb={self.size // 1024}]")
+
+
+RESULT_CACHE = ResultCache(CACHE_MAX_BYTES)
+
+
+def _cache_plan(config: Optional[UserParameters], args: ToolParameters):
+    """Returns (cache key, ttl) or (None, 0) if the query must not be cached."""
+    if config is None:
+        return None, 0
+    ttl = config.cache_ttl_seconds if args.cache_ttl_seconds is None else args.cache_ttl_seconds
+    normalized = normalize_sql(args.sql_query)
+    if ttl <= 0 or not _CACHEABLE_RE.match(normalized):
+        return None, 0
+    # Entries are only stored after a successful run, so a hit requires credentials that did authenticate.
+    credentials = hmac.new(_CREDENTIAL_KEY, f"{config.workload_user}\0{config.workload_pass}".encode("utf-8"),
+                           hashlib.sha256).hexdigest()
+    # The limits shape the formatted output, so callers with different limits do not share entries.
+    key = (config.hive_cai_data_connection_name, config.workload_user, credentials, config.default_database,
+           config.guarded_execution, config.max_rows, config.max_chars, config.summary_scan_rows,
+           config.max_estimated_rows, config.over_cost_action, normalized)
+    return key, ttl
+
+
+# --- Guarded execution ---
+
+_UNITS = {"": 1, "k": 1e3, "m": 1e6, "b": 1e9, "g": 1e9}
+# Row estimate of the node producing the result: Impala and Trino print the plan
+# top-down (root / exchange node first), Hive lists the final operator last.
+_ESTIMATE_RES = (
+    (re.compile(r"cardinality=([\d.]+)([KMB]?)", re.I), 0),       # Impala
+    (re.compile(r"Num rows:\s*([\d.]+)()", re.I), -1),             # Hive
+    (re.compile(r"rows:\s*([\d.]+)([kMB]?)\b", re.I), 0),         # Trino
+)
+_LIMIT_RE = re.compile(r"\blimit\s+\d+(\s+offset\s+\d+)?\s*$")
+
+
+def estimate_rows(cursor, sql_query: str) -> Optional[float]:
+    """Estimated result rows of the plan's root node, or None if the engine gives none."""
+    try:
+        cursor.execute(f"EXPLAIN {sql_query}")
+        plan = "\n".join(" ".join(str(value) for value in row) for row in cursor.fetchall())
+    except Exception:
+        return None
+    for pattern, position in _ESTIMATE_RES:
+        estimates = pattern.findall(plan)
+        if estimates:
+            number, unit = estimates[position]
+            return float(number) * _UNITS[unit.lower()]
+    return None
+
+
+class ColumnSummary:
+    """Streaming count/min/max and approximate top values (Misra-Gries) for one column."""
+
+    def __init__(self, top_k: int = 20):
+        self.count = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.top_k = top_k
+        self.counters: Dict = {}
+
+    def add(self, value):
+        if value is None:
+            self.nulls += 1
+            return
+        self.count += 1
+        try:
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+        except TypeError:
+            pass
+        if value in self.counters:
+            self.counters[value] += 1
+        elif len(self.counters) < self.top_k:
+            self.counters[value] = 1
+        else:
+            for key in list(self.counters):
+                self.counters[key] -= 1
+                if not self.counters[key]:
+                    del self.counters[key]
+
+    def top(self, n: int = 3) -> str:
+        # Counters are lower bounds; a residual count of 1 carries no frequency information.
+        ranked = sorted((item for item in self.counters.items() if item[1] > 1), key=lambda item: -item[1])[:n]
+        return ", ".join(str(value)[:30] for value, _ in ranked)
+
+
+def guarded_fetch(cursor, config: UserParameters):
+    """
+    Fetches with fetchmany: keeps at most max_rows rows / max_chars characters
+    for display and keeps scanning up to summary_scan_rows rows for the column
+    summaries. Returns (columns, kept rows, rows scanned, exhausted, summaries).
+    """
+    columns = [desc[0] for desc in cursor.description]
+    summaries = [ColumnSummary() for _ in columns]
+    kept: List[tuple] = []
+    chars = 0
+    scanned = 0
+    keeping = True
+    exhausted = False
+    while scanned < config.summary_scan_rows:
+        batch = cursor.fetchmany(min(FETCH_BATCH_SIZE, config.summary_scan_rows - scanned))
+        if not batch:
+            exhausted = True
+            break
+        for row in batch:
+            scanned += 1
+            for summary, value in zip(summaries, row):
+                summary.add(value)
+            if keeping:
+                chars += sum(len(str(value)) + 2 for value in row) + 1
+                if len(kept) >= config.max_rows or chars > config.max_chars:
+                    keeping = False
+                else:
+                    kept.append(tuple(row))
+    return columns, kept, scanned, exhausted, summaries
+
+
+def format_guarded(columns, kept, scanned, exhausted, summaries, note: str = "") -> str:
+    output = pd.DataFrame(kept, columns=columns).to_string(index=False)
+    if len(kept) == scanned and exhausted:
+        return output + (f"\n\n{note}" if note else "")
+    total = f"{scanned}" if exhausted else f"at least {scanned}"
+    summary = pd.DataFrame(
+        [[name, s.count, s.nulls, s.min, s.max, s.top()] for name, s in zip(columns, summaries)],
+        columns=["column", "count", "nulls", "min", "max", "top_values"],
+    )
+    lines = [output, "", f"[truncated: showing {len(kept)} of {total} rows]"]
+    if note:
+        lines.append(note)
+    lines += ["", f"Column summary over {scanned} rows:", summary.to_string(index=False)]
+    return "\n".join(lines)
+
+
+def execute_guarded(cursor, sql_query: str, config: UserParameters) -> str:
+    """
+    EXPLAIN first and refuse or LIMIT queries whose estimated result row count
+    exceeds max_estimated_rows, then stream the result under the row/character budget.
+    """
+    note = ""
+    normalized = normalize_sql(sql_query)
+    if re.match(r"^(select|with)\b", normalized):
+        estimate = estimate_rows(cursor, sql_query)
+        if estimate is not None and estimate > config.max_estimated_rows:
+            if config.over_cost_action == "refuse":
+                return (f"Query refused: the plan estimates {estimate:,.0f} rows "
+                        f"(limit {config.max_estimated_rows:,}). Add filters, aggregate or use LIMIT.")
+            if not _LIMIT_RE.search(normalized):
+                # Appended rather than wrapped: an inline view would lose the ORDER BY (Impala)
+                # and fail on duplicate column names of joins.
+                sql_query = f"{sql_query}\nLIMIT {config.summary_scan_rows}"
+                note = f"[plan estimated {estimate:,.0f} rows; LIMIT {config.summary_scan_rows} applied]"
+
+    cursor.execute(sql_query)
+    if not cursor.description:
+        return "Statement executed."
+    return format_guarded(*guarded_fetch(cursor, config), note=note)
+
+
+def cached_result(config: UserParameters, args: ToolParameters) -> Optional[str]:
+    """Cache lookup that needs no connection (TTL only, without snapshot validation)."""
+    key, ttl = _cache_plan(config, args)
+    if key is None or config.cache_validate_snapshots:
+        return None
+    output = RESULT_CACHE.get(key, ttl)
+    return None if output is None else f"{output}\n\n{RESULT_CACHE.metadata('hit')}"
+
+
+def run_with_cursor(cursor, args: ToolParameters, config: Optional[UserParameters] = None):
+    """
+    Executes the query on a cursor whose connection already selected the
+    default database. Used by run_tool and by the tool host's pooled connections.
+    With a config the result cache is consulted first and filled afterwards.
+    """
+    key, ttl = _cache_plan(config, args)
+    versions = ()
+    if key is not None:
+        if config.cache_validate_snapshots:
+            versions = table_snapshots(cursor, referenced_tables(key[-1]))
+        output = RESULT_CACHE.get(key, ttl, versions)
+        if output is not None:
+            return f"{output}\n\n{RESULT_CACHE.metadata('hit')}"
+
+    sql_query = args.sql_query
+    if sql_query[-1] == ";":
+        sql_query = sql_query[:-1]
+
+    if config is not None and config.guarded_execution:
+        output = execute_guarded(cursor, sql_query, config)
+    else:
+        cursor.execute(sql_query)
+        columns = [desc[0] for desc in cursor.description]  # Extract column names
+        rows = cursor.fetchall()
+        df = pd.DataFrame(rows, columns=columns)
+        output = df.to_string(index=False)
+
+    if key is None:
+        return output
+    RESULT_CACHE.put(key, output, versions)
+    return f"{output}\n\n{RESULT_CACHE.metadata('miss')}"
 
 
 def run_tool(config: UserParameters, args: ToolParameters):
+    output = cached_result(config, args)
+    if output is not None:
+        return output
+
     conn = cmldata.get_connection(
         config.hive_cai_data_connection_name,
         parameters={
@@ -47,21 +416,13 @@ def run_tool(config: UserParameters, args: ToolParameters):
     try:
 
         cursor.execute(f"USE {config.default_database}")
-
-        sql_query = args.sql_query
-        if sql_query[-1] == ";":
-            sql_query = sql_query[:-1]
-        
-        cursor.execute(sql_query)
-        columns = [desc[0] for desc in cursor.description]  # Extract column names
-        rows = cursor.fetchall()
-        df = pd.DataFrame(rows, columns=columns)
+        output = run_with_cursor(cursor, args, config)
     except Exception as error:
         return f"SQL Execution failed. Error details: {error}"
     finally:
         conn.close()
 
-    return df.to_string(index=False)
+    return output
 
 
 OUTPUT_KEY = "tool_output"
@@ -72,7 +433,15 @@ if __name__ == "__main__":
     parser.add_argument("--tool-params", required=True, help="JSON string for tool arguments")
     args = parser.parse_args()
 
-    config = UserParameters(**json.loads(args.user_params))
-    params = ToolParameters(**json.loads(args.tool_params))
-    output = run_tool(config, params)
+    user_params = json.loads(args.user_params)
+    tool_params = json.loads(args.tool_params)
+    config = UserParameters(**user_params)
+    params = ToolParameters(**tool_params)
+    try:
+        sys.path.insert(0, TOOL_HOST_DIR)
+        from tool_host import call_tool_host
+        output = call_tool_host("CDW_Query_tool", user_params, tool_params, timeout=None)
+    except (ImportError, OSError):
+        # Tool host not deployed or not running: connect directly.
+        output = run_tool(config, params)
     print(OUTPUT_KEY, output)
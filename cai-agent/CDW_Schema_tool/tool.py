@@ -10,9 +10,28 @@ from pydantic import BaseModel as StudioBaseTool  # Required for the tool to be
 import argparse
 import json
 
-import cml.data_v1 as cmldata
+try:
+    import cml.data_v1 as cmldata
+except ImportError:  # outside CML, e.g. loaded by the tool host with its stand-in backend
+    cmldata = None
 import pandas as pd
+import hashlib
 import os
+import queue
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Local tool host (cai-agent/CDW_Tool_Host) that keeps warm connections.
+TOOL_HOST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "CDW_Tool_Host")
+
+# Persisted schema catalogs, one JSON file per (connection name, database).
+SCHEMA_CACHE_DIR = os.environ.get(
+    "CDW_SCHEMA_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "cdw_schema")
+)
 
 class UserParameters(BaseModel):
     """
@@ -23,6 +42,9 @@ class UserParameters(BaseModel):
     workload_pass: str
     hive_cai_data_connection_name: str
     default_database: str
+    schema_format: str = "compact"
+    schema_cache_ttl_seconds: int = 300
+    describe_workers: int = 4
 
 
 class ToolParameters(BaseModel):
@@ -30,8 +52,217 @@ class ToolParameters(BaseModel):
     Parameters for executing the SQL query.
     """
     sql_query: str = Field(
+        default="",
         description="The SQL query to execute on the database."
     )
+    refresh: bool = Field(
+        default=False,
+        description="Re-read the schema from the database instead of using the cached catalog."
+    )
+
+
+# --- Schema catalog ---
+
+_CATALOGS: Dict[str, dict] = {}
+_CATALOG_LOCK = threading.Lock()
+
+
+def catalog_path(config: UserParameters) -> str:
+    name = re.sub(r"[^\w.-]", "_", f"{config.hive_cai_data_connection_name}__{config.default_database}")
+    return os.path.join(SCHEMA_CACHE_DIR, f"{name}.json")
+
+
+def load_catalog(path: str) -> Optional[dict]:
+    with _CATALOG_LOCK:
+        if path in _CATALOGS:
+            return _CATALOGS[path]
+    try:
+        with open(path, encoding="utf-8") as handle:
+            catalog = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    with _CATALOG_LOCK:
+        _CATALOGS[path] = catalog
+    return catalog
+
+
+def save_catalog(path: str, catalog: dict):
+    with _CATALOG_LOCK:
+        _CATALOGS[path] = catalog
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(catalog, handle)
+    os.replace(tmp_path, path)
+
+
+def fingerprint(tables: List[str], columns: Optional[Dict[str, List[List[str]]]] = None) -> str:
+    """
+    DDL change marker: the sorted table/view list of the database plus, where the
+    engine has information_schema, every table's column names and types, so that
+    ALTER TABLE ... ADD COLUMNS is detected as well. Impala has no such view and
+    relies on the table list and schema_cache_ttl_seconds.
+    """
+    parts = sorted(tables)
+    if columns is not None:
+        parts += [f"{table}({', '.join(f'{name} {data_type}' for name, data_type, _ in columns[table])})"
+                  for table in sorted(columns)]
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def describe_rows(cursor, table: str) -> List[List[str]]:
+    """DESCRIBE output as [column, type, comment] rows, without partition/detail sections."""
+    cursor.execute(f"DESCRIBE {table}")
+    columns = []
+    for row in cursor.fetchall():
+        name = str(row[0]).strip() if row[0] is not None else ""
+        if not name or name.startswith("#"):
+            if columns:
+                break  # Hive appends "# Partition Information" / "# Detailed Table Information"
+            continue
+        data_type = str(row[1]).strip() if len(row) > 1 and row[1] is not None else ""
+        comment = str(row[2]).strip() if len(row) > 2 and row[2] is not None else ""
+        columns.append([name, data_type, comment])
+    return columns
+
+
+def describe_all(cursor, tables: List[str], connection_factory: Optional[Callable] = None,
+                 workers: int = 4) -> Dict[str, List[List[str]]]:
+    """
+    Runs the DESCRIBEs on the given cursor plus up to workers-1 extra connections
+    from connection_factory (a callable returning a context manager that yields a
+    connection with the default database selected). Extra connections that cannot
+    be opened are skipped, the given cursor always drains the remaining tables.
+    """
+    pending = queue.Queue()
+    for table in tables:
+        pending.put(table)
+    described: Dict[str, List[List[str]]] = {}
+    errors: List[Exception] = []
+
+    def drain(worker_cursor):
+        while True:
+            try:
+                table = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                described[table] = describe_rows(worker_cursor, table)
+            except Exception as error:
+                errors.append(error)
+
+    def extra_worker():
+        try:
+            with connection_factory() as conn:
+                drain(conn.get_cursor())
+        except Exception:
+            pass  # the caller's cursor picks up the remaining tables
+
+    threads = []
+    if connection_factory is not None:
+        for _ in range(min(workers, len(tables)) - 1):
+            thread = threading.Thread(target=extra_worker, daemon=True)
+            thread.start()
+            threads.append(thread)
+    drain(cursor)
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return {table: described[table] for table in tables}
+
+
+def information_schema_columns(cursor, database: str) -> Optional[Dict[str, List[List[str]]]]:
+    """Whole catalog in one metadata query where the engine offers information_schema (Hive 3, Trino)."""
+    try:
+        cursor.execute(
+            "SELECT table_name, column_name, data_type FROM information_schema.columns "
+            f"WHERE table_schema = '{database}' ORDER BY table_name, ordinal_position"
+        )
+        rows = cursor.fetchall()
+    except Exception:
+        return None
+    catalog: Dict[str, List[List[str]]] = {}
+    for table, column, data_type in rows:
+        catalog.setdefault(table, []).append([column, data_type, ""])
+    return catalog
+
+
+def format_compact(tables: Dict[str, List[List[str]]]) -> str:
+    """One line per table: name(column type, ...) with comments only where present."""
+    lines = []
+    for table, columns in tables.items():
+        parts = []
+        for name, data_type, comment in columns:
+            part = f"{name} {data_type.lower()}"
+            if comment:
+                part += f" -- {comment}"
+            parts.append(part)
+        lines.append(f"{table}({', '.join(parts)})")
+    return "\n".join(lines)
+
+
+def format_tables(tables: Dict[str, List[List[str]]]) -> Dict[str, str]:
+    """The original per-table DataFrame rendering."""
+    return {
+        table: pd.DataFrame(columns, columns=["name", "type", "comment"]).to_string(index=False)
+        for table, columns in tables.items()
+    }
+
+
+def run_with_cursor(cursor, args: ToolParameters, config: UserParameters = None,
+                    connection_factory: Optional[Callable] = None):
+    """
+    Describes all tables on a cursor whose connection already selected the
+    default database. Used by run_tool and by the tool host's pooled connections.
+
+    With a config the catalog is cached in memory and on disk. A warm call only
+    runs SHOW TABLES and, where available, one information_schema query and
+    compares their fingerprint with the cached one; the full refresh happens on
+    a changed fingerprint, an expired TTL or refresh=True.
+    """
+    # Get all tables in the database
+    cursor.execute("SHOW TABLES")
+    tables = [row[0] for row in cursor.fetchall()]
+
+    path = catalog_path(config) if config is not None else None
+    columns = information_schema_columns(cursor, config.default_database) if config is not None else None
+    current = fingerprint(tables, columns)
+    catalog = load_catalog(path) if path is not None and not args.refresh else None
+    if catalog is not None and catalog["fingerprint"] == current and \
+            time.time() - catalog["refreshed_at"] < config.schema_cache_ttl_seconds:
+        described = catalog["tables"]
+    else:
+        described = columns
+        if described is not None and set(described) != set(tables):
+            described = None  # views or tables missing from information_schema
+        if described is None:
+            workers = config.describe_workers if config is not None else 1
+            described = describe_all(cursor, tables, connection_factory, workers)
+        if path is not None:
+            save_catalog(path, {"fingerprint": current, "refreshed_at": time.time(), "tables": described})
+
+    if config is not None and config.schema_format == "compact":
+        return format_compact(described)
+    return format_tables(described)
+
+
+def cml_connection_factory(config: UserParameters):
+    @contextmanager
+    def connection():
+        conn = cmldata.get_connection(
+            config.hive_cai_data_connection_name,
+            parameters={
+                "USERNAME": config.workload_user,
+                "PASSWORD": config.workload_pass
+            }
+        )
+        try:
+            conn.get_cursor().execute(f"USE {config.default_database}")
+            yield conn
+        finally:
+            conn.close()
+    return connection
 
 
 def run_tool(config: UserParameters, args: ToolParameters):
@@ -46,29 +277,13 @@ def run_tool(config: UserParameters, args: ToolParameters):
     
     try:
         cursor.execute(f"USE {config.default_database}")
-        
-        # Get all tables in the database
-        cursor.execute("SHOW TABLES")
-        tables = [row[0] for row in cursor.fetchall()]
-        
-        # Dictionary to hold the schema for each table
-        schemas = {}
-        
-        # Loop through each table to get its schema
-        for table in tables:
-            cursor.execute(f"DESCRIBE {table}")
-            columns = [desc[0] for desc in cursor.description]
-            rows = cursor.fetchall()
-            df = pd.DataFrame(rows, columns=columns)
-            schemas[table] = df.to_string(index=False)
-            
-        return schemas
+        return run_with_cursor(cursor, args, config, cml_connection_factory(config))
         
     except Exception as error:
         return f"SQL Execution failed. Error details: {error}"
     finally:
         conn.close()
- 
+
 
 OUTPUT_KEY = "tool_output"
 
@@ -78,7 +293,15 @@ if __name__ == "__main__":
     parser.add_argument("--tool-params", required=True, help="JSON string for tool arguments")
     args = parser.parse_args()
 
-    config = UserParameters(**json.loads(args.user_params))
-    params = ToolParameters(**json.loads(args.tool_params))
-    output = run_tool(config, params)
+    user_params = json.loads(args.user_params)
+    tool_params = json.loads(args.tool_params)
+    config = UserParameters(**user_params)
+    params = ToolParameters(**tool_params)
+    try:
+        sys.path.insert(0, TOOL_HOST_DIR)
+        from tool_host import call_tool_host
+        output = call_tool_host("CDW_Schema_tool", user_params, tool_params, timeout=None)
+    except (ImportError, OSError):
+        # Tool host not deployed or not running: connect directly.
+        output = run_tool(config, params)
     print(OUTPUT_KEY, output)
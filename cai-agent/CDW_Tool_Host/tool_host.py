@@ -0,0 +1,541 @@
+"""
+Long-lived tool host for the CDW agent tools.
+
+CDW_Query_tool and CDW_Schema_tool open a connection with cmldata.get_connection,
+run USE <db> and close the connection on every invocation, so every tool call pays
+connection setup and authentication. This host keeps a bounded pool of warm
+connections per (connection name, user, database, credentials), health-checks and recycles
+them, and serves tool invocations over a local Unix socket. The tools' __main__
+forwards to the host when its socket exists and runs in-process otherwise.
+
+Protocol: one JSON request per line
+    {"tool": "CDW_Query_tool", "user_params": {...}, "tool_params": {...}}
+answered by one JSON line {"output": ...} or {"error": "..."}.
+
+Start the host:
+    python tool_host.py                       # cml.data_v1 connections
+    python tool_host.py --backend standin     # sqlite stand-in for offline tests
+"""
+
+import argparse
+import hashlib
+import hmac
+import importlib.util
+import json
+import os
+import re
+import signal
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOCKET = os.environ.get("CDW_TOOL_HOST_SOCKET", "/tmp/cdw_tool_host.sock")
+
+TOOL_MODULES = {
+    "CDW_Query_tool": os.path.join(HERE, "..", "CDW_Query_tool", "tool.py"),
+    "CDW_Schema_tool": os.path.join(HERE, "..", "CDW_Schema_tool", "tool.py"),
+}
+
+DEFAULT_MAX_SIZE = 4
+DEFAULT_IDLE_TIMEOUT = 600.0      # close connections unused for 10 minutes
+DEFAULT_MAX_LIFETIME = 3600.0     # recycle connections after 1 hour (token expiry)
+DEFAULT_CHECK_INTERVAL = 30.0     # health-check connections idle for longer than this
+DEFAULT_ACQUIRE_TIMEOUT = 60.0
+SCHEMA_WORKER_ACQUIRE_TIMEOUT = 1.0
+
+# Per-process key for credential digests, so pool keys never contain a reusable password hash.
+_CREDENTIAL_KEY = os.urandom(32)
+
+# Queries that change session options; their connection is closed instead of going back to the pool.
+SESSION_SET_RE = re.compile(r"(?:^|;)\s*(?:SET|UNSET)\b", re.IGNORECASE)
+
+
+# --- Stand-in backend ------------------------------------------------------------
+
+class StandInCursor:
+    """
+    DB-API cursor over sqlite3 that understands the Impala statements used by
+    the tools (USE, SHOW TABLES, DESCRIBE).
+    """
+
+    def __init__(self, connection: "StandInConnection"):
+        self._connection = connection
+        self._cursor = connection.sqlite.cursor()
+        self.description = None
+        self._rows = None
+
+    def execute(self, sql: str, parameters=()):
+        statement = sql.strip().rstrip(";")
+        upper = statement.upper()
+        self._rows = None
+        if upper.startswith("USE "):
+            self._connection.database = statement[4:].strip()
+            self.description = None
+        elif upper == "SHOW TABLES":
+            self._rows = self._cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') ORDER BY name").fetchall()
+            self.description = [("name", None, None, None, None, None, None)]
+        elif upper.startswith("DESCRIBE "):
+            table = statement.split(None, 1)[1].strip("`")
+            info = self._cursor.execute(f"PRAGMA table_info('{table}')").fetchall()
+            self._rows = [(row[1], row[2].lower(), "") for row in info]
+            self.description = [(name, None, None, None, None, None, None) for name in ("name", "type", "comment")]
+        else:
+            self._cursor.execute(statement, parameters)
+            self.description = self._cursor.description
+        self._connection.statements += 1
+        return self
+
+    def executemany(self, sql: str, seq_of_parameters):
+        self._cursor.executemany(sql.strip().rstrip(";"), seq_of_parameters)
+        self._connection.statements += 1
+        return self
+
+    def fetchall(self):
+        if self._rows is not None:
+            rows, self._rows = self._rows, []
+            return rows
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size: int = 1):
+        if self._rows is not None:
+            rows, self._rows = self._rows[:size], self._rows[size:]
+            return rows
+        return self._cursor.fetchmany(size)
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StandInConnection:
+    """
+    Offline replacement for the cml.data_v1 connection object (get_cursor,
+    get_base_connection, close). connect_latency simulates authentication cost.
+    """
+
+    def __init__(self, path: str = ":memory:", connect_latency: float = 0.0):
+        time.sleep(connect_latency)
+        self.sqlite = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.database = None
+        self.statements = 0
+        self.closed = False
+
+    def get_cursor(self):
+        return StandInCursor(self)
+
+    def cursor(self):
+        return StandInCursor(self)
+
+    def get_base_connection(self):
+        return self
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed = True
+        self.sqlite.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+def seed_standin_database(path: str):
+    """Creates a few defense tables with sample rows for offline runs."""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS ais_events_ice (
+            mmsi BIGINT, event_timestamp STRING, latitude DOUBLE, longitude DOUBLE,
+            speed DOUBLE, course DOUBLE, status STRING, Destination STRING);
+        CREATE TABLE IF NOT EXISTS baltic_sea_harbours (
+            name STRING, country STRING, latitude DOUBLE, longitude DOUBLE);
+        CREATE TABLE IF NOT EXISTS sanctioned_vessels (
+            Name STRING, MMSI BIGINT, IMO BIGINT, Type STRING, Flag STRING,
+            Sanction_Reason STRING, Linked_To STRING);
+    """)
+    if conn.execute("SELECT COUNT(*) FROM baltic_sea_harbours").fetchone()[0] == 0:
+        conn.executemany("INSERT INTO baltic_sea_harbours VALUES (?, ?, ?, ?)", [
+            ("Rostock", "Germany", 54.0887, 12.1405),
+            ("Kiel", "Germany", 54.3233, 10.1228),
+            ("Gdynia", "Poland", 54.5189, 18.5305),
+        ])
+        conn.executemany("INSERT INTO ais_events_ice VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+            (123456000 + i, f"2025-10-01 12:{i:02d}:00.000", 54.1 + i * 0.01, 12.1 + i * 0.01,
+             8.5, 90.0, "Underway", "Rostock") for i in range(20)
+        ])
+        conn.execute("INSERT INTO sanctioned_vessels VALUES ('ARISTO', 123456011, 9327413, "
+                     "'Chemical/Products Tanker', 'Liberia', 'Blocked under E.O. 14024', 'Hennesea Holdings Limited')")
+    conn.commit()
+    conn.close()
+
+
+# --- Connection pool ---------------------------------------------------------------
+
+class PooledConnection:
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """
+    Bounded pool of connections for one (connection name, user, database, credentials).
+
+    Connections are handed out LIFO so the warmest one is reused first.
+    Connections idle for longer than check_interval are health-checked with
+    SELECT 1 before reuse, connections older than max_lifetime are recycled and
+    connections that failed during a call are discarded. reset runs on every
+    reused connection before it is handed out (e.g. USE <default_database>, so
+    a USE of an earlier caller does not leak into the next one).
+    """
+
+    def __init__(self, factory: Callable[[], Any], max_size: int = DEFAULT_MAX_SIZE,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT, max_lifetime: float = DEFAULT_MAX_LIFETIME,
+                 check_interval: float = DEFAULT_CHECK_INTERVAL, reset: Optional[Callable[[Any], None]] = None):
+        self.factory = factory
+        self.reset = reset
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self._idle = []
+        self._open = 0
+        self._lock = threading.Condition()
+        self.stats = {"created": 0, "reused": 0, "recycled": 0, "failed_checks": 0}
+
+    @staticmethod
+    def _close(pooled: PooledConnection):
+        try:
+            pooled.raw.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def healthy(pooled: PooledConnection) -> bool:
+        try:
+            cursor = pooled.raw.get_cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, timeout: float = DEFAULT_ACQUIRE_TIMEOUT) -> PooledConnection:
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"no connection available within {timeout:.0f}s")
+                    self._lock.wait(remaining)
+                if self._idle:
+                    pooled = self._idle.pop()
+                else:
+                    self._open += 1
+                    pooled = None
+
+            if pooled is None:
+                try:
+                    pooled = PooledConnection(self.factory())
+                except Exception:
+                    self._discard(None)
+                    raise
+                self.stats["created"] += 1
+                return pooled
+
+            # Checks run outside the lock so a slow server does not block other callers.
+            now = time.monotonic()
+            if now - pooled.created_at > self.max_lifetime:
+                self.stats["recycled"] += 1
+            elif now - pooled.last_used > self.check_interval and not self.healthy(pooled):
+                self.stats["failed_checks"] += 1
+            elif not self._reset(pooled):
+                self.stats["failed_checks"] += 1
+            else:
+                self.stats["reused"] += 1
+                return pooled
+            self._discard(pooled)
+
+    def _reset(self, pooled: PooledConnection) -> bool:
+        if self.reset is None:
+            return True
+        try:
+            self.reset(pooled.raw)
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, pooled: Optional[PooledConnection]):
+        with self._lock:
+            self._open -= 1
+            self._lock.notify()
+        if pooled is not None:
+            self._close(pooled)
+
+    def release(self, pooled: PooledConnection, broken: bool = False):
+        if broken:
+            self._discard(pooled)
+            return
+        with self._lock:
+            pooled.last_used = time.monotonic()
+            self._idle.append(pooled)
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout: float = DEFAULT_ACQUIRE_TIMEOUT, discard: bool = False):
+        """Pooled connection for one call; with discard it is closed afterwards instead of reused."""
+        pooled = self.acquire(timeout)
+        broken = discard
+        try:
+            yield pooled.raw
+        except Exception:
+            # The statement may have failed for reasons unrelated to the connection.
+            broken = discard or not self.healthy(pooled)
+            raise
+        finally:
+            self.release(pooled, broken)
+
+    def reap(self):
+        """Closes connections that have been idle longer than idle_timeout."""
+        now = time.monotonic()
+        with self._lock:
+            keep = []
+            for pooled in self._idle:
+                if now - pooled.last_used > self.idle_timeout:
+                    self._open -= 1
+                    self._close(pooled)
+                else:
+                    keep.append(pooled)
+            self._idle = keep
+
+    def close(self):
+        with self._lock:
+            for pooled in self._idle:
+                self._close(pooled)
+            self._open -= len(self._idle)
+            self._idle = []
+
+
+PoolKey = Tuple[str, str, str, str]
+
+
+def credential_digest(user_params: Dict[str, Any]) -> str:
+    """Keyed hash of user and password: a pool is only reused by callers presenting the same credentials."""
+    secret = f"{user_params['workload_user']}\0{user_params['workload_pass']}".encode("utf-8")
+    return hmac.new(_CREDENTIAL_KEY, secret, hashlib.sha256).hexdigest()
+
+
+class PoolRegistry:
+    """
+    One ConnectionPool per (connection name, user, database, credentials).
+
+    The credentials are part of the key because a warm pool does not
+    authenticate again: a wrong password gets a new pool whose first connect
+    fails, and after a password rotation the pool of the old password is
+    reaped once it is idle.
+    """
+
+    def __init__(self, connect: Callable[[Dict[str, Any]], Any], **pool_options):
+        self.connect = connect
+        self.pool_options = pool_options
+        self.pools: Dict[PoolKey, ConnectionPool] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_params: Dict[str, Any]) -> ConnectionPool:
+        key = (user_params["hive_cai_data_connection_name"], user_params["workload_user"],
+               user_params["default_database"], credential_digest(user_params))
+        with self._lock:
+            pool = self.pools.get(key)
+            if pool is None:
+                database = user_params["default_database"]
+                pool = ConnectionPool(lambda: self.connect(user_params),
+                                      reset=lambda conn: conn.get_cursor().execute(f"USE {database}"),
+                                      **self.pool_options)
+                self.pools[key] = pool
+            return pool
+
+    def reap(self):
+        with self._lock:
+            pools = list(self.pools.values())
+        for pool in pools:
+            pool.reap()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {f"{'/'.join(key[:3])}@{key[3][:8]}": dict(pool.stats, open=pool._open, idle=len(pool._idle))
+                    for key, pool in self.pools.items()}
+
+
+def cml_connect(user_params: Dict[str, Any]):
+    """Opens a cml.data_v1 connection and selects the default database once."""
+    import cml.data_v1 as cmldata
+
+    conn = cmldata.get_connection(
+        user_params["hive_cai_data_connection_name"],
+        parameters={
+            "USERNAME": user_params["workload_user"],
+            "PASSWORD": user_params["workload_pass"]
+        }
+    )
+    conn.get_cursor().execute(f"USE {user_params['default_database']}")
+    return conn
+
+
+def standin_connect_factory(path: str, connect_latency: float):
+    def connect(user_params: Dict[str, Any]):
+        conn = StandInConnection(path, connect_latency)
+        conn.get_cursor().execute(f"USE {user_params['default_database']}")
+        return conn
+    return connect
+
+
+# --- Tool host ------------------------------------------------------------------------
+
+def load_tool(name: str):
+    spec = importlib.util.spec_from_file_location(f"cdw_tool_{name}", TOOL_MODULES[name])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class ToolHost:
+    """Runs tool invocations with pooled connections."""
+
+    def __init__(self, registry: PoolRegistry):
+        self.registry = registry
+        self.tools = {name: load_tool(name) for name in TOOL_MODULES}
+
+    def invoke(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if request.get("tool") == "stats":
+            return {"output": self.registry.stats()}
+        tool = self.tools.get(request.get("tool"))
+        if tool is None:
+            return {"error": f"unknown tool: {request.get('tool')}"}
+        config = tool.UserParameters(**request["user_params"])
+        params = tool.ToolParameters(**request["tool_params"])
+        pool = self.registry.get(request["user_params"])
+        # SET options cannot be reset generically, so such a session is not handed to the next caller.
+        discard = bool(SESSION_SET_RE.search(getattr(params, "sql_query", "")))
+        try:
+            with pool.connection(discard=discard) as conn:
+                if request["tool"] == "CDW_Schema_tool":
+                    # Parallel DESCRIBEs borrow further pooled connections when they are free.
+                    output = tool.run_with_cursor(conn.get_cursor(), params, config,
+                                                  lambda: pool.connection(timeout=SCHEMA_WORKER_ACQUIRE_TIMEOUT))
+                else:
+                    output = tool.run_with_cursor(conn.get_cursor(), params, config)
+        except Exception as error:
+            output = f"SQL Execution failed. Error details: {error}"
+        return {"output": output}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = self.server.host.invoke(json.loads(line))
+            except Exception as error:
+                response = {"error": str(error)}
+            self.wfile.write((json.dumps(response, default=str) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class ToolHostServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, host: ToolHost):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        # Requests carry workload credentials: only the owner may connect, from the moment of bind().
+        previous_umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _RequestHandler)
+        finally:
+            os.umask(previous_umask)
+        self.host = host
+
+
+def call_tool_host(tool: str, user_params: Dict[str, Any], tool_params: Dict[str, Any],
+                   socket_path: str = DEFAULT_SOCKET, timeout: Optional[float] = 900.0):
+    """
+    Client side: sends one invocation to the host and returns its output.
+    Raises OSError if no host is listening, RuntimeError for errors reported by the host.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        request = {"tool": tool, "user_params": user_params, "tool_params": tool_params}
+        client.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with client.makefile("rb") as reader:
+            response = json.loads(reader.readline())
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    return response["output"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the CDW tools with pooled connections.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    parser.add_argument("--backend", choices=["cml", "standin"], default="cml")
+    parser.add_argument("--standin-db", default="/tmp/cdw_standin.sqlite")
+    parser.add_argument("--standin-connect-latency", type=float, default=2.0,
+                        help="Simulated connection/authentication time of the stand-in backend")
+    parser.add_argument("--max-size", type=int, default=DEFAULT_MAX_SIZE)
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT)
+    parser.add_argument("--max-lifetime", type=float, default=DEFAULT_MAX_LIFETIME)
+    args = parser.parse_args()
+
+    if args.backend == "standin":
+        seed_standin_database(args.standin_db)
+        connect = standin_connect_factory(args.standin_db, args.standin_connect_latency)
+    else:
+        connect = cml_connect
+
+    registry = PoolRegistry(connect, max_size=args.max_size, idle_timeout=args.idle_timeout,
+                            max_lifetime=args.max_lifetime)
+    server = ToolHostServer(args.socket, ToolHost(registry))
+
+    def reaper():
+        while True:
+            time.sleep(min(60.0, args.idle_timeout))
+            registry.reap()
+
+    threading.Thread(target=reaper, daemon=True).start()
+
+    def shutdown(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    print(f"CDW tool host listening on {args.socket} (backend={args.backend})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,66 +4,281 @@ forecast weather information for a specific geolocation.
 
 It is structured to be runnable as a standalone script or as a tool
 within a larger system, following a similar pattern to the example provided.
+
+Besides a single latitude/longitude the tool accepts a batch of positions
+(e.g. all harbours or a cluster of contacts). Batch positions are snapped to
+geohash cells and answered with the weather at the cell centre; a single
+latitude/longitude is queried at its exact coordinates. Answers come from a TTL
+cache that is persisted across invocations and keyed by API endpoint, the rest
+is fetched concurrently over one pooled aiohttp session with a request rate
+limit. Responses are reduced to the fields the agent needs. weather_stub.py
+serves WeatherAPI-shaped answers locally.
 """
+import asyncio
 import json
-import requests
+import os
+import time
 import argparse
-from typing import Type
-from pydantic import BaseModel, Field, validator
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field
+
+# Persisted cache of projected forecasts, keyed by API base URL and geohash cell / coordinates.
+WEATHER_CACHE_PATH = os.environ.get(
+    "WEATHER_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "weather_tool", "cache.json")
+)
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
 
 
 # Pydantic models to define and validate user and tool parameters.
 class UserParameters(BaseModel):
     """Configuration parameters for the WeatherAPI.com."""
     weatherapi_api_key: str = Field(description="Your WeatherAPI.com API key.")
+    weatherapi_base_url: str = Field(
+        default="http://api.weatherapi.com/v1",
+        description="Base URL of the API, e.g. http://127.0.0.1:8099/v1 for weather_stub.py."
+    )
+    cache_ttl_seconds: int = 900
+    geohash_precision: int = 5         # cells of about 4.9 x 4.9 km
+    max_concurrency: int = 8
+    requests_per_second: float = 10.0
+
+
+class Position(BaseModel):
+    latitude: float
+    longitude: float
+    label: Optional[str] = None
 
 
 class ToolParameters(BaseModel):
     """Input parameters for the tool call."""
-    latitude: float = Field(
+    latitude: Optional[float] = Field(
+        default=None,
         description="The latitude of the location (e.g., 51.5074)."
     )
-    longitude: float = Field(
+    longitude: Optional[float] = Field(
+        default=None,
         description="The longitude of the location (e.g., -0.1278)."
     )
-    
+    positions: Optional[List[Position]] = Field(
+        default=None,
+        description="Batch of positions [{'latitude': .., 'longitude': .., 'label': ..}] instead of latitude/longitude."
+    )
+
+
+def geohash_encode(lat: float, lon: float, precision: int) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def geohash_center(cell: str) -> Tuple[float, float]:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        index = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (index >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return round((lat_range[0] + lat_range[1]) / 2, 4), round((lon_range[0] + lon_range[1]) / 2, 4)
+
+
+def project(data: dict) -> dict:
+    """Keeps the fields relevant for maritime operations from a forecast.json response."""
+    current = data.get("current", {})
+    return {
+        "location": data.get("location", {}).get("name"),
+        "current": {
+            "time": current.get("last_updated"),
+            "condition": current.get("condition", {}).get("text"),
+            "temp_c": current.get("temp_c"),
+            "wind_kph": current.get("wind_kph"),
+            "wind_dir": current.get("wind_dir"),
+            "gust_kph": current.get("gust_kph"),
+            "vis_km": current.get("vis_km"),
+            "precip_mm": current.get("precip_mm"),
+            "pressure_mb": current.get("pressure_mb"),
+        },
+        "forecast": [
+            {
+                "date": day.get("date"),
+                "condition": day.get("day", {}).get("condition", {}).get("text"),
+                "mintemp_c": day.get("day", {}).get("mintemp_c"),
+                "maxtemp_c": day.get("day", {}).get("maxtemp_c"),
+                "maxwind_kph": day.get("day", {}).get("maxwind_kph"),
+                "totalprecip_mm": day.get("day", {}).get("totalprecip_mm"),
+                "avgvis_km": day.get("day", {}).get("avgvis_km"),
+            }
+            for day in data.get("forecast", {}).get("forecastday", [])
+        ],
+    }
+
+
+def load_cache(path: str) -> Dict[str, dict]:
+    try:
+        with open(path, encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(path: str, cache: Dict[str, dict], ttl: int):
+    now = time.time()
+    cache = {cell: entry for cell, entry in cache.items() if now - entry["fetched_at"] < ttl}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(cache, handle)
+    os.replace(tmp_path, path)
+
+
+class RateLimiter:
+    """Token bucket shared by the concurrent fetches."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(1.0, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self.tokens) / self.rate)
+
+
+async def fetch_forecasts(config: UserParameters, locations: Dict[str, Tuple[float, float]]) -> Dict[str, dict]:
+    """Fetches the forecast for each (lat, lon); failed keys map to {"error": ...}."""
+    import aiohttp
+
+    limiter = RateLimiter(config.requests_per_second)
+    semaphore = asyncio.Semaphore(config.max_concurrency)
+    url = f"{config.weatherapi_base_url.rstrip('/')}/forecast.json"
+
+    async def fetch(session, key):
+        lat, lon = locations[key]
+        params = {"key": config.weatherapi_api_key, "q": f"{lat},{lon}", "days": 3}
+        error = {"error": "HTTP error occurred: 429 - rate limited by the API."}
+        async with semaphore:
+            for attempt in range(3):
+                await limiter.wait()
+                try:
+                    async with session.get(url, params=params) as response:
+                        if response.status == 429:
+                            if attempt < 2:
+                                await asyncio.sleep(0.5 * 2 ** attempt)
+                                continue
+                            return key, error
+                        if response.status >= 400:
+                            return key, {"error": f"HTTP error occurred: {response.status} - Check your API key or the location."}
+                        return key, project(await response.json())
+                except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                    error = {"error": f"An error occurred: {err}"}
+            return key, error
+
+    connector = aiohttp.TCPConnector(limit=config.max_concurrency)
+    timeout = aiohttp.ClientTimeout(total=30)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        return dict(await asyncio.gather(*(fetch(session, key) for key in locations)))
+
+
+def lookup(config: UserParameters, positions: List[Position], cache_path: str = WEATHER_CACHE_PATH,
+           exact: bool = False) -> dict:
+    """
+    Weather for a batch of positions, one upstream request per uncached geohash
+    cell. With exact=True each position is queried at its own coordinates.
+    """
+    if exact:
+        cells = [f"{p.latitude},{p.longitude}" for p in positions]
+    else:
+        cells = [geohash_encode(p.latitude, p.longitude, config.geohash_precision) for p in positions]
+    # Entries of other endpoints (e.g. weather_stub.py) are never served for this one.
+    endpoint = config.weatherapi_base_url.rstrip("/")
+    cache = load_cache(cache_path)
+    now = time.time()
+    fresh = {cell for cell in set(cells) if f"{endpoint}|{cell}" in cache
+             and now - cache[f"{endpoint}|{cell}"]["fetched_at"] < config.cache_ttl_seconds}
+    missing = sorted(set(cells) - fresh)
+
+    locations = {cell: (p.latitude, p.longitude) if exact else geohash_center(cell)
+                 for p, cell in zip(positions, cells) if cell in missing}
+    fetched = asyncio.run(fetch_forecasts(config, locations)) if missing else {}
+    for cell, data in fetched.items():
+        if "error" not in data:
+            cache[f"{endpoint}|{cell}"] = {"fetched_at": now, "data": data}
+    if fetched:
+        save_cache(cache_path, cache, config.cache_ttl_seconds)
+
+    # Positions reference their cell so a forecast shared by many positions is listed once.
+    results = []
+    for position, cell in zip(positions, cells):
+        entry = {"latitude": position.latitude, "longitude": position.longitude, "geohash": cell}
+        if position.label:
+            entry["label"] = position.label
+        results.append(entry)
+    return {
+        "results": results,
+        "weather": {cell: cache[f"{endpoint}|{cell}"]["data"] if cell in fresh or "error" not in fetched[cell]
+                    else fetched[cell] for cell in sorted(set(cells))},
+        "stats": {"positions": len(positions), "cells": len(set(cells)),
+                  "cache_hits": len(fresh), "fetched": len(missing)},
+    }
+
+
 def run_tool(
     config: UserParameters,
     args: ToolParameters,
 ):
     """
-    Fetches weather data from the WeatherAPI.com for the specified geolocation.
-    
+    Fetches weather data from the WeatherAPI.com for the specified geolocation(s).
+
     Args:
         config (UserParameters): The API configuration, including the API key.
-        args (ToolParameters): The geolocation details (latitude and longitude).
-    
+        args (ToolParameters): A single latitude/longitude or a batch of positions.
+
     Returns:
-        str: A JSON string of the raw weather data or an error message.
+        str: A compact JSON string of the projected weather data or an error message.
     """
-    # Base URL for the WeatherAPI.com forecast API endpoint
-    base_url = "http://api.weatherapi.com/v1/forecast.json"
-    
-    # Construct the API call URL with the geolocation and API key
-    params = {
-        "key": config.weatherapi_api_key,
-        "q": f"{args.latitude},{args.longitude}",  # WeatherAPI uses a single 'q' parameter for lat/lon
-        "days": 3  # Retrieve current and a 3-day forecast
-    }
-    
+    positions = args.positions
+    if not positions:
+        if args.latitude is None or args.longitude is None:
+            return "An error occurred: provide latitude and longitude or positions."
+        positions = [Position(latitude=args.latitude, longitude=args.longitude)]
+
     try:
-        # Make the GET request to the WeatherAPI.com
-        response = requests.get(base_url, params=params)
-        response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-        
-        # Return the JSON response as a formatted string
-        return json.dumps(response.json(), indent=2)
-        
-    except requests.exceptions.HTTPError as http_err:
-        return f"HTTP error occurred: {http_err} - Check your API key or the location."
+        result = lookup(config, positions, exact=args.positions is None)
     except Exception as err:
         return f"An error occurred: {err}"
 
+    if args.positions is None:
+        # Single position: keep the previous shape of a single forecast.
+        return json.dumps(result["weather"][result["results"][0]["geohash"]])
+    return json.dumps(result)
+
 
 # --- Script Execution ---
 # This part of the code allows the program to be executed from the command line.
@@ -73,22 +288,23 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Call the WeatherAPI.com to get weather data."
     )
-    
+
     # Define arguments for the script
     parser.add_argument(
-        "--user-params", 
+        "--user-params",
         required=True,
         help="JSON string for user configuration parameters (e.g., {'weatherapi_api_key': 'your_key'})"
     )
-    
+
     parser.add_argument(
         "--tool-params",
         required=True,
-        help="JSON string for tool arguments (e.g., {'latitude': 51.5, 'longitude': -0.1})"
+        help="JSON string for tool arguments (e.g., {'latitude': 51.5, 'longitude': -0.1} "
+             "or {'positions': [{'latitude': 54.3, 'longitude': 10.1, 'label': 'Kiel'}]})"
     )
-    
+
     args = parser.parse_args()
-    
+
     # Parse JSON strings into Python dictionaries
     try:
         config_dict = json.loads(args.user_params)
@@ -96,7 +312,7 @@ if __name__ == "__main__":
     except json.JSONDecodeError as e:
         print(f"Error decoding JSON: {e}")
         exit(1)
-    
+
     # Validate the dictionaries against Pydantic models
     try:
         config = UserParameters(**config_dict)
@@ -0,0 +1,109 @@
+"""
+Local stand-in for the WeatherAPI.com forecast endpoint.
+
+Answers GET /v1/forecast.json?key=..&q=lat,lon&days=N with a deterministic,
+WeatherAPI-shaped response so the Weather_tool batch mode can be exercised
+without an API key or network. Requests are counted and logged so cache hits
+and concurrency are visible.
+
+    python weather_stub.py --port 8099 --latency 0.2
+    python tool.py --user-params '{"weatherapi_api_key": "x", "weatherapi_base_url": "http://127.0.0.1:8099/v1"}' \
+        --tool-params '{"positions": [{"latitude": 54.32, "longitude": 10.14, "label": "Kiel"}]}'
+"""
+import argparse
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CONDITIONS = ["Sunny", "Partly cloudy", "Overcast", "Mist", "Light rain", "Moderate rain", "Fog"]
+
+
+def forecast(lat: float, lon: float, days: int) -> dict:
+    seed = int(abs(lat * 1000) + abs(lon * 1000))
+    today = datetime.date.today()
+    return {
+        "location": {"name": f"Stub {lat:.2f},{lon:.2f}", "lat": lat, "lon": lon, "tz_id": "Europe/Berlin"},
+        "current": {
+            "last_updated": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
+            "temp_c": round(5 + seed % 15 + 0.5, 1),
+            "condition": {"text": CONDITIONS[seed % len(CONDITIONS)], "code": 1000 + seed % 7},
+            "wind_kph": round(5 + seed % 40, 1),
+            "wind_dir": ["N", "NE", "E", "SE", "S", "SW", "W", "NW"][seed % 8],
+            "gust_kph": round(10 + seed % 55, 1),
+            "vis_km": float(2 + seed % 9),
+            "precip_mm": round((seed % 5) * 0.3, 1),
+            "pressure_mb": float(990 + seed % 40),
+            "humidity": 60 + seed % 40,
+            "cloud": seed % 100,
+        },
+        "forecast": {"forecastday": [
+            {
+                "date": (today + datetime.timedelta(days=offset)).isoformat(),
+                "day": {
+                    "maxtemp_c": round(8 + (seed + offset) % 12, 1),
+                    "mintemp_c": round(1 + (seed + offset) % 6, 1),
+                    "maxwind_kph": round(10 + (seed + offset) % 45, 1),
+                    "totalprecip_mm": round(((seed + offset) % 7) * 0.8, 1),
+                    "avgvis_km": float(3 + (seed + offset) % 8),
+                    "condition": {"text": CONDITIONS[(seed + offset) % len(CONDITIONS)]},
+                },
+                # Hourly data makes the upstream response large; the tool drops it.
+                "hour": [{"time": f"{today + datetime.timedelta(days=offset)} {hour:02d}:00",
+                          "temp_c": 5.0 + hour % 7, "wind_kph": 10.0 + hour} for hour in range(24)],
+            }
+            for offset in range(days)
+        ]},
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path.rstrip("/") != "/v1/forecast.json":
+            return self.reply(404, {"error": {"code": 1005, "message": "API method not found."}})
+        if not query.get("key"):
+            return self.reply(401, {"error": {"code": 1002, "message": "API key is invalid or not provided."}})
+        try:
+            lat, lon = (float(part) for part in query["q"][0].split(","))
+        except (KeyError, ValueError):
+            return self.reply(400, {"error": {"code": 1006, "message": "No location found matching parameter 'q'"}})
+        with self.server.lock:
+            self.server.requests += 1
+        time.sleep(self.server.latency)
+        self.reply(200, forecast(lat, lon, int(query.get("days", ["1"])[0])))
+
+    def reply(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, fmt, *args):
+        print(f"[stub #{self.server.requests}] {fmt % args}")
+
+
+def serve(port: int, latency: float) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.latency = latency
+    server.requests = 0
+    server.lock = threading.Lock()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local WeatherAPI.com stand-in.")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated upstream latency in seconds")
+    args = parser.parse_args()
+    server = serve(args.port, args.latency)
+    print(f"Weather stub listening on http://127.0.0.1:{args.port}/v1/forecast.json")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
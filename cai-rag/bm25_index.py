@@ -0,0 +1,429 @@
+"""
+Local BM25 retrieval index over the cai-rag corpus.
+
+Layout of an index directory:
+
+    manifest.json        segments, indexed files (path -> sha1), deleted chunks ("seg-0001:17")
+    seg-0001/
+        lexicon.json     term -> [offset, nbytes, df] into postings.bin
+        postings.bin     per term: varint (doc gap, tf) pairs, memory-mapped at query time
+        chunks.json      per chunk: [chunk_id, doc, heading, line, token count, text offset, text bytes]
+        texts.bin        chunk texts (utf-8), memory-mapped, read only for returned hits
+
+Chunks come from chunking.py (Chapter / Section / numbered headings). Adding or
+changing a Meldung writes a new small segment and marks the chunks of an older
+version of the same file as deleted, so the existing segments are never
+rewritten. compact() merges all segments into one.
+
+    python bm25_index.py build
+    python bm25_index.py add meldungen/luftraum-rostock.txt
+    python bm25_index.py query "ED-R Rostock Flugbeschränkung" -k 5
+    python bm25_index.py bench --scale 20
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import statistics
+import tempfile
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from chunking import CORPUS_DIR, Chunk, chunk_file, corpus_files
+
+INDEX_DIR = os.environ.get("CAI_RAG_INDEX_DIR", os.path.join(CORPUS_DIR, "index"))
+K1 = 1.2
+B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has in is it its of on or that the this to was were will with which
+der die das den dem des ein eine einer eines und oder ist sind im in am an auf aus bei mit von vom zu zum zur
+für über unter nach durch wird werden als auch nicht
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_RE.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+def encode_varints(values: Iterable[int], out: bytearray):
+    for value in values:
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+
+def decode_postings(buffer, offset: int, nbytes: int) -> List[Tuple[int, int]]:
+    """(local doc id, tf) pairs from the varint (doc gap, tf) stream at buffer[offset:offset + nbytes]."""
+    data = buffer[offset:offset + nbytes]
+    values = []
+    value = shift = 0
+    for byte in data:
+        if byte & 0x80:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+        else:
+            values.append(value | (byte << shift))
+            value = shift = 0
+    postings = []
+    doc = 0
+    for i in range(0, len(values), 2):
+        doc += values[i]
+        postings.append((doc, values[i + 1]))
+    return postings
+
+
+@dataclass
+class Hit:
+    score: float
+    chunk_id: str
+    doc: str
+    heading: str
+    line: int
+    text: str
+
+
+class Segment:
+    """One immutable on-disk segment; postings and texts are memory-mapped."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, "lexicon.json"), encoding="utf-8") as handle:
+            self.lexicon: Dict[str, List[int]] = json.load(handle)
+        with open(os.path.join(path, "chunks.json"), encoding="utf-8") as handle:
+            self.chunks: List[List] = json.load(handle)
+        self._files = []
+        self.postings = self._map("postings.bin")
+        self.texts = self._map("texts.bin")
+
+    def _map(self, name: str):
+        handle = open(os.path.join(self.path, name), "rb")
+        self._files.append(handle)
+        if os.fstat(handle.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def postings_for(self, term: str) -> List[Tuple[int, int]]:
+        entry = self.lexicon.get(term)
+        return decode_postings(self.postings, entry[0], entry[1]) if entry else []
+
+    def text(self, local_id: int) -> str:
+        _, _, _, _, _, offset, nbytes = self.chunks[local_id]
+        return bytes(self.texts[offset:offset + nbytes]).decode("utf-8")
+
+    def close(self):
+        for mapped in (self.postings, self.texts):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        for handle in self._files:
+            handle.close()
+
+
+def write_segment(path: str, chunks: List[Chunk]):
+    """Writes chunks as a new segment directory (via a temporary directory and rename)."""
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+    records = []
+    texts = bytearray()
+    for local_id, chunk in enumerate(chunks):
+        counts = Counter(tokenize(f"{chunk.heading}\n{chunk.text}"))
+        for term, tf in counts.items():
+            postings[term].append((local_id, tf))
+        encoded = chunk.text.encode("utf-8")
+        records.append([chunk.chunk_id, chunk.doc, chunk.heading, chunk.line, sum(counts.values()),
+                        len(texts), len(encoded)])
+        texts += encoded
+
+    lexicon = {}
+    blob = bytearray()
+    for term in sorted(postings):
+        start = len(blob)
+        previous = 0
+        for local_id, tf in postings[term]:
+            encode_varints((local_id - previous, tf), blob)
+            previous = local_id
+        lexicon[term] = [start, len(blob) - start, len(postings[term])]
+
+    with open(os.path.join(tmp_path, "postings.bin"), "wb") as handle:
+        handle.write(blob)
+    with open(os.path.join(tmp_path, "texts.bin"), "wb") as handle:
+        handle.write(texts)
+    with open(os.path.join(tmp_path, "lexicon.json"), "w", encoding="utf-8") as handle:
+        json.dump(lexicon, handle, ensure_ascii=False, separators=(",", ":"))
+    with open(os.path.join(tmp_path, "chunks.json"), "w", encoding="utf-8") as handle:
+        json.dump(records, handle, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def file_sha1(path: str) -> str:
+    with open(path, "rb") as handle:
+        return hashlib.sha1(handle.read()).hexdigest()
+
+
+class BM25Index:
+    """
+    Reader and incremental writer. Statistics (N, avgdl, df) are global across
+    segments; df still counts deleted chunks until the next compact(), as in
+    most segment-based engines.
+    """
+
+    def __init__(self, path: str, manifest: Dict):
+        self.path = path
+        self.manifest = manifest
+        self.segments = [Segment(os.path.join(path, name)) for name in manifest["segments"]]
+        self.deleted = set(manifest["deleted"])
+        self._stats()
+
+    def _stats(self):
+        self.bases = []
+        self.skip = []      # deleted local ids per segment
+        base = 0
+        total_tokens = 0
+        for segment in self.segments:
+            self.bases.append(base)
+            self.skip.append({i for i in range(len(segment.chunks)) if f"{segment.name}:{i}" in self.deleted})
+            base += len(segment.chunks)
+            total_tokens += sum(record[4] for record in segment.chunks)
+        self.doc_count = base
+        self.avgdl = total_tokens / base if base else 0.0
+
+    @classmethod
+    def open(cls, path: str = INDEX_DIR) -> "BM25Index":
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as handle:
+            return cls(path, json.load(handle))
+
+    @classmethod
+    def create(cls, path: str = INDEX_DIR) -> "BM25Index":
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        index = cls(path, {"segments": [], "files": {}, "deleted": [], "next_segment": 1})
+        index._save_manifest()
+        return index
+
+    def _save_manifest(self):
+        self.manifest["deleted"] = sorted(self.deleted)
+        tmp_path = os.path.join(self.path, "manifest.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(self.manifest, handle, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, os.path.join(self.path, "manifest.json"))
+
+    def _add_segment(self, chunks: List[Chunk]):
+        name = f"seg-{self.manifest['next_segment']:04d}"
+        self.manifest["next_segment"] += 1
+        write_segment(os.path.join(self.path, name), chunks)
+        self.manifest["segments"].append(name)
+        self.segments.append(Segment(os.path.join(self.path, name)))
+        self._stats()
+
+    def add_chunks(self, chunks: List[Chunk]):
+        """Adds chunks of new or changed files; chunks of older versions of these files are deleted."""
+        if not chunks:
+            return
+        self._delete_docs({chunk.doc for chunk in chunks})
+        self._add_segment(chunks)
+        self._save_manifest()
+
+    def add_files(self, paths: Iterable[str], corpus_dir: str = CORPUS_DIR) -> Dict[str, int]:
+        """Indexes new or modified files in one segment; unchanged files (same sha1) are skipped."""
+        chunks = []
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "chunks": 0}
+        for path in paths:
+            doc = os.path.relpath(os.path.abspath(path), corpus_dir)
+            digest = file_sha1(path)
+            known = self.manifest["files"].get(doc)
+            if known == digest:
+                stats["unchanged"] += 1
+                continue
+            stats["updated" if known else "added"] += 1
+            chunks += chunk_file(path, corpus_dir)
+            self.manifest["files"][doc] = digest
+        stats["chunks"] = len(chunks)
+        self.add_chunks(chunks)
+        if not chunks:
+            self._save_manifest()
+        return stats
+
+    def _delete_docs(self, docs):
+        for segment in self.segments:
+            self.deleted.update(f"{segment.name}:{i}" for i, record in enumerate(segment.chunks) if record[1] in docs)
+        self._stats()
+
+    def remove_file(self, doc: str):
+        self._delete_docs({doc})
+        self.manifest["files"].pop(doc, None)
+        self._save_manifest()
+
+    def compact(self):
+        """Rewrites all live chunks into a single segment."""
+        live = [Chunk(record[0], record[1], record[2], segment.text(local_id), record[3])
+                for segment, skip in zip(self.segments, self.skip)
+                for local_id, record in enumerate(segment.chunks) if local_id not in skip]
+        old = list(self.manifest["segments"])
+        self.close()
+        self.segments, self.manifest["segments"], self.deleted = [], [], set()
+        self._add_segment(live)
+        self._save_manifest()
+        for name in old:
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def search(self, query: str, k: int = 10, doc_prefix: Optional[str] = None) -> List[Hit]:
+        terms = Counter(tokenize(query))
+        if not terms or not self.doc_count:
+            return []
+        scores: Dict[int, float] = defaultdict(float)
+        for term, query_tf in terms.items():
+            df = sum(segment.lexicon[term][2] for segment in self.segments if term in segment.lexicon)
+            if not df:
+                continue
+            idf = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+            for base, segment, skip in zip(self.bases, self.segments, self.skip):
+                chunks = segment.chunks
+                for local_id, tf in segment.postings_for(term):
+                    if local_id in skip or (doc_prefix and not chunks[local_id][1].startswith(doc_prefix)):
+                        continue
+                    norm = K1 * (1 - B + B * chunks[local_id][4] / self.avgdl)
+                    scores[base + local_id] += query_tf * idf * tf * (K1 + 1) / (tf + norm)
+
+        hits = []
+        for global_id, score in heapq.nlargest(k, scores.items(), key=lambda item: item[1]):
+            segment, local_id = self._locate(global_id)
+            record = segment.chunks[local_id]
+            hits.append(Hit(round(score, 4), record[0], record[1], record[2], record[3], segment.text(local_id)))
+        return hits
+
+    def _locate(self, global_id: int) -> Tuple[Segment, int]:
+        for base, segment in zip(reversed(self.bases), reversed(self.segments)):
+            if global_id >= base:
+                return segment, global_id - base
+        raise IndexError(global_id)
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+
+
+def build_index(path: str = INDEX_DIR, files: Optional[List[str]] = None,
+                corpus_dir: str = CORPUS_DIR) -> BM25Index:
+    """Full build of the corpus (doc/ and meldungen/) into a fresh index directory."""
+    index = BM25Index.create(path)
+    index.add_files(files if files is not None else corpus_files(corpus_dir), corpus_dir)
+    return index
+
+
+BENCH_QUERIES = [
+    "joint operations planning", "operations assessment measures of effectiveness",
+    "command and control relationships", "host nation support logistics",
+    "ED-R Rostock Flugbeschränkung", "Transponderpflicht RMZ TMZ München", "stabilization and reconstruction",
+    "maritime interdiction operation", "rules of engagement", "Aktivierungszeiten Oktoberfest",
+    "information environment", "civil-military cooperation", "air and missile defence",
+    "non-combatant evacuation operation", "Seitliche Begrenzung Kreis Radius",
+]
+
+
+def benchmark(scale: int, queries: int, k: int):
+    """Build time for the corpus repeated scale times, incremental add time and query latency."""
+    workdir = tempfile.mkdtemp(prefix="bm25_bench_")
+    try:
+        base_chunks = [chunk for path in corpus_files() for chunk in chunk_file(path)]
+        chunks = [Chunk(f"copy{copy}/{chunk.chunk_id}", f"copy{copy}/{chunk.doc}", chunk.heading, chunk.text,
+                        chunk.line) for copy in range(scale) for chunk in base_chunks]
+        start = time.perf_counter()
+        index = BM25Index.create(workdir)
+        index.add_chunks(chunks)
+        build_seconds = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(workdir) for name in names)
+        postings_bytes = sum(os.path.getsize(os.path.join(segment.path, "postings.bin"))
+                             for segment in index.segments)
+        print(f"build: {len(chunks)} chunks ({scale}x corpus) in {build_seconds:.2f}s, "
+              f"index {size / 1e6:.1f} MB (postings {postings_bytes / 1e6:.2f} MB), "
+              f"{len(index.segments[0].lexicon)} terms")
+        index.close()
+
+        start = time.perf_counter()
+        index = BM25Index.open(workdir)
+        print(f"open: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        melding = next(path for path in corpus_files() if "meldungen" in path)
+        start = time.perf_counter()
+        index.add_chunks([Chunk(f"new/{chunk.chunk_id}", f"new/{chunk.doc}", chunk.heading, chunk.text, chunk.line)
+                          for chunk in chunk_file(melding)])
+        print(f"incremental add of {os.path.basename(melding)}: {(time.perf_counter() - start) * 1000:.1f} ms "
+              f"({len(index.segments)} segments)")
+
+        latencies = []
+        for i in range(queries):
+            start = time.perf_counter()
+            index.search(BENCH_QUERIES[i % len(BENCH_QUERIES)], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        print(f"query: {queries} queries, top-{k}, p50 {statistics.median(latencies):.2f} ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms, max {latencies[-1]:.2f} ms")
+        index.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_hits(hits: List[Hit], width: int):
+    for rank, hit in enumerate(hits, start=1):
+        snippet = " ".join(hit.text.split())[:width]
+        print(f"{rank:2d}. {hit.score:7.3f}  {hit.doc}:{hit.line}  [{hit.heading}]\n    {snippet}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BM25 index over the cai-rag documents.")
+    parser.add_argument("--index", default=INDEX_DIR, help="Index directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("build", help="Full build of doc/ and meldungen/")
+    add = commands.add_parser("add", help="Add new or changed files without a rebuild")
+    add.add_argument("files", nargs="+")
+    remove = commands.add_parser("remove", help="Delete a document (path relative to cai-rag/)")
+    remove.add_argument("doc")
+    commands.add_parser("compact", help="Merge all segments and drop deleted chunks")
+    query = commands.add_parser("query", help="BM25 top-k search")
+    query.add_argument("text")
+    query.add_argument("-k", type=int, default=5)
+    query.add_argument("--doc-prefix", help="Restrict hits, e.g. meldungen/")
+    query.add_argument("--width", type=int, default=200)
+    bench = commands.add_parser("bench", help="Build time and query latency")
+    bench.add_argument("--scale", type=int, default=20, help="Corpus copies to index")
+    bench.add_argument("--queries", type=int, default=300)
+    bench.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index = build_index(args.index)
+        print(f"{index.doc_count} chunks from {len(index.manifest['files'])} files "
+              f"in {time.perf_counter() - start:.2f}s -> {args.index}")
+    elif args.command == "add":
+        index = BM25Index.open(args.index)
+        print(index.add_files(args.files))
+    elif args.command == "remove":
+        BM25Index.open(args.index).remove_file(args.doc)
+    elif args.command == "compact":
+        index = BM25Index.open(args.index)
+        index.compact()
+        print(f"{index.doc_count} chunks in 1 segment")
+    elif args.command == "query":
+        index = BM25Index.open(args.index)
+        start = time.perf_counter()
+        hits = index.search(args.text, args.k, args.doc_prefix)
+        elapsed = (time.perf_counter() - start) * 1000
+        print_hits(hits, args.width)
+        print(f"({len(hits)} hits in {elapsed:.2f} ms)")
+    elif args.command == "bench":
+        benchmark(args.scale, args.queries, args.k)
@@ -0,0 +1,102 @@
+"""
+Section-aware chunking of the cai-rag corpus.
+
+NATO_operations.txt (AJP-3) is split at its Chapter / Section / Annex / Lexicon
+headings, the Meldungen at their numbered headings ("1.", "2.1 ..."). Page
+running headers ("AJP-3", "Edition C Version 1", "Annex A to ... AJP-3") are
+dropped. Sections longer than max_chars are cut at paragraph boundaries; every
+chunk keeps its heading path so hits can be cited.
+"""
+
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+from typing import Iterator, List
+
+DEFAULT_MAX_CHARS = 1500
+CORPUS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_RUNNING_HEADER_RE = re.compile(
+    r"^(AJP-3|.*\bAJP-3|(\S+ )?Edition C Version 1( \S+)?|Intentionally blank|[ivxlc]+|\d+-\d+)$"
+)
+_DOCTRINE_HEADING_RE = re.compile(r"^(Chapter \d+\b|Section \d+\b|ANNEX [A-Z]\b|Annex [A-Z] –|Lexicon$)")
+_NUMBERED_HEADING_RE = re.compile(r"^(\d+\.)(\d+)?\s+\S.{0,80}$")
+_PARAGRAPH_RE = re.compile(r"^(\d+\.\d+|[A-Z]\.\d+|[a-z]\)|•)\s")
+
+
+@dataclass
+class Chunk:
+    chunk_id: str          # "<relative path>#<n>"
+    doc: str               # path relative to the corpus directory
+    heading: str           # "Chapter 1 – Fundamentals > Section 1 – Introduction"
+    text: str
+    line: int              # first line of the chunk in the source file
+
+    @property
+    def content_hash(self) -> str:
+        return hashlib.sha1(self.text.encode("utf-8")).hexdigest()
+
+
+def _split_long(lines: List[str], max_chars: int) -> Iterator[List[str]]:
+    """Cuts a section at paragraph starts (1.2, A.3, a), •) into pieces of at most max_chars."""
+    piece: List[str] = []
+    size = 0
+    for line in lines:
+        if piece and size + len(line) > max_chars and (_PARAGRAPH_RE.match(line) or size > 2 * max_chars):
+            yield piece
+            piece, size = [], 0
+        piece.append(line)
+        size += len(line) + 1
+    if piece:
+        yield piece
+
+
+def chunk_text(text: str, doc: str, max_chars: int = DEFAULT_MAX_CHARS) -> List[Chunk]:
+    doctrine = "AJP-3" in text[:2000]
+    heading_re = _DOCTRINE_HEADING_RE if doctrine else _NUMBERED_HEADING_RE
+    title = next((line.strip() for line in text.splitlines() if line.strip()), doc)
+
+    sections = []   # (heading path, first line number, lines)
+    path: List[str] = [] if doctrine else [title]
+    current: List[str] = []
+    start = 1
+    for number, raw in enumerate(text.splitlines(), start=1):
+        line = raw.strip()
+        if not line or (doctrine and _RUNNING_HEADER_RE.match(line)):
+            continue
+        if heading_re.match(line):
+            if current:
+                sections.append((" > ".join(path), start, current))
+            current, start = [], number
+            if doctrine:
+                level = 1 if line.startswith("Section") else 0
+                path = path[:level] + [line]
+            else:
+                level = 2 if _NUMBERED_HEADING_RE.match(line).group(2) else 1
+                path = path[:level] + [line]
+        current.append(line)
+    if current:
+        sections.append((" > ".join(path), start, current))
+
+    chunks = []
+    for heading, line_number, lines in sections:
+        for piece in _split_long(lines, max_chars):
+            chunks.append(Chunk(f"{doc}#{len(chunks)}", doc, heading, "\n".join(piece), line_number))
+    return chunks
+
+
+def chunk_file(path: str, corpus_dir: str = CORPUS_DIR, max_chars: int = DEFAULT_MAX_CHARS) -> List[Chunk]:
+    with open(path, encoding="utf-8") as handle:
+        text = handle.read()
+    return chunk_text(text, os.path.relpath(os.path.abspath(path), corpus_dir), max_chars)
+
+
+def corpus_files(corpus_dir: str = CORPUS_DIR) -> List[str]:
+    """doc/*.txt and meldungen/*.txt below the corpus directory."""
+    files = []
+    for sub in ("doc", "meldungen"):
+        folder = os.path.join(corpus_dir, sub)
+        if os.path.isdir(folder):
+            files += sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(".txt"))
+    return files
@@ -0,0 +1,539 @@
+"""
+Airspace restrictions from the Meldungen as structured records plus a
+spatio-temporal index.
+
+parse_notice() turns a DFS / BMV notice into Restriction records:
+
+    lateral   "Kreis mit 3 NM Radius um 48 07 59 N 011 33 53 E"      -> circle
+              "1.5 NM Radius um den Bezugspunk 54 09 05 N 012 06 12 O" -> circle
+              three or more coordinates without a radius               -> polygon
+    vertical  "GND - FL100", "GND – 1000 Fuß AMSL"                     -> lower_ft / upper_ft
+    validity  "20 SEP 2025 - 05 OCT 2025 täglich 0600-2330",
+              "Vom 25. August 2025 00:00 Uhr UTC bis zum 12. September 2025 23:59 Uhr UTC."
+
+A restriction starts at its "Seitliche Begrenzung" paragraph and is named by
+the last quoted designator before it ("ED-R Rostock", "RMZ/TMZ München").
+Notices without a lateral definition (e.g. "ED-R 148 zeitweise aktiv") are
+reported as unparsed.
+
+RestrictionIndex keeps an STR-packed R-tree over the restriction bounding
+boxes and an interval tree over the validity windows. lookup() answers
+"which restrictions are active at (lat, lon, t[, alt])" for numpy batches: the
+interval tree selects the restrictions valid in the batch's time span, the
+R-tree is traversed once for the whole batch with point masks per node, and
+only the points reaching a leaf get the exact circle / polygon, daily window
+and altitude tests.
+
+    python restrictions.py parse
+    python restrictions.py enrich --input gps_jammer_events.parquet --kind gps_jammer --output enriched.parquet
+    python restrictions.py bench --points 1000000 --synthetic 5000 --verify
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from chunking import CORPUS_DIR
+
+MELDUNGEN_DIR = os.path.join(CORPUS_DIR, "meldungen")
+EARTH_RADIUS_KM = 6371.0
+KM_PER_NM = 1.852
+FEET_PER_METRE = 3.28084
+RTREE_FANOUT = 16
+
+# Column presets for enrich(): defense.gps_jammer_events and ais_events_ice tracks.
+INPUT_KINDS = {
+    "gps_jammer": {"lat": "latitude", "lon": "longitude", "time": "ts", "alt": None},
+    "track": {"lat": "latitude", "lon": "longitude", "time": "event_timestamp", "alt": None},
+}
+
+MONTHS = {
+    "jan": 1, "januar": 1, "january": 1, "feb": 2, "februar": 2, "february": 2, "mar": 3, "mär": 3, "märz": 3,
+    "march": 3, "apr": 4, "april": 4, "may": 5, "mai": 5, "jun": 6, "juni": 6, "june": 6, "jul": 7, "juli": 7,
+    "july": 7, "aug": 8, "august": 8, "sep": 9, "sept": 9, "september": 9, "oct": 10, "okt": 10,
+    "oktober": 10, "october": 10, "nov": 11, "november": 11, "dec": 12, "dez": 12, "dezember": 12,
+    "december": 12,
+}
+
+_HEADING_RE = re.compile(r"^(\d+(?:\.\d+)?)\.?\s+([A-ZÄÖÜ][a-zäöüß].*)$")
+_DESIGNATOR_RE = re.compile(r"[\"„“]((?:ED-[RDP]|RMZ|TMZ|TRA|TSA)[^\"“”]*)[\"“”]")
+_COORD_RE = re.compile(r"(\d{1,2})\s+(\d{2})\s+(\d{2}(?:[.,]\d+)?)\s*([NS])\s+(\d{1,3})\s+(\d{2})\s+(\d{2}(?:[.,]\d+)?)\s*([EOW])")
+_RADIUS_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(NM|km|m)\s+Radius", re.IGNORECASE)
+_DATE_RE = re.compile(r"(\d{1,2})\.?\s+([A-Za-zÄÖÜäöü]{3,9})\.?\s+(\d{4})(?:\s+(\d{2}):?(\d{2}))?")
+_DAILY_RE = re.compile(r"(?:täglich|daily)\s+(\d{2})(\d{2})\s*-\s*(\d{2})(\d{2})", re.IGNORECASE)
+_PERIOD_RE = re.compile(r"\(([^()]*\d{4}\s*[-–][^()]*\d{4})\)")
+_LEVEL_RE = re.compile(r"(GND|SFC|Grund)|FL\s*(\d+)|(\d+(?:[.,]\d+)?)\s*(ft|Fuß|FT|m)\b", re.IGNORECASE)
+
+
+@dataclass
+class Restriction:
+    name: str
+    source: str
+    kind: str                                   # "circle" or "polygon"
+    center: Optional[Tuple[float, float]] = None
+    radius_km: Optional[float] = None
+    polygon: Optional[List[Tuple[float, float]]] = None
+    lower_ft: Optional[float] = 0.0             # None: not parseable (treated as unbounded)
+    upper_ft: Optional[float] = None
+    vertical_text: str = ""
+    valid_from: Optional[float] = None          # epoch seconds UTC, None: open
+    valid_to: Optional[float] = None
+    daily: Optional[Tuple[int, int]] = None     # active minutes of the day (UTC), e.g. (360, 1410)
+    time_text: str = ""
+
+    def bbox(self) -> Tuple[float, float, float, float]:
+        """(min_lat, min_lon, max_lat, max_lon)"""
+        if self.kind == "circle":
+            lat, lon = self.center
+            dlat = np.degrees(self.radius_km / EARTH_RADIUS_KM)
+            dlon = dlat / max(np.cos(np.radians(min(89.0, abs(lat) + dlat))), 1e-6)
+            return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+        lats = [point[0] for point in self.polygon]
+        lons = [point[1] for point in self.polygon]
+        return min(lats), min(lons), max(lats), max(lons)
+
+    def to_json(self) -> Dict:
+        record = asdict(self)
+        for key in ("valid_from", "valid_to"):
+            if record[key] is not None:
+                record[key] = datetime.fromtimestamp(record[key], timezone.utc).isoformat()
+        return record
+
+
+# --- Parser ---------------------------------------------------------------------
+
+def parse_coordinates(text: str) -> List[Tuple[float, float]]:
+    points = []
+    for match in _COORD_RE.finditer(text):
+        lat = int(match[1]) + int(match[2]) / 60 + float(match[3].replace(",", ".")) / 3600
+        lon = int(match[5]) + int(match[6]) / 60 + float(match[7].replace(",", ".")) / 3600
+        points.append((-lat if match[4] == "S" else lat, -lon if match[8] == "W" else lon))
+    return points
+
+
+def parse_level(text: str) -> Optional[float]:
+    match = _LEVEL_RE.search(text)
+    if not match:
+        return None
+    if match[1]:
+        return 0.0
+    if match[2]:
+        return float(match[2]) * 100
+    value = float(match[3].replace(",", "."))
+    return value * FEET_PER_METRE if match[4].lower() == "m" else value
+
+
+def parse_vertical(text: str) -> Tuple[Optional[float], Optional[float]]:
+    parts = re.split(r"\s+(?:-|–|bis)\s+", text, maxsplit=1)
+    lower = parse_level(parts[0])
+    upper = parse_level(parts[1]) if len(parts) > 1 else None
+    return (0.0 if lower is None else lower), upper
+
+
+def parse_dates(text: str) -> List[Tuple[float, bool]]:
+    stamps = []
+    for match in _DATE_RE.finditer(text):
+        month = MONTHS.get(match[2].lower())
+        if not month:
+            continue
+        hour, minute = (int(match[4]), int(match[5])) if match[4] else (None, None)
+        stamps.append((datetime(int(match[3]), month, int(match[1]), hour or 0, minute or 0, tzinfo=timezone.utc)
+                       .timestamp(), hour is not None))
+    return stamps
+
+
+def parse_validity(text: str) -> Tuple[Optional[float], Optional[float], Optional[Tuple[int, int]]]:
+    """(valid_from, valid_to, daily window); a date without a time ends at the end of that day."""
+    dates = parse_dates(text)
+    valid_from = dates[0][0] if dates else None
+    valid_to = None
+    if len(dates) > 1:
+        end, has_time = dates[1]
+        valid_to = end + 59 if has_time else end + 86399
+    daily = None
+    match = _DAILY_RE.search(text)
+    if match:
+        daily = (int(match[1]) * 60 + int(match[2]), int(match[3]) * 60 + int(match[4]))
+    return valid_from, valid_to, daily
+
+
+def _sections(lines: List[str]) -> List[Tuple[str, str]]:
+    """(heading, body) pairs; text before the first numbered heading has heading ''."""
+    sections = [["", []]]
+    for line in lines:
+        if _HEADING_RE.match(line):
+            sections.append([line, []])
+        else:
+            sections[-1][1].append(line)
+    return [(heading, " ".join(body)) for heading, body in sections]
+
+
+def parse_notice(text: str, source: str = "") -> Tuple[List[Restriction], List[str]]:
+    """Returns (restrictions, designators mentioned without a parseable lateral definition)."""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    sections = _sections(lines)
+    # Notice-wide validity, e.g. "(20 SEP 2025 - 05 OCT 2025)" below the title.
+    period = _PERIOD_RE.search(sections[0][1])
+    default_from, default_to, default_daily = parse_validity(period[1]) if period else (None, None, None)
+
+    restrictions: List[Restriction] = []
+    mentioned: List[str] = []
+    name = ""
+    current: Optional[Restriction] = None
+    for heading, body in sections:
+        lowered = heading.lower()
+        if "seitliche begrenzung" in lowered or "lateral limits" in lowered:
+            points = parse_coordinates(body)
+            radius = _RADIUS_RE.search(body)
+            current = None
+            if radius and points:
+                value = float(radius[1].replace(",", "."))
+                unit = radius[2].lower()
+                radius_km = value * KM_PER_NM if unit == "nm" else value if unit == "km" else value / 1000
+                current = Restriction(name, source, "circle", center=points[0], radius_km=radius_km)
+            elif len(points) >= 3:
+                current = Restriction(name, source, "polygon", polygon=points)
+            if current is not None:
+                current.valid_from, current.valid_to, current.daily = default_from, default_to, default_daily
+                restrictions.append(current)
+            continue
+        if current is not None and ("vertikale begrenzung" in lowered or "vertical limits" in lowered):
+            current.lower_ft, current.upper_ft = parse_vertical(body)
+            current.vertical_text = body
+            continue
+        if current is not None and any(word in lowered for word in ("aktivierungszeit", "wirksamkeit", "activation")):
+            valid_from, valid_to, daily = parse_validity(body)
+            if valid_from is not None:
+                current.valid_from, current.valid_to = valid_from, valid_to
+            current.daily = daily or current.daily
+            current.time_text = body
+            continue
+        for match in _DESIGNATOR_RE.finditer(f"{heading} {body}"):
+            if current is None or "ausnahme" not in lowered:
+                name = match[1].strip()
+            mentioned.append(match[1].strip())
+        if heading and "." not in _HEADING_RE.match(heading)[1]:
+            current = None      # a new top-level section ("3. Gebiet ...") ends the previous restriction
+    parsed = {restriction.name for restriction in restrictions}
+    unparsed = sorted({designator for designator in mentioned if designator not in parsed})
+    return restrictions, unparsed
+
+
+def load_meldungen(folder: str = MELDUNGEN_DIR) -> Tuple[List[Restriction], Dict[str, List[str]]]:
+    restrictions, unparsed = [], {}
+    for file in sorted(os.listdir(folder)):
+        if not file.endswith(".txt"):
+            continue
+        with open(os.path.join(folder, file), encoding="utf-8") as handle:
+            found, missing = parse_notice(handle.read(), os.path.join("meldungen", file))
+        restrictions += found
+        if missing:
+            unparsed[file] = missing
+    return restrictions, unparsed
+
+
+# --- Index ------------------------------------------------------------------------
+
+class IntervalTree:
+    """Centered interval tree over (start, end, item) with open ends as -inf / +inf."""
+
+    def __init__(self, intervals: Sequence[Tuple[float, float, int]]):
+        self.root = self._build(list(intervals))
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        points = sorted(value for start, end, _ in intervals for value in (start, end) if np.isfinite(value))
+        center = points[len(points) // 2] if points else 0.0
+        left = [interval for interval in intervals if interval[1] < center]
+        right = [interval for interval in intervals if interval[0] > center]
+        middle = [interval for interval in intervals if interval[0] <= center <= interval[1]]
+        return {"center": center, "by_start": sorted(middle), "by_end": sorted(middle, key=lambda i: -i[1]),
+                "left": self._build(left), "right": self._build(right)}
+
+    def overlapping(self, start: float, end: float) -> List[int]:
+        found, stack = [], [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            if end < node["center"]:
+                found += [item for s, _, item in node["by_start"] if s <= end]
+                stack.append(node["left"])
+            elif start > node["center"]:
+                found += [item for _, e, item in node["by_end"] if e >= start]
+                stack.append(node["right"])
+            else:
+                found += [item for _, _, item in node["by_start"]]
+                stack += [node["left"], node["right"]]
+        return found
+
+
+class PackedRTree:
+    """
+    Static R-tree built with sort-tile-recursive packing. Level 0 holds the
+    entries, every upper level the bounding boxes of RTREE_FANOUT children.
+    """
+
+    def __init__(self, boxes: np.ndarray, fanout: int = RTREE_FANOUT):
+        self.fanout = fanout
+        order = self._str_order(boxes)
+        self.entry_ids = order
+        self.levels = [boxes[order]]           # level boxes, children of node i: [i * fanout, (i + 1) * fanout)
+        while len(self.levels[-1]) > 1:
+            child = self.levels[-1]
+            count = -(-len(child) // fanout)
+            parent = np.empty((count, 4))
+            for i in range(count):
+                block = child[i * fanout:(i + 1) * fanout]
+                parent[i] = (block[:, 0].min(), block[:, 1].min(), block[:, 2].max(), block[:, 3].max())
+            self.levels.append(parent)
+
+    def _str_order(self, boxes: np.ndarray) -> np.ndarray:
+        centers_lat = (boxes[:, 0] + boxes[:, 2]) / 2
+        centers_lon = (boxes[:, 1] + boxes[:, 3]) / 2
+        leaves = -(-len(boxes) // self.fanout)
+        slices = max(1, int(np.ceil(np.sqrt(leaves))))
+        by_lon = np.argsort(centers_lon, kind="stable")
+        per_slice = slices * self.fanout
+        order = [part[np.argsort(centers_lat[part], kind="stable")]
+                 for part in (by_lon[i:i + per_slice] for i in range(0, len(by_lon), per_slice))]
+        return np.concatenate(order) if order else np.empty(0, dtype=np.int64)
+
+    def batch_query(self, lat: np.ndarray, lon: np.ndarray, point_ids: np.ndarray, candidates: Optional[set] = None):
+        """Yields (entry id, point ids inside the entry's box) for all boxes hit by the points."""
+        top = len(self.levels) - 1
+        stack = [(top, 0, point_ids)]
+        while stack:
+            level, node, ids = stack.pop()
+            box = self.levels[level][node]
+            inside = ids[(lat[ids] >= box[0]) & (lat[ids] <= box[2]) & (lon[ids] >= box[1]) & (lon[ids] <= box[3])]
+            if not len(inside):
+                continue
+            if level == 0:
+                entry = int(self.entry_ids[node])
+                if candidates is None or entry in candidates:
+                    yield entry, inside
+                continue
+            children = range(node * self.fanout, min((node + 1) * self.fanout, len(self.levels[level - 1])))
+            stack += [(level - 1, child, inside) for child in children]
+
+
+def _haversine_km(lat: np.ndarray, lon: np.ndarray, lat0: float, lon0: float) -> np.ndarray:
+    phi, phi0 = np.radians(lat), np.radians(lat0)
+    a = np.sin((phi - phi0) / 2) ** 2 + np.cos(phi) * np.cos(phi0) * np.sin(np.radians(lon - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _in_polygon(lat: np.ndarray, lon: np.ndarray, polygon: List[Tuple[float, float]]) -> np.ndarray:
+    inside = np.zeros(len(lat), dtype=bool)
+    for (lat1, lon1), (lat2, lon2) in zip(polygon, polygon[1:] + polygon[:1]):
+        crosses = (lat1 > lat) != (lat2 > lat)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lon_at = lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1)
+        inside ^= crosses & (lon < lon_at)
+    return inside
+
+
+class RestrictionIndex:
+    def __init__(self, restrictions: List[Restriction]):
+        self.restrictions = restrictions
+        boxes = np.array([restriction.bbox() for restriction in restrictions], dtype=float).reshape(-1, 4)
+        self.rtree = PackedRTree(boxes) if len(restrictions) else None
+        self.intervals = IntervalTree([
+            (-np.inf if r.valid_from is None else r.valid_from, np.inf if r.valid_to is None else r.valid_to, i)
+            for i, r in enumerate(restrictions)
+        ])
+
+    def _matches(self, restriction: Restriction, lat, lon, t, alt) -> np.ndarray:
+        if restriction.kind == "circle":
+            hit = _haversine_km(lat, lon, *restriction.center) <= restriction.radius_km
+        else:
+            hit = _in_polygon(lat, lon, restriction.polygon)
+        if restriction.valid_from is not None:
+            hit &= t >= restriction.valid_from
+        if restriction.valid_to is not None:
+            hit &= t <= restriction.valid_to
+        if restriction.daily is not None:
+            minute = (t % 86400) // 60
+            start, end = restriction.daily
+            hit &= ((minute >= start) & (minute <= end)) if start <= end else ((minute >= start) | (minute <= end))
+        if alt is not None:
+            if restriction.lower_ft is not None:
+                hit &= alt >= restriction.lower_ft
+            if restriction.upper_ft is not None:
+                hit &= alt <= restriction.upper_ft
+        return hit
+
+    def lookup(self, lat, lon, t, alt=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Active restrictions for point batches (degrees, epoch seconds UTC,
+        optional altitude in ft). Returns parallel arrays (point index,
+        restriction index) of all hits, sorted by point index.
+        """
+        lat, lon, t = (np.asarray(values, dtype=float) for values in (lat, lon, t))
+        alt = None if alt is None else np.asarray(alt, dtype=float)
+        if self.rtree is None or not len(lat):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        candidates = set(self.intervals.overlapping(float(t.min()), float(t.max())))
+        point_parts, restriction_parts = [], []
+        for entry, ids in self.rtree.batch_query(lat, lon, np.arange(len(lat)), candidates):
+            hit = self._matches(self.restrictions[entry], lat[ids], lon[ids], t[ids],
+                                None if alt is None else alt[ids])
+            if hit.any():
+                point_parts.append(ids[hit])
+                restriction_parts.append(np.full(int(hit.sum()), entry))
+        if not point_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        points, found = np.concatenate(point_parts), np.concatenate(restriction_parts)
+        order = np.argsort(points, kind="stable")
+        return points[order], found[order]
+
+    def lookup_brute_force(self, lat, lon, t, alt=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Every restriction against every point, for --verify."""
+        lat, lon, t = (np.asarray(values, dtype=float) for values in (lat, lon, t))
+        point_parts, restriction_parts = [], []
+        for entry, restriction in enumerate(self.restrictions):
+            hit = np.flatnonzero(self._matches(restriction, lat, lon, t, alt))
+            point_parts.append(hit)
+            restriction_parts.append(np.full(len(hit), entry))
+        points, found = np.concatenate(point_parts), np.concatenate(restriction_parts)
+        order = np.lexsort((found, points))
+        return points[order], found[order]
+
+    def enrich(self, dataframe: pd.DataFrame, lat: str = "latitude", lon: str = "longitude", time_column: str = "ts",
+               alt: Optional[str] = None) -> pd.DataFrame:
+        """Adds active_restrictions (names joined with ', ') and in_restricted_area to a copy of dataframe."""
+        times = pd.to_datetime(dataframe[time_column], utc=True, format="mixed")
+        epoch = (times - pd.Timestamp("1970-01-01", tz="UTC")).dt.total_seconds().to_numpy()
+        points, found = self.lookup(dataframe[lat].to_numpy(), dataframe[lon].to_numpy(), epoch,
+                                    None if alt is None else dataframe[alt].to_numpy())
+        names = [""] * len(dataframe)
+        for point, entry in zip(points.tolist(), found.tolist()):
+            name = self.restrictions[entry].name
+            names[point] = f"{names[point]}, {name}" if names[point] else name
+        result = dataframe.copy()
+        result["active_restrictions"] = names
+        result["in_restricted_area"] = result["active_restrictions"] != ""
+        return result
+
+
+# --- Benchmark ----------------------------------------------------------------------
+
+def synthetic_restrictions(count: int, seed: int = 3) -> List[Restriction]:
+    """Random circles and quadrilaterals over Germany and the western Baltic with 1-30 day windows."""
+    rng = np.random.default_rng(seed)
+    start = datetime(2025, 8, 1, tzinfo=timezone.utc).timestamp()
+    restrictions = []
+    for i in range(count):
+        lat, lon = rng.uniform(47.5, 56.0), rng.uniform(6.0, 15.0)
+        valid_from = start + rng.uniform(0, 60) * 86400
+        valid_to = valid_from + rng.uniform(1, 30) * 86400
+        daily = (360, 1410) if i % 4 == 0 else None
+        if i % 3:
+            restrictions.append(Restriction(f"SYN-{i}", "synthetic", "circle", center=(lat, lon),
+                                            radius_km=float(rng.uniform(1, 25)), upper_ft=float(rng.uniform(1, 10)) * 1000,
+                                            valid_from=valid_from, valid_to=valid_to, daily=daily))
+        else:
+            d = rng.uniform(0.05, 0.3, 4)
+            polygon = [(lat - d[0], lon - d[1]), (lat - d[2], lon + d[1]), (lat + d[0], lon + d[3]),
+                       (lat + d[2], lon - d[3])]
+            restrictions.append(Restriction(f"SYN-{i}", "synthetic", "polygon", polygon=polygon,
+                                            valid_from=valid_from, valid_to=valid_to, daily=daily))
+    return restrictions
+
+
+def synthetic_points(count: int, restrictions: List[Restriction], seed: int = 5):
+    """Points spread over the area, a quarter of them close to restriction centres, Aug - Oct 2025."""
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(47.5, 56.0, count)
+    lon = rng.uniform(6.0, 15.0, count)
+    near = rng.random(count) < 0.25
+    anchors = np.array([r.center if r.kind == "circle" else r.polygon[0] for r in restrictions])
+    picks = anchors[rng.integers(0, len(anchors), int(near.sum()))]
+    lat[near] = picks[:, 0] + rng.normal(0, 0.02, len(picks))
+    lon[near] = picks[:, 1] + rng.normal(0, 0.03, len(picks))
+    t = datetime(2025, 8, 15, tzinfo=timezone.utc).timestamp() + rng.uniform(0, 60 * 86400, count)
+    return lat, lon, t
+
+
+def benchmark(points: int, synthetic: int, verify: bool):
+    restrictions, _ = load_meldungen()
+    restrictions += synthetic_restrictions(synthetic)
+    start = time.perf_counter()
+    index = RestrictionIndex(restrictions)
+    print(f"index: {len(restrictions)} restrictions, R-tree depth {len(index.rtree.levels)}, "
+          f"built in {(time.perf_counter() - start) * 1000:.1f} ms")
+    lat, lon, t = synthetic_points(points, restrictions)
+    start = time.perf_counter()
+    found_points, _ = index.lookup(lat, lon, t)
+    seconds = time.perf_counter() - start
+    print(f"lookup: {points:,} points in {seconds:.2f}s ({points / seconds:,.0f} points/s), "
+          f"{len(found_points):,} hits, {len(np.unique(found_points)):,} points in an active restriction")
+    if verify:
+        sample = slice(0, min(points, 20000))
+        expected = index.lookup_brute_force(lat[sample], lon[sample], t[sample])
+        got_points, got_found = index.lookup(lat[sample], lon[sample], t[sample])
+        order = np.lexsort((got_found, got_points))
+        identical = np.array_equal(expected[0], got_points[order]) and np.array_equal(expected[1], got_found[order])
+        print(f"verify: {sample.stop:,} points against brute force: {'identical' if identical else 'DIFFERENT'}")
+
+
+def read_table(path: str) -> pd.DataFrame:
+    return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Airspace restrictions from the Meldungen.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("parse", help="Print the parsed restriction records as JSON")
+    check = commands.add_parser("check", help="Active restrictions at one position and time")
+    check.add_argument("lat", type=float)
+    check.add_argument("lon", type=float)
+    check.add_argument("time", help="ISO 8601, UTC if no offset is given")
+    check.add_argument("--alt-ft", type=float)
+    enrich = commands.add_parser("enrich", help="Annotate gps_jammer_events or track rows (Parquet/CSV)")
+    enrich.add_argument("--input", required=True)
+    enrich.add_argument("--output", required=True)
+    enrich.add_argument("--kind", choices=sorted(INPUT_KINDS), default="gps_jammer")
+    bench = commands.add_parser("bench", help="Batch lookup throughput")
+    bench.add_argument("--points", type=int, default=1000000)
+    bench.add_argument("--synthetic", type=int, default=5000, help="Additional random restrictions")
+    bench.add_argument("--verify", action="store_true", help="Compare a sample with the brute-force lookup")
+    args = parser.parse_args()
+
+    if args.command == "parse":
+        restrictions, unparsed = load_meldungen()
+        print(json.dumps({"restrictions": [restriction.to_json() for restriction in restrictions],
+                          "unparsed": unparsed}, ensure_ascii=False, indent=1))
+    elif args.command == "check":
+        restrictions, _ = load_meldungen()
+        when = pd.Timestamp(args.time)
+        when = when.tz_localize("UTC") if when.tzinfo is None else when
+        _, found = RestrictionIndex(restrictions).lookup(
+            [args.lat], [args.lon], [when.timestamp()], None if args.alt_ft is None else [args.alt_ft])
+        for entry in found.tolist():
+            print(json.dumps(restrictions[entry].to_json(), ensure_ascii=False))
+    elif args.command == "enrich":
+        restrictions, _ = load_meldungen()
+        columns = INPUT_KINDS[args.kind]
+        frame = read_table(args.input)
+        start = time.perf_counter()
+        result = RestrictionIndex(restrictions).enrich(frame, columns["lat"], columns["lon"], columns["time"],
+                                                       columns["alt"])
+        print(f"{len(result)} rows, {int(result['in_restricted_area'].sum())} in an active restriction "
+              f"({time.perf_counter() - start:.2f}s)")
+        if args.output.endswith(".parquet"):
+            result.to_parquet(args.output, index=False)
+        else:
+            result.to_csv(args.output, index=False)
+    elif args.command == "bench":
+        benchmark(args.points, args.synthetic, args.verify)
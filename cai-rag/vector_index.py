@@ -0,0 +1,462 @@
+"""
+Vector retrieval over the cai-rag corpus: embedding cache, quantized IVF index
+and exact re-ranking.
+
+- Embeddings are computed once per (backend, chunk text) and kept in an
+  append-only cache (keys.txt + float32 rows) below the index directory.
+- The index clusters the vectors with k-means into nlist inverted lists and
+  stores their rows list by list, so one list is one contiguous slice of the
+  memory-mapped code matrix. Codes are either int8 (one byte per dimension,
+  per-dimension scale) or product-quantized (pq: m sub-spaces with 256
+  centroids each, m bytes per vector).
+- A query scores the nprobe closest lists on the codes, keeps the best
+  `rerank` candidates and re-ranks them exactly against the float32 vectors
+  (vectors.f32, memory-mapped; only the candidate rows are read).
+
+Backends: "hashing" is a deterministic local stand-in (hashed words and
+character trigrams, no model, reproducible for tests); "openai" calls any
+OpenAI-compatible /v1/embeddings endpoint (CAI_RAG_EMBED_BASE_URL,
+CAI_RAG_EMBED_MODEL, CAI_RAG_EMBED_API_KEY).
+
+    python vector_index.py build
+    python vector_index.py query "restrictions near Rostock" -k 5
+    python vector_index.py bench --rows 200000 --quantizer pq
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import statistics
+import tempfile
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from chunking import CORPUS_DIR, Chunk, chunk_file, corpus_files
+
+VECTOR_DIR = os.environ.get("CAI_RAG_VECTOR_DIR", os.path.join(CORPUS_DIR, "index", "vectors"))
+CACHE_DIR = os.environ.get("CAI_RAG_EMBED_CACHE_DIR", os.path.join(CORPUS_DIR, "index", "embedding_cache"))
+EMBEDDER = os.environ.get("CAI_RAG_EMBEDDER", "hashing")
+
+_WORD_RE = re.compile(r"\w+")
+
+
+# --- Embedding backends ---
+
+class HashingEmbedder:
+    """Deterministic stand-in: signed feature hashing of words and character trigrams, L2-normalized."""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> Dict[int, float]:
+        features: Dict[int, float] = {}
+        for word in _WORD_RE.findall(text.lower()):
+            grams = [word] if len(word) < 4 else [word] + [f"#{word}#"[i:i + 3] for i in range(len(word) - 1)]
+            for position, gram in enumerate(grams):
+                code = zlib.crc32(gram.encode("utf-8"))
+                index = code % self.dim
+                weight = (1.0 if position == 0 else 0.35) * (1.0 if code & 0x80000000 else -1.0)
+                features[index] = features.get(index, 0.0) + weight
+        return features
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for index, weight in self._features(text).items():
+                matrix[row, index] = weight
+        return normalize(matrix)
+
+
+class OpenAIEmbedder:
+    """Any OpenAI-compatible embeddings endpoint (e.g. a CML serving endpoint)."""
+
+    def __init__(self, model: Optional[str] = None, base_url: Optional[str] = None,
+                 api_key: Optional[str] = None, batch_size: int = 64):
+        from openai import OpenAI
+        self.model = model or os.environ.get("CAI_RAG_EMBED_MODEL", "nvidia/nv-embedqa-e5-v5")
+        self.client = OpenAI(base_url=base_url or os.environ.get("CAI_RAG_EMBED_BASE_URL"),
+                             api_key=api_key or os.environ.get("CAI_RAG_EMBED_API_KEY", "none"))
+        self.batch_size = batch_size
+        self.name = f"openai-{self.model}"
+        self.dim = None
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        rows = []
+        for start in range(0, len(texts), self.batch_size):
+            response = self.client.embeddings.create(model=self.model, input=list(texts[start:start + self.batch_size]))
+            rows += [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        matrix = np.asarray(rows, dtype=np.float32)
+        self.dim = matrix.shape[1]
+        return normalize(matrix)
+
+
+def get_embedder(name: str = EMBEDDER):
+    if name == "hashing":
+        return HashingEmbedder()
+    if name == "openai":
+        return OpenAIEmbedder()
+    raise ValueError(f"Unknown embedder: {name}")
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class EmbeddingCache:
+    """Append-only cache keyed by sha1(backend name + text): keys.txt and a float32 row file per backend."""
+
+    def __init__(self, embedder, path: str = CACHE_DIR):
+        self.embedder = embedder
+        self.path = os.path.join(path, re.sub(r"[^\w.-]", "_", embedder.name))
+        os.makedirs(self.path, exist_ok=True)
+        self.keys_path = os.path.join(self.path, "keys.txt")
+        self.rows_path = os.path.join(self.path, "vectors.f32")
+        self.index: Dict[str, int] = {}
+        self.dim = getattr(embedder, "dim", None)
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, encoding="ascii") as handle:
+                keys = handle.read().split()
+            if keys and self.dim is None:
+                self.dim = os.path.getsize(self.rows_path) // (4 * len(keys))
+            if keys:
+                # Drop rows without a key (append interrupted before keys.txt was written).
+                with open(self.rows_path, "r+b") as handle:
+                    handle.truncate(4 * self.dim * len(keys))
+            self.index = {key: row for row, key in enumerate(keys)}
+        self.hits = self.misses = 0
+
+    def key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.embedder.name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        keys = [self.key(text) for text in texts]
+        missing = sorted({key: text for key, text in zip(keys, texts) if key not in self.index}.items())
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        if missing:
+            vectors = self.embedder.embed([text for _, text in missing]).astype(np.float32)
+            self.dim = vectors.shape[1]
+            # Rows first, then keys: a crash between both leaves only unreferenced rows.
+            with open(self.rows_path, "ab") as handle:
+                handle.write(vectors.tobytes())
+            with open(self.keys_path, "a", encoding="ascii") as handle:
+                handle.write("".join(f"{key}\n" for key, _ in missing))
+            for key, _ in missing:
+                self.index[key] = len(self.index)
+        stored = np.memmap(self.rows_path, dtype=np.float32, mode="r").reshape(-1, self.dim)
+        return np.array(stored[[self.index[key] for key in keys]])
+
+
+# --- Quantizers ---
+
+def kmeans(x: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means (squared L2); empty clusters are re-seeded with random points."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), k, replace=len(x) < k)].astype(np.float32)
+    for _ in range(iterations):
+        assign = nearest(x, centroids)
+        counts = np.bincount(assign, minlength=k)
+        order = np.argsort(assign, kind="stable")
+        filled = counts > 0
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        centroids[filled] = np.add.reduceat(x[order], starts, axis=0) / counts[filled, None]
+        empty = ~filled
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), int(empty.sum()))]
+    return centroids
+
+
+def nearest(x: np.ndarray, centroids: np.ndarray, block: int = 65536) -> np.ndarray:
+    squared = (centroids * centroids).sum(axis=1)
+    out = np.empty(len(x), dtype=np.int32)
+    for start in range(0, len(x), block):
+        part = x[start:start + block]
+        out[start:start + block] = np.argmin(squared[None, :] - 2 * part @ centroids.T, axis=1)
+    return out
+
+
+class Int8Quantizer:
+    kind = "int8"
+
+    def fit(self, x: np.ndarray):
+        self.scale = (np.abs(x).max(axis=0) / 127.0).astype(np.float32) + 1e-12
+        return self
+
+    def encode(self, x: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(x / self.scale), -127, 127).astype(np.int8)
+
+    def scorer(self, query: np.ndarray):
+        weights = (query * self.scale).astype(np.float32)
+        return lambda codes: codes.astype(np.float32) @ weights
+
+    def code_width(self, dim: int) -> int:
+        return dim
+
+    def save(self, path: str):
+        np.save(os.path.join(path, "int8_scale.npy"), self.scale)
+
+    def load(self, path: str):
+        self.scale = np.load(os.path.join(path, "int8_scale.npy"))
+        return self
+
+
+class PQQuantizer:
+    """Product quantization for inner product: score = sum of per-sub-space lookup table entries."""
+    kind = "pq"
+
+    def __init__(self, m: int = 32):
+        self.m = m
+
+    def fit(self, x: np.ndarray, sample: int = 20000):
+        if x.shape[1] % self.m:
+            raise ValueError(f"dimension {x.shape[1]} is not divisible by m={self.m}")
+        rng = np.random.default_rng(1)
+        train = x[rng.choice(len(x), min(sample, len(x)), replace=False)]
+        sub = x.shape[1] // self.m
+        self.codebooks = np.stack([kmeans(train[:, j * sub:(j + 1) * sub], 256, iterations=8, seed=j)
+                                   for j in range(self.m)])
+        return self
+
+    def encode(self, x: np.ndarray) -> np.ndarray:
+        sub = self.codebooks.shape[2]
+        return np.stack([nearest(x[:, j * sub:(j + 1) * sub], self.codebooks[j]) for j in range(self.m)],
+                        axis=1).astype(np.uint8)
+
+    def scorer(self, query: np.ndarray):
+        sub = self.codebooks.shape[2]
+        table = np.einsum("jcs,js->jc", self.codebooks, query.reshape(self.m, sub)).astype(np.float32)
+        columns = np.arange(self.m)
+        return lambda codes: table[columns, codes].sum(axis=1)
+
+    def code_width(self, dim: int) -> int:
+        return self.m
+
+    def save(self, path: str):
+        np.save(os.path.join(path, "pq_codebooks.npy"), self.codebooks)
+
+    def load(self, path: str):
+        self.codebooks = np.load(os.path.join(path, "pq_codebooks.npy"))
+        self.m = self.codebooks.shape[0]
+        return self
+
+
+def make_quantizer(kind: str, pq_m: int = 32):
+    return Int8Quantizer() if kind == "int8" else PQQuantizer(pq_m)
+
+
+# --- IVF index ---
+
+@dataclass
+class VectorHit:
+    score: float
+    chunk_id: str
+    doc: str
+    heading: str
+    line: int
+    text: str
+
+
+class IVFIndex:
+    """
+    Files: meta.json, centroids.npy, offsets.npy (list boundaries), ids.npy
+    (row -> chunk number), codes.bin and vectors.f32 (both in list order,
+    memory-mapped), plus the quantizer parameters.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as handle:
+            self.meta = json.load(handle)
+        dim = self.meta["dim"]
+        self.quantizer = make_quantizer(self.meta["quantizer"]).load(path)
+        self.centroids = np.load(os.path.join(path, "centroids.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        self.ids = np.load(os.path.join(path, "ids.npy"), mmap_mode="r")
+        width = self.quantizer.code_width(dim)
+        code_type = np.int8 if self.meta["quantizer"] == "int8" else np.uint8
+        self.codes = np.memmap(os.path.join(path, "codes.bin"), dtype=code_type, mode="r").reshape(-1, width)
+        self.vectors = np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r").reshape(-1, dim)
+        self.chunks = self.meta.get("chunks", [])
+
+    @staticmethod
+    def build(path: str, vectors: np.ndarray, chunks: Optional[List[Chunk]] = None, quantizer: str = "int8",
+              nlist: Optional[int] = None, pq_m: int = 32, embedder_name: str = "", train_size: int = 50000):
+        """Writes a new index for the row-aligned vectors (and chunk metadata) into path."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        count, dim = vectors.shape
+        nlist = nlist or max(1, int(4 * np.sqrt(count)) if count > 10000 else int(np.sqrt(count)))
+        rng = np.random.default_rng(0)
+        train = vectors[rng.choice(count, min(count, max(train_size, 40 * nlist)), replace=False)]
+        centroids = kmeans(train, nlist)
+        assign = nearest(vectors, centroids)
+        order = np.argsort(assign, kind="stable").astype(np.int32)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+        ordered = vectors[order]
+        coder = make_quantizer(quantizer, pq_m).fit(train)
+
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, "centroids.npy"), centroids)
+        np.save(os.path.join(tmp_path, "offsets.npy"), offsets)
+        np.save(os.path.join(tmp_path, "ids.npy"), order)
+        with open(os.path.join(tmp_path, "codes.bin"), "wb") as handle:
+            for start in range(0, count, 65536):
+                handle.write(coder.encode(ordered[start:start + 65536]).tobytes())
+        ordered.tofile(os.path.join(tmp_path, "vectors.f32"))
+        coder.save(tmp_path)
+        meta = {"dim": dim, "count": count, "nlist": nlist, "quantizer": quantizer, "embedder": embedder_name,
+                "chunks": [[chunk.chunk_id, chunk.doc, chunk.heading, chunk.line, chunk.text]
+                           for chunk in chunks] if chunks else []}
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as handle:
+            json.dump(meta, handle, ensure_ascii=False)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        return IVFIndex(path)
+
+    def search_vector(self, query: np.ndarray, k: int = 10, nprobe: int = 16,
+                      rerank: int = 200) -> List[Tuple[int, float]]:
+        """(chunk number, exact inner product) of the approximate top-k."""
+        query = np.asarray(query, dtype=np.float32)
+        probe = np.argsort(-(self.centroids @ query))[:nprobe]
+        rows = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in probe])
+        if not len(rows):
+            return []
+        rows.sort()
+        approx = self.quantizer.scorer(query)(self.codes[rows])
+        if len(rows) > rerank:
+            rows = np.sort(rows[np.argpartition(-approx, rerank)[:rerank]])
+        exact = self.vectors[rows] @ query
+        best = np.argsort(-exact)[:k]
+        return [(int(self.ids[rows[i]]), float(exact[i])) for i in best]
+
+    def search(self, embedder, text: str, k: int = 5, nprobe: int = 16, rerank: int = 200) -> List[VectorHit]:
+        if self.meta["embedder"] != embedder.name:
+            raise ValueError(f"index was built with {self.meta['embedder']}, not {embedder.name}")
+        query = embedder.embed([text])[0]
+        hits = []
+        for number, score in self.search_vector(query, k, nprobe, rerank):
+            chunk_id, doc, heading, line, chunk_text = self.chunks[number]
+            hits.append(VectorHit(round(score, 4), chunk_id, doc, heading, line, chunk_text))
+        return hits
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """Resident (codes, ids, centroids, offsets) vs. on-disk re-rank vectors."""
+        return {"codes": self.codes.nbytes, "ids": self.ids.nbytes,
+                "centroids": self.centroids.nbytes + self.offsets.nbytes, "rerank_vectors": self.vectors.nbytes}
+
+
+def build_corpus_index(path: str = VECTOR_DIR, embedder=None, quantizer: str = "int8") -> Tuple[IVFIndex, Dict]:
+    embedder = embedder or get_embedder()
+    cache = EmbeddingCache(embedder)
+    chunks = [chunk for file in corpus_files() for chunk in chunk_file(file)]
+    vectors = cache.embed([f"{chunk.heading}\n{chunk.text}" for chunk in chunks])
+    index = IVFIndex.build(path, vectors, chunks, quantizer=quantizer, pq_m=16, embedder_name=embedder.name)
+    return index, {"chunks": len(chunks), "cache_hits": cache.hits, "embedded": cache.misses}
+
+
+# --- Benchmark ---
+
+def synthetic_vectors(rows: int, dim: int, clusters: int = 1000, seed: int = 7) -> np.ndarray:
+    """Clustered unit vectors (topics plus noise), closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((clusters, dim)).astype(np.float32))
+    out = np.empty((rows, dim), dtype=np.float32)
+    for start in range(0, rows, 100000):
+        count = min(100000, rows - start)
+        topic = rng.integers(0, clusters, count)
+        noise = rng.standard_normal((count, dim)).astype(np.float32) * (1.6 / np.sqrt(dim))
+        out[start:start + count] = centers[topic] + noise
+    return normalize(out)
+
+
+def benchmark(rows: int, dim: int, quantizer: str, queries: int, k: int, pq_m: int, rerank: int):
+    vectors = synthetic_vectors(rows + queries, dim)
+    base, probes = vectors[:rows], vectors[rows:]
+    workdir = tempfile.mkdtemp(prefix="ivf_bench_")
+    try:
+        start = time.perf_counter()
+        index = IVFIndex.build(os.path.join(workdir, "index"), base, quantizer=quantizer, pq_m=pq_m)
+        print(f"build: {rows} x {dim} ({quantizer}, nlist {index.meta['nlist']}) in {time.perf_counter() - start:.1f}s")
+        truth = [set(np.argsort(-(base @ query))[:k]) for query in probes]
+
+        start = time.perf_counter()
+        for query in probes:
+            np.argpartition(-(base @ query), k)[:k]
+        brute_ms = (time.perf_counter() - start) * 1000 / queries
+        print(f"brute force (float32, in RAM): {brute_ms:.2f} ms/query")
+
+        for nprobe in (4, 8, 16, 32, 64):
+            latencies, recall = [], 0.0
+            for query, expected in zip(probes, truth):
+                start = time.perf_counter()
+                found = index.search_vector(query, k, nprobe=nprobe, rerank=rerank)
+                latencies.append((time.perf_counter() - start) * 1000)
+                recall += len(expected & {number for number, _ in found}) / k
+            latencies.sort()
+            print(f"nprobe {nprobe:3d}: recall@{k} {recall / queries:.3f}, p50 {statistics.median(latencies):.2f} ms, "
+                  f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms")
+
+        memory = index.memory_bytes()
+        per_million = 1e6 / rows
+        resident = (memory["codes"] + memory["ids"]) * per_million + memory["centroids"]
+        print(f"memory per 1M chunks: {resident / 2**20:.0f} MiB resident "
+              f"(codes {memory['codes'] * per_million / 2**20:.0f} MiB, ids {memory['ids'] * per_million / 2**20:.0f} MiB), "
+              f"{memory['rerank_vectors'] * per_million / 2**20:.0f} MiB float32 re-rank vectors memory-mapped on disk "
+              f"(float32 brute force: {4 * dim * 1e6 / 2**20:.0f} MiB)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_hits(hits: List[VectorHit], width: int):
+    for rank, hit in enumerate(hits, start=1):
+        snippet = " ".join(hit.text.split())[:width]
+        print(f"{rank:2d}. {hit.score:6.3f}  {hit.doc}:{hit.line}  [{hit.heading}]\n    {snippet}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantized IVF vector index over the cai-rag documents.")
+    parser.add_argument("--index", default=VECTOR_DIR, help="Index directory")
+    parser.add_argument("--embedder", default=EMBEDDER, choices=["hashing", "openai"])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Embed (cached) and index doc/ and meldungen/")
+    build.add_argument("--quantizer", default="int8", choices=["int8", "pq"])
+    query = commands.add_parser("query", help="Semantic top-k search")
+    query.add_argument("text")
+    query.add_argument("-k", type=int, default=5)
+    query.add_argument("--nprobe", type=int, default=16)
+    query.add_argument("--width", type=int, default=200)
+    bench = commands.add_parser("bench", help="Recall@k against brute force, latency and memory")
+    bench.add_argument("--rows", type=int, default=200000)
+    bench.add_argument("--dim", type=int, default=256)
+    bench.add_argument("--quantizer", default="int8", choices=["int8", "pq"])
+    bench.add_argument("--pq-m", type=int, default=32, help="PQ sub-spaces (bytes per vector)")
+    bench.add_argument("--queries", type=int, default=200)
+    bench.add_argument("-k", type=int, default=10)
+    bench.add_argument("--rerank", type=int, default=200, help="Candidates re-ranked exactly")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        index, stats = build_corpus_index(args.index, get_embedder(args.embedder), args.quantizer)
+        print(f"{stats['chunks']} chunks ({stats['embedded']} embedded, {stats['cache_hits']} from cache) "
+              f"in {time.perf_counter() - start:.2f}s -> {args.index}")
+    elif args.command == "query":
+        index = IVFIndex(args.index)
+        embedder = get_embedder(args.embedder)
+        start = time.perf_counter()
+        hits = index.search(embedder, args.text, args.k, args.nprobe)
+        elapsed = (time.perf_counter() - start) * 1000
+        print_hits(hits, args.width)
+        print(f"({len(hits)} hits in {elapsed:.2f} ms)")
+    elif args.command == "bench":
+        benchmark(args.rows, args.dim, args.quantizer, args.queries, args.k, args.pq_m, args.rerank)
@@ -0,0 +1,203 @@
+"""
+Token-budgeted compaction of defense.lagebild rows for the LLM prompt.
+
+lagebild.py used to render the whole result as markdown and, above 32k
+characters, keep whatever rows came first. This module ranks rows by severity
+(sanctioned vessels, submarine and ordnance contacts, magnetic anomaly magnitude,
+distance to the harbour, message priority), keeps the most severe rows as a
+compact CSV and folds the rest into per harbour/source counts, sized to a token
+budget with a tokenizer-free estimate. Critical rows are always kept, even if
+they alone exceed the budget.
+
+    python compaction.py --synthetic 5000 --budget 6000     # timing and stats
+"""
+
+import argparse
+import csv
+import io
+import re
+import time
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+DEFAULT_TOKEN_BUDGET = 6000
+
+# Scores for the row kinds; critical rows are never dropped.
+CRITICAL_SCORE = 1000.0
+# Buoy contacts by payload_object_type: every SUBMARINE classification (including
+# LARGE_DIESEL_ELECTRIC) and ORDNANCE (POSSIBLE_TORPEDO) near a harbour is critical.
+CRITICAL_OBJECT_TYPES = {"SUBMARINE", "ORDNANCE"}
+PRIORITY_SCORES = {"hoch": 25.0, "mittel": 10.0, "niedrig": 0.0}  # MessengerSimulator priorities
+SOURCE_BASE_SCORES = {"Buoy": 40.0, "Marine_Message": 30.0, "AIS": 10.0, "SocialMedia": 5.0, "Marine": 5.0}
+STATUS_SCORES = {"Non-Operational": 25.0, "Limited Operational": 10.0}
+
+_SANCTIONED_RE = re.compile(r"Sanctioned: (?!No\b)")
+_OBJECT_RE = re.compile(r"Object: ([A-Z_]+)/")
+_ANOMALY_RE = re.compile(r"Mag Anomaly: (-?[\d.]+)")
+_PRIO_RE = re.compile(r"Prio: (\w+)")
+_STATUS_RE = re.compile(r"Status: ([\w -]+)")
+_DISTANCE_PREFIX_RE = re.compile(r"^Distance: [\d.]+ km \| ")
+_TOKEN_RE = re.compile(r"[A-Za-z]+|\d|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Tokenizer-free estimate for BPE vocabularies (Mistral/Llama): digits and
+    punctuation are about one token each, words about one token per 4 letters.
+    """
+    tokens = 0
+    for piece in _TOKEN_RE.findall(text):
+        tokens += 1 + (len(piece) - 1) // 4 if piece[0].isalpha() else 1
+    return tokens
+
+
+def severity(source: str, details: str, dist_km: float) -> Tuple[float, bool]:
+    """Returns (score, critical) for one lagebild row."""
+    details = details or ""
+    score = SOURCE_BASE_SCORES.get(source, 0.0)
+    critical = False
+    if source == "AIS" and _SANCTIONED_RE.search(details):
+        score += CRITICAL_SCORE
+        critical = True
+    elif source == "Buoy":
+        match = _OBJECT_RE.search(details)
+        if match and match.group(1) in CRITICAL_OBJECT_TYPES:
+            score += CRITICAL_SCORE
+            critical = True
+        match = _ANOMALY_RE.search(details)
+        if match:
+            score += min(abs(float(match.group(1))), 500.0) / 5.0
+    elif source == "SocialMedia":
+        match = _PRIO_RE.search(details)
+        if match:
+            score += PRIORITY_SCORES.get(match.group(1), 0.0)
+    elif source == "Marine":
+        match = _STATUS_RE.search(details)
+        if match:
+            score += STATUS_SCORES.get(match.group(1).strip(), 0.0)
+    # Closer is more relevant: up to 20 points inside the 50 km view radius.
+    score += max(0.0, 20.0 * (1.0 - dist_km / 50.0))
+    return score, critical
+
+
+def rank(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """Adds score/critical columns and sorts by severity, most severe first."""
+    df = dataframe.copy()
+    dist = pd.to_numeric(df["dist_km"], errors="coerce").fillna(50.0)
+    scored = [severity(source, details, d) for source, details, d in zip(df["Data_Source"], df["details"], dist)]
+    df["score"] = [score for score, _ in scored]
+    df["critical"] = [critical for _, critical in scored]
+    df["dist_km"] = dist
+    return df.sort_values(["critical", "score", "timestamp"], ascending=[False, False, False], kind="stable")
+
+
+def _csv_line(values) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(values)
+    return buffer.getvalue()
+
+
+def _event_line(row) -> str:
+    details = _DISTANCE_PREFIX_RE.sub("", str(row.details or ""))
+    timestamp = str(row.timestamp)[:16]
+    return _csv_line(["!" if row.critical else "", row.harbour_name, row.Data_Source, row.ID,
+                      timestamp, f"{row.dist_km:.2f}", details])
+
+
+def _aggregate_lines(rest: pd.DataFrame) -> List[str]:
+    if rest.empty:
+        return []
+    grouped = rest.groupby(["harbour_name", "Data_Source"]).agg(
+        count=("ID", "size"), min_dist_km=("dist_km", "min"), latest=("timestamp", "max")
+    ).reset_index()
+    return [_csv_line([row.harbour_name, row.Data_Source, row.count, f"{row.min_dist_km:.2f}",
+                       str(row.latest)[:16]]) for row in grouped.itertuples(index=False)]
+
+
+EVENTS_HEADER = "EVENTS (crit=! marks sanctioned vessels, submarine and ordnance contacts)\ncrit,harbour,source,id,time,dist_km,details\n"
+SUMMARY_HEADER = "FURTHER EVENTS (not listed individually)\nharbour,source,count,min_dist_km,latest\n"
+
+
+def compact(dataframe: pd.DataFrame, token_budget: int = DEFAULT_TOKEN_BUDGET) -> Tuple[str, Dict]:
+    """
+    Encodes the lagebild rows within token_budget. Returns the text and stats
+    (rows, listed, aggregated, critical, estimated tokens).
+    """
+    if dataframe.empty:
+        return "No events in the reporting period.\n", {"rows": 0, "listed": 0, "aggregated": 0,
+                                                          "critical": 0, "tokens": 0}
+    ranked = rank(dataframe)
+    lines = [_event_line(row) for row in ranked.itertuples(index=False)]
+    costs = [estimate_tokens(line) for line in lines]
+    critical_count = int(ranked["critical"].sum())
+
+    # Reserve room for the aggregate lines; the group lines over all non-critical
+    # rows bound the lines needed for whatever ends up not listed.
+    aggregate_cost = sum(estimate_tokens(line) for line in _aggregate_lines(ranked.iloc[critical_count:]))
+    used = estimate_tokens(EVENTS_HEADER) + estimate_tokens(SUMMARY_HEADER) + aggregate_cost
+    listed = 0
+    for index, cost in enumerate(costs):
+        if index >= critical_count and used + cost > token_budget:
+            break
+        used += cost
+        listed += 1
+
+    aggregates = _aggregate_lines(ranked.iloc[listed:])
+    text = EVENTS_HEADER + "".join(lines[:listed])
+    if aggregates:
+        text += "\n" + SUMMARY_HEADER + "".join(aggregates)
+    stats = {"rows": len(ranked), "listed": listed, "aggregated": len(ranked) - listed,
+             "critical": critical_count, "tokens": estimate_tokens(text)}
+    return text, stats
+
+
+def synthetic_lagebild(rows: int, seed: int = 7) -> pd.DataFrame:
+    """lagebild-shaped rows for timing runs without a CDW connection."""
+    import random
+    rng = random.Random(seed)
+    harbours = ["Kiel", "Rostock", "Wismar", "Lübeck", "Stralsund", "Sassnitz", "Flensburg", "Eckernförde"]
+    records = []
+    for i in range(rows):
+        source = rng.choice(["AIS", "AIS", "AIS", "Buoy", "Marine", "SocialMedia", "Marine_Message"])
+        dist = round(rng.uniform(0.1, 50.0), 2)
+        if source == "AIS":
+            sanctioned = "ARISTO (Sanction Reason: Blocked under E.O. 14024)" if rng.random() < 0.002 else "No"
+            details = f"Distance: {dist} km | Sanctioned: {sanctioned}"
+        elif source == "Buoy":
+            obj = rng.choice(["SUBMARINE/POSSIBLE_SUBMARINE", "SUBMARINE/LARGE_DIESEL_ELECTRIC",
+                              "ORDNANCE/POSSIBLE_TORPEDO"]) if rng.random() < 0.01 else "SURFACE_VESSEL/SHIPWRECK"
+            details = f"Distance: {dist} km | Object: {obj} | Mag Anomaly: {rng.uniform(0, 250):.1f}"
+        elif source == "Marine":
+            details = f"Distance: {dist} km | Status: {rng.choice(['Fully Operational', 'Limited Operational', 'Non-Operational'])}"
+        elif source == "SocialMedia":
+            prio = rng.choices(["niedrig", "mittel", "hoch"], [98, 1, 1])[0]
+            details = f"Distance: {dist} km | Prio: {prio} | Tweet: Ungewöhnliche Aktivität im Hafen #{i}"
+        else:
+            details = f"Distance: {dist} km | Subject: Sperrgebiet Übung {i} | From: MARKOM"
+        records.append({
+            "Data_Source": source, "ID": str(200000000 + i), "timestamp": f"2025-10-0{1 + i % 9}T{i % 24:02d}:00:00",
+            "latitude": 54.0, "longitude": 11.0, "harbour_name": rng.choice(harbours),
+            "dist_m_raw": dist * 1000, "dist_km": str(dist), "details": details,
+        })
+    return pd.DataFrame(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact lagebild rows to a token budget.")
+    parser.add_argument("--synthetic", type=int, default=5000, help="Number of synthetic rows")
+    parser.add_argument("--budget", type=int, default=DEFAULT_TOKEN_BUDGET)
+    parser.add_argument("--show", action="store_true", help="Print the compacted text")
+    args = parser.parse_args()
+
+    df = synthetic_lagebild(args.synthetic)
+    start = time.perf_counter()
+    markdown = df.to_markdown(index=False)
+    markdown_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    text, stats = compact(df, args.budget)
+    compact_seconds = time.perf_counter() - start
+    if args.show:
+        print(text)
+    print(f"markdown (full): {len(markdown):,} chars, ~{estimate_tokens(markdown):,} tokens, {markdown_seconds:.2f}s")
+    print(f"compact: {len(text):,} chars, {stats}, {compact_seconds:.2f}s")
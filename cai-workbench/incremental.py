@@ -0,0 +1,136 @@
+"""
+Incremental situation summaries for lagebild.py.
+
+Every harbour keeps a content hash of its lagebild rows, a watermark (latest
+event timestamp seen) and its last summary in a small JSON state file.
+
+- unchanged hash: the cached summary is reused, no LLM call
+- changed hash: only the rows newer than the watermark are sent, together with
+  the previous summary, and the model updates the summary
+- new harbour or no previous summary: full per-harbour summary as in mapreduce.py
+
+If no harbour changed, the previous report is kept and nothing is re-inserted.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Callable, Dict, Optional, TextIO, Tuple
+
+import pandas as pd
+
+from compaction import compact
+from mapreduce import (MAP_CONCURRENCY, MAP_MAX_TOKENS, MAP_PROMPT, MAP_TOKEN_BUDGET,
+                       _complete, collect_partials, partitions, reduce_partials)
+
+STATE_PATH = os.environ.get("LAGEBILD_STATE_PATH", "lagebild_state.json")
+HASH_COLUMNS = ["Data_Source", "ID", "timestamp", "dist_km", "details"]
+
+UPDATE_PROMPT = """
+--- MILITARY SITUATION REPORT: UPDATE ({group}) ---
+Previous summary for {group}:
+{previous}
+
+{removed}New events since {watermark}:
+{data}
+
+END OF DATA.
+
+Update the summary for {group} in at most 8 short lines. Keep still valid points,
+integrate the new events (sanctioned vessels and submarine contacts, marked with !, first).
+"""
+
+
+def normalized_time(value) -> str:
+    """Comparable timestamp text for the mixed lagebild formats (ISO with T/Z or space separated)."""
+    return str(value)[:19].replace("T", " ")
+
+
+def content_hash(part: pd.DataFrame) -> str:
+    rows = sorted("\x1f".join(str(row[column]) for column in HASH_COLUMNS) for _, row in part.iterrows())
+    return hashlib.sha1("\x1e".join(rows).encode("utf-8")).hexdigest()
+
+
+def load_state(path: str = STATE_PATH) -> Dict:
+    try:
+        with open(path, encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {"harbours": {}, "report": None}
+
+
+def save_state(state: Dict, path: str = STATE_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(state, handle, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+async def incremental_report(client, model: str, dataframe: pd.DataFrame, state: Dict, reduce_template: str,
+                             outfile: Optional[TextIO] = None, group_by: str = "harbour_name",
+                             concurrency: int = MAP_CONCURRENCY,
+                             on_report_delta: Optional[Callable[[str], None]] = None) -> Tuple[Optional[str], Dict]:
+    """
+    Updates state in place. Returns (report, stats); report is None when no
+    harbour changed since the previous run.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+    harbours = state.setdefault("harbours", {})
+    stats = {"groups": 0, "unchanged": 0, "delta": 0, "full": 0, "dropped": 0}
+
+    async def cached(group: str, entry: Dict, rows: int):
+        return group, entry["summary"], rows
+
+    async def summarize(group: str, part: pd.DataFrame, entry: Optional[Dict], digest: str):
+        times = part["timestamp"].map(normalized_time)
+        watermark = times.max()
+        if entry and entry.get("summary"):
+            delta = part[times > entry["watermark"]]
+            removed = len(entry.get("ids", [])) - len(set(entry.get("ids", [])) & set(part["ID"].astype(str)))
+            data, _ = compact(delta, MAP_TOKEN_BUDGET) if len(delta) else ("(no new events)\n", None)
+            prompt = UPDATE_PROMPT.format(
+                group=group, previous=entry["summary"], watermark=entry["watermark"], data=data,
+                removed=f"{removed} earlier events are no longer in the reporting window.\n\n" if removed > 0 else "",
+            )
+        else:
+            data, _ = compact(part, MAP_TOKEN_BUDGET)
+            prompt = MAP_PROMPT.format(group=group, data=data)
+        async with semaphore:
+            text = (await _complete(client, model, prompt, MAP_MAX_TOKENS)).strip()
+        harbours[group] = {"hash": digest, "watermark": watermark, "summary": text,
+                           "ids": sorted(set(part["ID"].astype(str))), "updated_at": time.time()}
+        return group, text, len(part)
+
+    plans = []
+    for group, part in partitions(dataframe, group_by):
+        digest = content_hash(part)
+        entry = harbours.get(group)
+        if entry and entry["hash"] == digest:
+            stats["unchanged"] += 1
+            plans.append(cached(group, entry, len(part)))
+        else:
+            stats["delta" if entry and entry.get("summary") else "full"] += 1
+            plans.append(summarize(group, part, entry, digest))
+    present = set(dataframe[group_by].astype(str)) if len(dataframe) else set()
+    for group in set(harbours) - present:
+        del harbours[group]
+        stats["dropped"] += 1
+    stats["groups"] = len(plans)
+
+    changed = stats["delta"] + stats["full"] + stats["dropped"]
+    if not changed and state.get("report"):
+        for plan in plans:
+            plan.close()
+        stats["total_seconds"] = round(time.perf_counter() - started, 2)
+        return None, stats
+
+    tasks = [asyncio.create_task(plan) for plan in plans]
+    partials = await collect_partials(tasks, outfile, started)
+    report = await reduce_partials(client, model, partials, len(dataframe), reduce_template, outfile, group_by,
+                                   on_report_delta)
+    state["report"] = report
+    stats["total_seconds"] = round(time.perf_counter() - started, 2)
+    return report, stats
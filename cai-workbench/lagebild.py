@@ -1,106 +1,53 @@
 import cml.data_v1 as cmldata
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+import asyncio
 import json
+import os
 import pandas as pd
 from datetime import datetime
 from io import StringIO 
 import sys # For error logging
+import argparse
+import time
+import urllib.request
+from compaction import compact
+from mapreduce import map_reduce
+from incremental import incremental_report, load_state, save_state
+from summary_sink import SummarySink
 
 # --- Database and Connection Configuration ---
 CONNECTION_NAME = "cdw-aw-se-impala"
-# NOTE: API_KEY is set in the notebook environment, ensuring compatibility.
-API_KEY = json.load(open("/tmp/jwt"))["access_token"]
+# NOTE: the access token is provided in /tmp/jwt by the notebook environment and refreshed there.
+JWT_PATH = "/tmp/jwt"
 
-# --- LLM Configuration ---
-MODEL_ID = "mistralai/mistral-7b-instruct-v0.3"
-BASE_URL = "https://ml-641a1b1b-617.se-sandb.a465-9q4k.cloudera.site/namespaces/serving-default/endpoints/mistral7binstruct/v1"
-# --- Function Definitions ---
 
-def generate_summary_sql(summary_text, timestamp):
-    """
-    Generates a single, bulk SQL INSERT statement for the 
-    Situation_Awareness_Summary table, separating value sets by comma.
-    """
-    values = []
-    # Format the timestamp for SQL (YYYY-MM-DD HH:MM:SS)
-    sql_timestamp = timestamp.strftime("'%Y-%m-%d %H:%M:%S'")
-    
-    # Split the summary into lines for separate row insertion
-    for line_num, line_content in enumerate(summary_text.splitlines()):
-        # Skip empty or whitespace-only lines
-        if not line_content.strip():
-            continue
-            
-        # Escape single quotes within the content for SQL safety
-        escaped_content = line_content.replace("'", "''")
-        
-        # Create the value tuple: (summary_timestamp, summare_line, summary_text)
-        value_tuple = f"({sql_timestamp}, {line_num + 1}, '{escaped_content}')"
-        values.append(value_tuple)
-    
-    if not values:
-        return "-- No content generated for insertion."
-
-    # Construct the final single BULK INSERT statement
-    insert_statement = (
-        "INSERT INTO defense.Situation_Awareness_Summary (summary_timestamp, summare_line, summary_text) VALUES \n"
-        + ",\n".join(values) + ";"
-    )
-        
-    return insert_statement
+def read_api_key():
+    """Current access token; read on every connect so a refreshed JWT is picked up."""
+    with open(JWT_PATH) as f:
+        return json.load(f)["access_token"]
 
-# --- Main Pipeline Execution ---
+# --- LLM Configuration ---
+MODEL_ID = "mistralai/mistral-7b-instruct-v0.3"
+# LAGEBILD_LLM_BASE_URL=http://127.0.0.1:8098/v1 points the script at llm_stub.py.
+BASE_URL = os.environ.get(
+    "LAGEBILD_LLM_BASE_URL",
+    "https://ml-641a1b1b-617.se-sandb.a465-9q4k.cloudera.site/namespaces/serving-default/endpoints/mistral7binstruct/v1"
+)
+DATA_TOKEN_BUDGET = 6000  # estimated tokens for the data section of the prompt
+# Map-reduce mode: concurrent per-harbour summaries merged by a final call (see mapreduce.py).
+MAP_REDUCE = os.environ.get("LAGEBILD_MAP_REDUCE", "0") == "1"
+# Incremental mode: per-harbour content hashes, LLM calls only for changed harbours (see incremental.py).
+INCREMENTAL = os.environ.get("LAGEBILD_INCREMENTAL", "0") == "1"
+# LAGEBILD_COP_URL=http://127.0.0.1:8097 reads the rows from the in-memory COP (csa-flink/cop_service.py)
+# instead of the lagebild view; the COP has no Marine_Message rows.
+COP_URL = os.environ.get("LAGEBILD_COP_URL")
+DAEMON_INTERVAL_SECONDS = int(os.environ.get("LAGEBILD_INTERVAL", "300"))
+MAP_CONCURRENCY = int(os.environ.get("LAGEBILD_MAP_CONCURRENCY", "8"))
+# Report lines are inserted while the LLM streams, in batches of this many lines or after this many seconds.
+SINK_BATCH_ROWS = 50
+SINK_FLUSH_SECONDS = 2.0
 
-# Setup Connection and API Client
-try:
-    conn = cmldata.get_connection(CONNECTION_NAME)
-    # The user provided the API_KEY as a string in the prompt; use it directly.
-    client = OpenAI(
-      base_url=BASE_URL,
-      api_key=API_KEY
-    )
-except Exception as e:
-    print(f"Failed to initialize connection or API client: {e}")
-    sys.exit(1)
-
-# 1. Data Retrieval
-try:
-    SQL_QUERY = "SELECT * FROM defense.lagebild WHERE harbour_name in (select name from defense.baltic_sea_harbours where country = 'Germany')"
-    dataframe = conn.get_pandas_dataframe(SQL_QUERY)
-    
-    # --- NEW LIMITING LOGIC ---
-    MAX_CHAR_LIMIT = 32000
-    
-    # Start with the full DataFrame
-    df_to_use = dataframe
-    
-    # Convert the full DataFrame to Markdown to check its size
-    df_content_string = df_to_use.to_markdown(index=False)
-    
-    # Check if the generated string exceeds the limit
-    if len(df_content_string) > MAX_CHAR_LIMIT:
-        print(f"Warning: Data size ({len(df_content_string)} chars) exceeds the {MAX_CHAR_LIMIT} limit. Truncating rows...")
-        
-        # Estimate the maximum number of rows based on the original length
-        # We divide the total limit by the length of the string per row
-        avg_row_length = len(df_content_string) / len(dataframe)
-        max_rows = int(MAX_CHAR_LIMIT / avg_row_length) - 1 # Subtract 1 for header space
-
-        # Truncate the DataFrame to the estimated max_rows
-        df_to_use = dataframe.head(max_rows)
-        
-        # Re-generate the markdown string with the limited rows
-        df_content_string = df_to_use.to_markdown(index=False)
-        print(f"Truncated data to {len(df_to_use)} rows. New size: {len(df_content_string)} characters.")
-
-
-except Exception as e:
-    print(f"Failed to retrieve or process data: {e}")
-    # Ensure connection is closed on failure
-    if 'conn' in locals():
-        conn.close()
-    sys.exit(1)
-# 2. Prompt Construction
+# --- Prompt Construction ---
 prompt_template = """
 --- MILITARY SITUATION REPORT ---
 Analyst: military situation awreness - Please Analyse and provide a concise, pretty summary based on the data below.
@@ -122,59 +69,199 @@ Data:
 
 END OF DATA.
 """
-prompt = prompt_template.format(df_content_string)
-
-# 3. LLM Execution Setup
-analysis_start_time = datetime.now()
-timestamp_str = analysis_start_time.strftime("%Y%m%d_%H%M%S")
-report_filename = f"llm_analysis_report_{timestamp_str}.txt"
-sql_filename = f"llm_summary_insert_{timestamp_str}.sql"
-llm_response_buffer = StringIO()
-
-
-print(f"Starting analysis and writing report to {report_filename}...")
-
-# 4. LLM Streaming and Capture
-try:
-    with open(report_filename, 'w', encoding='utf-8') as outfile:
-        completion = client.chat.completions.create(
-            model=MODEL_ID,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.2,
-            top_p=0.7,
-            max_tokens=2048,
-            stream=True
-        )
-        
-        for chunk in completion:
-            content = chunk.choices[0].delta.content
-            if content is not None:
-                outfile.write(content)
-                llm_response_buffer.write(content)
-                print(".", end="", flush=True)
-
-    llm_summary_text = llm_response_buffer.getvalue()
-
-except Exception as e:
-    print(f"\nError during LLM streaming: {e}")
-    conn.close()
-    sys.exit(1)
-
-# 5. SQL Generation and Execution
-try:
-    # Generate the bulk INSERT statement
-    sql_statement = generate_summary_sql(llm_summary_text, analysis_start_time) 
-    
-    with conn.get_base_connection() as base_conn:
-        with base_conn.cursor() as cursor:
-            # 3. Execute the DML statement (INSERT)
-            cursor.execute(sql_statement)
-            print("Bulk insertion into defense.Situation_Awareness_Summary complete.")    
-
-except Exception as e:
-    print(f"\nError during SQL DML Report Insert: {e}")
-    
-finally:
-    # 6. Close the connection
-    conn.close()
-    print("\nDatabase connection closed.")
+
+SQL_QUERY = "SELECT * FROM defense.lagebild WHERE harbour_name in (select name from defense.baltic_sea_harbours where country = 'Germany')"
+
+
+_EVENT_LOOP = None
+
+
+def run_async(coroutine):
+    """Runs on one persistent event loop so the async client's connection pool survives between cycles."""
+    global _EVENT_LOOP
+    if _EVENT_LOOP is None:
+        _EVENT_LOOP = asyncio.new_event_loop()
+    return _EVENT_LOOP.run_until_complete(coroutine)
+
+
+def close_event_loop():
+    global _EVENT_LOOP
+    if _EVENT_LOOP is not None:
+        _EVENT_LOOP.run_until_complete(_EVENT_LOOP.shutdown_asyncgens())
+        _EVENT_LOOP.close()
+        _EVENT_LOOP = None
+
+
+def connect():
+    """Database connection plus sync and async LLM clients, kept warm across daemon cycles."""
+    conn = cmldata.get_connection(CONNECTION_NAME)
+    api_key = read_api_key()
+    client = OpenAI(
+      base_url=BASE_URL,
+      api_key=api_key
+    )
+    async_client = AsyncOpenAI(base_url=BASE_URL, api_key=api_key)
+    return conn, client, async_client
+
+
+def fetch_dataframe(conn):
+    """The lagebild rows for the German harbours, from the COP service if configured, else from the CDW."""
+    if COP_URL:
+        with urllib.request.urlopen(f"{COP_URL.rstrip('/')}/lagebild?country=Germany", timeout=30) as response:
+            return pd.DataFrame(json.load(response)["rows"])
+    return conn.get_pandas_dataframe(SQL_QUERY)
+
+
+def stream_single_prompt(client, dataframe, outfile, sink):
+    """The original mode: one prompt over the compacted data, streamed into the report file."""
+    # --- Token-budgeted compaction (see compaction.py) ---
+    # Critical rows (sanctioned vessels, submarine contacts) are always listed,
+    # the rest by severity until the budget is used; remaining rows are counted
+    # per harbour and source.
+    df_content_string, compaction_stats = compact(dataframe, DATA_TOKEN_BUDGET)
+    print(f"Compacted {compaction_stats['rows']} rows: {compaction_stats['listed']} listed "
+          f"({compaction_stats['critical']} critical), {compaction_stats['aggregated']} aggregated, "
+          f"~{compaction_stats['tokens']} tokens.")
+    prompt = prompt_template.format(df_content_string)
+
+    llm_response_buffer = StringIO()
+    completion = client.chat.completions.create(
+        model=MODEL_ID,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.2,
+        top_p=0.7,
+        max_tokens=2048,
+        stream=True
+    )
+
+    for chunk in completion:
+        content = chunk.choices[0].delta.content
+        if content is not None:
+            outfile.write(content)
+            llm_response_buffer.write(content)
+            sink.write(content)
+            print(".", end="", flush=True)
+    return llm_response_buffer.getvalue()
+
+
+def run_once(conn, client, async_client, state=None):
+    """
+    One analysis cycle: query, summarize, write the report file and insert the
+    summary. Raises on failure. Returns False if the incremental mode found no
+    change and nothing was generated.
+    """
+    # 1. Data Retrieval
+    dataframe = fetch_dataframe(conn)
+
+    # 3. LLM Execution Setup
+    analysis_start_time = datetime.now()
+    timestamp_str = analysis_start_time.strftime("%Y%m%d_%H%M%S")
+    report_filename = f"llm_analysis_report_{timestamp_str}.txt"
+
+    print(f"Starting analysis and writing report to {report_filename}...")
+
+    # 4. LLM Streaming and Capture, 5. SQL Execution
+    # The sink inserts report lines into defense.Situation_Awareness_Summary while
+    # they stream and flushes what it has if the stream fails.
+    cursor = conn.get_cursor()
+    try:
+        with open(report_filename, 'w', encoding='utf-8') as outfile, \
+                SummarySink(cursor, analysis_start_time, batch_rows=SINK_BATCH_ROWS,
+                            flush_seconds=SINK_FLUSH_SECONDS) as sink:
+            if state is not None:
+                # Only harbours whose rows changed are sent to the LLM, with their previous summary.
+                llm_summary_text, incremental_stats = run_async(incremental_report(
+                    async_client, MODEL_ID, dataframe, state, prompt_template, outfile,
+                    concurrency=MAP_CONCURRENCY, on_report_delta=sink.write
+                ))
+                print(f"Incremental run: {incremental_stats}")
+            elif MAP_REDUCE:
+                # Partial summaries are written to the report as they complete, followed by the merged report.
+                llm_summary_text, map_reduce_stats = run_async(map_reduce(
+                    async_client, MODEL_ID, dataframe, prompt_template, outfile,
+                    concurrency=MAP_CONCURRENCY, on_report_delta=sink.write
+                ))
+                print(f"Map-reduce finished: {map_reduce_stats}")
+            else:
+                llm_summary_text = stream_single_prompt(client, dataframe, outfile, sink)
+    finally:
+        cursor.close()
+
+    if llm_summary_text is None:
+        os.remove(report_filename)
+        print("No changes since the previous run; keeping the previous summary.")
+        return False
+
+    print(f"\nInserted {sink.rows} lines in {sink.batches} batches into defense.Situation_Awareness_Summary.")
+    if state is not None:
+        # Persist the new summaries only once they are stored in the database.
+        save_state(state)
+    return True
+
+
+def run_daemon(interval):
+    """Runs a cycle every interval seconds with a warm connection; errors are logged and the connection rebuilt."""
+    conn = None
+    token_mtime = None
+    state = load_state() if INCREMENTAL else None
+    while True:
+        cycle_start = time.monotonic()
+        try:
+            if conn is not None and os.path.getmtime(JWT_PATH) != token_mtime:
+                conn.close()  # the JWT was refreshed: rebuild the clients with the new token
+                conn = None
+            if conn is None:
+                token_mtime = os.path.getmtime(JWT_PATH)
+                conn, client, async_client = connect()
+            run_once(conn, client, async_client, state)
+        except KeyboardInterrupt:
+            break
+        except Exception as e:
+            print(f"\nCycle failed: {e}")
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                conn = None
+            if state is not None:
+                state = load_state()  # drop unsaved summaries of the failed cycle
+        try:
+            time.sleep(max(0.0, interval - (time.monotonic() - cycle_start)))
+        except KeyboardInterrupt:
+            break
+    close_event_loop()
+    if conn is not None:
+        conn.close()
+        print("\nDatabase connection closed.")
+
+
+# --- Main Pipeline Execution ---
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Situation awareness summary for German harbours.")
+    parser.add_argument("--daemon", action="store_true", help="Run every --interval seconds instead of once")
+    parser.add_argument("--interval", type=int, default=DAEMON_INTERVAL_SECONDS)
+    args = parser.parse_args()
+
+    if args.daemon:
+        run_daemon(args.interval)
+        sys.exit(0)
+
+    # Setup Connection and API Client
+    try:
+        conn, client, async_client = connect()
+    except Exception as e:
+        print(f"Failed to initialize connection or API client: {e}")
+        sys.exit(1)
+
+    try:
+        run_once(conn, client, async_client, load_state() if INCREMENTAL else None)
+    except Exception as e:
+        print(f"\nLagebild run failed: {e}")
+        sys.exit(1)
+    finally:
+        # 6. Close the connection
+        close_event_loop()
+        conn.close()
+        print("\nDatabase connection closed.")
@@ -0,0 +1,130 @@
+"""
+Local OpenAI-compatible stand-in for the Mistral serving endpoint.
+
+Serves POST /v1/chat/completions (streaming and non-streaming) with a simple
+latency model so lagebild's single-prompt and map-reduce modes can be compared
+offline:
+
+    prefill  = prompt_tokens * --prefill-latency
+    decode   = completion_tokens * --token-latency
+    completion_tokens = min(max_tokens, 50 + prompt_tokens * --output-ratio)
+
+At most --max-parallel requests are generated concurrently (the serving
+replica's batch capacity); further requests queue.
+
+    python llm_stub.py --port 8098
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("Lage ruhig. Kontakt nahe Hafen bestätigt, Verifikation empfohlen. "
+         "Sanktioniertes Schiff im Zulauf, Priorität hoch. Magnetische Anomalie gemeldet. ").split()
+
+
+def count_tokens(text: str) -> int:
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self.reply(404, {"error": {"message": "not found"}})
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        prompt_tokens = count_tokens(prompt)
+        completion_tokens = min(int(body.get("max_tokens") or 512), 50 + int(prompt_tokens * self.server.output_ratio))
+        server = self.server
+        with server.capacity:
+            with server.lock:
+                server.requests += 1
+            time.sleep(prompt_tokens * server.prefill_latency)
+            if body.get("stream"):
+                self.stream(body, completion_tokens)
+            else:
+                time.sleep(completion_tokens * server.token_latency)
+                self.reply(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion",
+                    "created": int(time.time()), "model": body.get("model", "stub"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": self.text(completion_tokens)}}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens},
+                })
+
+    @staticmethod
+    def text(tokens: int, offset: int = 0) -> str:
+        return " ".join(WORDS[(offset + i) % len(WORDS)] for i in range(tokens))
+
+    def stream(self, body: dict, completion_tokens: int):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        for start in range(0, completion_tokens, 5):
+            count = min(5, completion_tokens - start)
+            time.sleep(count * self.server.token_latency)
+            self.event({"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": body.get("model", "stub"),
+                        "choices": [{"index": 0, "delta": {"content": self.text(count, start) + " "},
+                                     "finish_reason": None}]})
+        self.event({"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.write_chunk(b"")
+
+    def event(self, payload: dict):
+        self.write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def reply(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def serve(port: int = 8098, prefill_latency: float = 0.0005, token_latency: float = 0.02,
+          max_parallel: int = 8, output_ratio: float = 0.25) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.prefill_latency = prefill_latency
+    server.token_latency = token_latency
+    server.output_ratio = output_ratio
+    server.capacity = threading.BoundedSemaphore(max_parallel)
+    server.lock = threading.Lock()
+    server.requests = 0
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible LLM stub with simulated token latency.")
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--prefill-latency", type=float, default=0.0005, help="Seconds per prompt token")
+    parser.add_argument("--token-latency", type=float, default=0.02, help="Seconds per generated token")
+    parser.add_argument("--max-parallel", type=int, default=8)
+    parser.add_argument("--output-ratio", type=float, default=0.25, help="Completion tokens per prompt token")
+    args = parser.parse_args()
+    stub = serve(args.port, args.prefill_latency, args.token_latency, args.max_parallel, args.output_ratio)
+    print(f"LLM stub listening on http://127.0.0.1:{args.port}/v1")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,202 @@
+"""
+Map-reduce summarization for lagebild.py.
+
+Instead of one long generation over all harbours, every harbour (or data
+source) is summarized by its own LLM call. The calls run concurrently on an
+asyncio OpenAI client under a concurrency limit and each partial summary is
+written to the report file as soon as it completes. A final reduce call merges
+the partial summaries into the usual situation report format.
+
+Offline comparison against the single-prompt mode with llm_stub.py:
+
+    python mapreduce.py --benchmark --rows 3000
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional, TextIO, Tuple
+
+import pandas as pd
+
+from compaction import compact
+
+MAP_CONCURRENCY = 8
+MAP_TOKEN_BUDGET = 1500      # estimated data tokens per harbour prompt
+MAP_MAX_TOKENS = 160       # about 8 short lines
+REDUCE_MAX_TOKENS = 2048
+
+MAP_PROMPT = """
+--- MILITARY SITUATION REPORT: PARTIAL ({group}) ---
+Summarize the events for {group} in at most 8 short lines:
+- the highest-priority event (sanctioned vessels and submarine contacts, marked with !) with ID, time and distance
+- other notable activity (magnetic anomalies, vessel status, messages, social media) with counts
+- a one-line assessment for {group}
+Use only the data below.
+
+Data:
+{data}
+
+END OF DATA.
+"""
+
+
+def partitions(dataframe: pd.DataFrame, group_by: str = "harbour_name") -> List[Tuple[str, pd.DataFrame]]:
+    return [(str(name), part) for name, part in dataframe.groupby(group_by, sort=True)]
+
+
+async def _complete(client, model: str, prompt: str, max_tokens: int,
+                    on_delta: Optional[Callable[[str], None]] = None) -> str:
+    """One streamed chat completion; on_delta receives the content pieces as they arrive."""
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.2,
+        top_p=0.7,
+        max_tokens=max_tokens,
+        stream=True
+    )
+    pieces = []
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        content = chunk.choices[0].delta.content
+        if content is not None:
+            pieces.append(content)
+            if on_delta is not None:
+                on_delta(content)
+    return "".join(pieces)
+
+
+async def reduce_partials(client, model: str, partials: Dict[str, Tuple[str, int]], total_rows: int,
+                          reduce_template: str, outfile: Optional[TextIO] = None,
+                          group_by: str = "harbour_name",
+                          on_delta: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Merges {group: (summary, rows)} with one streamed call. reduce_template is
+    the single-prompt template with one {} slot for the data; it receives the
+    partial summaries instead of the raw rows. on_delta receives the report
+    text as it streams (e.g. a SummarySink).
+    """
+    reduce_data = "\n\n".join(
+        f"{group} ({rows} events):\n{text}" for group, (text, rows) in sorted(partials.items())
+    )
+    reduce_data = f"Events analysed: {total_rows} across {len(partials)} {group_by} groups.\n\n{reduce_data}"
+    if outfile is not None:
+        outfile.write("\n=== SITUATION REPORT ===\n")
+
+    def write_delta(content: str):
+        if outfile is not None:
+            outfile.write(content)
+            outfile.flush()
+        if on_delta is not None:
+            on_delta(content)
+
+    return await _complete(client, model, reduce_template.format(reduce_data), REDUCE_MAX_TOKENS, write_delta)
+
+
+async def map_reduce(client, model: str, dataframe: pd.DataFrame, reduce_template: str,
+                     outfile: Optional[TextIO] = None, group_by: str = "harbour_name",
+                     concurrency: int = MAP_CONCURRENCY,
+                     on_report_delta: Optional[Callable[[str], None]] = None) -> Tuple[str, Dict]:
+    """
+    Runs the per-group map calls concurrently and the reduce call over their
+    results. Returns the final report text and timing stats.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+
+    async def summarize(group: str, part: pd.DataFrame) -> Tuple[str, str, int]:
+        data, stats = compact(part, MAP_TOKEN_BUDGET)
+        async with semaphore:
+            text = await _complete(client, model, MAP_PROMPT.format(group=group, data=data), MAP_MAX_TOKENS)
+        return group, text.strip(), stats["rows"]
+
+    tasks = [asyncio.create_task(summarize(group, part)) for group, part in partitions(dataframe, group_by)]
+    partials = await collect_partials(tasks, outfile, started)
+    map_seconds = time.perf_counter() - started
+
+    report = await reduce_partials(client, model, partials, len(dataframe), reduce_template, outfile, group_by,
+                                   on_report_delta)
+    stats = {"groups": len(partials), "map_seconds": round(map_seconds, 2),
+             "total_seconds": round(time.perf_counter() - started, 2)}
+    return report, stats
+
+
+async def collect_partials(tasks, outfile: Optional[TextIO], started: float) -> Dict[str, Tuple[str, int]]:
+    """Awaits (group, summary, rows) tasks in completion order and writes each to the report file."""
+    partials: Dict[str, Tuple[str, int]] = {}
+    if outfile is not None:
+        outfile.write("=== PARTIAL SUMMARIES ===\n")
+    try:
+        for finished in asyncio.as_completed(tasks):
+            group, text, rows = await finished
+            partials[group] = (text, rows)
+            if outfile is not None:
+                outfile.write(f"\n--- {group} ({rows} events) ---\n{text}\n")
+                outfile.flush()
+            print(f"[map] {group} done after {time.perf_counter() - started:.1f}s")
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return partials
+
+
+async def single_prompt(client, model: str, dataframe: pd.DataFrame, template: str, token_budget: int) -> str:
+    data, _ = compact(dataframe, token_budget)
+    return await _complete(client, model, template.format(data), REDUCE_MAX_TOKENS)
+
+
+BENCHMARK_TEMPLATE = """
+--- MILITARY SITUATION REPORT ---
+Analyse and provide a concise summary: 1. High-Priority Threat Assessment 2. Geographic Hotspots
+3. Conclusion and Recommendation. AIS Sanctions.
+
+Data:
+{}
+
+END OF DATA.
+"""
+
+
+def benchmark(rows: int, port: int, token_latency: float, token_budget: int):
+    """Single prompt vs. map-reduce against llm_stub.py started in-process."""
+    import os
+    import threading
+    from openai import AsyncOpenAI
+    import llm_stub
+    from compaction import synthetic_lagebild
+
+    stub = llm_stub.serve(port, token_latency=token_latency)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    client = AsyncOpenAI(base_url=f"http://127.0.0.1:{port}/v1", api_key="stub")
+    df = synthetic_lagebild(rows)
+
+    start = time.perf_counter()
+    asyncio.run(single_prompt(client, "stub", df, BENCHMARK_TEMPLATE, token_budget))
+    single_seconds = time.perf_counter() - start
+
+    client = AsyncOpenAI(base_url=f"http://127.0.0.1:{port}/v1", api_key="stub")
+    report_path = os.path.join("/tmp", "lagebild_mapreduce_benchmark.txt")
+    with open(report_path, "w", encoding="utf-8") as outfile:
+        _, stats = asyncio.run(map_reduce(client, "stub", df, BENCHMARK_TEMPLATE, outfile))
+    stub.shutdown()
+    print(f"single prompt: {single_seconds:.1f}s")
+    print(f"map-reduce:    {stats['total_seconds']:.1f}s (map {stats['map_seconds']:.1f}s, "
+          f"{stats['groups']} groups), report in {report_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Map-reduce lagebild summarization.")
+    parser.add_argument("--benchmark", action="store_true", help="Compare with the single prompt on llm_stub.py")
+    parser.add_argument("--rows", type=int, default=3000)
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    parser.add_argument("--token-budget", type=int, default=6000)
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.rows, args.port, args.token_latency, args.token_budget)
+    else:
+        parser.print_help()
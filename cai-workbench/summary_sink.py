@@ -0,0 +1,177 @@
+"""
+Streaming sink for LLM report lines into defense.Situation_Awareness_Summary.
+
+lagebild.py used to build one string-escaped multi-row INSERT after the whole
+completion had been received. The sink receives the streamed text instead,
+cuts it into lines and writes completed lines in parameterized batches once
+batch_rows lines are buffered or flush_seconds have passed. Leaving the sink
+(also through an exception) flushes the buffered lines, so a partial report
+survives an aborted stream.
+
+impyla's executemany() runs one statement per row, so by default a batch is
+sent as a single multi-row INSERT with bound parameters (multirow=True).
+multirow=False uses cursor.executemany() for drivers with native batching.
+
+    python summary_sink.py --lines 20000      # batching check and rows/sec on sqlite3
+"""
+
+import argparse
+import sqlite3
+import time
+from datetime import datetime
+from typing import List, Tuple
+
+SUMMARY_TABLE = "defense.Situation_Awareness_Summary"
+PLACEHOLDERS = {"qmark": "?", "format": "%s", "pyformat": "%s"}
+
+
+class SummarySink:
+    """
+    Line-oriented writer: write() accepts arbitrary text chunks, each completed
+    line becomes one (summary_timestamp, summare_line, summary_text) row. Line
+    numbers count empty lines like the previous generate_summary_sql did, empty
+    lines themselves are not stored.
+    """
+
+    def __init__(self, cursor, summary_timestamp: datetime, table: str = SUMMARY_TABLE,
+                 batch_rows: int = 50, flush_seconds: float = 2.0, paramstyle: str = "pyformat",
+                 multirow: bool = True):
+        self.cursor = cursor
+        self.timestamp = summary_timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        self.table = table
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self.placeholder = PLACEHOLDERS[paramstyle]
+        self.multirow = multirow
+        self.pending = ""
+        self.line_num = 0
+        self.batch: List[Tuple] = []
+        self.last_flush = time.monotonic()
+        self.rows = 0
+        self.batches = 0
+
+    def write(self, text: str):
+        self.pending += text
+        if "\n" not in self.pending:
+            return
+        *lines, self.pending = self.pending.split("\n")
+        for line in lines:
+            self._add(line)
+        if len(self.batch) >= self.batch_rows or time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def _add(self, line: str):
+        self.line_num += 1
+        line = line.rstrip("\r")
+        if line.strip():
+            self.batch.append((self.timestamp, self.line_num, line))
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        while self.batch:
+            chunk, self.batch = self.batch[:self.batch_rows], self.batch[self.batch_rows:]
+            columns = "(summary_timestamp, summare_line, summary_text)"
+            row = f"({', '.join([self.placeholder] * 3)})"
+            if self.multirow:
+                sql = f"INSERT INTO {self.table} {columns} VALUES " + ", ".join([row] * len(chunk))
+                self.cursor.execute(sql, [value for values in chunk for value in values])
+            else:
+                self.cursor.executemany(f"INSERT INTO {self.table} {columns} VALUES {row}", chunk)
+            self.rows += len(chunk)
+            self.batches += 1
+
+    def close(self):
+        """Writes the unterminated last line and everything still buffered."""
+        if self.pending:
+            self._add(self.pending)
+            self.pending = ""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+        return False
+
+
+class CountingCursor:
+    """DB-API cursor wrapper recording the statements it receives."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.execute_calls = 0
+        self.executemany_calls = 0
+
+    def execute(self, sql, parameters=()):
+        self.execute_calls += 1
+        return self.cursor.execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.executemany_calls += 1
+        return self.cursor.executemany(sql, seq_of_parameters)
+
+
+def check(lines: int, batch_rows: int, chunk_chars: int):
+    """Streams a synthetic report through the sink into sqlite3 and checks batching and content."""
+    report = "\n".join("" if i % 7 == 6 else f"Line {i}: Kontakt nahe Rostock, 'Priorität' hoch"
+                       for i in range(lines))
+    chunks = [report[i:i + chunk_chars] for i in range(0, len(report), chunk_chars)]
+    expected = [(i + 1, line) for i, line in enumerate(report.split("\n")) if line.strip()]
+
+    for multirow in (True, False):
+        db = sqlite3.connect(":memory:")
+        db.execute("CREATE TABLE summary (summary_timestamp TEXT, summare_line INT, summary_text TEXT)")
+        cursor = CountingCursor(db.cursor())
+        start = time.perf_counter()
+        # sqlite allows 999 bound variables per statement in older builds: 333 rows per multi-row INSERT.
+        with SummarySink(cursor, datetime(2025, 10, 1, 12, 0), table="summary", batch_rows=batch_rows,
+                         flush_seconds=3600, paramstyle="qmark", multirow=multirow) as sink:
+            for chunk in chunks:
+                sink.write(chunk)
+        db.commit()
+        seconds = time.perf_counter() - start
+        stored = db.execute("SELECT summare_line, summary_text FROM summary ORDER BY summare_line").fetchall()
+        assert stored == expected, "stored rows differ from the report lines"
+        expected_batches = -(-len(expected) // batch_rows)
+        assert sink.batches == expected_batches, (sink.batches, expected_batches)
+        calls = cursor.execute_calls if multirow else cursor.executemany_calls
+        assert calls == expected_batches, (calls, expected_batches)
+        print(f"{'multi-row INSERT' if multirow else 'executemany':17s}: {sink.rows} rows in {sink.batches} batches, "
+              f"{sink.rows / seconds:,.0f} rows/s")
+
+    # Time threshold: with flush_seconds=0 every chunk that completes a line is written at once.
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE summary (summary_timestamp TEXT, summare_line INT, summary_text TEXT)")
+    sink = SummarySink(db.cursor(), datetime(2025, 10, 1), table="summary", batch_rows=10000,
+                       flush_seconds=0, paramstyle="qmark")
+    sink.write("1. Lage\n")
+    assert sink.rows == 1 and not sink.batch
+    sink.write("2. Hotspot")
+    assert sink.rows == 1
+    sink.close()
+    assert sink.rows == 2 and sink.batches == 2
+    print("time threshold: lines written while streaming")
+
+    # Flush on error: lines streamed before the failure are persisted.
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE summary (summary_timestamp TEXT, summare_line INT, summary_text TEXT)")
+    try:
+        with SummarySink(db.cursor(), datetime(2025, 10, 1), table="summary", batch_rows=batch_rows,
+                         paramstyle="qmark") as sink:
+            sink.write("1. Lage\n2. Hotspot Rostock\n3. unvollst")
+            raise ConnectionError("stream aborted")
+    except ConnectionError:
+        pass
+    stored = db.execute("SELECT summary_text FROM summary ORDER BY summare_line").fetchall()
+    assert stored == [("1. Lage",), ("2. Hotspot Rostock",), ("3. unvollst",)], stored
+    print("flush on error: partial report persisted")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the summary sink against sqlite3.")
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument("--batch-rows", type=int, default=300)
+    parser.add_argument("--chunk-chars", type=int, default=17, help="Size of the simulated stream chunks")
+    args = parser.parse_args()
+    check(args.lines, args.batch_rows, args.chunk_chars)
@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import pytest
+
+from summary_sink import SummarySink
+
+
+class FakeCursor:
+    """DB-API cursor stand-in that records every statement and its parameters."""
+
+    def __init__(self, fail_on_call=None):
+        self.calls = []
+        self.fail_on_call = fail_on_call
+
+    def execute(self, sql, parameters=()):
+        self._record("execute", sql, list(parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        self._record("executemany", sql, [tuple(values) for values in seq_of_parameters])
+
+    def _record(self, method, sql, parameters):
+        if self.fail_on_call is not None and len(self.calls) == self.fail_on_call:
+            raise ConnectionError("connection lost")
+        self.calls.append((method, sql, parameters))
+
+
+TIMESTAMP = datetime(2025, 10, 1, 12, 0)
+REPORT = "1. Lage\n2. Hotspot Rostock\n\n4. Empfehlung\n5. MPA\n6. USV\n7. Ende\n"
+
+
+def stream(sink, text, chunk_chars=5):
+    for i in range(0, len(text), chunk_chars):
+        sink.write(text[i:i + chunk_chars])
+
+
+def test_multirow_batches_of_batch_rows():
+    cursor = FakeCursor()
+    with SummarySink(cursor, TIMESTAMP, table="summary", batch_rows=3, flush_seconds=3600) as sink:
+        stream(sink, REPORT)
+
+    assert [method for method, _, _ in cursor.calls] == ["execute", "execute"]
+    first_sql, first_params = cursor.calls[0][1], cursor.calls[0][2]
+    assert first_sql == ("INSERT INTO summary (summary_timestamp, summare_line, summary_text) VALUES "
+                         "(%s, %s, %s), (%s, %s, %s), (%s, %s, %s)")
+    assert first_params == ["2025-10-01 12:00:00", 1, "1. Lage",
+                            "2025-10-01 12:00:00", 2, "2. Hotspot Rostock",
+                            "2025-10-01 12:00:00", 4, "4. Empfehlung"]
+    # The empty third line is counted but not stored.
+    assert [first_params[i] for i in range(1, len(first_params), 3)] == [1, 2, 4]
+    assert sink.rows == 6 and sink.batches == 2
+
+
+def test_executemany_with_qmark():
+    cursor = FakeCursor()
+    with SummarySink(cursor, TIMESTAMP, table="summary", batch_rows=4, flush_seconds=3600, paramstyle="qmark",
+                     multirow=False) as sink:
+        stream(sink, REPORT)
+
+    assert [method for method, _, _ in cursor.calls] == ["executemany", "executemany"]
+    assert cursor.calls[0][1] == "INSERT INTO summary (summary_timestamp, summare_line, summary_text) VALUES (?, ?, ?)"
+    assert [len(rows) for _, _, rows in cursor.calls] == [4, 2]
+    assert cursor.calls[1][2][-1] == ("2025-10-01 12:00:00", 7, "7. Ende")
+
+
+def test_time_threshold_flushes_while_streaming():
+    cursor = FakeCursor()
+    sink = SummarySink(cursor, TIMESTAMP, batch_rows=1000, flush_seconds=0)
+    sink.write("1. Lage\n2. Hot")
+    assert sink.rows == 1 and len(cursor.calls) == 1
+    sink.write("spot")
+    assert len(cursor.calls) == 1  # no completed line, nothing to write
+    sink.close()
+    assert sink.rows == 2 and cursor.calls[-1][2][-1] == "2. Hotspot"
+
+
+def test_flush_on_error_persists_partial_report():
+    cursor = FakeCursor()
+    with pytest.raises(ConnectionError):
+        with SummarySink(cursor, TIMESTAMP, batch_rows=50, flush_seconds=3600) as sink:
+            sink.write("1. Lage\n2. Hotspot Rostock\n3. unvollst")
+            raise ConnectionError("stream aborted")
+
+    assert len(cursor.calls) == 1
+    assert cursor.calls[0][2][2::3] == ["1. Lage", "2. Hotspot Rostock", "3. unvollst"]
+
+
+def test_failed_insert_propagates():
+    cursor = FakeCursor(fail_on_call=1)
+    with pytest.raises(ConnectionError):
+        with SummarySink(cursor, TIMESTAMP, batch_rows=2, flush_seconds=3600) as sink:
+            stream(sink, REPORT)
+    assert len(cursor.calls) == 1 and sink.rows == 2
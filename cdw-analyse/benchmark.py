@@ -0,0 +1,407 @@
+"""
+Offline benchmark for the defense views (lagebild, vessel_proximity,
+area_violation, buoy_near_harbours) without the Impala cluster.
+
+Synthetic AIS, buoy, marine status, social media and STANAG rows with the
+simulators' schemas (nifi-processors/*) are generated directly inside a local
+DuckDB database, the reference tables are loaded from the INSERT statements in
+create_db_tables_impala.sql and the views from create_views_duckdb.sql.
+Every view is then materialized per scale and the latency, rows scanned and
+peak buffer memory are appended to benchmark_results.jsonl (local, not versioned) with the
+current git commit, so runs of different commits can be compared.
+
+Requires duckdb (pip install duckdb); area_violation additionally needs the
+DuckDB spatial extension and is skipped if it cannot be loaded.
+
+Usage:
+    python benchmark.py --scales 1M 10M
+    python benchmark.py --scales 1M --views lagebild --repeat 5
+    python benchmark.py --compare <base-commit> [--fail-on-regression]
+"""
+
+import argparse
+import json
+import os
+import re
+import resource
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+IMPALA_DDL = os.path.join(HERE, "create_db_tables_impala.sql")
+DUCKDB_VIEWS = os.path.join(HERE, "create_views_duckdb.sql")
+RESULTS_FILE = os.path.join(HERE, "benchmark_results.jsonl")
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), "triton_benchmark")
+
+VIEWS = ["lagebild", "vessel_proximity", "area_violation", "buoy_near_harbours"]
+REFERENCE_TABLES = ["baltic_sea_harbours", "sanctioned_vessels", "observation_areas"]
+
+# Share of the total row count per generated table.
+TABLE_MIX = {
+    "ais_events_ice": 0.60,
+    "buoy_data": 0.15,
+    "marine_vessel_status": 0.10,
+    "social_media_messages": 0.10,
+    "maritime_surveillance_reports": 0.05,
+}
+
+# Timestamps are spread over the 48 hours before BENCHMARK_NOW, so the 24h filters keep about half.
+TIME_SPAN_SECONDS = 48 * 3600
+# Fixed "current time" of the generated data and of the views' now() (UTC). A database generated
+# once therefore selects the same rows in every later run, however old the cached file is.
+BENCHMARK_NOW = "2025-10-01 12:00:00"
+
+GENERATORS = {
+    # MarineShipSimulator / ShipSimulationRoutes (generate_ais_message)
+    "ais_events_ice": """
+        INSERT INTO ais_events_ice
+        SELECT
+            123456000 + (i % {vessels}) AS mmsi,
+            strftime(TIMESTAMP '{now}' - to_seconds(CAST(random() * {span} AS BIGINT)), '%Y-%m-%d %H:%M:%S.%g'),
+            round(h.latitude + (random() - 0.5) * 0.8, 5),
+            round(h.longitude + (random() - 0.5) * 0.8, 5),
+            round(random() * 15, 1),
+            round(random() * 360, 1),
+            ['Underway using engine', 'Underway', 'Anchored', 'Moored', 'Not under command'][1 + (i % 5)],
+            h.name
+        FROM range({rows}) r(i)
+        JOIN harbour_seed h ON h.idx = i % {harbours}
+    """,
+    # MarineShipSimulator with the extended J2.2 status fields
+    "marine_vessel_status": """
+        INSERT INTO marine_vessel_status
+        SELECT
+            'MAR' || CAST(123400 + (i % 56) AS VARCHAR),
+            strftime(TIMESTAMP '{now}' - to_seconds(CAST(random() * {span} AS BIGINT)), '%Y-%m-%d %H:%M:%S.%g'),
+            round(h.latitude + (random() - 0.5) * 0.8, 5),
+            round(h.longitude + (random() - 0.5) * 0.8, 5),
+            round(random() * 10, 1),
+            round(random() * 360, 1),
+            ['Underway using engine', 'Underway', 'Moored'][1 + (i % 3)],
+            h.name,
+            round(random() * 15, 1),
+            ['Fully Operational', 'Limited Operational', 'Non-Operational'][1 + (i % 3)],
+            ['All Systems Green', 'Minor Sensor Issues', 'Major Engine Failure', 'Weapon System Offline'][1 + (i % 4)]
+        FROM range({rows}) r(i)
+        JOIN harbour_seed h ON h.idx = i % {harbours}
+    """,
+    # BuoySensorSimulator (flat MAD record)
+    "buoy_data": """
+        INSERT INTO buoy_data
+        SELECT
+            'MAD-' || lpad(CAST(i % 200 AS VARCHAR), 2, '0'),
+            strftime(TIMESTAMP '{now}' - to_seconds(CAST(random() * {span} AS BIGINT)), '%Y-%m-%dT%H:%M:%S.%gZ'),
+            round(h.latitude + (random() - 0.5) * 0.2, 4),
+            round(h.longitude + (random() - 0.5) * 0.2, 4),
+            CAST(50 + random() * 150 AS INTEGER),
+            round(49900 + random() * 400, 1),
+            round((random() - 0.5) * 600, 1),
+            ['VERY_STEEP', 'MODERATE', 'SHALLOW', 'STEADY', 'FLAT', 'BROAD', 'LINEAR', 'VERY_STEEP', 'ERRATIC', 'VERY_STEEP'][1 + (i % 10)],
+            ['VERY_HIGH', 'HIGH', 'MEDIUM', 'HIGH', 'LOW', 'HIGH', 'HIGH', 'MEDIUM', 'LOW', 'VERY_HIGH'][1 + (i % 10)],
+            ['SUBMARINE', 'SUBMARINE', 'SUBMARINE', 'SURFACE_VESSEL', 'NATURAL_PHENOMENON', 'GEOLOGICAL',
+             'MANMADE_STRUCTURE', 'ORDNANCE', 'BIOLOGICAL', 'SUBMARINE'][1 + (i % 10)],
+            ['LARGE_DIESEL_ELECTRIC', 'MIDGET_SUBMARINE', 'POSSIBLE_SUBMARINE', 'SHIPWRECK', 'BACKGROUND_NOISE',
+             'MAGNETIC_ORE_DEPOSIT', 'PIPELINE_OR_CABLE', 'POSSIBLE_TORPEDO', 'MARINE_FAUNA_SWARM',
+             'CONFIRMED_SUBMARINE'][1 + (i % 10)],
+            CAST(50 + random() * 49 AS INTEGER),
+            CAST(10 + random() * 90 AS INTEGER),
+            ['MOVING', 'FIXED', 'FAST_MOVING', 'ERRATIC'][1 + (i % 4)],
+            NULL,
+            NULL,
+            NULL,
+            NULL
+        FROM range({rows}) r(i)
+        JOIN harbour_seed h ON h.idx = i % {harbours}
+    """,
+    # TwitterMessageGenerator (MessengerSimulator.py), tagged by EntityExtraction
+    "social_media_messages": """
+        INSERT INTO social_media_messages
+        SELECT
+            'User ' || CAST(i % 5000 AS VARCHAR),
+            'user' || CAST(i % 5000 AS VARCHAR),
+            'Vessel sighting near ' || h.name || ' ' || CAST(i % 997 AS VARCHAR) || ' #vessel #NATO',
+            strftime(TIMESTAMP '{now}' - to_seconds(CAST(random() * {span} AS BIGINT)), '%Y-%m-%dT%H:%M:%S.%g+00:00'),
+            CASE WHEN i % 100 = 0 THEN 'hoch' WHEN i % 100 = 1 THEN 'mittel' ELSE 'niedrig' END,
+            round(h.latitude + (random() - 0.5) * 0.8, 4),
+            round(h.longitude + (random() - 0.5) * 0.8, 4),
+            CAST(random() * 500 AS INTEGER),
+            CAST(10 + random() * 1990 AS INTEGER),
+            CAST(random() * 50 AS INTEGER),
+            h.name,
+            '[{{"entity": "' || h.name || '", "type": "harbour", "text": "' || h.name || '", "start": 21, "end": '
+                || CAST(21 + length(h.name) AS VARCHAR) || '}}]',
+            substr(md5('Vessel sighting near ' || h.name || ' ' || CAST(i % 997 AS VARCHAR)), 1, 16),
+            1
+        FROM range({rows}) r(i)
+        JOIN harbour_seed h ON h.idx = i % {harbours}
+    """,
+    # StanagMessageGenerator (STANAGSimulator.py), one row per message as written by StanagMessageParser
+    "maritime_surveillance_reports": """
+        INSERT INTO maritime_surveillance_reports
+        SELECT
+            subject,
+            'FGS Unit ' || CAST(i % 56 AS VARCHAR) || ' at ' || position || ' is patrolling merchant ship.',
+            'FGS Unit ' || CAST(i % 56 AS VARCHAR),
+            strftime(ts, '%d%H%MZ') || upper(strftime(ts, '%b')) || strftime(ts, '%y'),
+            'SITREP/FGSUnit' || CAST(i % 56 AS VARCHAR) || '/' || CAST(i AS VARCHAR),
+            'NAVAL COMMAND',
+            position,
+            date_trunc('minute', ts),
+            lat,
+            lon,
+            '',
+            '[]',
+            NULL,
+            NULL
+        FROM (
+            SELECT
+                i, lat, lon, ts, subject,
+                'LAT ' || CAST(lat AS VARCHAR) || '°N, LON ' || CAST(lon AS VARCHAR) || '°E' AS position
+            FROM (
+                SELECT
+                    i,
+                    CASE WHEN i % 2 = 0 THEN 'MARITIME SURVEILLANCE REPORT' ELSE 'SICK REPORT' END AS subject,
+                    round(h.latitude + (random() - 0.5) * 0.8, 4) AS lat,
+                    round(h.longitude + (random() - 0.5) * 0.8, 4) AS lon,
+                    TIMESTAMP '{now}' - to_seconds(CAST(random() * {span} AS BIGINT)) AS ts
+                FROM range({rows}) r(i)
+                JOIN harbour_seed h ON h.idx = i % {harbours}
+            )
+        )
+    """,
+}
+
+
+def parse_scale(value: str) -> int:
+    """'1M' -> 1_000_000, '250k' -> 250_000, '5000' -> 5000."""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([kKmM]?)", value.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid scale: {value}")
+    factor = {"": 1, "k": 1_000, "m": 1_000_000}[match.group(2).lower()]
+    return int(float(match.group(1)) * factor)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def reference_inserts(table: str) -> List[str]:
+    """Extracts the INSERT statements of a reference table from the Impala DDL."""
+    with open(IMPALA_DDL, encoding="utf-8") as f:
+        ddl = f.read()
+    pattern = re.compile(r"^INSERT INTO (?:TABLE )?" + re.escape(table) + r"\b.*?\)\s*;\s*$", re.S | re.M | re.I)
+    return [m.group(0).rstrip().rstrip(";") for m in pattern.finditer(ddl)]
+
+
+# Views that need the DuckDB spatial extension.
+SPATIAL_VIEWS = {"area_violation"}
+
+
+def connect(db_path: str):
+    """Opens the benchmark database; returns (connection, spatial extension available)."""
+    import duckdb
+
+    conn = duckdb.connect(db_path)
+    conn.execute("SET TimeZone = 'UTC'")
+    try:
+        conn.execute("INSTALL spatial")
+        conn.execute("LOAD spatial")
+        spatial = True
+    except Exception as error:
+        print(f"Warning: spatial extension unavailable, skipping {sorted(SPATIAL_VIEWS)}: {error}")
+        spatial = False
+    return conn, spatial
+
+
+def apply_schema(conn, spatial: bool):
+    """
+    Runs create_views_duckdb.sql with now() pinned to BENCHMARK_NOW, leaving
+    out the spatial views if the extension is missing.
+    """
+    with open(DUCKDB_VIEWS, encoding="utf-8") as f:
+        script = f.read().replace("CAST(now() AS TIMESTAMP)", f"TIMESTAMP '{BENCHMARK_NOW}'")
+    for block in re.split(r"^(?=-- VIEW: )", script, flags=re.M):
+        match = re.match(r"-- VIEW: (\w+)", block)
+        if match and match.group(1) in SPATIAL_VIEWS and not spatial:
+            continue
+        conn.execute(block)
+
+
+def generate(conn, total_rows: int, vessels: int, spatial: bool):
+    """Creates the schema and fills every table for the given scale."""
+    apply_schema(conn, spatial)
+
+    for table in REFERENCE_TABLES:
+        conn.execute(f"DELETE FROM {table}")
+        for statement in reference_inserts(table):
+            conn.execute(statement)
+
+    conn.execute("""
+        CREATE OR REPLACE TABLE harbour_seed AS
+        SELECT row_number() OVER (ORDER BY name) - 1 AS idx, name, latitude, longitude
+        FROM baltic_sea_harbours
+    """)
+    harbours = conn.execute("SELECT count(*) FROM harbour_seed").fetchone()[0]
+    conn.execute("SELECT setseed(0.42)")
+
+    for table, share in TABLE_MIX.items():
+        rows = max(1, int(total_rows * share))
+        start = time.perf_counter()
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(GENERATORS[table].format(rows=rows, harbours=harbours, vessels=vessels, span=TIME_SPAN_SECONDS,
+                                              now=BENCHMARK_NOW))
+        print(f"  generated {rows:>12,} rows in {table} ({time.perf_counter() - start:.1f}s)")
+    conn.execute(f"CREATE OR REPLACE TABLE bench_meta AS SELECT {total_rows} AS total_rows, now() AS generated_at, "
+                 f"'{BENCHMARK_NOW}' AS data_now")
+    conn.execute("CHECKPOINT")
+
+
+def is_generated(conn) -> bool:
+    """True once generate() completed for this database with the current BENCHMARK_NOW."""
+    columns = {row[0] for row in conn.execute(
+        "SELECT column_name FROM duckdb_columns() WHERE table_name = 'bench_meta'").fetchall()}
+    if "data_now" not in columns:
+        return False
+    return conn.execute("SELECT data_now FROM bench_meta").fetchone()[0] == BENCHMARK_NOW
+
+
+def _walk_profile(node: Dict[str, Any], totals: Dict[str, int]):
+    name = str(node.get("operator_type") or node.get("name") or "")
+    if "SCAN" in name.upper():
+        totals["rows_scanned"] += int(node.get("operator_cardinality", node.get("cardinality", 0)) or 0)
+    for child in node.get("children", []):
+        _walk_profile(child, totals)
+
+
+def read_profile(path: str) -> Dict[str, Optional[int]]:
+    """Rows scanned and peak buffer memory from a DuckDB JSON profile."""
+    with open(path, encoding="utf-8") as f:
+        profile = json.load(f)
+    rows_scanned = profile.get("cumulative_rows_scanned")
+    if rows_scanned is None:
+        totals = {"rows_scanned": 0}
+        _walk_profile(profile, totals)
+        rows_scanned = totals["rows_scanned"]
+    return {
+        "rows_scanned": int(rows_scanned),
+        "peak_buffer_memory_bytes": profile.get("system_peak_buffer_memory"),
+    }
+
+
+def run_view(conn, view: str, repeat: int, profile_path: str) -> Dict[str, Any]:
+    """Materializes a view `repeat` times and returns the median latency and profile metrics."""
+    conn.execute("PRAGMA enable_profiling = 'json'")
+    conn.execute(f"PRAGMA profiling_output = '{profile_path}'")
+    try:
+        conn.execute("""PRAGMA custom_profiling_settings = '{"CUMULATIVE_ROWS_SCANNED": "true",
+            "SYSTEM_PEAK_BUFFER_MEMORY": "true", "OPERATOR_CARDINALITY": "true", "OPERATOR_TYPE": "true"}'""")
+    except Exception:
+        pass  # older DuckDB: fall back to walking the operator tree
+
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(f"CREATE OR REPLACE TEMP TABLE bench_result AS SELECT * FROM {view}")
+        latencies.append(time.perf_counter() - start)
+    conn.execute("PRAGMA disable_profiling")
+
+    result = {
+        "latency_s": round(statistics.median(latencies), 4),
+        "latency_min_s": round(min(latencies), 4),
+        "rows_returned": conn.execute("SELECT count(*) FROM bench_result").fetchone()[0],
+        "process_max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    result.update(read_profile(profile_path))
+    conn.execute("DROP TABLE bench_result")
+    return result
+
+
+def load_results() -> List[Dict[str, Any]]:
+    if not os.path.exists(RESULTS_FILE):
+        return []
+    with open(RESULTS_FILE, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(base: str, head: str, threshold: float) -> int:
+    """Prints latency ratios head/base per view and scale; returns the number of regressions."""
+    latest: Dict[Any, Dict[str, Any]] = {}
+    for record in load_results():
+        if record["commit"] in (base, head):
+            latest[(record["commit"], record["view"], record["scale"])] = record
+
+    regressions = 0
+    print(f"{'view':<20} {'scale':>12} {'base s':>9} {'head s':>9} {'ratio':>7}")
+    for (commit, view, scale), record in sorted(latest.items(), key=lambda kv: (kv[0][1], kv[0][2])):
+        if commit != head or (base, view, scale) not in latest:
+            continue
+        base_latency = latest[(base, view, scale)]["latency_s"]
+        ratio = record["latency_s"] / base_latency if base_latency else float("inf")
+        flag = "  REGRESSION" if ratio > threshold else ""
+        regressions += bool(flag)
+        print(f"{view:<20} {scale:>12,} {base_latency:>9.3f} {record['latency_s']:>9.3f} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the defense views on DuckDB.")
+    parser.add_argument("--scales", nargs="+", type=parse_scale, default=[parse_scale("1M")],
+                        help="Total generated rows per run, e.g. 1M 10M 100M")
+    parser.add_argument("--views", nargs="+", choices=VIEWS, default=VIEWS)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per view; the median is reported")
+    parser.add_argument("--vessels", type=int, default=500, help="Distinct AIS MMSIs")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="Directory for the generated databases")
+    parser.add_argument("--regenerate", action="store_true", help="Regenerate data even if a database exists")
+    parser.add_argument("--compare", metavar="BASE_COMMIT", help="Compare stored results of BASE_COMMIT with HEAD")
+    parser.add_argument("--threshold", type=float, default=1.10, help="Latency ratio counted as regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    if args.compare:
+        regressions = compare(args.compare, commit, args.threshold)
+        raise SystemExit(1 if regressions and args.fail_on_regression else 0)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    for scale in args.scales:
+        db_path = os.path.join(args.workdir, f"defense_{scale}_{args.vessels}.duckdb")
+        if args.regenerate and os.path.exists(db_path):
+            os.remove(db_path)
+        conn, spatial = connect(db_path)
+        if not is_generated(conn):
+            print(f"Generating {scale:,} rows into {db_path}")
+            generate(conn, scale, args.vessels, spatial)
+        conn.close()
+
+        with open(RESULTS_FILE, "a", encoding="utf-8") as out:
+            for view in args.views:
+                # A fresh connection per view, so the peak buffer memory is the view's own.
+                conn, spatial = connect(db_path)
+                if view in SPATIAL_VIEWS and not spatial:
+                    conn.close()
+                    continue
+                # Views may have changed since the data was generated.
+                apply_schema(conn, spatial)
+                metrics = run_view(conn, view, args.repeat, os.path.join(args.workdir, f"profile_{view}.json"))
+                conn.close()
+                record = {
+                    "commit": commit,
+                    "run_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "view": view,
+                    "scale": scale,
+                    **metrics,
+                }
+                out.write(json.dumps(record) + "\n")
+                print(f"{view:<20} scale={scale:<12,} latency={metrics['latency_s']:.3f}s "
+                      f"rows_scanned={metrics['rows_scanned']:,} peak_mem={metrics['peak_buffer_memory_bytes']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -183,6 +183,7 @@ CREATE TABLE buoy_data (
 PARTITIONED BY SPEC (TRUNCATE(10, ts))
 STORED by ICEBERG;
 
+-- Existing tables: add the newer columns with migrate_tables_hive.sql
 CREATE TABLE IF NOT EXISTS maritime_surveillance_reports (
   message_subject   STRING    COMMENT 'The subject line of the message',
   message_text      STRING    COMMENT 'The full text of the message report',
@@ -190,7 +191,14 @@ CREATE TABLE IF NOT EXISTS maritime_surveillance_reports (
   message_dtg       STRING    COMMENT 'The date-time group of the message',
   message_id        STRING    COMMENT 'A unique identifier for the message',
   message_to        STRING    COMMENT 'The intended recipient of the message',
-  message_position  STRING    COMMENT 'The position of the asset, if provided'
+  message_position  STRING    COMMENT 'The position of the asset, if provided',
+  message_timestamp TIMESTAMP COMMENT 'DTG as UTC timestamp, precomputed by StanagMessageParser',
+  message_latitude  DOUBLE    COMMENT 'Latitude from message_position, precomputed by StanagMessageParser',
+  message_longitude DOUBLE    COMMENT 'Longitude from message_position, precomputed by StanagMessageParser',
+  entity_names      STRING    COMMENT 'Fleet units, harbours and sanctioned vessels named in the text, extracted by EntityExtraction',
+  entities          STRING    COMMENT 'JSON array of the extracted entities with type and character offsets, written by EntityExtraction',
+  cluster_id        STRING    COMMENT 'Near-duplicate cluster at write time (MinHash/LSH over a sliding window; earlier rows keep their id after a merge), written by NearDuplicateDetector',
+  duplicate_count   INT       COMMENT 'Members of the cluster up to this message (1 = first), written by NearDuplicateDetector'
 )
 COMMENT 'Table for maritime surveillance reports'
 STORED by ICEBERG;
@@ -198,6 +206,7 @@ STORED by ICEBERG;
 
 drop table if exists social_media_messages;
 
+-- Existing tables: add the newer columns with migrate_tables_hive.sql
 CREATE TABLE IF NOT EXISTS social_media_messages(
   user_name         STRING    COMMENT 'The name of the user who posted the tweet',
   user_username     STRING    COMMENT 'The username of the user',
@@ -208,7 +217,11 @@ CREATE TABLE IF NOT EXISTS social_media_messages(
   longitude         DOUBLE    COMMENT 'The longitude of the tweet location',
   metrics_retweets  INT       COMMENT 'The number of retweets',
   metrics_likes     INT       COMMENT 'The number of likes',
-  metrics_replies   INT       COMMENT 'The number of replies'
+  metrics_replies   INT       COMMENT 'The number of replies',
+  entity_names      STRING    COMMENT 'Fleet units, harbours and sanctioned vessels named in the text, extracted by EntityExtraction',
+  entities          STRING    COMMENT 'JSON array of the extracted entities with type and character offsets, written by EntityExtraction',
+  cluster_id        STRING    COMMENT 'Near-duplicate cluster at write time (MinHash/LSH over a sliding window; earlier rows keep their id after a merge), written by NearDuplicateDetector',
+  duplicate_count   INT       COMMENT 'Members of the cluster up to this message (1 = first), written by NearDuplicateDetector'
 )
 PARTITIONED BY SPEC (TRUNCATE(10, ts))
 STORED by ICEBERG;
@@ -525,13 +538,16 @@ select
     message_from ,
     message_to,
     message_dtg ,
-     -- extract timestamp 
-    FROM_UNIXTIME(UNIX_TIMESTAMP(message_dtg, 'ddHHmmZMMMyy'), 'yyyy-MM-dd HH:mm:ss') AS message_timestamp,
+     -- precomputed by StanagMessageParser; parsed here only for rows loaded without it
+    COALESCE(CAST(message_timestamp AS STRING),
+             FROM_UNIXTIME(UNIX_TIMESTAMP(message_dtg, 'ddHHmmZMMMyy'), 'yyyy-MM-dd HH:mm:ss')) AS message_timestamp,
     message_position,
-     -- Extract Latitude: Looks for "LAT " followed by any number of digits/decimals until '°'
-    CAST(REGEXP_EXTRACT(message_position, 'LAT\\s+([0-9]+\\.[0-9]+)°', 1) AS DOUBLE) AS message_latitude,
-      -- Extract Longitude: Looks for "LON " followed by any number of digits/decimals until '°'
-    CAST(REGEXP_EXTRACT(message_position, 'LON\\s+([0-9]+\\.[0-9]+)°', 1) AS DOUBLE) AS message_longitude
+     -- Latitude: "LAT " followed by digits/decimals until '°'
+    COALESCE(message_latitude,
+             CAST(REGEXP_EXTRACT(message_position, 'LAT\\s+([0-9]+\\.[0-9]+)°', 1) AS DOUBLE)) AS message_latitude,
+      -- Longitude: "LON " followed by digits/decimals until '°'
+    COALESCE(message_longitude,
+             CAST(REGEXP_EXTRACT(message_position, 'LON\\s+([0-9]+\\.[0-9]+)°', 1) AS DOUBLE)) AS message_longitude
 from maritime_surveillance_reports order by message_dtg desc;
 
 CREATE VIEW defense.lagebild AS
@@ -554,6 +570,7 @@ LatestBuoyDetections AS (
         b.ts AS buoy_time,
         b.geo_position_lat AS buoy_lat,
         b.geo_position_lon AS buoy_lon,
+        b.payload_object_type,
         b.payload_object_classification,
         b.payload_magneticField_anomaly,
         h.harbour_name AS harbour_name,
@@ -661,7 +678,10 @@ LatestSocialMedia AS (
                 4326
             )
         ) AS distance_m,
-        ROW_NUMBER() OVER (PARTITION BY s.tweet, s.user_username, h.harbour_name ORDER BY s.ts DESC) AS rn -- Partition by user/tweet AND harbor
+        -- Partition by near-duplicate cluster (fallback user/tweet) AND harbor. cluster_id is the id at write time:
+        -- after an LSH merge only later rows carry the surviving id, so rows from before the merge stay separate
+        -- until they leave the 24 hour window.
+        ROW_NUMBER() OVER (PARTITION BY COALESCE(s.cluster_id, concat(s.user_username, '|', s.tweet)), h.harbour_name ORDER BY s.ts DESC) AS rn
     FROM
         defense.social_media_messages s
     CROSS JOIN
@@ -718,7 +738,7 @@ SELECT
     CAST(ROUND(b.distance_m / 1000.0, 2) AS VARCHAR) AS dist_km,
     CONCAT(
         'Distance: ', CAST(ROUND(b.distance_m / 1000.0, 2) AS VARCHAR), ' km | ',
-        'Object: ', b.payload_object_classification,
+        'Object: ', b.payload_object_type, '/', b.payload_object_classification,
         ' | Mag Anomaly: ', CAST(b.payload_magneticField_anomaly AS VARCHAR)
     ) AS details
 FROM
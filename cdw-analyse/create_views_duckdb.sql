@@ -0,0 +1,511 @@
+-- DuckDB translation of the defense tables and views (stand-in for Impala in
+-- cdw-analyse/benchmark.py). Keep in sync with create_db_tables_impala.sql.
+--
+-- Dialect mapping:
+--   ST_GeodesicLengthWGS84(ST_SetSRID(ST_LineString(lon1, lat1, lon2, lat2), 4326))
+--       -> geodesic_m(lon1, lat1, lon2, lat2)  (haversine, meters)
+--   NOW() - INTERVAL 24 HOURS           -> CAST(now() AS TIMESTAMP) - INTERVAL 24 HOUR
+--   TO_TIMESTAMP(dtg, 'ddHHmmZMMMyy')   -> strptime(dtg, '%d%H%MZ%b%y')
+--   REGEXP_EXTRACT(..)                  -> regexp_extract(..)
+--   ST_Within / ST_Point / ST_GeomFromText via the DuckDB spatial extension.
+
+CREATE OR REPLACE MACRO geodesic_m(lon1, lat1, lon2, lat2) AS
+    6371000.0 * 2 * ASIN(
+        SQRT(
+            POWER(SIN(RADIANS(lat2 - lat1) / 2), 2) +
+            COS(RADIANS(lat1)) * COS(RADIANS(lat2)) *
+            POWER(SIN(RADIANS(lon2 - lon1) / 2), 2)
+        )
+    );
+
+-- Buoy / social timestamps are ISO 8601 with a trailing 'Z'.
+CREATE OR REPLACE MACRO to_ts(value) AS CAST(replace(value, 'Z', '') AS TIMESTAMP);
+
+-- DDL: base tables (column names and types as in create_db_tables_impala.sql)
+CREATE TABLE IF NOT EXISTS ais_events_ice (
+  mmsi BIGINT,
+  event_timestamp VARCHAR,
+  latitude DOUBLE,
+  longitude DOUBLE,
+  speed DOUBLE,
+  course DOUBLE,
+  status VARCHAR,
+  Destination VARCHAR
+);
+
+CREATE TABLE IF NOT EXISTS observation_areas (
+  area_id VARCHAR,
+  polygon VARCHAR,
+  center_latitude DOUBLE,
+  center_longitude DOUBLE
+);
+
+CREATE TABLE IF NOT EXISTS sanctioned_vessels (
+  Name VARCHAR,
+  MMSI BIGINT,
+  IMO BIGINT,
+  Type VARCHAR,
+  Flag VARCHAR,
+  Sanction_Reason VARCHAR,
+  Linked_To VARCHAR
+);
+
+CREATE TABLE IF NOT EXISTS baltic_sea_harbours (
+  name VARCHAR,
+  country VARCHAR,
+  latitude DOUBLE,
+  longitude DOUBLE
+);
+
+CREATE TABLE IF NOT EXISTS marine_vessel_status (
+  MMSI VARCHAR,
+  event_timestamp VARCHAR,
+  Latitude DOUBLE,
+  Longitude DOUBLE,
+  Speed DOUBLE,
+  Course DOUBLE,
+  Status VARCHAR,
+  Destination VARCHAR,
+  Depth DOUBLE,
+  Operational_Status VARCHAR,
+  System_Status VARCHAR
+);
+
+CREATE TABLE IF NOT EXISTS buoy_data (
+  buoyid VARCHAR,
+  ts VARCHAR,
+  geo_position_lat DOUBLE,
+  geo_position_lon DOUBLE,
+  altitude INTEGER,
+  payload_magneticField_totalField DOUBLE,
+  payload_magneticField_anomaly DOUBLE,
+  payload_magneticField_gradient VARCHAR,
+  payload_detectionConfidence VARCHAR,
+  payload_object_type VARCHAR,
+  payload_object_classification VARCHAR,
+  payload_object_confidence INTEGER,
+  payload_object_estimatedDepth INTEGER,
+  payload_object_motion VARCHAR,
+  payload_object_extent VARCHAR,
+  payload_object_notes VARCHAR,
+  payload_object_orientation INTEGER,
+  payload_object_correlationId VARCHAR
+);
+
+CREATE TABLE IF NOT EXISTS maritime_surveillance_reports (
+  message_subject VARCHAR,
+  message_text VARCHAR,
+  message_from VARCHAR,
+  message_dtg VARCHAR,
+  message_id VARCHAR,
+  message_to VARCHAR,
+  message_position VARCHAR,
+  message_timestamp TIMESTAMP,
+  message_latitude DOUBLE,
+  message_longitude DOUBLE,
+  entity_names VARCHAR,
+  entities VARCHAR,
+  cluster_id VARCHAR,
+  duplicate_count INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS social_media_messages (
+  user_name VARCHAR,
+  user_username VARCHAR,
+  tweet VARCHAR,
+  ts VARCHAR,
+  priority VARCHAR,
+  latitude DOUBLE,
+  longitude DOUBLE,
+  metrics_retweets INTEGER,
+  metrics_likes INTEGER,
+  metrics_replies INTEGER,
+  entity_names VARCHAR,
+  entities VARCHAR,
+  cluster_id VARCHAR,
+  duplicate_count INTEGER
+);
+
+-- VIEW: area_violation
+CREATE OR REPLACE VIEW area_violation AS
+WITH observation_polygons AS (
+    SELECT
+        area_id,
+        ST_GeomFromText(polygon) AS geom
+    FROM observation_areas
+),
+ship_positions AS (
+    SELECT
+        e.mmsi,
+        e.event_timestamp,
+        e.latitude,
+        e.longitude,
+        o.area_id
+    FROM
+        ais_events_ice e
+    JOIN
+        observation_polygons o
+    ON
+        ST_Within(ST_Point(e.longitude, e.latitude), o.geom)
+),
+ship_transitions AS (
+    SELECT
+        mmsi,
+        area_id,
+        event_timestamp,
+        CASE
+            WHEN LAG(area_id) OVER (PARTITION BY mmsi ORDER BY event_timestamp) IS NULL
+                 OR LAG(area_id) OVER (PARTITION BY mmsi ORDER BY event_timestamp) != area_id
+            THEN 'enter'
+            ELSE 'exit'
+        END AS transition
+    FROM
+        ship_positions
+) SELECT
+        mmsi,
+        area_id,
+        event_timestamp,
+        transition
+FROM ship_transitions;
+
+-- VIEW: buoy_near_harbours
+CREATE OR REPLACE VIEW buoy_near_harbours AS
+SELECT
+  b.*,
+  h.name AS harbor_name,
+  h.country AS harbor_country,
+  h.latitude AS harbor_latitude,
+  h.longitude AS harbor_longitude,
+  geodesic_m(b.geo_position_lon, b.geo_position_lat, h.longitude, h.latitude) / 1000.0 AS distance_km
+FROM
+  buoy_data b
+JOIN
+  baltic_sea_harbours h
+ON
+  geodesic_m(b.geo_position_lon, b.geo_position_lat, h.longitude, h.latitude) / 1000.0 <= 10;
+
+-- VIEW: marine_messages
+CREATE OR REPLACE VIEW marine_messages AS
+SELECT
+    message_id,
+    message_subject,
+    message_text,
+    message_from,
+    message_to,
+    message_dtg,
+    -- precomputed by StanagMessageParser; parsed here only for rows loaded without it
+    COALESCE(message_timestamp, try_strptime(message_dtg, '%d%H%MZ%b%y')) AS message_timestamp,
+    message_position,
+    COALESCE(message_latitude,
+             CAST(NULLIF(regexp_extract(message_position, 'LAT\s+([0-9]+\.[0-9]+)°', 1), '') AS DOUBLE)) AS message_latitude,
+    COALESCE(message_longitude,
+             CAST(NULLIF(regexp_extract(message_position, 'LON\s+([0-9]+\.[0-9]+)°', 1), '') AS DOUBLE)) AS message_longitude
+FROM maritime_surveillance_reports;
+
+-- VIEW: lagebild
+CREATE OR REPLACE VIEW lagebild AS
+WITH Harbour_Ref AS (
+    SELECT
+        name AS harbour_name,
+        country AS harbour_country,
+        latitude AS Harbour_Lat,
+        longitude AS Harbour_Lon,
+        10000.0 AS Proximity_Meters
+    FROM
+        baltic_sea_harbours
+),
+LatestBuoyDetections AS (
+    SELECT
+        b.buoyid,
+        b.ts AS buoy_time,
+        b.geo_position_lat AS buoy_lat,
+        b.geo_position_lon AS buoy_lon,
+        b.payload_object_type,
+        b.payload_object_classification,
+        b.payload_magneticField_anomaly,
+        h.harbour_name AS harbour_name,
+        h.Proximity_Meters AS Proximity_Meters,
+        geodesic_m(b.geo_position_lon, b.geo_position_lat, h.Harbour_Lon, h.Harbour_Lat) AS distance_m,
+        ROW_NUMBER() OVER (PARTITION BY b.buoyid, h.harbour_name ORDER BY b.ts DESC) AS rn
+    FROM
+        buoy_data b
+    CROSS JOIN
+        Harbour_Ref h
+    WHERE
+        b.payload_detectionConfidence IS NOT NULL
+        AND to_ts(b.ts) >= CAST(now() AS TIMESTAMP) - INTERVAL 24 HOUR
+),
+FilteredBuoyDetections AS (
+    SELECT * FROM LatestBuoyDetections WHERE rn = 1 AND distance_m <= 2000
+),
+LatestAisEvents AS (
+    SELECT
+        a.mmsi,
+        a.event_timestamp AS ship_time,
+        a.latitude AS ship_lat,
+        a.longitude AS ship_lon,
+        s.Name AS sanctioned_name,
+        s.Sanction_Reason,
+        h.harbour_name AS harbour_name,
+        h.Proximity_Meters AS Proximity_Meters,
+        geodesic_m(a.longitude, a.latitude, h.Harbour_Lon, h.Harbour_Lat) AS distance_m,
+        ROW_NUMBER() OVER (PARTITION BY a.mmsi, h.harbour_name ORDER BY a.event_timestamp DESC) AS rn
+    FROM
+        ais_events_ice a
+    CROSS JOIN
+        Harbour_Ref h
+    LEFT JOIN
+        sanctioned_vessels s ON a.mmsi = s.mmsi
+    WHERE CAST(a.event_timestamp AS TIMESTAMP) >= CAST(now() AS TIMESTAMP) - INTERVAL 24 HOUR
+),
+FilteredAisEvents AS (
+    SELECT * FROM LatestAisEvents WHERE rn = 1 AND distance_m <= 30000
+),
+LatestMarineStatus AS (
+    SELECT
+        v.mmsi AS marine_mmsi,
+        v.event_timestamp AS marine_time,
+        v.longitude AS marine_lon,
+        v.latitude AS marine_lat,
+        v.operational_status,
+        h.harbour_name AS harbour_name,
+        h.Proximity_Meters AS Proximity_Meters,
+        geodesic_m(v.longitude, v.latitude, h.Harbour_Lon, h.Harbour_Lat) AS distance_m,
+        ROW_NUMBER() OVER (PARTITION BY v.mmsi, h.harbour_name ORDER BY v.event_timestamp DESC) AS rn
+    FROM
+        marine_vessel_status v
+    CROSS JOIN
+        Harbour_Ref h
+    WHERE CAST(v.event_timestamp AS TIMESTAMP) >= CAST(now() AS TIMESTAMP) - INTERVAL 24 HOUR
+),
+FilteredMarineStatus AS (
+    SELECT * FROM LatestMarineStatus WHERE rn = 1 AND distance_m <= 30000
+),
+LatestSocialMedia AS (
+    SELECT
+        s.tweet,
+        s.user_username,
+        s.priority,
+        s.ts AS social_time,
+        s.longitude AS social_lon,
+        s.latitude AS social_lat,
+        h.harbour_name AS harbour_name,
+        h.Proximity_Meters AS Proximity_Meters,
+        geodesic_m(s.longitude, s.latitude, h.Harbour_Lon, h.Harbour_Lat) AS distance_m,
+        -- Partition by near-duplicate cluster (fallback user/tweet) AND harbor. cluster_id is the id at write time:
+        -- after an LSH merge only later rows carry the surviving id, so rows from before the merge stay separate
+        -- until they leave the 24 hour window.
+        ROW_NUMBER() OVER (PARTITION BY COALESCE(s.cluster_id, concat(s.user_username, '|', s.tweet)), h.harbour_name ORDER BY s.ts DESC) AS rn
+    FROM
+        social_media_messages s
+    CROSS JOIN
+        Harbour_Ref h
+    WHERE to_ts(s.ts) >= CAST(now() AS TIMESTAMP) - INTERVAL 24 HOUR
+),
+FilteredSocialMedia AS (
+    SELECT * FROM LatestSocialMedia WHERE rn = 1 AND distance_m <= 50000
+),
+LatestMarineMessages AS (
+    SELECT
+        m.message_id,
+        CAST(m.message_timestamp AS TIMESTAMP) AS message_time,
+        m.message_latitude AS message_lat,
+        m.message_longitude AS message_lon,
+        m.message_subject,
+        m.message_from,
+        h.harbour_name AS harbour_name,
+        h.Proximity_Meters AS Proximity_Meters,
+        geodesic_m(m.message_longitude, m.message_latitude, h.Harbour_Lon, h.Harbour_Lat) AS distance_m,
+        ROW_NUMBER() OVER (PARTITION BY m.message_id, h.harbour_name ORDER BY m.message_timestamp DESC) AS rn
+    FROM
+        marine_messages m
+    CROSS JOIN
+        Harbour_Ref h
+    WHERE m.message_timestamp >= CAST(now() AS TIMESTAMP) - INTERVAL 24 HOUR
+),
+FilteredMarineMessages AS (
+    SELECT * FROM LatestMarineMessages WHERE rn = 1 AND distance_m <= 50000
+)
+SELECT
+    'Buoy' AS Data_Source,
+    b.buoyid AS ID,
+    b.buoy_time AS "timestamp",
+    b.buoy_lat AS latitude,
+    b.buoy_lon AS longitude,
+    b.harbour_name AS harbour_name,
+    b.distance_m AS dist_m_raw,
+    CAST(ROUND(b.distance_m / 1000.0, 2) AS VARCHAR) AS dist_km,
+    CONCAT(
+        'Distance: ', CAST(ROUND(b.distance_m / 1000.0, 2) AS VARCHAR), ' km | ',
+        'Object: ', b.payload_object_type, '/', b.payload_object_classification,
+        ' | Mag Anomaly: ', CAST(b.payload_magneticField_anomaly AS VARCHAR)
+    ) AS details
+FROM
+    FilteredBuoyDetections b
+UNION ALL
+SELECT
+    'AIS' AS Data_Source,
+    CAST(a.mmsi AS VARCHAR) AS ID,
+    a.ship_time AS "timestamp",
+    a.ship_lat AS latitude,
+    a.ship_lon AS longitude,
+    a.harbour_name AS harbour_name,
+    a.distance_m AS dist_m_raw,
+    CAST(ROUND(a.distance_m / 1000.0, 2) AS VARCHAR) AS dist_km,
+    CONCAT(
+        'Distance: ', CAST(ROUND(a.distance_m / 1000.0, 2) AS VARCHAR), ' km | ',
+        'Sanctioned: ', COALESCE(a.sanctioned_name, 'No'),
+        COALESCE(' (Sanction Reason: ' || a.Sanction_Reason || ')', '')
+    ) AS details
+FROM
+    FilteredAisEvents a
+UNION ALL
+SELECT
+    'Marine' AS Data_Source,
+    CAST(m.marine_mmsi AS VARCHAR) AS ID,
+    m.marine_time AS "timestamp",
+    m.marine_lat AS latitude,
+    m.marine_lon AS longitude,
+    m.harbour_name AS harbour_name,
+    m.distance_m AS dist_m_raw,
+    CAST(ROUND(m.distance_m / 1000.0, 2) AS VARCHAR) AS dist_km,
+    CONCAT(
+        'Distance: ', CAST(ROUND(m.distance_m / 1000.0, 2) AS VARCHAR), ' km | ',
+        'Status: ', m.operational_status
+    ) AS details
+FROM
+    FilteredMarineStatus m
+UNION ALL
+SELECT
+    'SocialMedia' AS Data_Source,
+    s.user_username AS ID,
+    s.social_time AS "timestamp",
+    s.social_lat AS latitude,
+    s.social_lon AS longitude,
+    s.harbour_name AS harbour_name,
+    s.distance_m AS dist_m_raw,
+    CAST(ROUND(s.distance_m / 1000.0, 2) AS VARCHAR) AS dist_km,
+    CONCAT(
+        'Distance: ', CAST(ROUND(s.distance_m / 1000.0, 2) AS VARCHAR), ' km | ',
+        'Prio: ', CAST(s.priority AS VARCHAR),
+        ' | Tweet: ', s.tweet
+    ) AS details
+FROM
+    FilteredSocialMedia s
+UNION ALL
+SELECT
+    'Marine_Message' AS Data_Source,
+    m.message_id AS ID,
+    CAST(m.message_time AS VARCHAR) AS "timestamp",
+    m.message_lat AS latitude,
+    m.message_lon AS longitude,
+    m.harbour_name AS harbour_name,
+    m.distance_m AS dist_m_raw,
+    CAST(ROUND(m.distance_m / 1000.0, 2) AS VARCHAR) AS dist_km,
+    CONCAT(
+        'Distance: ', CAST(ROUND(m.distance_m / 1000.0, 2) AS VARCHAR), ' km | ',
+        'Subject: ', m.message_subject,
+        ' | From: ', m.message_from
+    ) AS details
+FROM
+    FilteredMarineMessages m
+ORDER BY harbour_name, "timestamp" DESC;
+
+-- VIEW: vessel_proximity
+CREATE OR REPLACE VIEW vessel_proximity AS
+WITH
+latest_vessel_ref AS (
+    SELECT
+        CAST(mmsi AS VARCHAR) AS vessel_mmsi,
+        a.event_timestamp AS vessel_time,
+        latitude AS vessel_lat,
+        longitude AS vessel_lon,
+        ROW_NUMBER() OVER (PARTITION BY a.mmsi ORDER BY a.event_timestamp DESC) AS rn
+    FROM
+        ais_events_ice a
+    WHERE
+        CAST(a.event_timestamp AS TIMESTAMP) >= CAST(now() AS TIMESTAMP) - INTERVAL 24 HOUR
+),
+vessel_ref AS (
+    SELECT * FROM latest_vessel_ref WHERE rn = 1
+),
+latest_ais_events AS (
+    SELECT
+        CAST(a.mmsi AS VARCHAR) AS vessel_mmsi,
+        a.event_timestamp AS vessel_time,
+        a.latitude AS vessel_lat,
+        a.longitude AS vessel_lon,
+        geodesic_m(a.longitude, a.latitude, h.vessel_lon, h.vessel_lat) AS distance_m,
+        ROW_NUMBER() OVER (PARTITION BY a.mmsi, h.vessel_mmsi ORDER BY a.event_timestamp DESC) AS rn,
+        h.vessel_mmsi AS ref_vessel_mmsi
+    FROM
+        ais_events_ice a
+        CROSS JOIN vessel_ref h
+    WHERE
+        CAST(a.event_timestamp AS TIMESTAMP) >= CAST(h.vessel_time AS TIMESTAMP) - INTERVAL 4 HOUR
+),
+filtered_ais_events AS (
+    SELECT * FROM latest_ais_events WHERE rn = 1
+),
+latest_marine_status AS (
+    SELECT
+        v.mmsi AS marine_mmsi,
+        v.event_timestamp AS marine_time,
+        v.latitude AS marine_lat,
+        v.longitude AS marine_lon,
+        v.operational_status,
+        geodesic_m(v.longitude, v.latitude, h.vessel_lon, h.vessel_lat) AS distance_m,
+        ROW_NUMBER() OVER (PARTITION BY v.mmsi, h.vessel_mmsi ORDER BY v.event_timestamp DESC) AS rn,
+        h.vessel_mmsi AS ref_vessel_mmsi
+    FROM
+        marine_vessel_status v
+        CROSS JOIN vessel_ref h
+    WHERE
+        CAST(v.event_timestamp AS TIMESTAMP) >= CAST(now() AS TIMESTAMP) - INTERVAL 4 HOUR
+),
+filtered_marine_status AS (
+    SELECT * FROM latest_marine_status WHERE rn = 1
+)
+SELECT
+    'REF' AS Data_Source,
+    vessel_mmsi,
+    vessel_time,
+    vessel_lon,
+    vessel_lat,
+    0 AS distance_m,
+    0 AS distance_km,
+    'Reference Vessel' AS "detail",
+    vessel_mmsi AS ref_vessel_mmsi
+FROM
+    vessel_ref
+UNION ALL
+SELECT
+    'AIS' AS Data_Source,
+    a.vessel_mmsi,
+    a.vessel_time,
+    a.vessel_lon,
+    a.vessel_lat,
+    a.distance_m,
+    ROUND(a.distance_m / 1000.0, 2) AS dist_km,
+    CONCAT('Distance: ', CAST(ROUND(a.distance_m / 1000.0, 2) AS VARCHAR), ' km ') AS details,
+    a.ref_vessel_mmsi
+FROM
+    filtered_ais_events a
+UNION ALL
+SELECT
+    'Fleet' AS Data_Source,
+    m.marine_mmsi,
+    m.marine_time,
+    m.marine_lon,
+    m.marine_lat,
+    m.distance_m,
+    ROUND(m.distance_m / 1000.0, 2) AS dist_km,
+    CONCAT(
+        'Distance: ', CAST(ROUND(m.distance_m / 1000.0, 2) AS VARCHAR), ' km | ',
+        'Status: ', m.operational_status
+    ) AS details,
+    m.ref_vessel_mmsi
+FROM
+    filtered_marine_status m
+ORDER BY
+    Data_Source DESC;
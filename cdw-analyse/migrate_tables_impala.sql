@@ -0,0 +1,32 @@
+-- Migrations for deployments created with an earlier create_db_tables_impala.sql (Impala).
+-- New deployments get these columns from the CREATE TABLE statements and do not need this file.
+-- Idempotent (ADD IF NOT EXISTS COLUMNS), safe to run repeatedly.
+
+USE defense;
+
+-- maritime_surveillance_reports: columns precomputed by StanagMessageParser (views marine_messages, lagebild)
+ALTER TABLE maritime_surveillance_reports ADD IF NOT EXISTS COLUMNS (
+  message_timestamp TIMESTAMP COMMENT 'DTG as UTC timestamp, precomputed by StanagMessageParser',
+  message_latitude  DOUBLE    COMMENT 'Latitude from message_position, precomputed by StanagMessageParser',
+  message_longitude DOUBLE    COMMENT 'Longitude from message_position, precomputed by StanagMessageParser'
+);
+
+-- Entity columns written by EntityExtraction
+ALTER TABLE maritime_surveillance_reports ADD IF NOT EXISTS COLUMNS (
+  entity_names      STRING    COMMENT 'Fleet units, harbours and sanctioned vessels named in the text, extracted by EntityExtraction',
+  entities          STRING    COMMENT 'JSON array of the extracted entities with type and character offsets, written by EntityExtraction'
+);
+ALTER TABLE social_media_messages ADD IF NOT EXISTS COLUMNS (
+  entity_names      STRING    COMMENT 'Fleet units, harbours and sanctioned vessels named in the text, extracted by EntityExtraction',
+  entities          STRING    COMMENT 'JSON array of the extracted entities with type and character offsets, written by EntityExtraction'
+);
+
+-- Near-duplicate columns written by NearDuplicateDetector (view lagebild partitions by cluster_id)
+ALTER TABLE maritime_surveillance_reports ADD IF NOT EXISTS COLUMNS (
+  cluster_id        STRING    COMMENT 'Near-duplicate cluster at write time (MinHash/LSH over a sliding window; earlier rows keep their id after a merge), written by NearDuplicateDetector',
+  duplicate_count   INT       COMMENT 'Members of the cluster up to this message (1 = first), written by NearDuplicateDetector'
+);
+ALTER TABLE social_media_messages ADD IF NOT EXISTS COLUMNS (
+  cluster_id        STRING    COMMENT 'Near-duplicate cluster at write time (MinHash/LSH over a sliding window; earlier rows keep their id after a merge), written by NearDuplicateDetector',
+  duplicate_count   INT       COMMENT 'Members of the cluster up to this message (1 = first), written by NearDuplicateDetector'
+);
@@ -24,6 +24,9 @@ the ship name. It filters the results based on the payload object type being
 'SURFACE_VESSEL' and a distance less than or equal to 1 kilometer.
 
   */
+-- NOTE: the minute-truncated equality join misses pairs across minute boundaries and
+-- computes ST_Distance for every pair in the same minute. csa-flink/spatiotemporal_join.py
+-- returns the exact pairs (|dt| <= window, distance <= radius) using geohash/time buckets.
 -- Berechnung der Distanz in Kilometern (ST_Distance_Sphere liefert Meter, muss durch 1000 geteilt werden)
 /* NQL: add ship_name */
 /* NQL: add ship_name */
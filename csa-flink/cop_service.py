@@ -0,0 +1,1005 @@
+"""
+In-memory common operational picture (COP): latest state per entity with a grid index.
+
+The CDV dashboards, cai-workbench/lagebild.py and the agent tools all rebuild
+"what is around harbour X right now" in the CDW: the lagebild view CROSS JOINs
+every event table with baltic_sea_harbours and keeps the newest row per
+entity with ROW_NUMBER(). This service consumes the streams instead, keeps
+only the latest record per entity and answers the same questions from memory:
+
+    layer    entity                                   stream / table
+    ais      mmsi                                     ais_events
+    marine   MMSI                                     marine_vessel_status
+    buoy     buoyid                                   buoy_data
+    jammer   geohash                                  gps_jammer_events
+    social   cluster_id (else user_username|tweet)    social_media_messages
+
+Each layer stores latitude, longitude and event time in numpy columns indexed
+by slot, the display fields per slot as a tuple, and a grid index (cell_deg x
+cell_deg cells -> set of slots) that is updated in place when an entity moves.
+Radius and bbox queries only visit the covering cells and compute haversine
+distances vectorized over the candidates. Nearest-k widens rings of cells
+until k candidates are found and finishes with one radius query at the k-th
+distance (a scan once the rings would visit more cells than are occupied).
+Updates older than the stored state are ignored; entities older than max_age
+are dropped by expire().
+
+HTTP/JSON API (rows, or column arrays with format=columns):
+
+    GET  /health
+    GET  /radius?lat=54.32&lon=10.12&km=30[&layers=ais,buoy&max_age=86400&limit=1000]
+    GET  /bbox?min_lat=54&min_lon=10&max_lat=55&max_lon=11[&layers=..]
+    GET  /nearest?lat=54.32&lon=10.12&k=10[&layers=..]
+    GET  /digest?harbour=Kiel              (or country=Germany)
+    GET  /lagebild?country=Germany         rows shaped like the lagebild view
+    POST /ingest                           NDJSON, layer detected per record
+    POST /snapshot
+
+The lagebild rows use the view's radii and detail texts; Marine_Message rows
+(STANAG reports) are not part of the COP. A snapshot is one .npz file
+(columns plus keys and fields as JSON) written to a temp file and renamed; it
+is taken every --snapshot-interval seconds and on shutdown, and serve loads
+it on start, so a restart does not wait for a replay of the topics.
+
+    kafka-console-consumer ... --topic ais_events | python cop_service.py serve --input - --snapshot-dir /data/cop
+    python cop_service.py serve --standin 2000      # local stream stand-in instead of Kafka
+    python cop_service.py verify
+    python cop_service.py benchmark --entities 200000 --queries 2000
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import random
+import re
+import signal
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+from urllib.request import Request, urlopen
+
+import numpy as np
+
+from dark_vessel import format_timestamp
+from spatiotemporal_join import (EARTH_RADIUS_KM, destination, geohash_encode, haversine_km, radius_box_deg,
+                                  to_epoch_seconds)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HARBOURS = os.path.join(HERE, "..", "cdw-analyse", "create_db_tables_impala.sql")
+SNAPSHOT_FILE = "cop_snapshot.npz"
+
+DEFAULT_PORT = 8097
+DEFAULT_CELL_DEG = 0.1
+DEFAULT_MAX_AGE_SECONDS = 86400.0  # the lagebild view looks back 24 hours
+DEFAULT_SNAPSHOT_INTERVAL = 60.0
+EXPIRE_INTERVAL_SECONDS = 60.0
+INGEST_BATCH = 1000
+
+# Per-entity flags, derived from the fields on every update.
+COUNTED = 1  # part of the harbour digest (buoys with a detection, jammer cells that jam, everything else)
+ALERT = 2    # listed as an alert in the digest (see alert_reason)
+
+
+class LayerSpec(NamedTuple):
+    source: str               # Data_Source in the lagebild rows
+    key: str
+    time: str
+    lat: str
+    lon: str
+    fields: Tuple[str, ...]   # kept per entity and returned with it
+    digest_km: float          # harbour radius of the lagebild view
+
+
+# Field names are matched in lower case (the simulators and the tables mix MMSI / mmsi).
+LAYERS = {
+    "ais": LayerSpec("AIS", "mmsi", "event_timestamp", "latitude", "longitude",
+                     ("speed", "course", "status", "destination", "sanctions_name", "sanction_reason"), 30.0),
+    "marine": LayerSpec("Marine", "mmsi", "event_timestamp", "latitude", "longitude",
+                        ("speed", "course", "status", "depth", "operational_status", "system_status"), 30.0),
+    "buoy": LayerSpec("Buoy", "buoyid", "ts", "geo_position_lat", "geo_position_lon",
+                      ("payload_detectionconfidence", "payload_object_type", "payload_object_classification",
+                       "payload_magneticfield_anomaly"), 2.0),
+    "jammer": LayerSpec("GPSJammer", "geohash", "ts", "latitude", "longitude",
+                        ("adsb_nic", "signal_integrity", "jamming_indicator"), 50.0),
+    "social": LayerSpec("SocialMedia", "cluster_id", "ts", "latitude", "longitude",
+                        ("user_username", "tweet", "priority", "duplicate_count"), 50.0),
+}
+
+
+# --- Geo helpers -------------------------------------------------------------
+
+def haversine_km_array(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """haversine_km from one point to many."""
+    phi1, phi2 = math.radians(lat), np.radians(lats)
+    a = (np.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lons - lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def load_harbours(path: str) -> List[Dict[str, Any]]:
+    """baltic_sea_harbours as .csv, .json/.ndjson or from the INSERT in the DDL."""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = [{k.lower(): v for k, v in row.items()} for row in csv.DictReader(f)]
+    elif path.endswith((".json", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            text = f.read().strip()
+        rows = json.loads(text) if text.startswith("[") else [json.loads(line) for line in text.splitlines() if line]
+        rows = [{k.lower(): v for k, v in row.items()} for row in rows]
+    else:
+        with open(path, encoding="utf-8") as f:
+            match = re.search(r"INSERT INTO baltic_sea_harbours VALUES(.*?);", f.read(), re.S | re.I)
+        rows = [{"name": name, "country": country, "latitude": lat, "longitude": lon}
+                for name, country, lat, lon in
+                re.findall(r"\('([^']*)',\s*'([^']*)',\s*(-?[\d.]+),\s*(-?[\d.]+)\)", match.group(1) if match else "")]
+    return [{"name": row["name"], "country": row.get("country"),
+             "latitude": float(row["latitude"]), "longitude": float(row["longitude"])} for row in rows]
+
+
+def detect_layer(record: Dict[str, Any]) -> Optional[str]:
+    """Layer of a (lower-cased) stream record, from the fields only that stream has."""
+    if "buoyid" in record:
+        return "buoy"
+    if "tweet" in record:
+        return "social"
+    if "adsb_nic" in record or record.get("event_type") == "gps_jammer_event":
+        return "jammer"
+    if "operational_status" in record:
+        return "marine"
+    if "mmsi" in record:
+        return "ais"
+    return None
+
+
+# --- Layer -------------------------------------------------------------------
+
+class Layer:
+    """Latest state of one entity type: slot columns, key -> slot, cell -> slots."""
+
+    def __init__(self, name: str, cell_deg: float = DEFAULT_CELL_DEG, capacity: int = 1024):
+        self.name = name
+        self.spec = LAYERS[name]
+        self.cell_deg = cell_deg
+        self.cols = int(round(360.0 / cell_deg))
+        self.slots: Dict[str, int] = {}
+        self.keys: List[Optional[str]] = []
+        self.fields: List[Optional[tuple]] = []
+        self.free: List[int] = []
+        self.grid: Dict[int, Set[int]] = {}
+        self.lat = np.zeros(capacity)
+        self.lon = np.zeros(capacity)
+        self.t = np.full(capacity, -np.inf)
+        self.cell = np.full(capacity, -1, np.int64)
+        self.flags = np.zeros(capacity, np.uint8)
+        self.late = 0
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def cell_of(self, lat: float, lon: float) -> int:
+        row = int((min(lat, 89.999999) + 90.0) // self.cell_deg)
+        return row * self.cols + int((lon + 180.0) // self.cell_deg) % self.cols
+
+    def _allocate(self, key: str) -> int:
+        if self.free:
+            slot = self.free.pop()
+            self.keys[slot] = key
+        else:
+            slot = len(self.keys)
+            if slot == len(self.t):
+                grow = len(self.t)
+                self.lat = np.concatenate([self.lat, np.zeros(grow)])
+                self.lon = np.concatenate([self.lon, np.zeros(grow)])
+                self.t = np.concatenate([self.t, np.full(grow, -np.inf)])
+                self.cell = np.concatenate([self.cell, np.full(grow, -1, np.int64)])
+                self.flags = np.concatenate([self.flags, np.zeros(grow, np.uint8)])
+            self.keys.append(key)
+            self.fields.append(None)
+        self.slots[key] = slot
+        return slot
+
+    def upsert(self, key: str, t: float, lat: float, lon: float, fields: tuple, flags: int = COUNTED) -> bool:
+        """Stores the record if it is not older than the entity's state."""
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = self._allocate(key)
+        elif t < self.t[slot]:
+            self.late += 1
+            return False
+        cell = self.cell_of(lat, lon)
+        old = int(self.cell[slot])
+        if old != cell:
+            if old >= 0:
+                members = self.grid[old]
+                members.discard(slot)
+                if not members:
+                    del self.grid[old]
+            self.grid.setdefault(cell, set()).add(slot)
+            self.cell[slot] = cell
+        self.lat[slot] = lat
+        self.lon[slot] = lon
+        self.t[slot] = t
+        self.fields[slot] = fields
+        self.flags[slot] = flags
+        return True
+
+    def remove(self, slot: int):
+        members = self.grid[int(self.cell[slot])]
+        members.discard(slot)
+        if not members:
+            del self.grid[int(self.cell[slot])]
+        del self.slots[self.keys[slot]]
+        self.keys[slot] = None
+        self.fields[slot] = None
+        self.t[slot] = -np.inf
+        self.cell[slot] = -1
+        self.flags[slot] = 0
+        self.free.append(slot)
+
+    def expire(self, before: float) -> int:
+        stale = np.nonzero((self.cell >= 0) & (self.t < before))[0]
+        for slot in stale.tolist():
+            self.remove(slot)
+        return len(stale)
+
+    def live(self) -> np.ndarray:
+        return np.nonzero(self.cell >= 0)[0]
+
+    def _candidates(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> np.ndarray:
+        """Slots in the cells overlapping the box (longitudes may run past +-180)."""
+        rows = self.cols // 2
+        r0 = max(0, int((min_lat + 90.0) // self.cell_deg))
+        r1 = min(rows - 1, int((min(max_lat, 89.999999) + 90.0) // self.cell_deg))
+        if max_lon - min_lon >= 360.0:
+            c0, width = 0, self.cols - 1
+        else:
+            c0 = int((min_lon + 180.0) // self.cell_deg)
+            width = int((max_lon + 180.0) // self.cell_deg) - c0
+        if (r1 - r0 + 1) * (width + 1) <= len(self.grid):
+            grid = self.grid
+            sets = [grid[cell] for cell in (r * self.cols + (c0 + c) % self.cols
+                                            for r in range(r0, r1 + 1) for c in range(width + 1)) if cell in grid]
+        else:
+            # Box larger than the occupied area: filter the occupied cells instead.
+            sets = [members for cell, members in self.grid.items()
+                    if r0 <= cell // self.cols <= r1 and (cell % self.cols - c0) % self.cols <= width]
+        return np.fromiter(itertools.chain.from_iterable(sets), np.int64)
+
+    def radius(self, lat: float, lon: float, km: float, min_t: float = -np.inf) -> Tuple[np.ndarray, np.ndarray]:
+        """(slots, distances) within km, nearest first."""
+        dlat, dlon = radius_box_deg(lat, km)
+        slots = self._candidates(lat - dlat, lat + dlat, lon - dlon, lon + dlon)
+        return self._within(slots, lat, lon, km, min_t)
+
+    def _within(self, slots: np.ndarray, lat: float, lon: float, km: float, min_t: float):
+        slots = slots[self.t[slots] >= min_t]
+        distance = haversine_km_array(lat, lon, self.lat[slots], self.lon[slots])
+        keep = distance <= km
+        slots, distance = slots[keep], distance[keep]
+        order = np.argsort(distance, kind="stable")
+        return slots[order], distance[order]
+
+    def bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+             min_t: float = -np.inf) -> np.ndarray:
+        slots = self._candidates(min_lat, max_lat, min_lon, max_lon)
+        lat, lon = self.lat[slots], self.lon[slots]
+        keep = (self.t[slots] >= min_t) & (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+        return slots[keep]
+
+    def nearest(self, lat: float, lon: float, k: int, min_t: float = -np.inf) -> Tuple[np.ndarray, np.ndarray]:
+        """(slots, distances) of the k nearest entities."""
+        if k <= 0 or not self.grid:
+            return np.zeros(0, np.int64), np.zeros(0)
+        center = self.cell_of(lat, lon)
+        row, col = divmod(center, self.cols)
+        found: List[Set[int]] = []
+        count, visited, ring = 0, 0, 0
+        while visited < len(self.grid):
+            cells = ([center] if ring == 0 else
+                     [r * self.cols + (col + c) % self.cols
+                      for r in range(row - ring, row + ring + 1) if 0 <= r < self.cols // 2
+                      for c in (range(-ring, ring + 1) if abs(r - row) == ring else (-ring, ring))])
+            visited += len(cells)
+            for cell in cells:
+                members = self.grid.get(cell)
+                if members:
+                    found.append(members)
+                    count += len(members)
+            if count >= k:
+                slots = np.fromiter(itertools.chain.from_iterable(found), np.int64)
+                slots = slots[self.t[slots] >= min_t]
+                if len(slots) >= k:
+                    distance = haversine_km_array(lat, lon, self.lat[slots], self.lon[slots])
+                    kth = float(np.partition(distance, k - 1)[k - 1])
+                    slots, distance = self.radius(lat, lon, kth, min_t)
+                    return slots[:k], distance[:k]
+            ring += 1
+        slots, distance = self._within(self.live(), lat, lon, np.inf, min_t)
+        return slots[:k], distance[:k]
+
+    def snapshot(self) -> Tuple[Dict[str, np.ndarray], Dict[str, list]]:
+        live = self.live()
+        columns = {"lat": self.lat[live], "lon": self.lon[live], "t": self.t[live], "flags": self.flags[live]}
+        return columns, {"keys": [self.keys[slot] for slot in live.tolist()],
+                         "fields": [self.fields[slot] for slot in live.tolist()]}
+
+    @classmethod
+    def restore(cls, name: str, cell_deg: float, columns: Dict[str, np.ndarray], meta: Dict[str, list]) -> "Layer":
+        count = len(meta["keys"])
+        layer = cls(name, cell_deg, max(1024, count))
+        layer.keys = list(meta["keys"])
+        layer.fields = [tuple(fields) for fields in meta["fields"]]
+        layer.slots = dict(zip(layer.keys, range(count)))
+        layer.lat[:count], layer.lon[:count], layer.t[:count] = columns["lat"], columns["lon"], columns["t"]
+        layer.flags[:count] = columns["flags"]
+        rows = ((np.minimum(columns["lat"], 89.999999) + 90.0) // cell_deg).astype(np.int64)
+        cells = rows * layer.cols + ((columns["lon"] + 180.0) // cell_deg).astype(np.int64) % layer.cols
+        layer.cell[:count] = cells
+        order = np.argsort(cells, kind="stable")
+        bounds = np.flatnonzero(np.diff(cells[order])) + 1
+        for group in np.split(order, bounds) if count else []:
+            layer.grid[int(cells[group[0]])] = set(group.tolist())
+        return layer
+
+
+# --- Operational picture -----------------------------------------------------
+
+class OperationalPicture:
+    """All layers plus the harbours; one lock guards ingest against queries."""
+
+    def __init__(self, harbours: Optional[List[Dict[str, Any]]] = None, cell_deg: float = DEFAULT_CELL_DEG,
+                 max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS):
+        self.harbours = harbours or []
+        self.cell_deg = cell_deg
+        self.max_age_seconds = max_age_seconds
+        self.layers = {name: Layer(name, cell_deg) for name in LAYERS}
+        self.lock = threading.RLock()
+        self.stats = {"records": 0, "skipped": 0, "expired": 0}
+
+    def ingest(self, records: Iterable[Dict[str, Any]], layer: Optional[str] = None) -> int:
+        """Upserts stream records; returns how many changed the state."""
+        parsed = []
+        for record in records:
+            try:
+                # Valid JSON that is not an object (a list, null) is skipped like an incomplete record.
+                record = {k.lower(): v for k, v in record.items()}
+                name = layer or detect_layer(record)
+                spec = LAYERS.get(name)
+                key = record.get(spec.key)
+                if name == "social" and not key:
+                    key = f"{record.get('user_username')}|{record.get('tweet')}"
+                parsed.append((self.layers[name], str(key), to_epoch_seconds(record[spec.time]),
+                               float(record[spec.lat]), float(record[spec.lon]),
+                               tuple(record.get(field) for field in spec.fields), entity_flags(name, record)))
+            except (AttributeError, KeyError, TypeError, ValueError):
+                self.stats["skipped"] += 1
+        changed = 0
+        with self.lock:
+            for target, key, t, lat, lon, fields, flags in parsed:
+                changed += target.upsert(key, t, lat, lon, fields, flags)
+            self.stats["records"] += len(parsed)
+        return changed
+
+    def expire(self, now: Optional[float] = None) -> int:
+        before = (time.time() if now is None else now) - self.max_age_seconds
+        with self.lock:
+            expired = sum(layer.expire(before) for layer in self.layers.values())
+            self.stats["expired"] += expired
+        return expired
+
+    def _layers(self, layers: Optional[Iterable[str]]) -> List[Layer]:
+        names = list(layers) if layers else list(LAYERS)
+        unknown = [name for name in names if name not in self.layers]
+        if unknown:
+            raise ValueError(f"unknown layers: {unknown}")
+        return [self.layers[name] for name in names]
+
+    def _min_t(self, max_age: Optional[float], now: Optional[float]) -> float:
+        return (time.time() if now is None else now) - (self.max_age_seconds if max_age is None else max_age)
+
+    @staticmethod
+    def entity(layer: Layer, slot: int, distance: Optional[float] = None) -> Dict[str, Any]:
+        item = {"layer": layer.name, "id": layer.keys[slot], "timestamp": format_timestamp(float(layer.t[slot])),
+                "latitude": float(layer.lat[slot]), "longitude": float(layer.lon[slot])}
+        if distance is not None:
+            item["distance_km"] = round(float(distance), 3)
+        item.update(zip(layer.spec.fields, layer.fields[slot]))
+        return item
+
+    def radius(self, lat: float, lon: float, km: float, layers=None, max_age=None, now=None,
+               limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        min_t = self._min_t(max_age, now)
+        with self.lock:
+            hits = []
+            for layer in self._layers(layers):
+                slots, distance = layer.radius(lat, lon, km, min_t)
+                hits.extend((d, layer, s) for s, d in zip(slots[:limit].tolist(), distance[:limit].tolist()))
+            hits.sort(key=lambda hit: hit[0])
+            return [self.entity(layer, slot, d) for d, layer, slot in hits[:limit]]
+
+    def bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float, layers=None, max_age=None,
+             now=None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        min_t = self._min_t(max_age, now)
+        with self.lock:
+            items = []
+            for layer in self._layers(layers):
+                slots = layer.bbox(min_lat, min_lon, max_lat, max_lon, min_t)
+                items.extend(self.entity(layer, slot) for slot in slots[:None if limit is None else limit - len(items)])
+        return items
+
+    def nearest(self, lat: float, lon: float, k: int, layers=None, max_age=None, now=None) -> List[Dict[str, Any]]:
+        min_t = self._min_t(max_age, now)
+        with self.lock:
+            hits = []
+            for layer in self._layers(layers):
+                slots, distance = layer.nearest(lat, lon, k, min_t)
+                hits.extend((d, layer, s) for s, d in zip(slots.tolist(), distance.tolist()))
+            hits.sort(key=lambda hit: hit[0])
+            return [self.entity(layer, slot, d) for d, layer, slot in hits[:k]]
+
+    def harbour_hits(self, harbour: Dict[str, Any], min_t: float) -> Iterator[Tuple[Layer, np.ndarray, np.ndarray]]:
+        """(layer, slots, distances) inside the lagebild radius of a harbour, COUNTED entities only."""
+        for layer in self.layers.values():
+            slots, distance = layer.radius(harbour["latitude"], harbour["longitude"], layer.spec.digest_km, min_t)
+            counted = (layer.flags[slots] & COUNTED) > 0
+            yield layer, slots[counted], distance[counted]
+
+    def _harbours(self, harbour: Optional[str], country: Optional[str]) -> List[Dict[str, Any]]:
+        selected = [h for h in self.harbours
+                    if (harbour is None or h["name"] == harbour) and (country is None or h["country"] == country)]
+        if harbour is not None and not selected:
+            raise ValueError(f"unknown harbour: {harbour}")
+        return selected
+
+    def digest(self, harbour: Optional[str] = None, country: Optional[str] = None, max_age=None, now=None,
+               nearest: int = 5) -> List[Dict[str, Any]]:
+        """Per harbour: counts per layer, alerts and the nearest entities per layer."""
+        min_t = self._min_t(max_age, now)
+        digests = []
+        with self.lock:
+            for h in self._harbours(harbour, country):
+                counts, alerts, closest = {}, [], {}
+                for layer, slots, distance in self.harbour_hits(h, min_t):
+                    counts[layer.name] = len(slots)
+                    closest[layer.name] = [self.entity(layer, slot, d) for slot, d in
+                                           zip(slots[:nearest].tolist(), distance[:nearest].tolist())]
+                    alerting = (layer.flags[slots] & ALERT) > 0
+                    for slot, d in zip(slots[alerting].tolist(), distance[alerting].tolist()):
+                        item = self.entity(layer, slot, d)
+                        alerts.append(dict(item, alert=alert_reason(layer.name, item)))
+                alerts.sort(key=lambda item: item["distance_km"])
+                digests.append({"harbour": h["name"], "country": h["country"], "latitude": h["latitude"],
+                                "longitude": h["longitude"], "counts": counts, "alerts": alerts, "nearest": closest})
+        return digests
+
+    def lagebild_rows(self, harbour: Optional[str] = None, country: Optional[str] = None, max_age=None,
+                      now=None) -> List[Dict[str, Any]]:
+        """Rows with the columns and detail texts of the lagebild view."""
+        min_t = self._min_t(max_age, now)
+        rows = []
+        with self.lock:
+            for h in self._harbours(harbour, country):
+                for layer, slots, distance in self.harbour_hits(h, min_t):
+                    for slot, d in zip(slots.tolist(), distance.tolist()):
+                        item = self.entity(layer, slot, d)
+                        dist_km = str(round(d, 2))
+                        rows.append({
+                            "Data_Source": layer.spec.source,
+                            "ID": str(item["user_username"] if layer.name == "social" else item["id"]),
+                            "timestamp": item["timestamp"],
+                            "latitude": item["latitude"],
+                            "longitude": item["longitude"],
+                            "harbour_name": h["name"],
+                            "dist_m_raw": d * 1000.0,
+                            "dist_km": dist_km,
+                            "details": f"Distance: {dist_km} km | {details(item)}",
+                        })
+        rows.sort(key=lambda row: row["timestamp"], reverse=True)
+        rows.sort(key=lambda row: row["harbour_name"])
+        return rows
+
+    def health(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"entities": {name: len(layer) for name, layer in self.layers.items()},
+                    "cells": {name: len(layer.grid) for name, layer in self.layers.items()},
+                    "late": {name: layer.late for name, layer in self.layers.items()},
+                    "harbours": len(self.harbours), **self.stats}
+
+    def save(self, directory: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, SNAPSHOT_FILE)
+        with self.lock:
+            arrays, meta = {}, {"saved_at": time.time(), "cell_deg": self.cell_deg, "layers": {}}
+            for name, layer in self.layers.items():
+                columns, meta["layers"][name] = layer.snapshot()
+                arrays.update({f"{name}_{column}": values for column, values in columns.items()})
+        arrays["meta"] = np.frombuffer(json.dumps(meta).encode("utf-8"), np.uint8)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(path + ".tmp", path)
+        return path
+
+    @classmethod
+    def load(cls, directory: str, **kwargs) -> "OperationalPicture":
+        with np.load(os.path.join(directory, SNAPSHOT_FILE)) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            picture = cls(cell_deg=meta["cell_deg"], **kwargs)
+            for name, layer_meta in meta["layers"].items():
+                columns = {column: data[f"{name}_{column}"] for column in ("lat", "lon", "t", "flags")}
+                picture.layers[name] = Layer.restore(name, picture.cell_deg, columns, layer_meta)
+        return picture
+
+
+def alert_reason(layer: str, item: Dict[str, Any]) -> Optional[str]:
+    if layer == "ais" and item.get("sanctions_name"):
+        return f"sanctioned vessel {item['sanctions_name']}"
+    if layer == "buoy" and item.get("payload_object_type") == "SUBMARINE":
+        return f"submarine contact {item.get('payload_object_classification')}"
+    if layer == "marine" and item.get("operational_status") == "Non-Operational":
+        return "unit non-operational"
+    if layer == "jammer" and item.get("jamming_indicator"):
+        return f"GPS jamming (NIC {item.get('adsb_nic')})"
+    return None
+
+
+def entity_flags(layer: str, record: Dict[str, Any]) -> int:
+    counted = not ((layer == "buoy" and record.get("payload_detectionconfidence") is None)
+                   or (layer == "jammer" and not record.get("jamming_indicator")))
+    return (COUNTED if counted else 0) | (ALERT if counted and alert_reason(layer, record) else 0)
+
+
+def details(item: Dict[str, Any]) -> str:
+    """details column of the lagebild view, without the distance prefix."""
+    layer = item["layer"]
+    if layer == "buoy":
+        return (f"Object: {item['payload_object_type']}/{item['payload_object_classification']} "
+                f"| Mag Anomaly: {item['payload_magneticfield_anomaly']}")
+    if layer == "ais":
+        reason = f" (Sanction Reason: {item['sanction_reason']})" if item.get("sanction_reason") else ""
+        return f"Sanctioned: {item.get('sanctions_name') or 'No'}{reason}"
+    if layer == "marine":
+        return f"Status: {item['operational_status']}"
+    if layer == "social":
+        return f"Prio: {item['priority']} | Tweet: {item['tweet']}"
+    return f"NIC: {item['adsb_nic']} | Integrity: {item['signal_integrity']}"
+
+
+# --- HTTP API ----------------------------------------------------------------
+
+def as_columns(items: List[Dict[str, Any]]) -> Dict[str, list]:
+    names = list(dict.fromkeys(name for item in items for name in item))
+    return {name: [item.get(name) for item in items] for name in names}
+
+
+class COPHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        cop: OperationalPicture = self.server.cop
+        try:
+            number = lambda name, default=None: float(query[name]) if name in query else default
+            layers = query["layers"].split(",") if query.get("layers") else None
+            limit = int(query["limit"]) if "limit" in query else None
+            common = {"layers": layers, "max_age": number("max_age")}
+            start = time.perf_counter()
+            if url.path == "/health":
+                return self.reply(200, cop.health())
+            if url.path == "/radius":
+                items = cop.radius(number("lat"), number("lon"), number("km"), limit=limit, **common)
+            elif url.path == "/bbox":
+                items = cop.bbox(number("min_lat"), number("min_lon"), number("max_lat"), number("max_lon"),
+                                 limit=limit, **common)
+            elif url.path == "/nearest":
+                items = cop.nearest(number("lat"), number("lon"), int(query.get("k", 10)), **common)
+            elif url.path == "/digest":
+                items = cop.digest(query.get("harbour"), query.get("country"), common["max_age"])
+            elif url.path == "/lagebild":
+                items = cop.lagebild_rows(query.get("harbour"), query.get("country"), common["max_age"])
+            else:
+                return self.reply(404, {"error": f"unknown endpoint {url.path}"})
+        except (KeyError, TypeError, ValueError) as e:
+            return self.reply(400, {"error": str(e)})
+        body = {"count": len(items), "ms": round((time.perf_counter() - start) * 1000, 3)}
+        if query.get("format") == "columns":
+            body["columns"] = as_columns(items)
+        else:
+            body["rows"] = items
+        self.reply(200, body)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        cop: OperationalPicture = self.server.cop
+        if url.path == "/snapshot":
+            if not self.server.snapshot_dir:
+                return self.reply(400, {"error": "no --snapshot-dir"})
+            return self.reply(200, {"path": cop.save(self.server.snapshot_dir)})
+        if url.path != "/ingest":
+            return self.reply(404, {"error": f"unknown endpoint {url.path}"})
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+        try:
+            records = [json.loads(line) for line in body.splitlines() if line.strip()]
+        except ValueError as e:
+            return self.reply(400, {"error": str(e)})
+        self.reply(200, {"records": len(records), "changed": cop.ingest(records)})
+
+    def reply(self, status: int, body: Dict[str, Any]):
+        payload = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def serve(cop: OperationalPicture, port: int, snapshot_dir: Optional[str] = None,
+          host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), COPHandler)
+    server.daemon_threads = True
+    server.cop = cop
+    server.snapshot_dir = snapshot_dir
+    return server
+
+
+# --- Streams -----------------------------------------------------------------
+
+def feed(cop: OperationalPicture, lines: Iterable[str], batch: int = INGEST_BATCH):
+    """Ingests NDJSON lines (stdin of kafka-console-consumer, replay files) in batches."""
+    records = []
+    for line in lines:
+        if line.strip():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                cop.stats["skipped"] += 1
+        if len(records) >= batch:
+            cop.ingest(records)
+            records = []
+    cop.ingest(records)
+
+
+def standin_stream(harbours: List[Dict[str, Any]], entities: int = 5000, seed: int = 11,
+                   now=time.time) -> Iterator[Dict[str, Any]]:
+    """
+    Endless local stand-in for the five topics: entities around the harbours
+    that drift and report in the simulators' record formats, stamped with now().
+    """
+    rng = random.Random(seed)
+    layers = ["ais"] * 6 + ["marine", "buoy", "jammer", "social"]
+    population = []
+    for i in range(entities):
+        h = harbours[i % len(harbours)]
+        population.append([layers[i % len(layers)], i, h["latitude"] + rng.uniform(-0.4, 0.4),
+                           h["longitude"] + rng.uniform(-0.6, 0.6)])
+    while True:
+        entity = population[rng.randrange(entities)]
+        layer, i = entity[0], entity[1]
+        entity[2] += rng.uniform(-0.01, 0.01)
+        entity[3] += rng.uniform(-0.015, 0.015)
+        lat, lon, t = round(entity[2], 5), round(entity[3], 5), now()
+        iso = datetime.fromtimestamp(t, timezone.utc).isoformat(timespec="milliseconds")[:-6] + "Z"
+        if layer == "ais":
+            yield {"MMSI": 211000000 + i, "Event_Timestamp": format_timestamp(t), "Latitude": lat, "Longitude": lon,
+                   "Speed": round(rng.uniform(0, 20), 1), "Course": round(rng.uniform(0, 360), 1),
+                   "Status": "Under way using engine", "Destination": "KIEL",
+                   **({"sanctions_name": f"SHADOW {i}", "Sanction_Reason": "Shadow fleet"} if i % 997 == 0 else {})}
+        elif layer == "marine":
+            yield {"MMSI": f"MAR{123400 + i}", "Event_Timestamp": format_timestamp(t), "Latitude": lat,
+                   "Longitude": lon, "Speed": 8.0, "Course": 90.0, "Status": "Patrolling", "Depth": 0.0,
+                   "Operational_Status": rng.choice(["Operational", "Limited Operational", "Non-Operational"]),
+                   "System_Status": "All systems nominal"}
+        elif layer == "buoy":
+            kind = rng.choice(["SUBMARINE", "SURFACE_VESSEL", "GEOLOGICAL", "WRECK"])
+            yield {"buoyid": f"MAD-{i:05d}", "ts": iso, "geo_position_lat": lat, "geo_position_lon": lon,
+                   "payload_magneticField_anomaly": round(rng.uniform(-300, 300), 1),
+                   "payload_detectionConfidence": rng.choice(["VERY_HIGH", "HIGH", "MEDIUM", "LOW", None]),
+                   "payload_object_type": kind, "payload_object_classification": f"{kind}_CONTACT"}
+        elif layer == "jammer":
+            nic = rng.randint(0, 9)
+            yield {"geohash": geohash_encode(lat, lon, 6), "ts": iso, "latitude": lat, "longitude": lon,
+                   "adsb_nic": nic, "signal_integrity": "LOW" if nic < 5 else "HIGH", "jamming_indicator": nic < 5,
+                   "event_type": "gps_jammer_event"}
+        else:
+            yield {"user_name": f"User {i}", "user_username": f"user{i}", "tweet": f"Vessel sighting {i} #vessel",
+                   "ts": iso, "priority": rng.choice(["niedrig", "mittel", "hoch"]), "latitude": lat,
+                   "longitude": lon, "cluster_id": f"c{i // 3}", "duplicate_count": 1 + i % 3}
+
+
+def run_standin(cop: OperationalPicture, rate: float, stop: threading.Event, entities: int = 5000):
+    stream = standin_stream(cop.harbours, entities)
+    batch = max(1, int(rate / 10))
+    while not stop.is_set():
+        start = time.monotonic()
+        cop.ingest(itertools.islice(stream, batch))
+        stop.wait(max(0.0, batch / rate - (time.monotonic() - start)))
+
+
+def maintain(cop: OperationalPicture, stop: threading.Event, snapshot_dir: Optional[str], interval: float):
+    last_snapshot = last_expire = time.monotonic()
+    while not stop.wait(1.0):
+        if time.monotonic() - last_expire >= EXPIRE_INTERVAL_SECONDS:
+            cop.expire()
+            last_expire = time.monotonic()
+        if snapshot_dir and time.monotonic() - last_snapshot >= interval:
+            cop.save(snapshot_dir)
+            last_snapshot = time.monotonic()
+
+
+# --- Verification and benchmark ------------------------------------------------
+
+def synthetic_picture(harbours: List[Dict[str, Any]], entities: int, now: float, seed: int = 3,
+                      cell_deg: float = DEFAULT_CELL_DEG) -> Tuple[OperationalPicture, List[Dict[str, Any]]]:
+    """Picture with `entities` entities after two updates each; also returns the records."""
+    rng = random.Random(seed)
+    stream = standin_stream(harbours, entities, seed, now=lambda: now - rng.uniform(0, 2 * 86400))
+    records = [next(stream) for _ in range(2 * entities)]
+    cop = OperationalPicture(harbours, cell_deg)
+    cop.ingest(records)
+    return cop, records
+
+
+def reference_state(records: List[Dict[str, Any]]) -> Dict[Tuple[str, str], Tuple[float, float, float]]:
+    """Latest (t, lat, lon) per (layer, key) by a plain scan of the records."""
+    state = {}
+    for record in records:
+        record = {k.lower(): v for k, v in record.items()}
+        layer = detect_layer(record)
+        spec = LAYERS[layer]
+        key = (layer, str(record.get(spec.key) or f"{record.get('user_username')}|{record.get('tweet')}"))
+        t = to_epoch_seconds(record[spec.time])
+        if key not in state or t >= state[key][0]:
+            state[key] = (t, float(record[spec.lat]), float(record[spec.lon]))
+    return state
+
+
+def verify() -> bool:
+    harbours = load_harbours(DEFAULT_HARBOURS)
+    now = time.time()
+    cop, records = synthetic_picture(harbours, 20000, now)
+    state = reference_state(records)
+    rng = random.Random(5)
+    ok = True
+
+    stored = {(name, key): (float(layer.t[slot]), float(layer.lat[slot]), float(layer.lon[slot]))
+              for name, layer in cop.layers.items() for key, slot in layer.slots.items()}
+    cells_ok = all(sum(map(len, layer.grid.values())) == len(layer) for layer in cop.layers.values())
+    good = stored == state and cells_ok
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} latest state per entity after {len(records)} out-of-order updates: "
+          f"{len(stored)} entities, {sum(layer.late for layer in cop.layers.values())} older updates ignored")
+
+    min_t = now - DEFAULT_MAX_AGE_SECONDS
+    live = [(name, key, lat, lon) for (name, key), (t, lat, lon) in state.items() if t >= min_t]
+    mismatches = 0
+    for _ in range(200):
+        h = rng.choice(harbours)
+        lat, lon = h["latitude"] + rng.uniform(-0.5, 0.5), h["longitude"] + rng.uniform(-0.5, 0.5)
+        km = rng.choice([1.0, 5.0, 30.0, 80.0])
+        expected = {(name, key) for name, key, a, b in live if haversine_km(lat, lon, a, b) <= km - 1e-9}
+        border = {(name, key) for name, key, a, b in live if abs(haversine_km(lat, lon, a, b) - km) < 1e-9}
+        got = {(item["layer"], item["id"]) for item in cop.radius(lat, lon, km, now=now)}
+        mismatches += not (expected <= got <= expected | border)
+        box = (lat - 0.3, lon - 0.5, lat + 0.3, lon + 0.5)
+        expected = {(name, key) for name, key, a, b in live if box[0] <= a <= box[2] and box[1] <= b <= box[3]}
+        mismatches += expected != {(item["layer"], item["id"]) for item in cop.bbox(*box, now=now)}
+        k = rng.choice([1, 10, 50])
+        layer = rng.choice(list(LAYERS))
+        expected = sorted(haversine_km(lat, lon, a, b) for name, key, a, b in live if name == layer)[:k]
+        got = [item["distance_km"] for item in cop.nearest(lat, lon, k, [layer], now=now)]
+        mismatches += len(got) != len(expected) or any(abs(a - b) > 1e-3 for a, b in zip(got, expected))
+    ok &= mismatches == 0
+    print(f"{'ok  ' if mismatches == 0 else 'FAIL'} 200 x radius / bbox / nearest-k against a full scan: "
+          f"{mismatches} mismatches")
+
+    sparse = OperationalPicture(harbours)
+    sparse.ingest([{"MMSI": 1, "Event_Timestamp": format_timestamp(now), "Latitude": 10.0, "Longitude": -170.0}])
+    far = sparse.nearest(54.3, 10.1, 3, now=now)
+    good = len(far) == 1 and far[0]["id"] == "1"
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} nearest-k falls back to a scan for far-away entities")
+
+    # Entities just inside / outside the radius, due north/east/south/west and at other bearings. The
+    # centres put the northern edge (0.719 deg) just above a cell boundary, where a box computed with
+    # 111.32 km per degree (0.718 deg) ends in the cell below.
+    edge = OperationalPicture(harbours)
+    centres = [(54.0 - 0.7186 + edge.cell_deg * i, 10.0 + 0.0291 * i) for i in range(40)]
+    edge_records, inside = [], set()
+    for i, (lat, lon) in enumerate(centres):
+        for j, bearing in enumerate((0.0, 90.0, 180.0, 270.0, 37.0, 301.0)):
+            for factor in (1 - 1e-6, 1 + 1e-6):
+                a, b = destination(lat, lon, bearing, 79.95 * factor)
+                key = f"{i}-{j}-{factor > 1}"
+                edge_records.append({"MMSI": key, "Event_Timestamp": format_timestamp(now), "Latitude": a,
+                                     "Longitude": b})
+                inside |= {(i, key)} if factor < 1 else set()
+    edge.ingest(edge_records)
+    found = {(i, item["id"]) for i, (lat, lon) in enumerate(centres)
+             for item in edge.radius(lat, lon, 79.95, now=now) if item["id"].startswith(f"{i}-")}
+    good = found == inside
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} radius edge: {len(found)} of {len(inside)} entities 1e-6 inside 79.95 km "
+          f"found, none outside")
+
+    skipped = edge.stats["skipped"]
+    feed(edge, ['[1, 2]', 'null', '"text"', '{"MMSI": 5}', 'not json'])
+    good = edge.stats["skipped"] - skipped == 5
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} non-object and incomplete NDJSON lines are skipped, not raised")
+
+    expected = 0
+    for h in harbours:
+        for (name, key), (t, a, b) in state.items():
+            if t >= min_t and haversine_km(h["latitude"], h["longitude"], a, b) <= LAYERS[name].digest_km:
+                slot = cop.layers[name].slots[key]
+                fields = dict(zip(LAYERS[name].fields, cop.layers[name].fields[slot]))
+                expected += not ((name == "buoy" and fields["payload_detectionconfidence"] is None)
+                                 or (name == "jammer" and not fields["jamming_indicator"]))
+    rows = cop.lagebild_rows(now=now)
+    counts = sum(sum(d["counts"].values()) for d in cop.digest(now=now))
+    good = len(rows) == expected == counts and all(row["details"].startswith("Distance: ") for row in rows)
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} digest / lagebild rows for {len(harbours)} harbours: {len(rows)} rows, "
+          f"{expected} expected by scan")
+
+    directory = "/tmp/cop_verify"
+    cop.save(directory)
+    restored = OperationalPicture.load(directory, harbours=harbours)
+    good = all(restored.radius(h["latitude"], h["longitude"], 40.0, now=now)
+               == cop.radius(h["latitude"], h["longitude"], 40.0, now=now) for h in harbours)
+    good &= restored.health()["entities"] == cop.health()["entities"]
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} snapshot round trip: {sum(restored.health()['entities'].values())} "
+          f"entities, identical query results")
+
+    expired = cop.expire(now)
+    good = all(layer.t[layer.live()].min(initial=np.inf) >= min_t for layer in cop.layers.values())
+    good &= sum(map(len, cop.layers.values())) == len(live)
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} expire drops {expired} entities older than 24 h, {len(live)} remain")
+
+    server = serve(restored, 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    update = {"MMSI": 999, "Event_Timestamp": format_timestamp(time.time()), "Latitude": 54.33, "Longitude": 10.13}
+    with urlopen(Request(f"{base}/ingest", data=json.dumps(update).encode("utf-8"), method="POST")) as response:
+        ingested = json.load(response)
+    with urlopen(f"{base}/nearest?lat=54.33&lon=10.13&k=1&layers=ais") as response:
+        nearest = json.load(response)
+    with urlopen(f"{base}/lagebild?harbour=Kiel&format=columns") as response:
+        columns = json.load(response)["columns"]
+    server.shutdown()
+    good = (ingested["changed"] == 1 and nearest["rows"][0]["id"] == "999"
+            and "999" in columns["ID"] and len(columns["ID"]) == len(restored.lagebild_rows("Kiel")))
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} HTTP ingest / nearest / lagebild (columns) round trip")
+    return ok
+
+
+def benchmark(entities: int, queries: int):
+    harbours = load_harbours(DEFAULT_HARBOURS)
+    now = time.time()
+    rng = random.Random(6)
+    stream = standin_stream(harbours, entities, 4, now=lambda: now - rng.uniform(0, 3600))
+    records = [next(stream) for _ in range(2 * entities)]
+    cop = OperationalPicture(harbours)
+    start = time.perf_counter()
+    for i in range(0, len(records), INGEST_BATCH):
+        cop.ingest(records[i:i + INGEST_BATCH])
+    ingest_seconds = time.perf_counter() - start
+
+    points = [(h["latitude"] + rng.uniform(-0.3, 0.3), h["longitude"] + rng.uniform(-0.3, 0.3))
+              for h in (rng.choice(harbours) for _ in range(queries))]
+
+    def timed(call) -> Dict[str, float]:
+        latencies = []
+        for lat, lon in points:
+            start = time.perf_counter()
+            call(lat, lon)
+            latencies.append(time.perf_counter() - start)
+        latencies = np.array(latencies) * 1000
+        return {"p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 3)}
+
+    ais, min_t = cop.layers["ais"], now - DEFAULT_MAX_AGE_SECONDS
+    live = ais.live()
+    hits = [len(ais.radius(lat, lon, 30.0, min_t)[0]) for lat, lon in points]
+    radius = timed(lambda lat, lon: ais.radius(lat, lon, 30.0, min_t))
+    scan = timed(lambda lat, lon: ais._within(live, lat, lon, 30.0, min_t))
+    radius_rows = timed(lambda lat, lon: cop.radius(lat, lon, 30.0, limit=100, now=now))
+    nearest = timed(lambda lat, lon: cop.nearest(lat, lon, 10, now=now))
+    bbox = timed(lambda lat, lon: cop.bbox(lat - 0.1, lon - 0.2, lat + 0.1, lon + 0.2, limit=100, now=now))
+    start = time.perf_counter()
+    digests = cop.digest(now=now)
+    digest_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    rows = cop.lagebild_rows(country="Germany", now=now)
+    lagebild_seconds = time.perf_counter() - start
+
+    directory = "/tmp/cop_bench"
+    start = time.perf_counter()
+    path = cop.save(directory)
+    save_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    OperationalPicture.load(directory, harbours=harbours)
+    load_seconds = time.perf_counter() - start
+    print(json.dumps({
+        "entities": sum(map(len, cop.layers.values())),
+        "records": len(records),
+        "ingest_records_per_second": round(len(records) / ingest_seconds),
+        "radius_30km_ais_mean_hits": round(float(np.mean(hits))),
+        "radius_30km_ais_grid": radius,
+        "radius_30km_ais_full_scan": scan,
+        "radius_30km_all_layers_100_rows": radius_rows,
+        "nearest_10_all_layers": nearest,
+        "bbox_all_layers_100_rows": bbox,
+        "digest_all_harbours_ms": round(digest_seconds * 1000, 2),
+        "digest_alerts": sum(len(d["alerts"]) for d in digests),
+        "lagebild_germany_ms": round(lagebild_seconds * 1000, 2),
+        "lagebild_germany_rows": len(rows),
+        "snapshot_mb": round(os.path.getsize(path) / 1e6, 1),
+        "snapshot_save_ms": round(save_seconds * 1000, 1),
+        "snapshot_load_ms": round(load_seconds * 1000, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-memory common operational picture with spatial queries.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("serve")
+    run.add_argument("--port", type=int, default=DEFAULT_PORT)
+    run.add_argument("--host", default="127.0.0.1")
+    run.add_argument("--input", nargs="*", default=[], help="NDJSON files to replay, '-' for stdin")
+    run.add_argument("--standin", type=float, default=0.0, help="Records per second from the local stand-in stream")
+    run.add_argument("--harbours", default=DEFAULT_HARBOURS, help="baltic_sea_harbours as .csv/.ndjson or DDL")
+    run.add_argument("--snapshot-dir")
+    run.add_argument("--snapshot-interval", type=float, default=DEFAULT_SNAPSHOT_INTERVAL)
+    run.add_argument("--cell-deg", type=float, default=DEFAULT_CELL_DEG)
+    run.add_argument("--max-age", type=float, default=DEFAULT_MAX_AGE_SECONDS, help="Seconds an entity is kept")
+    sub.add_parser("verify", help="Compare queries, digests and snapshots with full scans")
+    bench = sub.add_parser("benchmark")
+    bench.add_argument("--entities", type=int, default=200000)
+    bench.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        sys.exit(0 if verify() else 1)
+    if args.command == "benchmark":
+        benchmark(args.entities, args.queries)
+        sys.exit(0)
+
+    options = {"harbours": load_harbours(args.harbours), "max_age_seconds": args.max_age}
+    if args.snapshot_dir and os.path.exists(os.path.join(args.snapshot_dir, SNAPSHOT_FILE)):
+        picture = OperationalPicture.load(args.snapshot_dir, **options)
+        print(f"Loaded snapshot: {picture.health()['entities']}")
+    else:
+        picture = OperationalPicture(cell_deg=args.cell_deg, **options)
+    stop = threading.Event()
+    workers = [threading.Thread(target=maintain, args=(picture, stop, args.snapshot_dir, args.snapshot_interval))]
+    for source in args.input:
+        lines = sys.stdin if source == "-" else open(source, encoding="utf-8")
+        workers.append(threading.Thread(target=feed, args=(picture, lines)))
+    if args.standin > 0:
+        workers.append(threading.Thread(target=run_standin, args=(picture, args.standin, stop)))
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+
+    http_server = serve(picture, args.port, args.snapshot_dir, args.host)
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=http_server.shutdown).start())
+    print(f"COP listening on http://{args.host}:{args.port} (/health, /radius, /bbox, /nearest, /digest, /lagebild)")
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+    if args.snapshot_dir:
+        print(f"Snapshot written to {picture.save(args.snapshot_dir)}")
@@ -0,0 +1,479 @@
+"""
+Spatio-temporal correlation of buoy contacts with AIS positions.
+
+The buoy/AIS query in cdw-analyse/sample_queries.sql pairs rows on
+DATE_TRUNC('minute', ...) equality and then evaluates ST_Distance for every
+pair inside the same minute. That misses pairs that straddle a minute boundary
+and its cost grows with (buoys per minute) x (AIS fixes per minute).
+
+This module buckets both streams into (geohash cell, time bucket) keys. A probe
+only visits the neighbouring cells and adjacent buckets that can possibly hold a
+partner within the radius/time window, and the exact haversine distance is only
+computed for those candidates. The result is identical to a brute-force join
+with the same predicate (see brute_force_join / --verify).
+
+It can be used
+  * as a batch job over Parquet files (e.g. the data files of the Iceberg
+    tables ais_events_ice and buoy_data), and
+  * as a streaming operator (StreamingCorrelator) fed record by record, e.g.
+    from a PyFlink flat_map over the Kafka topics.
+"""
+
+import argparse
+import glob
+import heapq
+import json
+import math
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = math.radians(EARTH_RADIUS_KM)  # about 111.195, the sphere of haversine_km
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+DEFAULT_RADIUS_KM = 1.0
+DEFAULT_WINDOW_SECONDS = 60
+
+AIS_COLUMNS = ["mmsi", "event_timestamp", "latitude", "longitude"]
+BUOY_COLUMNS = ["buoyid", "ts", "geo_position_lat", "geo_position_lon", "payload_object_type"]
+
+
+# --- Geo helpers -------------------------------------------------------------
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in km (same formula as st_distance.udf_function)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def destination(lat: float, lon: float, bearing_deg: float, distance_km: float) -> Tuple[float, float]:
+    """Point at distance_km from (lat, lon) along the initial bearing, on the sphere of haversine_km."""
+    angle, bearing = distance_km / EARTH_RADIUS_KM, math.radians(bearing_deg)
+    phi1 = math.radians(lat)
+    phi2 = math.asin(math.sin(phi1) * math.cos(angle) + math.cos(phi1) * math.sin(angle) * math.cos(bearing))
+    dlambda = math.atan2(math.sin(bearing) * math.sin(angle) * math.cos(phi1),
+                         math.cos(angle) - math.sin(phi1) * math.sin(phi2))
+    return math.degrees(phi2), (lon + math.degrees(dlambda) + 180.0) % 360.0 - 180.0
+
+
+def radius_box_deg(lat: float, radius_km: float) -> Tuple[float, float]:
+    """
+    (dlat, dlon) of the smallest box around a point at lat that contains every
+    point within radius_km by haversine_km: the circle's longitude extent is
+    asin(sin(r / R) / cos(lat)). dlon is 360 where the circle reaches a pole.
+    """
+    angle = radius_km / EARTH_RADIUS_KM * (1.0 + 1e-9)  # margin against rounding at the edge
+    dlat = math.degrees(angle)
+    cos_lat = math.cos(math.radians(lat))
+    if abs(lat) + dlat >= 90.0 or math.sin(angle) >= cos_lat:
+        return dlat, 360.0
+    return dlat, math.degrees(math.asin(math.sin(angle) / cos_lat))
+
+
+def geohash_bits(precision: int) -> Tuple[int, int]:
+    """Number of (latitude, longitude) bits in a geohash of the given length."""
+    total = 5 * precision
+    return total // 2, total - total // 2
+
+
+def geohash_cell_index(lat: float, lon: float, precision: int) -> Tuple[int, int]:
+    """Integer (row, column) of the geohash cell containing the point."""
+    lat_bits, lon_bits = geohash_bits(precision)
+    rows, cols = 1 << lat_bits, 1 << lon_bits
+    row = min(rows - 1, max(0, int((lat + 90.0) / 180.0 * rows)))
+    col = int((lon + 180.0) / 360.0 * cols) % cols
+    return row, col
+
+
+def geohash_from_index(row: int, col: int, precision: int) -> str:
+    """Interleaves a cell index back into the standard base32 geohash string."""
+    lat_bits, lon_bits = geohash_bits(precision)
+    code = 0
+    lat_pos, lon_pos = lat_bits - 1, lon_bits - 1
+    for i in range(5 * precision):
+        code <<= 1
+        if i % 2 == 0:
+            code |= (col >> lon_pos) & 1
+            lon_pos -= 1
+        else:
+            code |= (row >> lat_pos) & 1
+            lat_pos -= 1
+    chars = []
+    for shift in range(5 * (precision - 1), -1, -5):
+        chars.append(GEOHASH_BASE32[(code >> shift) & 31])
+    return "".join(chars)
+
+
+def geohash_encode(lat: float, lon: float, precision: int) -> str:
+    """Geohash string of a point (same result as GPSJammerSimulator._encode_geohash)."""
+    row, col = geohash_cell_index(lat, lon, precision)
+    return geohash_from_index(row, col, precision)
+
+
+def geohash_cell_size_deg(precision: int) -> Tuple[float, float]:
+    """(height, width) of a geohash cell in degrees."""
+    lat_bits, lon_bits = geohash_bits(precision)
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def choose_precision(radius_km: float, max_abs_lat: float = 66.0) -> int:
+    """
+    Longest geohash whose cells are at least radius_km wide and high at
+    max_abs_lat, so that a probe only has to visit the 3x3 neighbourhood.
+    """
+    cos_lat = math.cos(math.radians(min(89.0, max_abs_lat)))
+    best = 1
+    for precision in range(1, 10):
+        height_deg, width_deg = geohash_cell_size_deg(precision)
+        if height_deg * KM_PER_DEGREE_LAT >= radius_km and width_deg * KM_PER_DEGREE_LAT * cos_lat >= radius_km:
+            best = precision
+        else:
+            break
+    return best
+
+
+def to_epoch_seconds(value: Any) -> float:
+    """Parses the timestamp formats emitted by the simulators into epoch seconds (UTC)."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        dt = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+# --- Index ---------------------------------------------------------------------
+
+class CellTimeIndex:
+    """
+    Hash index of points keyed by (geohash cell, time bucket).
+
+    Each entry is (epoch_seconds, lat, lon, payload). Probing visits all cells
+    and buckets that can contain a point within radius_km / window_seconds and
+    returns the exact matches. A heap of (time bucket, key) lets eviction pop
+    the expired buckets instead of scanning every key.
+    """
+
+    def __init__(self, radius_km: float, window_seconds: float, precision: Optional[int] = None):
+        self.radius_km = radius_km
+        self.window_seconds = window_seconds
+        self.precision = precision or choose_precision(radius_km)
+        self.bucket_seconds = max(1.0, float(window_seconds))
+        self.lat_bits, self.lon_bits = geohash_bits(self.precision)
+        self.cell_height_deg, self.cell_width_deg = geohash_cell_size_deg(self.precision)
+        self.buckets: Dict[Tuple[int, int, int], List[Tuple[float, float, float, Any]]] = {}
+        self.expiry: List[Tuple[int, Tuple[int, int, int]]] = []
+        self.size = 0
+
+    def key(self, t: float, lat: float, lon: float) -> Tuple[int, int, int]:
+        row, col = geohash_cell_index(lat, lon, self.precision)
+        return row, col, int(t // self.bucket_seconds)
+
+    def cell_of(self, key: Tuple[int, int, int]) -> str:
+        """Geohash string of an index key (for debugging and SQL push-down)."""
+        return geohash_from_index(key[0], key[1], self.precision)
+
+    def insert(self, t: float, lat: float, lon: float, payload: Any):
+        key = self.key(t, lat, lon)
+        entries = self.buckets.get(key)
+        if entries is None:
+            entries = self.buckets[key] = []
+            heapq.heappush(self.expiry, (key[2], key))
+        entries.append((t, lat, lon, payload))
+        self.size += 1
+
+    def _probe_ranges(self, t: float, lat: float, lon: float):
+        radius_deg_lat, radius_deg_lon = radius_box_deg(lat, self.radius_km)
+        row, col, bucket = self.key(t, lat, lon)
+        k_row = int(math.ceil(radius_deg_lat / self.cell_height_deg))
+        k_col = int(math.ceil(radius_deg_lon / self.cell_width_deg))
+        k_t = int(math.ceil(self.window_seconds / self.bucket_seconds))
+        return row, col, bucket, k_row, k_col, k_t, radius_deg_lat, radius_deg_lon
+
+    def probe(self, t: float, lat: float, lon: float):
+        """Yields (payload, t_other, distance_km) for every point inside the window."""
+        row, col, bucket, k_row, k_col, k_t, max_dlat, max_dlon = self._probe_ranges(t, lat, lon)
+        cols = 1 << self.lon_bits
+        # Near the poles the span covers all columns; each is visited once.
+        columns = range(cols) if 2 * k_col + 1 >= cols else [c % cols for c in range(col - k_col, col + k_col + 1)]
+        for b in range(bucket - k_t, bucket + k_t + 1):
+            for r in range(row - k_row, row + k_row + 1):
+                for c in columns:
+                    entries = self.buckets.get((r, c, b))
+                    if not entries:
+                        continue
+                    for t_other, lat_other, lon_other, payload in entries:
+                        if abs(t_other - t) > self.window_seconds:
+                            continue
+                        # Bounding box of the radius first: most points of the visited cells lie outside it.
+                        if abs(lat_other - lat) > max_dlat or abs((lon_other - lon + 180.0) % 360.0 - 180.0) > max_dlon:
+                            continue
+                        distance = haversine_km(lat, lon, lat_other, lon_other)
+                        if distance <= self.radius_km:
+                            yield payload, t_other, distance
+
+    def evict_before(self, t_min: float) -> int:
+        """Drops all buckets that end before t_min. Returns the number of removed points."""
+        last_bucket = int(t_min // self.bucket_seconds)
+        expiry = self.expiry
+        removed = 0
+        while expiry and expiry[0][0] < last_bucket:
+            removed += len(self.buckets.pop(heapq.heappop(expiry)[1]))
+        self.size -= removed
+        return removed
+
+
+# --- Batch join ----------------------------------------------------------------
+
+def _match_record(ais: Dict[str, Any], buoy: Dict[str, Any], distance_km: float) -> Dict[str, Any]:
+    return {
+        "mmsi": ais["mmsi"],
+        "ais_zeitstempel": ais["event_timestamp"],
+        "ais_breitengrad": ais["latitude"],
+        "ais_laengengrad": ais["longitude"],
+        "buoyid": buoy["buoyid"],
+        "bojen_zeitstempel": buoy["ts"],
+        "bojen_breitengrad": buoy["geo_position_lat"],
+        "bojen_laengengrad": buoy["geo_position_lon"],
+        "distance_km": distance_km,
+    }
+
+
+def correlate(ais_rows: Iterable[Dict[str, Any]],
+              buoy_rows: Iterable[Dict[str, Any]],
+              radius_km: float = DEFAULT_RADIUS_KM,
+              window_seconds: float = DEFAULT_WINDOW_SECONDS,
+              object_type: Optional[str] = "SURFACE_VESSEL",
+              precision: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Returns every (AIS fix, buoy contact) pair with |dt| <= window_seconds and
+    distance <= radius_km. AIS rows are indexed, buoy rows probe the index.
+    """
+    index = CellTimeIndex(radius_km, window_seconds, precision)
+    for ais in ais_rows:
+        if ais.get("latitude") is None or ais.get("longitude") is None:
+            continue
+        index.insert(to_epoch_seconds(ais["event_timestamp"]), float(ais["latitude"]), float(ais["longitude"]), ais)
+
+    matches = []
+    for buoy in buoy_rows:
+        if object_type and buoy.get("payload_object_type") != object_type:
+            continue
+        if buoy.get("geo_position_lat") is None or buoy.get("geo_position_lon") is None:
+            continue
+        t = to_epoch_seconds(buoy["ts"])
+        for ais, _, distance in index.probe(t, float(buoy["geo_position_lat"]), float(buoy["geo_position_lon"])):
+            matches.append(_match_record(ais, buoy, distance))
+    return matches
+
+
+def brute_force_join(ais_rows: List[Dict[str, Any]],
+                     buoy_rows: List[Dict[str, Any]],
+                     radius_km: float = DEFAULT_RADIUS_KM,
+                     window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                     object_type: Optional[str] = "SURFACE_VESSEL") -> List[Dict[str, Any]]:
+    """Nested-loop reference implementation with the same predicate as correlate()."""
+    matches = []
+    for buoy in buoy_rows:
+        if object_type and buoy.get("payload_object_type") != object_type:
+            continue
+        t_buoy = to_epoch_seconds(buoy["ts"])
+        for ais in ais_rows:
+            if abs(to_epoch_seconds(ais["event_timestamp"]) - t_buoy) > window_seconds:
+                continue
+            distance = haversine_km(buoy["geo_position_lat"], buoy["geo_position_lon"], ais["latitude"], ais["longitude"])
+            if distance <= radius_km:
+                matches.append(_match_record(ais, buoy, distance))
+    return matches
+
+
+def pair_keys(matches: Iterable[Dict[str, Any]]) -> List[Tuple[Any, ...]]:
+    """Order-independent representation of a join result for comparisons."""
+    return sorted((m["mmsi"], str(m["ais_zeitstempel"]), m["buoyid"], str(m["bojen_zeitstempel"])) for m in matches)
+
+
+def read_parquet_rows(paths: List[str], columns: List[str]) -> List[Dict[str, Any]]:
+    """
+    Reads the given columns from Parquet files (globs allowed), e.g. the
+    data/ directory of an Iceberg table. Column names are matched case-insensitively.
+    """
+    import pyarrow.parquet as pq
+
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(path, recursive=True)) or [path])
+
+    rows = []
+    for file_name in files:
+        table = pq.read_table(file_name)
+        lookup = {name.lower(): name for name in table.column_names}
+        selected = table.select([lookup[c.lower()] for c in columns if c.lower() in lookup])
+        for record in selected.to_pylist():
+            rows.append({k.lower(): v for k, v in record.items()})
+    return rows
+
+
+# --- Streaming operator ---------------------------------------------------------
+
+class StreamingCorrelator:
+    """
+    Symmetric streaming join of AIS and buoy records.
+
+    Every incoming record probes the index of the other stream and is then
+    inserted into its own index, so pairs are found regardless of arrival order.
+    State older than (watermark - window_seconds - allowed_lateness) is evicted,
+    which keeps memory bounded by the event rate within the window.
+    """
+
+    def __init__(self,
+                 radius_km: float = DEFAULT_RADIUS_KM,
+                 window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                 allowed_lateness: float = 60.0,
+                 object_type: Optional[str] = "SURFACE_VESSEL"):
+        self.window_seconds = window_seconds
+        self.allowed_lateness = allowed_lateness
+        self.object_type = object_type
+        self.ais_index = CellTimeIndex(radius_km, window_seconds)
+        self.buoy_index = CellTimeIndex(radius_km, window_seconds, self.ais_index.precision)
+        self.watermark = float("-inf")
+        self.emitted = 0
+
+    def _advance(self, t: float):
+        if t <= self.watermark:
+            return
+        self.watermark = t
+        horizon = t - self.window_seconds - self.allowed_lateness
+        self.ais_index.evict_before(horizon)
+        self.buoy_index.evict_before(horizon)
+
+    def process_ais(self, ais: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Feeds one ais_events record; returns the new matches it completes."""
+        t = to_epoch_seconds(ais["event_timestamp"])
+        lat, lon = float(ais["latitude"]), float(ais["longitude"])
+        matches = [_match_record(ais, buoy, d) for buoy, _, d in self.buoy_index.probe(t, lat, lon)]
+        self.ais_index.insert(t, lat, lon, ais)
+        self._advance(t)
+        self.emitted += len(matches)
+        return matches
+
+    def process_buoy(self, buoy: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Feeds one buoy_data record; returns the new matches it completes."""
+        if self.object_type and buoy.get("payload_object_type") != self.object_type:
+            return []
+        t = to_epoch_seconds(buoy["ts"])
+        lat, lon = float(buoy["geo_position_lat"]), float(buoy["geo_position_lon"])
+        matches = [_match_record(ais, buoy, d) for ais, _, d in self.ais_index.probe(t, lat, lon)]
+        self.buoy_index.insert(t, lat, lon, buoy)
+        self._advance(t)
+        self.emitted += len(matches)
+        return matches
+
+
+# --- Synthetic data for verification / benchmarking ----------------------------
+
+def synthetic_rows(num_ais: int, num_buoy: int, minutes: int = 60, seed: int = 42):
+    """Generates AIS and buoy rows clustered around a few Baltic harbours."""
+    rng = random.Random(seed)
+    centres = [(54.3233, 10.1228), (54.0887, 12.1405), (54.5189, 18.5305), (56.1612, 15.5869)]
+    start = datetime(2025, 10, 1, tzinfo=timezone.utc).timestamp()
+
+    def point():
+        lat, lon = rng.choice(centres)
+        return lat + rng.uniform(-0.1, 0.1), lon + rng.uniform(-0.1, 0.1), start + rng.uniform(0, minutes * 60)
+
+    ais_rows, buoy_rows = [], []
+    for i in range(num_ais):
+        lat, lon, t = point()
+        ais_rows.append({
+            "mmsi": 123456000 + i % 500,
+            "event_timestamp": datetime.fromtimestamp(t, timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            "latitude": round(lat, 5),
+            "longitude": round(lon, 5),
+        })
+    for i in range(num_buoy):
+        lat, lon, t = point()
+        buoy_rows.append({
+            "buoyid": f"MAD-{i:02d}",
+            "ts": datetime.fromtimestamp(t, timezone.utc).isoformat(timespec="milliseconds")[:-6] + "Z",
+            "geo_position_lat": round(lat, 4),
+            "geo_position_lon": round(lon, 4),
+            "payload_object_type": "SURFACE_VESSEL",
+        })
+    return ais_rows, buoy_rows
+
+
+def edge_rows(radius_km: float, count: int = 400, seed: int = 5):
+    """
+    Buoy contacts with one AIS fix each just inside and just outside radius_km
+    (relative 1e-6), due north/east/south/west and at random bearings, so that
+    --verify covers the pairs a too small bounding box would drop.
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 10, 1, tzinfo=timezone.utc).timestamp()
+    ais_rows, buoy_rows = [], []
+    for i in range(count):
+        lat, lon = rng.uniform(53.5, 66.0), rng.uniform(9.0, 30.0)
+        bearing = 90.0 * i if i < 4 else rng.uniform(0.0, 360.0)
+        stamp = datetime.fromtimestamp(start + i * 1000, timezone.utc)
+        buoy_rows.append({"buoyid": f"EDGE-{i:03d}", "ts": stamp.isoformat(timespec="milliseconds")[:-6] + "Z",
+                          "geo_position_lat": lat, "geo_position_lon": lon, "payload_object_type": "SURFACE_VESSEL"})
+        for j, factor in enumerate((1 - 1e-6, 1 + 1e-6)):
+            ais_lat, ais_lon = destination(lat, lon, bearing, radius_km * factor)
+            ais_rows.append({"mmsi": 200000000 + 2 * i + j,
+                             "event_timestamp": stamp.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+                             "latitude": ais_lat, "longitude": ais_lon})
+    return ais_rows, buoy_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Correlate buoy contacts with AIS positions.")
+    parser.add_argument("--ais", nargs="*", help="Parquet files/globs of ais_events_ice")
+    parser.add_argument("--buoy", nargs="*", help="Parquet files/globs of buoy_data")
+    parser.add_argument("--radius-km", type=float, default=DEFAULT_RADIUS_KM)
+    parser.add_argument("--window-seconds", type=float, default=DEFAULT_WINDOW_SECONDS)
+    parser.add_argument("--object-type", default="SURFACE_VESSEL", help="Empty string for all object types")
+    parser.add_argument("--verify", action="store_true", help="Compare against the brute-force join")
+    parser.add_argument("--synthetic", type=int, nargs=2, metavar=("NUM_AIS", "NUM_BUOY"),
+                        help="Use synthetic data instead of Parquet input")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        ais_rows, buoy_rows = synthetic_rows(*args.synthetic)
+    elif args.ais and args.buoy:
+        ais_rows = read_parquet_rows(args.ais, AIS_COLUMNS)
+        buoy_rows = read_parquet_rows(args.buoy, BUOY_COLUMNS)
+    else:
+        parser.error("either --synthetic or both --ais and --buoy are required")
+
+    object_type = args.object_type or None
+    start = time.perf_counter()
+    result = correlate(ais_rows, buoy_rows, args.radius_km, args.window_seconds, object_type)
+    indexed_seconds = time.perf_counter() - start
+    summary = {"ais_rows": len(ais_rows), "buoy_rows": len(buoy_rows), "pairs": len(result),
+               "indexed_seconds": round(indexed_seconds, 4)}
+
+    if args.verify:
+        start = time.perf_counter()
+        expected = brute_force_join(ais_rows, buoy_rows, args.radius_km, args.window_seconds, object_type)
+        summary["brute_force_seconds"] = round(time.perf_counter() - start, 4)
+        summary["identical"] = pair_keys(result) == pair_keys(expected)
+        edge_ais, edge_buoy = edge_rows(args.radius_km)
+        edge_result = correlate(edge_ais, edge_buoy, args.radius_km, args.window_seconds, "SURFACE_VESSEL")
+        edge_expected = brute_force_join(edge_ais, edge_buoy, args.radius_km, args.window_seconds, "SURFACE_VESSEL")
+        summary["edge_pairs"] = len(edge_result)
+        summary["edge_identical"] = pair_keys(edge_result) == pair_keys(edge_expected) \
+            and len(edge_expected) == len(edge_buoy)
+    else:
+        for match in result:
+            print(json.dumps(match, default=str))
+
+    print(json.dumps(summary))
@@ -0,0 +1,679 @@
+"""
+Position-at-time index for AIS tracks ("where was MMSI X at time t").
+
+The correlation queries (buoy contacts vs. ships, STANAG positions vs. fleet,
+social posts vs. vessels) currently join ais_events_ice on minute-truncated
+timestamps. The TrackStore keeps all fixes sorted by (mmsi, time) in flat
+columns (t, lat, lon, sog, cog) and answers batches of (mmsi, t) queries with
+one np.searchsorted over a composite key (vessel rank << 42 | epoch ms): the
+fixes before and after t are found by binary search, the position is
+interpolated between them or dead-reckoned from the last fix with its speed
+and course.
+
+Persistence: a store directory holds a sealed base generation (one .npy file
+per column, opened with mmap_mode="r", so a restart does not read the data)
+and that generation's append log of fixed-size records; CURRENT names the
+generation. append() writes to the log and to an in-memory delta that is
+queried alongside the base; compact() merges the delta into a new base
+generation with a new, empty log, so a crash at any point either keeps the
+old base and log or switches to the new ones, and never replays fixes twice. Nothing is rebuilt on append: the next query sorts
+only the new fixes and merges them into the sorted delta, and once the delta
+holds compact_threshold fixes it is compacted into the base automatically.
+
+    store = TrackStore.open("/data/tracks")
+    store.append_records(kafka_batch)                 # ais_events records
+    result = store.positions_at(mmsi_array, epoch_seconds_array)
+
+    python track_store.py build --ais "/data/ais_events_ice/data/**/*.parquet" --store /data/tracks
+    python track_store.py query --store /data/tracks --mmsi 123456007 --time "2025-10-01 12:00:00"
+    python track_store.py verify
+    python track_store.py benchmark --vessels 2000 --fixes 500 --queries 200000
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from spatiotemporal_join import to_epoch_seconds
+
+TIME_BITS = 42  # epoch milliseconds up to the year 2109
+MAX_VESSELS = 1 << (63 - TIME_BITS)  # per segment: about 2 million MMSIs
+
+COLUMNS = ("t", "lat", "lon", "sog", "cog")
+LOG_DTYPE = np.dtype([("mmsi", "<i8"), ("t", "<i8"), ("lat", "<f8"), ("lon", "<f8"), ("sog", "<f4"), ("cog", "<f4")])
+
+# Result codes of positions_at()
+NO_POSITION, EXACT, INTERPOLATED, DEAD_RECKONED = 0, 1, 2, 3
+
+NM_PER_DEGREE = 60.0
+
+# Delta size (fixes) at which append() and open() compact into a new base generation.
+COMPACT_THRESHOLD = 500_000
+
+
+class TrackSegment:
+    """
+    Immutable columnar fixes sorted by (mmsi, t). mmsi holds the distinct
+    MMSIs, starts the row offset of each vessel (len(mmsi) + 1 entries) and key
+    the composite search key per row.
+    """
+
+    def __init__(self, mmsi: np.ndarray, starts: np.ndarray, key: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.mmsi = mmsi
+        self.starts = starts
+        self.key = key
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.key)
+
+    @classmethod
+    def empty(cls) -> "TrackSegment":
+        return cls.from_arrays(np.zeros(0, np.int64), np.zeros(0, np.int64), *(np.zeros(0) for _ in range(4)))
+
+    @classmethod
+    def from_arrays(cls, mmsi: np.ndarray, t_ms: np.ndarray, lat: np.ndarray, lon: np.ndarray, sog: np.ndarray,
+                    cog: np.ndarray) -> "TrackSegment":
+        order = np.lexsort((t_ms, mmsi))
+        mmsi, t_ms = mmsi[order], t_ms[order]
+        vessels, first = np.unique(mmsi, return_index=True)
+        if len(vessels) > MAX_VESSELS:
+            raise ValueError(f"{len(vessels)} vessels exceed the {MAX_VESSELS} per segment")
+        rank = np.repeat(np.arange(len(vessels), dtype=np.int64), np.diff(np.append(first, len(mmsi))))
+        columns = {
+            "t": t_ms,
+            "lat": np.asarray(lat, dtype=np.float64)[order],
+            "lon": np.asarray(lon, dtype=np.float64)[order],
+            "sog": np.asarray(sog, dtype=np.float32)[order],
+            "cog": np.asarray(cog, dtype=np.float32)[order],
+        }
+        return cls(vessels, np.append(first, len(mmsi)).astype(np.int64), (rank << TIME_BITS) | t_ms, columns)
+
+    def merged(self, mmsi: np.ndarray, t_ms: np.ndarray, lat: np.ndarray, lon: np.ndarray, sog: np.ndarray,
+               cog: np.ndarray) -> "TrackSegment":
+        """
+        New segment with the given fixes merged in. Only the new fixes are
+        sorted; the existing rows are re-keyed to the combined vessel ranks and
+        the new rows inserted at their binary-search positions (linear copy).
+        """
+        if not len(self):
+            return TrackSegment.from_arrays(mmsi, t_ms, lat, lon, sog, cog)
+        new = TrackSegment.from_arrays(mmsi, t_ms, lat, lon, sog, cog)
+        vessels = np.union1d(self.mmsi, new.mmsi)
+        if len(vessels) > MAX_VESSELS:
+            raise ValueError(f"{len(vessels)} vessels exceed the {MAX_VESSELS} per segment")
+        old_rank = np.repeat(np.searchsorted(vessels, self.mmsi), np.diff(self.starts))
+        new_rank = np.repeat(np.searchsorted(vessels, new.mmsi), np.diff(new.starts))
+        old_key = (old_rank << TIME_BITS) | self.columns["t"]
+        new_key = (new_rank << TIME_BITS) | new.columns["t"]
+        # side="right": fixes with the same key stay in arrival order, as with the stable lexsort.
+        position = np.searchsorted(old_key, new_key, side="right")
+        key = np.insert(old_key, position, new_key)
+        columns = {name: np.insert(self.columns[name], position, new.columns[name]) for name in COLUMNS}
+        starts = np.searchsorted(key, np.arange(len(vessels) + 1, dtype=np.int64) << TIME_BITS)
+        return TrackSegment(vessels, starts.astype(np.int64), key, columns)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for name, values in [("mmsi", self.mmsi), ("starts", self.starts), ("key", self.key)] + list(self.columns.items()):
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(values))
+
+    @classmethod
+    def load(cls, directory: str) -> "TrackSegment":
+        def column(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        return cls(column("mmsi"), column("starts"), column("key"), {name: column(name) for name in COLUMNS})
+
+    def bracket(self, mmsi: np.ndarray, t_ms: np.ndarray):
+        """
+        Rows of the last fix at or before and the first fix after each query
+        time (-1 where the vessel has none), via one binary search per query.
+        """
+        before = np.full(len(mmsi), -1, dtype=np.int64)
+        after = np.full(len(mmsi), -1, dtype=np.int64)
+        if not len(self.mmsi):
+            return before, after
+        rank = np.searchsorted(self.mmsi, mmsi)
+        rank_clipped = np.minimum(rank, len(self.mmsi) - 1)
+        known = self.mmsi[rank_clipped] == mmsi
+        rank = rank_clipped[known]
+        position = np.searchsorted(self.key, (rank << TIME_BITS) | t_ms[known], side="right")
+        first, end = self.starts[rank], self.starts[rank + 1]
+        before[known] = np.where(position > first, position - 1, -1)
+        after[known] = np.where(position < end, position, -1)
+        return before, after
+
+
+class TrackStore:
+    """Base segment (mmap) + in-memory delta of appended fixes, both queried by positions_at()."""
+
+    def __init__(self, directory: Optional[str] = None, compact_threshold: Optional[int] = COMPACT_THRESHOLD):
+        self.directory = directory
+        self.compact_threshold = compact_threshold  # None: compact() only when called
+        self.base = TrackSegment.empty()
+        self.generation = 0
+        self._pending: List[np.ndarray] = []
+        self._unindexed: List[np.ndarray] = []  # appended rows not yet merged into _delta
+        self._delta_rows: Optional[np.ndarray] = None
+        self._delta_count = 0
+        self._delta = TrackSegment.empty()
+        self._log = None
+
+    # --- Persistence ------------------------------------------------------------
+
+    @classmethod
+    def open(cls, directory: str, compact_threshold: Optional[int] = COMPACT_THRESHOLD) -> "TrackStore":
+        """Maps the current base generation and replays the append log."""
+        store = cls(directory, compact_threshold)
+        os.makedirs(directory, exist_ok=True)
+        current = os.path.join(directory, "CURRENT")
+        if os.path.exists(current):
+            with open(current) as f:
+                store.generation = int(f.read().strip())
+            store.base = TrackSegment.load(store._generation_dir(store.generation))
+        log_path = store._log_path(store.generation)
+        legacy = os.path.join(directory, "append.log")
+        if os.path.exists(legacy) and not os.path.exists(log_path):
+            # Single log of stores written before the per-generation logs: it belongs to the current base.
+            os.replace(legacy, log_path)
+        store._remove_stale()
+        if os.path.exists(log_path):
+            size = os.path.getsize(log_path)
+            # A torn record at the end (crash during append) is ignored and cut off.
+            complete = size - size % LOG_DTYPE.itemsize
+            if complete != size:
+                with open(log_path, "r+b") as f:
+                    f.truncate(complete)
+            if complete:
+                store._add_delta(np.fromfile(log_path, dtype=LOG_DTYPE))
+        store._log = open(log_path, "ab")
+        store._maybe_compact()
+        return store
+
+    def _generation_dir(self, generation: int) -> str:
+        return os.path.join(self.directory, f"base-{generation:06d}")
+
+    def _log_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"append-{generation:06d}.log")
+
+    def _remove_stale(self):
+        """Bases and logs of other generations: leftovers of a compaction interrupted by a crash."""
+        keep = {os.path.basename(self._generation_dir(self.generation)),
+                os.path.basename(self._log_path(self.generation))}
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name in keep:
+                continue
+            if name.startswith("base-") and os.path.isdir(path):
+                shutil.rmtree(path)
+            elif name.startswith("append-") and name.endswith(".log"):
+                os.remove(path)
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def compact(self):
+        """Merges base and delta into a new base generation that starts with an empty append log."""
+        merged = self._merged_rows()
+        segment = TrackSegment.from_arrays(merged["mmsi"], merged["t"], merged["lat"], merged["lon"], merged["sog"],
+                                           merged["cog"])
+        if self.directory is None:
+            self.base = segment
+        else:
+            generation = self.generation + 1
+            target = self._generation_dir(generation)
+            segment.save(target)
+            log = open(self._log_path(generation), "wb")
+            # Switching CURRENT switches base and log together; the old log is never replayed onto the new base.
+            tmp = os.path.join(self.directory, "CURRENT.tmp")
+            with open(tmp, "w") as f:
+                f.write(str(generation))
+            os.replace(tmp, os.path.join(self.directory, "CURRENT"))
+            old_dir, old_log = self._generation_dir(self.generation), self._log_path(self.generation)
+            self._log.close()
+            self._log = log
+            self.base = TrackSegment.load(target)
+            self.generation = generation
+            if os.path.isdir(old_dir):
+                shutil.rmtree(old_dir)
+            if os.path.exists(old_log):
+                os.remove(old_log)
+        self._pending, self._unindexed, self._delta_rows = [], [], None
+        self._delta, self._delta_count = TrackSegment.empty(), 0
+
+    def _maybe_compact(self):
+        if self.compact_threshold is not None and self._delta_count >= self.compact_threshold:
+            self.compact()
+
+    def _merged_rows(self) -> np.ndarray:
+        base = self.base
+        rows = np.empty(len(base), dtype=LOG_DTYPE)
+        rows["mmsi"] = np.repeat(np.asarray(base.mmsi), np.diff(np.asarray(base.starts)))
+        for name in COLUMNS:
+            rows[name] = base.columns[name]
+        return np.concatenate([rows, self._delta_table()])
+
+    # --- Ingest -----------------------------------------------------------------
+
+    def append(self, mmsi, t_seconds, lat, lon, sog=None, cog=None):
+        """
+        Appends fixes (arrays or scalars; time in epoch seconds). Cost: one log
+        write, no re-sort; compacts when the delta reaches compact_threshold.
+        """
+        mmsi = np.atleast_1d(np.asarray(mmsi, dtype=np.int64))
+        rows = np.empty(len(mmsi), dtype=LOG_DTYPE)
+        rows["mmsi"] = mmsi
+        rows["t"] = np.rint(np.atleast_1d(np.asarray(t_seconds, dtype=np.float64)) * 1000)
+        rows["lat"], rows["lon"] = lat, lon
+        rows["sog"] = np.nan if sog is None else sog
+        rows["cog"] = np.nan if cog is None else cog
+        rows = rows[np.isfinite(rows["lat"]) & np.isfinite(rows["lon"])]
+        if self._log is not None:
+            self._log.write(rows.tobytes())
+            self._log.flush()
+        self._add_delta(rows)
+        self._maybe_compact()
+
+    def _add_delta(self, rows: np.ndarray):
+        self._pending.append(rows)
+        self._unindexed.append(rows)
+        self._delta_count += len(rows)
+
+    def append_records(self, records: Iterable[Dict[str, Any]]):
+        """ais_events records (simulator keys or lower-case table columns)."""
+        mmsi, t, lat, lon, sog, cog = [], [], [], [], [], []
+        for record in records:
+            record = {key.lower(): value for key, value in record.items()}
+            if record.get("latitude") is None or record.get("longitude") is None:
+                continue
+            mmsi.append(int(record["mmsi"]))
+            t.append(to_epoch_seconds(record["event_timestamp"]))
+            lat.append(float(record["latitude"]))
+            lon.append(float(record["longitude"]))
+            sog.append(float("nan") if record.get("speed") is None else float(record["speed"]))
+            cog.append(float("nan") if record.get("course") is None else float(record["course"]))
+        if mmsi:
+            self.append(mmsi, t, lat, lon, sog, cog)
+
+    def _delta_table(self) -> np.ndarray:
+        if self._pending:
+            parts = ([self._delta_rows] if self._delta_rows is not None else []) + self._pending
+            self._delta_rows = np.concatenate(parts)
+            self._pending = []
+        return self._delta_rows if self._delta_rows is not None else np.zeros(0, dtype=LOG_DTYPE)
+
+    def _delta_segment(self) -> TrackSegment:
+        """Fixes appended since the last query are sorted and merged into the sorted delta, once per batch."""
+        if self._unindexed:
+            rows = np.concatenate(self._unindexed)
+            self._unindexed = []
+            self._delta = self._delta.merged(rows["mmsi"], rows["t"], rows["lat"], rows["lon"], rows["sog"],
+                                             rows["cog"])
+        return self._delta
+
+    def __len__(self) -> int:
+        return len(self.base) + self._delta_count
+
+    # --- Queries ------------------------------------------------------------------
+
+    def positions_at(self, mmsi, t_seconds, method: str = "interpolate", max_gap_seconds: float = 1800.0,
+                     max_extrapolation_seconds: float = 600.0) -> Dict[str, np.ndarray]:
+        """
+        Position of each (mmsi, t) query.
+
+        method "interpolate": linear between the surrounding fixes if they are
+        at most max_gap_seconds apart, dead reckoning after the last fix.
+        method "dead_reckon": always projected from the last fix at or before t.
+        Dead reckoning is limited to max_extrapolation_seconds. Returns arrays
+        latitude, longitude, code (NO_POSITION/EXACT/INTERPOLATED/DEAD_RECKONED)
+        and fix_age_seconds (distance in time to the nearest fix used).
+        """
+        mmsi = np.atleast_1d(np.asarray(mmsi, dtype=np.int64))
+        t_ms = np.rint(np.atleast_1d(np.asarray(t_seconds, dtype=np.float64)) * 1000).astype(np.int64)
+        n = len(mmsi)
+        prev_t = np.full(n, np.iinfo(np.int64).min)
+        next_t = np.full(n, np.iinfo(np.int64).max)
+        prev = {name: np.full(n, np.nan) for name in ("lat", "lon", "sog", "cog")}
+        nxt = {name: np.full(n, np.nan) for name in ("lat", "lon")}
+
+        for segment in (self.base, self._delta_segment()):
+            if not len(segment):
+                continue
+            before, after = segment.bracket(mmsi, t_ms)
+            columns = segment.columns
+            hit = before >= 0
+            rows = before[hit]
+            newer = np.zeros(n, dtype=bool)
+            newer[hit] = columns["t"][rows] > prev_t[hit]
+            rows = before[newer]
+            prev_t[newer] = columns["t"][rows]
+            for name in prev:
+                prev[name][newer] = columns[name][rows]
+            hit = after >= 0
+            rows = after[hit]
+            sooner = np.zeros(n, dtype=bool)
+            sooner[hit] = columns["t"][rows] < next_t[hit]
+            rows = after[sooner]
+            next_t[sooner] = columns["t"][rows]
+            for name in nxt:
+                nxt[name][sooner] = columns[name][rows]
+
+        has_prev = prev_t != np.iinfo(np.int64).min
+        has_next = next_t != np.iinfo(np.int64).max
+        lat, lon = np.full(n, np.nan), np.full(n, np.nan)
+        code = np.zeros(n, dtype=np.int8)
+        age = np.full(n, np.nan)
+
+        exact = has_prev & (prev_t == t_ms)
+        lat[exact], lon[exact], code[exact], age[exact] = prev["lat"][exact], prev["lon"][exact], EXACT, 0.0
+
+        if method == "interpolate":
+            between = has_prev & has_next & ~exact & ((next_t - prev_t) <= max_gap_seconds * 1000)
+            span = (next_t[between] - prev_t[between]).astype(np.float64)
+            fraction = (t_ms[between] - prev_t[between]) / span
+            lat[between] = prev["lat"][between] + fraction * (nxt["lat"][between] - prev["lat"][between])
+            # Longitude difference through the shorter way around the antimeridian.
+            dlon = (nxt["lon"][between] - prev["lon"][between] + 180.0) % 360.0 - 180.0
+            lon[between] = (prev["lon"][between] + fraction * dlon + 180.0) % 360.0 - 180.0
+            code[between] = INTERPOLATED
+            age[between] = np.minimum(t_ms[between] - prev_t[between], next_t[between] - t_ms[between]) / 1000.0
+            reckon = has_prev & ~exact & ~between
+        else:
+            reckon = has_prev & ~exact
+        reckon &= (t_ms - prev_t) <= max_extrapolation_seconds * 1000
+        reckon &= np.isfinite(prev["sog"]) & np.isfinite(prev["cog"])
+        elapsed_h = (t_ms[reckon] - prev_t[reckon]) / 3600000.0
+        distance_deg = prev["sog"][reckon] * elapsed_h / NM_PER_DEGREE
+        course = np.radians(prev["cog"][reckon])
+        lat[reckon] = prev["lat"][reckon] + distance_deg * np.cos(course)
+        cos_lat = np.maximum(np.cos(np.radians(prev["lat"][reckon])), 1e-6)
+        lon[reckon] = (prev["lon"][reckon] + distance_deg * np.sin(course) / cos_lat + 180.0) % 360.0 - 180.0
+        code[reckon] = DEAD_RECKONED
+        age[reckon] = elapsed_h * 3600.0
+        return {"latitude": lat, "longitude": lon, "code": code, "fix_age_seconds": age}
+
+    def track(self, mmsi: int, start_seconds: float = -math.inf, end_seconds: float = math.inf) -> Dict[str, np.ndarray]:
+        """All fixes of one vessel within [start, end] in time order (base and delta merged)."""
+        parts = []
+        for segment in (self.base, self._delta_segment()):
+            rank = np.searchsorted(segment.mmsi, mmsi)
+            if rank < len(segment.mmsi) and segment.mmsi[rank] == mmsi:
+                rows = slice(int(segment.starts[rank]), int(segment.starts[rank + 1]))
+                parts.append({name: np.asarray(segment.columns[name][rows]) for name in COLUMNS})
+        if not parts:
+            return {name: np.zeros(0) for name in COLUMNS}
+        merged = {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+        order = np.argsort(merged["t"], kind="stable")
+        t = merged["t"][order]
+        keep = (t >= start_seconds * 1000) & (t <= end_seconds * 1000)
+        return {name: merged[name][order][keep] for name in COLUMNS}
+
+
+# --- Loading --------------------------------------------------------------------
+
+def parse_timestamps_ms(values) -> np.ndarray:
+    """'YYYY-MM-DD HH:MM:SS[.fff]' (UTC, as in ais_events_ice) -> epoch milliseconds."""
+    text = np.char.replace(np.asarray(values, dtype=str), " ", "T")
+    text = np.char.rstrip(text, "Z")
+    return np.asarray(text, dtype="datetime64[ms]").astype(np.int64)
+
+
+def load_parquet(store: TrackStore, paths: List[str], batch_rows: int = 1_000_000) -> int:
+    """Appends the fixes of ais_events_ice Parquet files (globs allowed, e.g. an Iceberg data/ directory)."""
+    import pyarrow.parquet as pq
+
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(path, recursive=True)) or [path])
+    total = 0
+    for file_name in files:
+        parquet = pq.ParquetFile(file_name)
+        lookup = {name.lower(): name for name in parquet.schema_arrow.names}
+        wanted = [lookup[c] for c in ("mmsi", "event_timestamp", "latitude", "longitude", "speed", "course")
+                  if c in lookup]
+        for batch in parquet.iter_batches(batch_size=batch_rows, columns=wanted):
+            columns = {name.lower(): batch.column(name) for name in batch.schema.names}
+            timestamps = columns["event_timestamp"]
+            if str(timestamps.type).startswith("timestamp"):
+                t_ms = timestamps.cast("timestamp[ms]").to_numpy(zero_copy_only=False).astype(np.int64)
+            else:
+                t_ms = parse_timestamps_ms(timestamps.to_numpy(zero_copy_only=False))
+
+            def floats(name):
+                if name not in columns:
+                    return np.full(len(batch), np.nan)
+                return columns[name].to_numpy(zero_copy_only=False).astype(np.float64)
+
+            store.append(columns["mmsi"].to_numpy(zero_copy_only=False).astype(np.int64), t_ms / 1000.0,
+                         floats("latitude"), floats("longitude"), floats("speed"), floats("course"))
+            total += len(batch)
+    return total
+
+
+# --- Verification and benchmark -----------------------------------------------------
+
+def synthetic_tracks(vessels: int, fixes: int, seed: int = 5):
+    """Tracks with irregular reporting intervals (2 s - 3 min) and occasional gaps of up to an hour."""
+    rng = np.random.default_rng(seed)
+    start = 1759305600.0  # 2025-10-01 00:00 UTC
+    intervals = rng.choice([2.0, 10.0, 30.0, 180.0], size=(vessels, fixes)) * rng.uniform(0.5, 1.5, (vessels, fixes))
+    intervals[rng.random((vessels, fixes)) < 0.002] = 3600.0
+    t = start + rng.uniform(0, 3600, (vessels, 1)) + np.cumsum(intervals, axis=1)
+    sog = rng.uniform(0, 20, (vessels, fixes))
+    cog = rng.uniform(0, 360, (vessels, fixes))
+    step_nm = sog * intervals / 3600.0
+    lat = rng.uniform(54.0, 60.0, (vessels, 1)) + np.cumsum(step_nm * np.cos(np.radians(cog)) / 60.0, axis=1)
+    lon = rng.uniform(10.0, 28.0, (vessels, 1)) + np.cumsum(step_nm * np.sin(np.radians(cog)) / 60.0 / 0.55, axis=1)
+    mmsi = (211000000 + rng.choice(999999, vessels, replace=False))[:, None].repeat(fixes, axis=1)
+    # Records arrive interleaved across vessels, as on the Kafka topic.
+    order = rng.permutation(vessels * fixes)
+    return (mmsi.ravel()[order], np.round(t.ravel()[order], 3), lat.ravel()[order], lon.ravel()[order],
+            sog.ravel()[order].astype(np.float32), cog.ravel()[order].astype(np.float32))
+
+
+def reference_position(fixes: List[tuple], t: float, method: str, max_gap: float, max_extrapolation: float):
+    """Linear scan over one vessel's fixes (t, lat, lon, sog, cog) with the semantics of positions_at()."""
+    t_ms = int(round(t * 1000))
+    before = [fix for fix in fixes if fix[0] <= t_ms]
+    after = [fix for fix in fixes if fix[0] > t_ms]
+    prev = max(before, key=lambda fix: fix[0]) if before else None
+    nxt = min(after, key=lambda fix: fix[0]) if after else None
+    if prev is not None and prev[0] == t_ms:
+        return prev[1], prev[2], EXACT
+    if method == "interpolate" and prev is not None and nxt is not None and nxt[0] - prev[0] <= max_gap * 1000:
+        fraction = (t_ms - prev[0]) / (nxt[0] - prev[0])
+        return prev[1] + fraction * (nxt[1] - prev[1]), prev[2] + fraction * (nxt[2] - prev[2]), INTERPOLATED
+    if prev is not None and t_ms - prev[0] <= max_extrapolation * 1000:
+        hours = (t_ms - prev[0]) / 3600000.0
+        distance = prev[3] * hours / NM_PER_DEGREE
+        lat = prev[1] + distance * math.cos(math.radians(prev[4]))
+        lon = prev[2] + distance * math.sin(math.radians(prev[4])) / max(math.cos(math.radians(prev[1])), 1e-6)
+        return lat, lon, DEAD_RECKONED
+    return None, None, NO_POSITION
+
+
+def _queries(data, count: int, seed: int):
+    rng = np.random.default_rng(seed)
+    mmsi, t = data[0], data[1]
+    pick = rng.integers(0, len(mmsi), count)
+    q_mmsi = mmsi[pick].copy()
+    q_t = t[pick] + rng.uniform(-400, 400, count)
+    q_t[::10] = t[pick][::10]  # some queries hit a fix exactly
+    q_mmsi[::50] = 999999999  # unknown vessel
+    return q_mmsi, q_t
+
+
+def verify(directory: str) -> bool:
+    data = synthetic_tracks(60, 300)
+    half, three_quarters = len(data[0]) // 2, len(data[0]) * 3 // 4
+    shutil.rmtree(directory, ignore_errors=True)
+    store = TrackStore.open(directory)
+    store.append(*(column[:half] for column in data))
+    store.compact()
+    q_mmsi, q_t = _queries(data, 3000, 1)
+
+    ok = True
+    for label in ("base + delta", "merged delta", "reopened", "auto-compacted", "compacted"):
+        if label == "base + delta":
+            store.append(*(column[half:three_quarters] for column in data))  # delta on top of the mmap base
+            count = three_quarters
+        elif label == "merged delta":
+            store.append(*(column[three_quarters:] for column in data))  # merged into the sorted delta
+            count = len(data[0])
+        elif label == "reopened":
+            store.close()
+            store = TrackStore.open(directory)
+        elif label == "auto-compacted":
+            store.close()
+            generation = store.generation
+            store = TrackStore.open(directory, compact_threshold=len(data[0]) - half)
+            if store.generation != generation + 1 or store._delta_count:
+                ok = False
+                print(f"FAIL {label:14s} replayed log of {len(data[0]) - half} fixes not compacted")
+        elif label == "compacted":
+            store.compact()
+        fixes: Dict[int, List[tuple]] = {}
+        for m, t, lat, lon, sog, cog in zip(*(column[:count].tolist() for column in data)):
+            fixes.setdefault(m, []).append((int(round(t * 1000)), lat, lon, sog, cog))
+        for method in ("interpolate", "dead_reckon"):
+            result = store.positions_at(q_mmsi, q_t, method)
+            mismatches = 0
+            for i, (m, t) in enumerate(zip(q_mmsi.tolist(), q_t.tolist())):
+                lat, lon, code = reference_position(fixes.get(m, []), t, method, 1800.0, 600.0)
+                got = result["code"][i]
+                if got != code or (code and (abs(result["latitude"][i] - lat) > 1e-9
+                                             or abs(result["longitude"][i] - lon) > 1e-9)):
+                    mismatches += 1
+            codes = np.bincount(result["code"], minlength=4).tolist()
+            ok &= mismatches == 0
+            print(f"{'ok  ' if mismatches == 0 else 'FAIL'} {label:14s} {method:11s} {len(q_t)} queries, "
+                  f"codes none/exact/interp/dr = {codes}, {mismatches} mismatches")
+    store.close()
+    shutil.rmtree(directory, ignore_errors=True)
+
+    # Crash right after CURRENT names the new generation: reopening must not replay the old log onto it.
+    store = TrackStore.open(directory, compact_threshold=None)
+    store.append(*(column[:half] for column in data))
+    store.compact()
+    store.append(*(column[half:] for column in data))
+    remove_tree = shutil.rmtree
+
+    def crash(path, *args, **kwargs):
+        raise OSError("simulated crash")
+
+    shutil.rmtree = crash
+    try:
+        store.compact()
+    except OSError:
+        pass
+    finally:
+        shutil.rmtree = remove_tree
+        store.close()
+    reopened = TrackStore.open(directory, compact_threshold=None)
+    good = len(reopened) == len(data[0]) and reopened._delta_count == 0
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} crash after switching generations: {len(reopened)} fixes "
+          f"after reopen (expected {len(data[0])})")
+    reopened.close()
+    shutil.rmtree(directory, ignore_errors=True)
+    return ok
+
+
+def benchmark(directory: str, vessels: int, fixes: int, queries: int):
+    data = synthetic_tracks(vessels, fixes)
+    shutil.rmtree(directory, ignore_errors=True)
+    store = TrackStore.open(directory, compact_threshold=None)
+    start = time.perf_counter()
+    store.append(*data)
+    append_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    store.compact()
+    compact_seconds = time.perf_counter() - start
+    store.close()
+
+    start = time.perf_counter()
+    store = TrackStore.open(directory)
+    open_seconds = time.perf_counter() - start
+    q_mmsi, q_t = _queries(data, queries, 2)
+    store.positions_at(q_mmsi[:1000], q_t[:1000])
+    start = time.perf_counter()
+    result = store.positions_at(q_mmsi, q_t)
+    query_seconds = time.perf_counter() - start
+
+    # Incremental append of a small batch (one Kafka poll) and the first query after it.
+    extra = tuple(column[:5000] for column in synthetic_tracks(50, 100, seed=9))
+    start = time.perf_counter()
+    store.append(*extra)
+    small_append_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    store.positions_at(q_mmsi, q_t)
+    query_after_append_seconds = time.perf_counter() - start
+    store.close()
+    shutil.rmtree(directory, ignore_errors=True)
+    print(json.dumps({
+        "fixes": len(data[0]),
+        "vessels": vessels,
+        "append_fixes_per_second": round(len(data[0]) / append_seconds),
+        "compact_seconds": round(compact_seconds, 3),
+        "open_ms": round(open_seconds * 1000, 2),
+        "queries": queries,
+        "query_us_per_position": round(query_seconds / queries * 1e6, 3),
+        "positioned": int((result["code"] > 0).sum()),
+        "append_5000_fixes_ms": round(small_append_seconds * 1000, 2),
+        "query_us_per_position_with_delta": round(query_after_append_seconds / queries * 1e6, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Position-at-time index for AIS tracks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Append ais_events_ice Parquet files and compact")
+    build.add_argument("--ais", nargs="+", required=True)
+    build.add_argument("--store", required=True)
+    query = sub.add_parser("query")
+    query.add_argument("--store", required=True)
+    query.add_argument("--mmsi", type=int, nargs="+", required=True)
+    query.add_argument("--time", nargs="+", required=True, help="Timestamps (one, or one per MMSI)")
+    query.add_argument("--method", choices=["interpolate", "dead_reckon"], default="interpolate")
+    check = sub.add_parser("verify", help="Compare with a linear-scan reference (base, delta, merge, reopen, auto-compact, compact)")
+    check.add_argument("--store", default="/tmp/track_store_verify")
+    bench = sub.add_parser("benchmark")
+    bench.add_argument("--store", default="/tmp/track_store_bench")
+    bench.add_argument("--vessels", type=int, default=2000)
+    bench.add_argument("--fixes", type=int, default=500)
+    bench.add_argument("--queries", type=int, default=200000)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        track_store = TrackStore.open(args.store)
+        count = load_parquet(track_store, args.ais)
+        track_store.compact()
+        print(json.dumps({"appended": count, "fixes": len(track_store), "vessels": len(track_store.base.mmsi)}))
+    elif args.command == "query":
+        track_store = TrackStore.open(args.store)
+        times = [to_epoch_seconds(value) for value in args.time]
+        times = times * len(args.mmsi) if len(times) == 1 else times
+        result = track_store.positions_at(args.mmsi, times, args.method)
+        names = {NO_POSITION: None, EXACT: "exact", INTERPOLATED: "interpolated", DEAD_RECKONED: "dead_reckoned"}
+        for i, (m, t) in enumerate(zip(args.mmsi, times)):
+            print(json.dumps({"mmsi": m, "t": t, "latitude": None if np.isnan(result["latitude"][i])
+                              else round(float(result["latitude"][i]), 6),
+                              "longitude": None if np.isnan(result["longitude"][i])
+                              else round(float(result["longitude"][i]), 6),
+                              "method": names[int(result["code"][i])],
+                              "fix_age_seconds": None if np.isnan(result["fix_age_seconds"][i])
+                              else round(float(result["fix_age_seconds"][i]), 1)}))
+    elif args.command == "verify":
+        raise SystemExit(0 if verify(args.store) else 1)
+    else:
+        benchmark(args.store, args.vessels, args.fixes, args.queries)
@@ -0,0 +1,96 @@
+import json
+
+from nifiapi.flowfiletransform import FlowFileTransform, FlowFileTransformResult
+from nifiapi.properties import PropertyDescriptor, StandardValidators
+
+# Framing, Fragment-Reassembly und das vektorisierte Bit-Decoding liegen ohne NiFi-Abhängigkeit in ais_nmea.py
+# (dort auch --verify / --benchmark).
+from ais_nmea import AISDecoder
+
+SHIPS_COLUMNS = ["mmsi", "ship_name", "vessel_type", "imo_number", "call_sign", "flag", "length_m", "beam_m",
+                 "gross_tonnage", "year_built"]
+
+
+class AISNMEADecoder(FlowFileTransform):
+    """
+    NiFi Python-Prozessor, der rohe NMEA 0183 AIVDM/AIVDO-Sätze eines echten AIS-Empfängers
+    (z.B. über ListenTCP / ListenUDP) dekodiert. Positionsmeldungen (Typ 1/2/3, 18, 19) werden
+    zu ais_events_ice-Records mit denselben Feldern wie die Schiffssimulatoren, statische Daten
+    (Typ 5, 19, 24) zu ships-Records.
+    """
+
+    class Java:
+        implements = ['org.apache.nifi.python.processor.FlowFileTransform']
+
+    class ProcessorDetails:
+        version = '1.0.0'
+        description = 'Decodes NMEA AIVDM/AIVDO sentences (types 1/2/3/5/18/19/24) into ais_events_ice and ships records.'
+        dependencies = ['numpy']
+
+    RECORD_TYPES = PropertyDescriptor(
+        name="Record Types",
+        description="Positions: nur ais_events_ice-Records. Ship Static Data: nur ships-Records. "
+                    "Both: beide, jeder Record mit Feld record_type (für RouteOnContent / QueryRecord).",
+        allowable_values=["Positions", "Ship Static Data", "Both"],
+        default_value="Positions",
+        required=True
+    )
+
+    CARRY_FRAGMENTS = PropertyDescriptor(
+        name="Carry Fragments",
+        description="true: unvollständige Mehrteil-Nachrichten (z.B. Typ 5) werden mit dem nächsten FlowFile "
+                    "zusammengesetzt, Typ-24-Teile A/B über FlowFiles hinweg zu einem ships-Record vereint und "
+                    "Ziele aus Typ 5 bleiben für spätere Positionen erhalten. "
+                    "false: jedes FlowFile wird für sich dekodiert.",
+        validators=[StandardValidators.BOOLEAN_VALIDATOR],
+        allowable_values=["true", "false"],
+        default_value="true",
+        required=True
+    )
+
+    def __init__(self, **kwargs):
+        kwargs.pop("jvm", None)
+        super().__init__(**kwargs)
+        self.descriptors = [self.RECORD_TYPES, self.CARRY_FRAGMENTS]
+        # Decoder-Zustand über FlowFiles hinweg (offene Fragmente, offene Typ-24-Teile, Destination je MMSI)
+        self.decoder = AISDecoder()
+
+    def getPropertyDescriptors(self):
+        return self.descriptors
+
+    def transform(self, context, flowFile):
+        try:
+            record_types = context.getProperty(self.RECORD_TYPES.name).getValue() or "Positions"
+            carry = (context.getProperty(self.CARRY_FRAGMENTS.name).getValue() or "true").lower() == "true"
+
+            decoder = self.decoder if carry else AISDecoder()
+            bad_before = decoder.stats["bad_checksum"]
+            positions, statics = decoder.decode(flowFile.getContentsAsBytes())
+            ships = [{column: record[column] for column in SHIPS_COLUMNS} for record in statics]
+
+            if record_types == "Positions":
+                records, schema_name = positions, "ais_events_ice"
+            elif record_types == "Ship Static Data":
+                records, schema_name = ships, "ships"
+            else:
+                records = [dict(record, record_type="ais_events_ice") for record in positions]
+                records += [dict(record, record_type="ships") for record in ships]
+                schema_name = "ais_nmea"
+
+            output_content = "".join(json.dumps(record) + "\n" for record in records)
+
+            return FlowFileTransformResult(
+                relationship="success",
+                contents=output_content,
+                attributes={
+                    "mime.type": "application/x-ndjson",
+                    "schema.name": schema_name,
+                    "record.count": str(len(records)),
+                    "ais.bad.checksum": str(decoder.stats["bad_checksum"] - bad_before),
+                    "ais.pending.fragments": str(len(decoder.assembler.pending))
+                }
+            )
+
+        except Exception as e:
+            self.logger.error(f"Fehler im AISNMEADecoder: {e}")
+            return FlowFileTransformResult(relationship="failure")
@@ -0,0 +1,97 @@
+import json
+
+from nifiapi.flowfiletransform import FlowFileTransform, FlowFileTransformResult
+from nifiapi.properties import PropertyDescriptor, StandardValidators
+
+# Aho-Corasick-Automat, Wörterbuch-Laden und Reload liegen ohne NiFi-Abhängigkeit in entity_extraction.py
+# (dort auch --verify / --benchmark).
+from entity_extraction import EntityExtractor, tag_record
+
+
+class EntityExtraction(FlowFileTransform):
+    """
+    NiFi Python-Prozessor, der Tweets (social_media_messages.tweet) und STANAG-Texte
+    (maritime_surveillance_reports.message_text) vor dem Iceberg-Sink in einem Durchlauf
+    nach Einheiten der Flotte, Häfen und sanktionierten Schiffen durchsucht. Jeder Record
+    erhält entity_names und entities (JSON mit Typ und Offsets), damit in CDW kein
+    LIKE-Scan mehr nötig ist. Ändert sich die Wörterbuch-Datei, wird der Automat neu
+    aufgebaut und atomar ausgetauscht.
+    """
+
+    class Java:
+        implements = ['org.apache.nifi.python.processor.FlowFileTransform']
+
+    class ProcessorDetails:
+        version = '1.0.0'
+        description = 'Tags social media and STANAG messages with naval units, harbours and sanctioned vessels found by an Aho-Corasick automaton.'
+        dependencies = []
+
+    DICTIONARY_FILE = PropertyDescriptor(
+        name="Dictionary File",
+        description=".sql mit den INSERTs für german_navy_fleet, baltic_sea_harbours und sanctioned_vessels "
+                    "(z.B. create_db_tables_hive.sql), JSON {\"typ\": [\"muster\", ...]} oder NDJSON "
+                    "{\"pattern\", \"type\", \"entity\"}. Wird bei Änderung neu geladen.",
+        validators=[StandardValidators.NON_EMPTY_VALIDATOR],
+        required=True
+    )
+
+    TEXT_FIELD = PropertyDescriptor(
+        name="Text Field",
+        description="Feld mit dem zu durchsuchenden Text. Leer: tweet bzw. message_text.",
+        required=False
+    )
+
+    OVERLAPPING = PropertyDescriptor(
+        name="Overlapping Matches",
+        description="false: bei Überlappung gewinnt der früheste, längste Treffer (FGS Sachsen-Anhalt statt "
+                    "FGS Sachsen). true: alle Treffer.",
+        validators=[StandardValidators.BOOLEAN_VALIDATOR],
+        allowable_values=["true", "false"],
+        default_value="false",
+        required=True
+    )
+
+    def __init__(self, **kwargs):
+        kwargs.pop("jvm", None)
+        super().__init__(**kwargs)
+        self.descriptors = [self.DICTIONARY_FILE, self.TEXT_FIELD, self.OVERLAPPING]
+        self.extractor = None
+
+    def getPropertyDescriptors(self):
+        return self.descriptors
+
+    def _extractor(self, context):
+        path = context.getProperty(self.DICTIONARY_FILE.name).getValue()
+        overlapping = (context.getProperty(self.OVERLAPPING.name).getValue() or "false").lower() == "true"
+        if self.extractor is None or self.extractor.source != path:
+            self.extractor = EntityExtractor.from_file(path, overlapping)
+        elif self.extractor.reload_if_changed():
+            self.logger.info(f"Wörterbuch neu geladen: {self.extractor.version}")
+        self.extractor.overlapping = overlapping
+        return self.extractor
+
+    def transform(self, context, flowFile):
+        try:
+            extractor = self._extractor(context)
+            text_field = context.getProperty(self.TEXT_FIELD.name).getValue() or None
+            input_data = flowFile.getContentsAsBytes().decode("utf-8")
+
+            entities_before = extractor.stats["entities"]
+            records = [tag_record(extractor, json.loads(line), text_field)
+                       for line in input_data.splitlines() if line.strip()]
+            output_content = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+            return FlowFileTransformResult(
+                relationship="success",
+                contents=output_content,
+                attributes={
+                    "mime.type": "application/x-ndjson",
+                    "record.count": str(len(records)),
+                    "entities.count": str(extractor.stats["entities"] - entities_before),
+                    "entities.dictionary.version": extractor.version
+                }
+            )
+
+        except Exception as e:
+            self.logger.error(f"Fehler in EntityExtraction: {e}")
+            return FlowFileTransformResult(relationship="failure")
@@ -0,0 +1,114 @@
+import json
+
+from nifiapi.flowfiletransform import FlowFileTransform, FlowFileTransformResult
+from nifiapi.properties import PropertyDescriptor, StandardValidators
+
+# MinHash-Signaturen, LSH-Index und Zeitfenster liegen ohne NiFi-Abhängigkeit in near_duplicates.py
+# (dort auch --verify / --benchmark).
+from near_duplicates import NearDuplicateIndex
+
+
+class NearDuplicateDetector(FlowFileTransform):
+    """
+    NiFi Python-Prozessor, der Tweets (social_media_messages) und STANAG-Berichte
+    (maritime_surveillance_reports) über MinHash-Signaturen und einen LSH-Index in einem
+    gleitenden Zeitfenster zu Clustern nahezu identischer Texte (Reposts, wiederholte
+    Meldungen) zusammenfasst. Jeder Record erhält cluster_id und duplicate_count, damit
+    nachgelagert ein Vertreter je Cluster gelesen wird statt nach dem vollen Text zu
+    partitionieren. Der Index bleibt über FlowFiles hinweg erhalten.
+    """
+
+    class Java:
+        implements = ['org.apache.nifi.python.processor.FlowFileTransform']
+
+    class ProcessorDetails:
+        version = '1.0.0'
+        description = 'Groups near-duplicate social media and report texts with MinHash/LSH over a sliding time window and adds cluster_id and duplicate_count.'
+        dependencies = ['numpy']
+
+    WINDOW_MINUTES = PropertyDescriptor(
+        name="Window Minutes",
+        description="Nachrichten werden nur mit Nachrichten der letzten N Minuten verglichen (bezogen auf ts bzw. "
+                    "message_timestamp). Begrenzt zusammen mit Max Messages den Speicher.",
+        validators=[StandardValidators.POSITIVE_INTEGER_VALIDATOR],
+        default_value="60",
+        required=True
+    )
+
+    THRESHOLD = PropertyDescriptor(
+        name="Similarity Threshold",
+        description="Geschätzte Jaccard-Ähnlichkeit (0-1) der Zeichen-Shingles, ab der eine Nachricht als Duplikat gilt. "
+                    "Änderung setzt den Index zurück.",
+        validators=[StandardValidators.NON_EMPTY_VALIDATOR],
+        default_value="0.7",
+        required=True
+    )
+
+    MAX_MESSAGES = PropertyDescriptor(
+        name="Max Messages",
+        description="Obergrenze der Nachrichten im Index (ca. 700 Byte je Nachricht); bei Überlauf fallen die ältesten "
+                    "heraus. Änderung setzt den Index zurück.",
+        validators=[StandardValidators.POSITIVE_INTEGER_VALIDATOR],
+        default_value="200000",
+        required=True
+    )
+
+    TEXT_FIELD = PropertyDescriptor(
+        name="Text Field",
+        description="Feld mit dem Text. Leer: tweet bzw. message_text.",
+        required=False
+    )
+
+    OUTPUT = PropertyDescriptor(
+        name="Output",
+        description="All Records: alle Records mit cluster_id und duplicate_count. "
+                    "First Per Cluster: nur die erste Nachricht je Cluster im Zeitfenster.",
+        allowable_values=["All Records", "First Per Cluster"],
+        default_value="All Records",
+        required=True
+    )
+
+    def __init__(self, **kwargs):
+        kwargs.pop("jvm", None)
+        super().__init__(**kwargs)
+        self.descriptors = [self.WINDOW_MINUTES, self.THRESHOLD, self.MAX_MESSAGES, self.TEXT_FIELD, self.OUTPUT]
+        self.index = None
+
+    def getPropertyDescriptors(self):
+        return self.descriptors
+
+    def _index(self, context):
+        threshold = float(context.getProperty(self.THRESHOLD.name).getValue() or 0.7)
+        max_messages = int(context.getProperty(self.MAX_MESSAGES.name).getValue() or 200000)
+        if self.index is None or self.index.threshold != threshold or self.index.max_messages != max_messages:
+            self.index = NearDuplicateIndex(threshold=threshold, max_messages=max_messages)
+        self.index.window_seconds = float(context.getProperty(self.WINDOW_MINUTES.name).getValue() or 60) * 60
+        return self.index
+
+    def transform(self, context, flowFile):
+        try:
+            index = self._index(context)
+            text_field = context.getProperty(self.TEXT_FIELD.name).getValue() or None
+            first_only = context.getProperty(self.OUTPUT.name).getValue() == "First Per Cluster"
+            input_data = flowFile.getContentsAsBytes().decode("utf-8")
+
+            records = index.tag([json.loads(line) for line in input_data.splitlines() if line.strip()], text_field)
+            duplicates = sum(1 for record in records if record["duplicate_count"] > 1)
+            if first_only:
+                records = [record for record in records if record["duplicate_count"] == 1]
+            output_content = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+            return FlowFileTransformResult(
+                relationship="success",
+                contents=output_content,
+                attributes={
+                    "mime.type": "application/x-ndjson",
+                    "record.count": str(len(records)),
+                    "duplicates.count": str(duplicates),
+                    "duplicates.live.clusters": str(len(index.clusters))
+                }
+            )
+
+        except Exception as e:
+            self.logger.error(f"Fehler im NearDuplicateDetector: {e}")
+            return FlowFileTransformResult(relationship="failure")
@@ -0,0 +1,83 @@
+from nifiapi.flowfiletransform import FlowFileTransform, FlowFileTransformResult
+from nifiapi.properties import PropertyDescriptor, StandardValidators
+
+# Framing und Parsing liegen ohne NiFi-Abhängigkeit in stanag_parser.py (dort auch --verify / --benchmark).
+from stanag_parser import StanagStreamParser, to_columns, to_ndjson
+
+
+class StanagMessageParser(FlowFileTransform):
+    """
+    NiFi Python-Prozessor, der ZCZC ... NNNN gerahmte STANAG-Nachrichten (z.B. aus
+    StanagMessageGenerator oder ListenTCP) einmalig beim Ingest in typisierte Records
+    zerlegt. message_timestamp, message_latitude und message_longitude werden hier
+    berechnet, damit die marine_messages Views kein TO_TIMESTAMP / REGEXP_EXTRACT
+    mehr pro Abfrage ausführen müssen.
+    """
+
+    class Java:
+        implements = ['org.apache.nifi.python.processor.FlowFileTransform']
+
+    class ProcessorDetails:
+        version = '1.0.0'
+        description = 'Parses ZCZC/NNNN framed STANAG-style messages into maritime_surveillance_reports records with precomputed timestamp and position columns.'
+        dependencies = []
+
+    OUTPUT_FORMAT = PropertyDescriptor(
+        name="Output Format",
+        description="NDJSON: ein Record pro Zeile. JSON Columns: ein JSON-Objekt mit einem Array pro Spalte.",
+        allowable_values=["NDJSON", "JSON Columns"],
+        default_value="NDJSON",
+        required=True
+    )
+
+    CARRY_INCOMPLETE = PropertyDescriptor(
+        name="Carry Incomplete Messages",
+        description="true: eine am FlowFile-Ende abgeschnittene Nachricht wird mit dem nächsten FlowFile fortgesetzt "
+                    "(z.B. hinter ListenTCP). false: jedes FlowFile wird für sich geparst.",
+        validators=[StandardValidators.BOOLEAN_VALIDATOR],
+        allowable_values=["true", "false"],
+        default_value="false",
+        required=True
+    )
+
+    def __init__(self, **kwargs):
+        kwargs.pop("jvm", None)
+        super().__init__(**kwargs)
+        self.descriptors = [self.OUTPUT_FORMAT, self.CARRY_INCOMPLETE]
+        # Parser-Zustand über FlowFiles hinweg (nur bei Carry Incomplete Messages = true)
+        self.stream_parser = StanagStreamParser()
+
+    def getPropertyDescriptors(self):
+        return self.descriptors
+
+    def transform(self, context, flowFile):
+        try:
+            output_format = context.getProperty(self.OUTPUT_FORMAT.name).getValue() or "NDJSON"
+            carry = (context.getProperty(self.CARRY_INCOMPLETE.name).getValue() or "false").lower() == "true"
+
+            parser = self.stream_parser if carry else StanagStreamParser()
+            malformed_before = parser.malformed
+            records = parser.feed(flowFile.getContentsAsBytes())
+            if not carry:
+                records += parser.flush()
+
+            if output_format == "JSON Columns":
+                output_content, mime_type = to_columns(records), "application/json"
+            else:
+                output_content, mime_type = to_ndjson(records), "application/x-ndjson"
+
+            return FlowFileTransformResult(
+                relationship="success",
+                contents=output_content,
+                attributes={
+                    "mime.type": mime_type,
+                    "schema.name": "maritime_surveillance_reports",
+                    "record.count": str(len(records)),
+                    "stanag.malformed": str(parser.malformed - malformed_before),
+                    "stanag.pending.bytes": str(parser.pending_bytes())
+                }
+            )
+
+        except Exception as e:
+            self.logger.error(f"Fehler im StanagMessageParser: {e}")
+            return FlowFileTransformResult(relationship="failure")
@@ -0,0 +1,102 @@
+import json
+
+from nifiapi.flowfiletransform import FlowFileTransform, FlowFileTransformResult
+from nifiapi.properties import PropertyDescriptor, StandardValidators
+
+# Hash-Maps, Trigramm-Index und atomarer Reload liegen ohne NiFi-Abhängigkeit in sanctions.py
+# (dort auch screen / verify / benchmark).
+from sanctions import Screener
+
+
+class SanctionsScreening(FlowFileTransform):
+    """
+    NiFi Python-Prozessor, der ais_events- und ships-Records (NDJSON) beim Ingest gegen
+    die Sanktionsliste prüft: exakt über MMSI und IMO, unscharf über normalisierte
+    Schiffsnamen ("M/V Angara" ~ "ANGARA"). Treffer werden mit sanctions_match,
+    sanctions_name, sanctions_score, Sanction_Reason und Linked_To angereichert.
+    Ändert sich die Listendatei, wird sie neu geladen und atomar ausgetauscht.
+    """
+
+    class Java:
+        implements = ['org.apache.nifi.python.processor.FlowFileTransform']
+
+    class ProcessorDetails:
+        version = '1.0.0'
+        description = 'Tags AIS and ship records that match the sanctions list by MMSI, IMO or fuzzy vessel name.'
+        dependencies = []
+
+    SANCTIONS_LIST = PropertyDescriptor(
+        name="Sanctions List File",
+        description="Export von sanctioned_vessels (Name, MMSI, IMO, Type, Flag, Sanction_Reason, Linked_To) "
+                    "als .csv, .ndjson/.json oder .sql mit INSERT-Statements (auch mit Spaltenliste ohne MMSI). "
+                    "Wird bei Änderung neu geladen.",
+        validators=[StandardValidators.NON_EMPTY_VALIDATOR],
+        required=True
+    )
+
+    NAME_THRESHOLD = PropertyDescriptor(
+        name="Name Similarity Threshold",
+        description="Mindest-Ähnlichkeit (Dice über Zeichen-Trigramme, 0-1) für einen Namenstreffer.",
+        validators=[StandardValidators.NON_EMPTY_VALIDATOR],
+        default_value="0.8",
+        required=True
+    )
+
+    OUTPUT = PropertyDescriptor(
+        name="Output",
+        description="All Records: alle Records mit Feld sanctioned. Matches Only: nur Treffer.",
+        allowable_values=["All Records", "Matches Only"],
+        default_value="All Records",
+        required=True
+    )
+
+    def __init__(self, **kwargs):
+        kwargs.pop("jvm", None)
+        super().__init__(**kwargs)
+        self.descriptors = [self.SANCTIONS_LIST, self.NAME_THRESHOLD, self.OUTPUT]
+        self.screener = None
+
+    def getPropertyDescriptors(self):
+        return self.descriptors
+
+    def _screener(self, context):
+        path = context.getProperty(self.SANCTIONS_LIST.name).getValue()
+        threshold = float(context.getProperty(self.NAME_THRESHOLD.name).getValue() or 0.8)
+        if self.screener is None or self.screener.source != path:
+            self.screener = Screener.from_file(path, threshold)
+        elif self.screener.reload_if_changed(threshold):
+            self.logger.info(f"Sanktionsliste neu geladen: {self.screener.sanctions.version}")
+        return self.screener
+
+    def transform(self, context, flowFile):
+        try:
+            screener = self._screener(context)
+            matches_only = context.getProperty(self.OUTPUT.name).getValue() == "Matches Only"
+            input_data = flowFile.getContentsAsBytes().decode("utf-8")
+
+            records = []
+            matches = 0
+            for line in input_data.splitlines():
+                if not line.strip():
+                    continue
+                record = screener.tag(json.loads(line))
+                matches += record["sanctioned"]
+                if record["sanctioned"] or not matches_only:
+                    records.append(record)
+
+            output_content = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+            return FlowFileTransformResult(
+                relationship="success",
+                contents=output_content,
+                attributes={
+                    "mime.type": "application/x-ndjson",
+                    "record.count": str(len(records)),
+                    "sanctions.matches": str(matches),
+                    "sanctions.list.version": screener.sanctions.version
+                }
+            )
+
+        except Exception as e:
+            self.logger.error(f"Fehler im SanctionsScreening: {e}")
+            return FlowFileTransformResult(relationship="failure")
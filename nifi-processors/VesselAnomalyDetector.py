@@ -0,0 +1,115 @@
+import json
+
+from nifiapi.flowfiletransform import FlowFileTransform, FlowFileTransformResult
+from nifiapi.properties import PropertyDescriptor, StandardValidators
+
+# Zustand je MMSI und die vektorisierten Regeln liegen ohne NiFi-Abhängigkeit in vessel_anomalies.py
+# (dort auch consume / verify / benchmark).
+from vessel_anomalies import AnomalyEngine, normalize_record
+
+
+class VesselAnomalyDetector(FlowFileTransform):
+    """
+    NiFi Python-Prozessor, der ais_events-Records (NDJSON) inkrementell gegen einen
+    Zustand je Schiff prüft (Welford-Statistik, EWMA, letzter Fix) und Anomalien
+    (Speed Jump, Impossible Position Jump, AIS Gap, Loitering, Inconsistent Maneuvering,
+    Destination Change) als vessel_outliers-Records ausgibt. Der Zustand bleibt über
+    FlowFiles hinweg erhalten und ist durch Max Vessels begrenzt.
+    """
+
+    class Java:
+        implements = ['org.apache.nifi.python.processor.FlowFileTransform']
+
+    class ProcessorDetails:
+        version = '1.0.0'
+        description = 'Flags per-vessel AIS anomalies incrementally and emits vessel_outliers records.'
+        dependencies = ['numpy']
+
+    GAP_MINUTES = PropertyDescriptor(
+        name="AIS Gap Minutes",
+        description="Ab dieser Meldelücke (Minuten) wird ein AIS Gap gemeldet.",
+        validators=[StandardValidators.NON_NEGATIVE_INTEGER_VALIDATOR],
+        default_value="30",
+        required=True
+    )
+
+    MAX_IMPLIED_KNOTS = PropertyDescriptor(
+        name="Max Implied Speed Knots",
+        description="Aus zwei Positionen berechnete Geschwindigkeit, ab der ein Impossible Position Jump vorliegt.",
+        validators=[StandardValidators.POSITIVE_INTEGER_VALIDATOR],
+        default_value="60",
+        required=True
+    )
+
+    LOITER_MINUTES = PropertyDescriptor(
+        name="Loitering Minutes",
+        description="Minuten innerhalb von 1 km ohne Status Moored/Anchored, ab denen Loitering gemeldet wird.",
+        validators=[StandardValidators.POSITIVE_INTEGER_VALIDATOR],
+        default_value="120",
+        required=True
+    )
+
+    COOLDOWN_MINUTES = PropertyDescriptor(
+        name="Cooldown Minutes",
+        description="Dieselbe Anomalie wird je Schiff höchstens einmal in diesem Zeitraum gemeldet.",
+        validators=[StandardValidators.NON_NEGATIVE_INTEGER_VALIDATOR],
+        default_value="30",
+        required=True
+    )
+
+    MAX_VESSELS = PropertyDescriptor(
+        name="Max Vessels",
+        description="Anzahl Schiffe im Zustand (ca. 150 Byte je Schiff); bei Überlauf werden die am längsten "
+                    "nicht gesehenen verdrängt. Änderung setzt den Zustand zurück.",
+        validators=[StandardValidators.POSITIVE_INTEGER_VALIDATOR],
+        default_value="1000000",
+        required=True
+    )
+
+    def __init__(self, **kwargs):
+        kwargs.pop("jvm", None)
+        super().__init__(**kwargs)
+        self.descriptors = [self.GAP_MINUTES, self.MAX_IMPLIED_KNOTS, self.LOITER_MINUTES, self.COOLDOWN_MINUTES,
+                            self.MAX_VESSELS]
+        self.engine = None
+
+    def getPropertyDescriptors(self):
+        return self.descriptors
+
+    def _engine(self, context):
+        capacity = int(context.getProperty(self.MAX_VESSELS.name).getValue() or 1000000)
+        if self.engine is None or self.engine.capacity != capacity:
+            self.engine = AnomalyEngine(capacity=capacity)
+        # Schwellen können ohne Verlust des Zustands geändert werden
+        self.engine.gap_seconds = float(context.getProperty(self.GAP_MINUTES.name).getValue() or 30) * 60
+        self.engine.max_implied_knots = float(context.getProperty(self.MAX_IMPLIED_KNOTS.name).getValue() or 60)
+        self.engine.loiter_seconds = float(context.getProperty(self.LOITER_MINUTES.name).getValue() or 120) * 60
+        self.engine.cooldown_seconds = float(context.getProperty(self.COOLDOWN_MINUTES.name).getValue() or 30) * 60
+        return self.engine
+
+    def transform(self, context, flowFile):
+        try:
+            engine = self._engine(context)
+            input_data = flowFile.getContentsAsBytes().decode("utf-8")
+            records = [normalize_record(json.loads(line)) for line in input_data.splitlines() if line.strip()]
+
+            late_before = engine.stats["late"]
+            outliers = engine.process(records)
+            output_content = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in outliers)
+
+            return FlowFileTransformResult(
+                relationship="success",
+                contents=output_content,
+                attributes={
+                    "mime.type": "application/x-ndjson",
+                    "schema.name": "vessel_outliers",
+                    "record.count": str(len(outliers)),
+                    "anomaly.updates": str(len(records)),
+                    "anomaly.late": str(engine.stats["late"] - late_before),
+                    "anomaly.vessels": str(len(engine.slots))
+                }
+            )
+
+        except Exception as e:
+            self.logger.error(f"Fehler im VesselAnomalyDetector: {e}")
+            return FlowFileTransformResult(relationship="failure")
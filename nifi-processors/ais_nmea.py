@@ -0,0 +1,764 @@
+"""
+NMEA 0183 AIVDM/AIVDO decoding (and encoding) for real AIS receiver feeds.
+
+Decoding runs in two passes over a byte batch (e.g. one ListenTCP FlowFile):
+
+1. Framing: one regex pass over the batch extracts every !xxVDM/!xxVDO
+   sentence (tag blocks and other lines are skipped), multi-fragment messages
+   (type 5, long type 19/24) are reassembled by (channel, sequence id). NMEA checksums of the whole batch
+   are verified at once with np.bitwise_xor.reduceat.
+2. Payload decoding: payloads are grouped by message type, padded to the
+   type's length and turned into one (messages x bits) matrix with a 256-entry
+   de-armoring table and np.unpackbits. Every field is then one matrix-vector
+   product over the bit columns, i.e. the per-message work is done by numpy.
+
+Message types 1/2/3 (class A position), 18 (class B position) and 19 (class
+B extended) produce ais_events_ice records (same keys as the ship
+simulators); 5 (class A static/voyage), 19 and 24 (class B static, parts A
+and B) produce ships records. The two parts of a type 24 report are merged
+per MMSI into one ships record, which is emitted once both parts have
+arrived. Positions and ships records keep the order of the input (a merged
+type 24 record takes the place of its second part). The latest destination
+per MMSI from type 5 is attached to the position reports that follow it.
+
+The encoder (encode_position, encode_static_voyage, ...) produces armored
+payloads and checksummed sentences; it is used for the self-check and by the
+AIVDM load generator.
+
+On the synthetic benchmark feed (500,000 sentences, mostly type 1/18
+positions) the decoder reaches about 170-190k sentences/s (8-9 MB/s) on one
+core, best of 5 runs; about a third of that time goes into building the output
+dicts.
+
+    python ais_nmea.py --verify
+    python ais_nmea.py --benchmark --sentences 500000
+"""
+
+import argparse
+import random
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# --- 6-bit armoring tables -----------------------------------------------------
+
+ARMOR = "0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVW`abcdefghijklmnopqrstuvw"
+SIXBIT_TEXT = "@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_ !\"#$%&'()*+,-./0123456789:;<=>?"
+
+DEARMOR = np.zeros(256, dtype=np.uint8)
+for _value, _char in enumerate(ARMOR):
+    DEARMOR[ord(_char)] = _value
+DEARMOR_LIST = DEARMOR.tolist()
+TEXT_TABLE = np.frombuffer(SIXBIT_TEXT.encode("ascii"), dtype=np.uint8)
+HEX_TABLE = np.zeros(256, dtype=np.uint8)
+for _value, _char in enumerate("0123456789ABCDEF"):
+    HEX_TABLE[ord(_char)] = HEX_TABLE[ord(_char.lower())] = _value
+
+# Payload length in bits used for the decode matrix of each type (shorter payloads are zero padded).
+TYPE_BITS = {1: 168, 2: 168, 3: 168, 5: 424, 18: 168, 19: 312, 24: 168}
+WEIGHTS = {length: (1 << np.arange(length - 1, -1, -1, dtype=np.int64)) for length in range(1, 43)}
+
+NAV_STATUS = {
+    0: "Underway using engine", 1: "Anchored", 2: "Not under command", 3: "Restricted manoeuverability",
+    4: "Constrained by her draught", 5: "Moored", 6: "Aground", 7: "Engaged in fishing", 8: "Underway sailing",
+    14: "AIS-SART", 15: "Not defined",
+}
+
+# Maritime identification digits (first three digits of the MMSI) -> flag state, Baltic and common flags.
+MID_FLAGS = {
+    209: "Cyprus", 210: "Cyprus", 211: "Germany", 212: "Cyprus", 218: "Germany", 219: "Denmark", 220: "Denmark",
+    224: "Spain", 225: "Spain", 226: "France", 227: "France", 228: "France", 230: "Finland", 231: "Faroe Islands",
+    232: "United Kingdom", 233: "United Kingdom", 234: "United Kingdom", 235: "United Kingdom", 236: "Gibraltar",
+    237: "Greece", 239: "Greece", 240: "Greece", 241: "Greece", 244: "Netherlands", 245: "Netherlands",
+    246: "Netherlands", 247: "Italy", 248: "Malta", 249: "Malta", 250: "Ireland", 251: "Iceland", 256: "Malta",
+    257: "Norway", 258: "Norway", 259: "Norway", 261: "Poland", 263: "Portugal", 265: "Sweden", 266: "Sweden",
+    271: "Turkey", 272: "Ukraine", 273: "Russia", 275: "Latvia", 276: "Estonia", 277: "Lithuania", 303: "United States",
+    308: "Bahamas", 309: "Bahamas", 311: "Bahamas", 338: "United States", 351: "Panama", 352: "Panama", 353: "Panama",
+    354: "Panama", 355: "Panama", 356: "Panama", 357: "Panama", 366: "United States", 367: "United States",
+    368: "United States", 369: "United States", 370: "Panama", 371: "Panama", 372: "Panama", 373: "Panama",
+    412: "China", 413: "China", 414: "China", 477: "Hong Kong", 538: "Marshall Islands", 563: "Singapore",
+    564: "Singapore", 565: "Singapore", 566: "Singapore", 636: "Liberia", 637: "Liberia",
+}
+
+
+def vessel_type(code: int) -> Optional[str]:
+    """AIS ship type code -> the vessel_type vocabulary of the ships table."""
+    if code == 30:
+        return "Fishing"
+    if code in (31, 32, 52):
+        return "Tug"
+    if code == 35:
+        return "Military"
+    if code == 36:
+        return "Sailboat"
+    if code == 37:
+        return "Pleasure Craft"
+    if code == 55:
+        return "Law Enforcement"
+    if 60 <= code <= 69:
+        return "Passenger"
+    if 70 <= code <= 79:
+        return "Cargo"
+    if 80 <= code <= 89:
+        return "Tanker"
+    if 40 <= code <= 59 or 90 <= code <= 99:
+        return "Other"
+    return None
+
+
+# --- Framing ---------------------------------------------------------------------
+
+def checksum(body: bytes) -> int:
+    value = 0
+    for byte in body:
+        value ^= byte
+    return value
+
+
+class FragmentAssembler:
+    """Reassembles multi-fragment messages keyed by (channel, sequence id); stale groups are dropped."""
+
+    def __init__(self, max_pending: int = 1000):
+        self.pending: Dict[Tuple[bytes, bytes], List[bytes]] = {}
+        self.max_pending = max_pending
+        self.dropped = 0
+
+    def add(self, count: int, number: int, sequence: bytes, channel: bytes, payload: bytes) -> Optional[bytes]:
+        key = (channel, sequence)
+        if number == 1:
+            if key in self.pending:
+                self.dropped += 1
+            if len(self.pending) >= self.max_pending:
+                self.pending.pop(next(iter(self.pending)))
+                self.dropped += 1
+            self.pending[key] = [payload]
+            return None
+        parts = self.pending.get(key)
+        if parts is None or len(parts) != number - 1:
+            self.pending.pop(key, None)
+            self.dropped += 1
+            return None
+        parts.append(payload)
+        if number < count:
+            return None
+        del self.pending[key]
+        return b"".join(parts)
+
+
+# One match per sentence: (body, fragment count, fragment number, sequence id, channel, payload, checksum).
+SENTENCE_RE = re.compile(rb"!((?:[A-Z]{2})VD[MO],(\d),(\d),(\d?),([^,]*),([^,*]*),\d)\*([0-9A-Fa-f]{2})")
+
+
+def frame(data: bytes, assembler: FragmentAssembler, stats: Dict[str, int]) -> List[bytes]:
+    """Complete payloads of the AIVDM/AIVDO sentences in data; counts bad and skipped lines in stats."""
+    matches = SENTENCE_RE.findall(data)
+    stats["skipped"] += max(0, len(data.split()) - len(matches))
+    if not matches:
+        return []
+
+    # Checksums of the whole batch at once: XOR-reduce every body in the concatenated buffer.
+    bodies = [match[0] for match in matches]
+    lengths = np.fromiter(map(len, bodies), dtype=np.int64, count=len(bodies))
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    computed = np.bitwise_xor.reduceat(np.frombuffer(b"".join(bodies), dtype=np.uint8), offsets)
+    hex_digits = np.frombuffer(b"".join(match[6] for match in matches), dtype=np.uint8).reshape(-1, 2)
+    valid = computed == HEX_TABLE[hex_digits[:, 0]] * 16 + HEX_TABLE[hex_digits[:, 1]]
+    stats["sentences"] += len(matches)
+
+    if valid.all():
+        checked = matches
+    else:
+        stats["bad_checksum"] += int(len(valid) - valid.sum())
+        checked = [match for match, ok in zip(matches, valid.tolist()) if ok]
+    payloads = [match[5] for match in checked if match[1] == b"1"]
+    if len(payloads) < len(checked):
+        # A reassembled message takes the place of its last fragment, so the payloads stay in input order.
+        payloads = []
+        for _, count, number, sequence, channel, payload, _ in checked:
+            if count != b"1":
+                payload = assembler.add(int(count), int(number), sequence, channel, payload)
+                if payload is None:
+                    continue
+            payloads.append(payload)
+    return payloads
+
+
+# --- Vectorized payload decoding -------------------------------------------------
+
+class BitMatrix:
+    """Bits of equally long payloads as a (messages x bits) uint8 matrix."""
+
+    def __init__(self, payloads: Sequence[bytes], nbits: int):
+        chars = -(-nbits // 6)
+        joined = b"".join(payloads)
+        if len(joined) != chars * len(payloads):
+            # Short (or over-long) payloads: pad with "0" (six zero bits) to the matrix width.
+            joined = b"".join(p[:chars].ljust(chars, b"0") for p in payloads)
+        armored = np.frombuffer(joined, dtype=np.uint8)
+        sixbit = DEARMOR[armored].reshape(len(payloads), chars, 1) << 2
+        self.bits = np.unpackbits(sixbit, axis=2)[:, :, :6].reshape(len(payloads), chars * 6)
+
+    def uint(self, start: int, length: int) -> np.ndarray:
+        return self.bits[:, start:start + length] @ WEIGHTS[length]
+
+    def int(self, start: int, length: int) -> np.ndarray:
+        value = self.uint(start, length)
+        return np.where(value >= 1 << (length - 1), value - (1 << length), value)
+
+    def text(self, start: int, chars: int) -> List[str]:
+        values = self.bits[:, start:start + 6 * chars].reshape(-1, chars, 6) @ WEIGHTS[6]
+        raw = np.ascontiguousarray(TEXT_TABLE[values]).view(f"S{chars}").ravel()
+        return [value.decode("ascii").split("@", 1)[0].strip() or None for value in raw.tolist()]
+
+
+def _coordinates(matrix: BitMatrix, lon_start: int, lat_start: int) -> Tuple[np.ndarray, np.ndarray]:
+    lon = matrix.int(lon_start, 28) / 600000.0
+    lat = matrix.int(lat_start, 27) / 600000.0
+    lon = np.where(np.abs(lon) > 180, np.nan, np.round(lon, 6))
+    lat = np.where(np.abs(lat) > 90, np.nan, np.round(lat, 6))
+    return lat, lon
+
+
+def _optional(values: np.ndarray, invalid: Optional[int] = None, scale: float = 1.0) -> List[Optional[float]]:
+    """Column as a list with None for the 'not available' value (NaN for coordinates)."""
+    if invalid is None:
+        missing = np.flatnonzero(np.isnan(values))
+        out = values.tolist()
+    else:
+        missing = np.flatnonzero(values == invalid)
+        out = np.round(values / scale, 1).tolist() if scale != 1.0 else values.tolist()
+    for i in missing.tolist():
+        out[i] = None
+    return out
+
+
+def decode_positions(matrix: BitMatrix, msg_type: int) -> Dict[str, list]:
+    """Columns of type 1/2/3 (class A) or 18/19 (class B) position reports."""
+    if msg_type in (1, 2, 3):
+        lat, lon = _coordinates(matrix, 61, 89)
+        status = [NAV_STATUS.get(code) for code in matrix.uint(38, 4).tolist()]
+        sog, cog, heading, second = matrix.uint(50, 10), matrix.uint(116, 12), matrix.uint(128, 9), matrix.uint(137, 6)
+    else:
+        lat, lon = _coordinates(matrix, 57, 85)
+        status = [None] * len(lat)
+        sog, cog, heading, second = matrix.uint(46, 10), matrix.uint(112, 12), matrix.uint(124, 9), matrix.uint(133, 6)
+    return {
+        "mmsi": matrix.uint(8, 30).tolist(),
+        "latitude": _optional(lat),
+        "longitude": _optional(lon),
+        "speed": _optional(sog, 1023, 10.0),
+        "course": _optional(cog, 3600, 10.0),
+        "heading": _optional(heading, 511),
+        "second": second,
+        "status": status,
+    }
+
+
+def _static_record(mmsi, name=None, ship_type=0, imo=0, call_sign=None, bow=0, stern=0, port=0, starboard=0,
+                   destination=None, draught=None, eta=None) -> Dict:
+    return {
+        "mmsi": mmsi,
+        "ship_name": name,
+        "vessel_type": vessel_type(ship_type),
+        "imo_number": f"IMO{imo:07d}" if imo else None,
+        "call_sign": call_sign,
+        "flag": MID_FLAGS.get(mmsi // 1000000),
+        "length_m": float(bow + stern) if bow + stern else None,
+        "beam_m": float(port + starboard) if port + starboard else None,
+        "gross_tonnage": None,
+        "year_built": None,
+        "ship_type_code": ship_type,
+        "destination": destination,
+        "draught_m": draught,
+        "eta": eta,
+    }
+
+
+def decode_statics(matrix: BitMatrix, msg_type: int) -> List[Dict]:
+    """ships records from type 5 and 19."""
+    mmsi = matrix.uint(8, 30).tolist()
+    if msg_type == 5:
+        columns = zip(mmsi, matrix.text(112, 20), matrix.uint(232, 8).tolist(), matrix.uint(40, 30).tolist(),
+                      matrix.text(70, 7), matrix.uint(240, 9).tolist(), matrix.uint(249, 9).tolist(),
+                      matrix.uint(258, 6).tolist(), matrix.uint(264, 6).tolist(), matrix.text(302, 20),
+                      matrix.uint(294, 8).tolist(), matrix.uint(274, 4).tolist(), matrix.uint(278, 5).tolist(),
+                      matrix.uint(283, 5).tolist(), matrix.uint(288, 6).tolist())
+        return [_static_record(m, name, code, imo, call, bow, stern, port, star, dest, draught / 10.0 if draught else None,
+                               f"{month:02d}-{day:02d} {hour:02d}:{minute:02d}" if month and day else None)
+                for m, name, code, imo, call, bow, stern, port, star, dest, draught, month, day, hour, minute in columns]
+    columns = zip(mmsi, matrix.text(143, 20), matrix.uint(263, 8).tolist(), matrix.uint(271, 9).tolist(),
+                  matrix.uint(280, 9).tolist(), matrix.uint(289, 6).tolist(), matrix.uint(295, 6).tolist())
+    return [_static_record(m, name, code, bow=bow, stern=stern, port=port, starboard=star)
+            for m, name, code, bow, stern, port, star in columns]
+
+
+def decode_static_parts(matrix: BitMatrix) -> List[Tuple[int, int, Dict]]:
+    """
+    (row, part number, partial ships record) from type 24: part A (0) the name,
+    part B (1) type, call sign, dimensions. Rows with another part number are left out.
+    """
+    mmsi = matrix.uint(8, 30).tolist()
+    part = matrix.uint(38, 2).tolist()
+    names = matrix.text(40, 20)
+    codes, calls = matrix.uint(40, 8).tolist(), matrix.text(90, 7)
+    dims = zip(matrix.uint(132, 9).tolist(), matrix.uint(141, 9).tolist(), matrix.uint(150, 6).tolist(),
+               matrix.uint(156, 6).tolist())
+    parts = []
+    for i, (bow, stern, port, star) in enumerate(dims):
+        if part[i] == 0:
+            parts.append((i, 0, _static_record(mmsi[i], names[i])))
+        elif part[i] == 1:
+            parts.append((i, 1, _static_record(mmsi[i], None, codes[i], call_sign=calls[i], bow=bow, stern=stern,
+                                               port=port, starboard=star)))
+    return parts
+
+
+class AISDecoder:
+    """
+    Stateful decoder: keeps incomplete fragment groups, the unmatched type 24
+    part per MMSI and the last destination per MMSI between decode() calls.
+    """
+
+    def __init__(self, max_pending_parts: int = 10000):
+        self.assembler = FragmentAssembler()
+        self.destinations: Dict[int, str] = {}
+        self.class_b_parts: Dict[int, Tuple[int, Dict]] = {}
+        self.max_pending_parts = max_pending_parts
+        self.stats = {"sentences": 0, "messages": 0, "positions": 0, "statics": 0, "bad_checksum": 0,
+                      "skipped": 0, "unsupported": 0}
+        self._time_cache: Dict[int, str] = {}
+
+    def _timestamps(self, received: float, seconds: np.ndarray) -> List[str]:
+        """Receive time with the AIS UTC second applied (one minute back if that second lies ahead)."""
+        minute = int(received // 60) * 60
+        stamps = np.where(seconds < 60, minute + seconds, int(received))
+        stamps = np.where(stamps > received + 1, stamps - 60, stamps)
+        unique, inverse = np.unique(stamps, return_inverse=True)
+        texts = []
+        for stamp in unique.tolist():
+            text = self._time_cache.get(stamp)
+            if text is None:
+                if len(self._time_cache) > 4096:
+                    self._time_cache.clear()
+                text = datetime.fromtimestamp(stamp, timezone.utc).strftime("%Y-%m-%d %H:%M:%S.000")
+                self._time_cache[stamp] = text
+            texts.append(text)
+        return [texts[i] for i in inverse.tolist()]
+
+    def _merge_class_b(self, parts: List[Tuple[int, int, Dict]]) -> List[Tuple[int, Dict]]:
+        """
+        One ships record per MMSI once part A and part B of type 24 are both
+        there, as (position of the completing part, record).
+        """
+        merged = []
+        for index, part, record in parts:
+            pending = self.class_b_parts.pop(record["mmsi"], None)
+            if pending is None or pending[0] == part:
+                if len(self.class_b_parts) >= self.max_pending_parts:
+                    self.class_b_parts.pop(next(iter(self.class_b_parts)))
+                self.class_b_parts[record["mmsi"]] = (part, record)
+                continue
+            name_part, data_part = (record, pending[1]) if part == 0 else (pending[1], record)
+            merged.append((index, dict(data_part, ship_name=name_part["ship_name"])))
+        return merged
+
+    def decode(self, data: bytes, received_at: Optional[datetime] = None) -> Tuple[List[Dict], List[Dict]]:
+        """(ais_events_ice records, ships records) for the complete messages in data."""
+        received = (received_at or datetime.now(timezone.utc)).timestamp()
+        payloads = frame(data, self.assembler, self.stats)
+        self.stats["messages"] += len(payloads)
+        # Payloads and their position in the batch, per message type.
+        groups: Dict[int, List[bytes]] = {}
+        order: Dict[int, List[int]] = {}
+        for index, payload in enumerate(payloads):
+            if payload:
+                msg_type = DEARMOR_LIST[payload[0]]
+                groups.setdefault(msg_type, []).append(payload)
+                order.setdefault(msg_type, []).append(index)
+
+        statics: List[Tuple[int, Dict]] = []
+        for msg_type in (5, 19):
+            if msg_type in groups:
+                records = decode_statics(BitMatrix(groups[msg_type], TYPE_BITS[msg_type]), msg_type)
+                statics += zip(order[msg_type], records)
+        if 24 in groups:
+            parts = decode_static_parts(BitMatrix(groups[24], TYPE_BITS[24]))
+            statics += self._merge_class_b([(order[24][row], part, record) for row, part, record in parts])
+        statics.sort(key=lambda item: item[0])
+
+        positions: List[Tuple[int, Dict]] = []
+        for msg_type in (1, 2, 3, 18, 19):
+            if msg_type not in groups:
+                continue
+            columns = decode_positions(BitMatrix(groups[msg_type], TYPE_BITS[msg_type]), msg_type)
+            for index, mmsi, timestamp, lat, lon, speed, course, status in zip(
+                    order[msg_type], columns["mmsi"], self._timestamps(received, columns["second"]),
+                    columns["latitude"], columns["longitude"], columns["speed"], columns["course"],
+                    columns["status"]):
+                positions.append((index, {
+                    "MMSI": mmsi,
+                    "Event_Timestamp": timestamp,
+                    "Latitude": lat,
+                    "Longitude": lon,
+                    "Speed": speed,
+                    "Course": course,
+                    "Status": status,
+                    "Destination": None,
+                }))
+        positions.sort(key=lambda item: item[0])
+
+        # A type 5 destination applies to the positions after it in the batch (and in later batches).
+        destinations = self.destinations
+        updates = [(index, record["mmsi"], record["destination"]) for index, record in statics if record["destination"]]
+        next_update = 0
+        for index, record in positions:
+            while next_update < len(updates) and updates[next_update][0] < index:
+                destinations[updates[next_update][1]] = updates[next_update][2]
+                next_update += 1
+            record["Destination"] = destinations.get(record["MMSI"])
+        for _, mmsi, destination in updates[next_update:]:
+            destinations[mmsi] = destination
+        positions = [record for _, record in positions]
+        statics = [record for _, record in statics]
+        self.stats["unsupported"] += sum(len(group) for msg_type, group in groups.items() if msg_type not in TYPE_BITS)
+        self.stats["positions"] += len(positions)
+        self.stats["statics"] += len(statics)
+        return positions, statics
+
+
+# --- Encoding ----------------------------------------------------------------------
+
+class BitWriter:
+    def __init__(self):
+        self.value = 0
+        self.length = 0
+
+    def uint(self, value: int, bits: int) -> "BitWriter":
+        self.value = (self.value << bits) | (int(value) & ((1 << bits) - 1))
+        self.length += bits
+        return self
+
+    def text(self, value: Optional[str], chars: int) -> "BitWriter":
+        value = (value or "").upper()[:chars].ljust(chars, "@")
+        for char in value:
+            index = SIXBIT_TEXT.find(char)
+            self.uint(index if index >= 0 else 0, 6)
+        return self
+
+    def armor(self) -> Tuple[str, int]:
+        """(payload, fill bits)"""
+        fill = (-self.length) % 6
+        value = self.value << fill
+        chars = (self.length + fill) // 6
+        return "".join(ARMOR[(value >> (6 * (chars - 1 - i))) & 63] for i in range(chars)), fill
+
+
+def _degrees(value: Optional[float], default: int) -> int:
+    return default if value is None else int(round(value * 600000))
+
+
+def encode_position(mmsi: int, lat: Optional[float], lon: Optional[float], speed: Optional[float] = None,
+                    course: Optional[float] = None, heading: Optional[int] = None, second: int = 60,
+                    status: int = 15, msg_type: int = 1) -> Tuple[str, int]:
+    """Type 1/2/3 (class A) or 18 (class B) position report."""
+    writer = BitWriter().uint(msg_type, 6).uint(0, 2).uint(mmsi, 30)
+    sog = 1023 if speed is None else min(1022, int(round(speed * 10)))
+    cog = 3600 if course is None else int(round(course * 10)) % 3600
+    hdg = 511 if heading is None else int(heading) % 360
+    if msg_type == 18:
+        writer.uint(0, 8).uint(sog, 10).uint(0, 1).uint(_degrees(lon, 108600000), 28)
+        writer.uint(_degrees(lat, 54600000), 27).uint(cog, 12).uint(hdg, 9).uint(second, 6)
+        writer.uint(0, 2).uint(1, 1).uint(0, 1).uint(1, 1).uint(1, 1).uint(0, 1).uint(0, 1).uint(0, 1).uint(0, 20)
+    else:
+        writer.uint(status, 4).uint(128, 8).uint(sog, 10).uint(0, 1).uint(_degrees(lon, 108600000), 28)
+        writer.uint(_degrees(lat, 54600000), 27).uint(cog, 12).uint(hdg, 9).uint(second, 6)
+        writer.uint(0, 2).uint(0, 3).uint(0, 1).uint(0, 19)
+    return writer.armor()
+
+
+def encode_static_voyage(mmsi: int, name: str, ship_type: int = 70, imo: int = 0, call_sign: str = "",
+                         bow: int = 0, stern: int = 0, port: int = 0, starboard: int = 0, destination: str = "",
+                         draught: float = 0.0, eta: Tuple[int, int, int, int] = (0, 0, 24, 60)) -> Tuple[str, int]:
+    """Type 5 static and voyage related data (424 bits, two sentences)."""
+    writer = BitWriter().uint(5, 6).uint(0, 2).uint(mmsi, 30).uint(0, 2).uint(imo, 30).text(call_sign, 7)
+    writer.text(name, 20).uint(ship_type, 8).uint(bow, 9).uint(stern, 9).uint(port, 6).uint(starboard, 6)
+    month, day, hour, minute = eta
+    writer.uint(1, 4).uint(month, 4).uint(day, 5).uint(hour, 5).uint(minute, 6).uint(int(round(draught * 10)), 8)
+    writer.text(destination, 20).uint(0, 1).uint(0, 1)
+    return writer.armor()
+
+
+def encode_class_b_extended(mmsi: int, lat: float, lon: float, speed: float, course: float, name: str,
+                            ship_type: int = 37, bow: int = 0, stern: int = 0, port: int = 0,
+                            starboard: int = 0, second: int = 60) -> Tuple[str, int]:
+    """Type 19 extended class B position report (312 bits)."""
+    writer = BitWriter().uint(19, 6).uint(0, 2).uint(mmsi, 30).uint(0, 8).uint(int(round(speed * 10)), 10)
+    writer.uint(0, 1).uint(_degrees(lon, 108600000), 28).uint(_degrees(lat, 54600000), 27)
+    writer.uint(int(round(course * 10)) % 3600, 12).uint(511, 9).uint(second, 6).uint(0, 4)
+    writer.text(name, 20).uint(ship_type, 8).uint(bow, 9).uint(stern, 9).uint(port, 6).uint(starboard, 6)
+    writer.uint(1, 4).uint(0, 1).uint(0, 1).uint(0, 1).uint(0, 4)
+    return writer.armor()
+
+
+def encode_static_b(mmsi: int, part: int, name: str = "", ship_type: int = 0, call_sign: str = "",
+                    bow: int = 0, stern: int = 0, port: int = 0, starboard: int = 0) -> Tuple[str, int]:
+    """Type 24 class B static data, part A (name) or part B (type, call sign, dimensions)."""
+    writer = BitWriter().uint(24, 6).uint(0, 2).uint(mmsi, 30).uint(part, 2)
+    if part == 0:
+        writer.text(name, 20)
+    else:
+        writer.uint(ship_type, 8).text("", 7).text(call_sign, 7)
+        writer.uint(bow, 9).uint(stern, 9).uint(port, 6).uint(starboard, 6).uint(0, 6)
+    return writer.armor()
+
+
+def sentences(payload: str, fill: int, channel: str = "A", sequence: Optional[int] = None,
+              max_chars: int = 60, talker: str = "AIVDM") -> List[str]:
+    """Splits an armored payload into checksummed !AIVDM sentences (fill bits on the last fragment)."""
+    parts = [payload[i:i + max_chars] for i in range(0, len(payload), max_chars)] or [""]
+    sequence_id = "" if len(parts) == 1 else str(0 if sequence is None else sequence % 10)
+    out = []
+    for number, part in enumerate(parts, start=1):
+        body = f"{talker},{len(parts)},{number},{sequence_id},{channel},{part},{fill if number == len(parts) else 0}"
+        out.append(f"!{body}*{checksum(body.encode('ascii')):02X}")
+    return out
+
+
+ARMOR_TABLE = np.frombuffer(ARMOR.encode("ascii"), dtype=np.uint8)
+HEX_DIGITS = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+
+# Type 1 field layout for the batch encoder: (bits, column or constant).
+POSITION_LAYOUT = [(6, 1), (2, 0), (30, "mmsi"), (4, "status"), (8, 128), (10, "sog"), (1, 0), (28, "lon"),
+                   (27, "lat"), (12, "cog"), (9, "heading"), (6, "second"), (2, 0), (3, 0), (1, 0), (19, 0)]
+
+
+def encode_position_batch(mmsi: np.ndarray, lat: np.ndarray, lon: np.ndarray, speed: np.ndarray,
+                          course: np.ndarray, heading: Optional[np.ndarray] = None, second: Optional[np.ndarray] = None,
+                          status: Optional[np.ndarray] = None, channel: str = "A") -> np.ndarray:
+    """
+    Type 1 sentences for whole arrays at once: a (n x 49) uint8 matrix, one
+    "!AIVDM,1,1,,A,<28 chars>,0*hh\r\n" sentence per row (row.tobytes()).
+    """
+    n = len(mmsi)
+    columns = {
+        "mmsi": np.asarray(mmsi, dtype=np.int64),
+        "status": np.full(n, 15, np.int64) if status is None else np.asarray(status, dtype=np.int64),
+        "sog": np.minimum(np.rint(np.asarray(speed) * 10), 1022).astype(np.int64),
+        "lon": np.rint(np.asarray(lon) * 600000).astype(np.int64),
+        "lat": np.rint(np.asarray(lat) * 600000).astype(np.int64),
+        "cog": np.rint(np.asarray(course) * 10).astype(np.int64) % 3600,
+        "heading": np.full(n, 511, np.int64) if heading is None else np.asarray(heading, dtype=np.int64) % 360,
+        "second": np.full(n, 60, np.int64) if second is None else np.asarray(second, dtype=np.int64),
+    }
+    bits = np.empty((n, 168), dtype=np.uint8)
+    position = 0
+    for length, source in POSITION_LAYOUT:
+        values = columns[source] if isinstance(source, str) else np.full(n, source, np.int64)
+        shifts = np.arange(length - 1, -1, -1, dtype=np.int64)
+        bits[:, position:position + length] = (values[:, None] >> shifts) & 1
+        position += length
+    payload = ARMOR_TABLE[bits.reshape(n, 28, 6) @ WEIGHTS[6]]
+
+    prefix = f"!AIVDM,1,1,,{channel},".encode("ascii")
+    out = np.empty((n, len(prefix) + 28 + 7), dtype=np.uint8)
+    out[:, :len(prefix)] = np.frombuffer(prefix, dtype=np.uint8)
+    out[:, len(prefix):len(prefix) + 28] = payload
+    out[:, len(prefix) + 28:len(prefix) + 31] = np.frombuffer(b",0*", dtype=np.uint8)
+    # Checksum over everything between "!" and "*": constant part XOR payload characters.
+    constant = checksum(prefix[1:] + b",0")
+    value = np.bitwise_xor.reduce(payload, axis=1) ^ constant
+    out[:, -4] = HEX_DIGITS[value >> 4]
+    out[:, -3] = HEX_DIGITS[value & 15]
+    out[:, -2:] = np.frombuffer(b"\r\n", dtype=np.uint8)
+    return out
+
+
+# --- Self-check and benchmark -----------------------------------------------------
+
+# Published sentences with their decoded values (gpsd AIVDM/AIVDO protocol documentation examples).
+KNOWN_SENTENCES = [
+    (["!AIVDM,1,1,,B,177KQJ5000G?tO`K>RA1wUbN0TKH,0*5C"],
+     "position", {"MMSI": 477553000, "Status": "Moored", "Speed": 0.0, "Course": 51.0,
+                  "Latitude": 47.582833, "Longitude": -122.345833}),
+    (["!AIVDM,2,1,1,A,55?MbV02;H;s<HtKR20EHE:0@T4@Dn2222222216L961O5Gf0NSQEp6ClRp8,0*1C",
+      "!AIVDM,2,2,1,A,88888888880,2*25"],
+     "static", {"mmsi": 351759000, "ship_name": "EVER DIADEM", "call_sign": "3FOF8", "imo_number": "IMO9134270",
+                "vessel_type": "Cargo", "length_m": 295.0, "beam_m": 32.0, "destination": "NEW YORK",
+                "draught_m": 12.2, "flag": "Panama"}),
+    (["!AIVDM,1,1,,A,H42O55i18tMET00000000000000,2*6D", "!AIVDM,1,1,,A,H42O55lti4hhhilD3nink000?050,0*40"],
+     "static", {"mmsi": 271041815, "ship_name": "PROGUY", "flag": "Turkey", "vessel_type": "Passenger",
+                "call_sign": "TC6163", "length_m": 15.0, "beam_m": 5.0}),
+]
+
+
+def reference_decode(payload: bytes) -> Dict:
+    """Scalar decoder on one Python integer, independent of the numpy path (for --verify)."""
+    value, nbits = 0, 0
+    for char in payload:
+        value = (value << 6) | ARMOR.index(chr(char))
+        nbits += 6
+
+    def uint(start, length):
+        # Missing trailing bits count as zero, like the zero padding of the bit matrix.
+        total = max(nbits, start + length)
+        return ((value << (total - nbits)) >> (total - start - length)) & ((1 << length) - 1)
+
+    def sint(start, length):
+        raw = uint(start, length)
+        return raw - (1 << length) if raw >> (length - 1) else raw
+
+    msg_type = uint(0, 6)
+    lon_start, lat_start, sog_start, cog_start = (61, 89, 50, 116) if msg_type in (1, 2, 3) else (57, 85, 46, 112)
+    lat, lon = sint(lat_start, 27) / 600000.0, sint(lon_start, 28) / 600000.0
+    sog, cog = uint(sog_start, 10), uint(cog_start, 12)
+    return {
+        "MMSI": uint(8, 30),
+        "Latitude": None if abs(lat) > 90 else round(lat, 6),
+        "Longitude": None if abs(lon) > 180 else round(lon, 6),
+        "Speed": None if sog == 1023 else round(sog / 10.0, 1),
+        "Course": None if cog == 3600 else round(cog / 10.0, 1),
+        "Status": NAV_STATUS.get(uint(38, 4)) if msg_type in (1, 2, 3) else None,
+    }
+
+
+def synthetic_feed(count: int, seed: int = 3) -> Tuple[bytes, List[Dict], List[Dict]]:
+    """
+    Mixed feed (about 85 % type 1/2/3, 8 % type 18, 4 % type 5, 2 % type 24,
+    1 % type 19) with the values that were encoded, for round-trip checks.
+    """
+    rng = random.Random(seed)
+    lines: List[str] = []
+    positions: List[Dict] = []
+    statics: List[Dict] = []
+    sequence = 0
+    while len(lines) < count:
+        mmsi = rng.choice([211, 230, 265, 273, 276, 636, 351]) * 1000000 + rng.randrange(1000000)
+        roll = rng.random()
+        # Coordinates on the 1/10000 minute grid of the AIS position fields.
+        lat = round(round(rng.uniform(53.5, 65.8) * 600000) / 600000.0, 6)
+        lon = round(round(rng.uniform(9.5, 30.2) * 600000) / 600000.0, 6)
+        speed, course = round(rng.uniform(0, 25), 1), round(rng.uniform(0, 359.9), 1)
+        if roll < 0.85:
+            msg_type = rng.choice((1, 2, 3))
+            status = rng.choice((0, 1, 5, 8))
+            lines += sentences(*encode_position(mmsi, lat, lon, speed, course, rng.randrange(360), rng.randrange(60),
+                                                status, msg_type), rng.choice("AB"))
+            positions.append({"MMSI": mmsi, "Latitude": lat, "Longitude": lon, "Speed": speed, "Course": course,
+                              "Status": NAV_STATUS[status]})
+        elif roll < 0.93:
+            lines += sentences(*encode_position(mmsi, lat, lon, speed, course, None, rng.randrange(60), msg_type=18))
+            positions.append({"MMSI": mmsi, "Latitude": lat, "Longitude": lon, "Speed": speed, "Course": course,
+                              "Status": None})
+        elif roll < 0.97:
+            sequence += 1
+            name = rng.choice(["BALTIC TRADER", "NORDIC STAR", "OSTSEE", "KAPITAN IVANOV"])
+            lines += sentences(*encode_static_voyage(mmsi, name, 80, 9000000 + rng.randrange(999999), "DABC",
+                                                     150, 30, 12, 14, "ROSTOCK", 7.4, (10, 21, 6, 30)),
+                               "B", sequence)
+            statics.append({"mmsi": mmsi, "ship_name": name, "vessel_type": "Tanker", "length_m": 180.0,
+                            "beam_m": 26.0, "destination": "ROSTOCK", "draught_m": 7.4})
+        elif roll < 0.99:
+            lines += sentences(*encode_static_b(mmsi, 0, name="SEGLER"))
+            lines += sentences(*encode_static_b(mmsi, 1, ship_type=36, call_sign="DK1234", bow=8, stern=4,
+                                                port=2, starboard=2))
+            statics.append({"mmsi": mmsi, "ship_name": "SEGLER", "vessel_type": "Sailboat", "call_sign": "DK1234",
+                            "length_m": 12.0, "beam_m": 4.0})
+        else:
+            lines += sentences(*encode_class_b_extended(mmsi, lat, lon, speed, course, "FISCHER 7", 30, 10, 5, 3, 3))
+            positions.append({"MMSI": mmsi, "Latitude": lat, "Longitude": lon, "Speed": speed, "Course": course,
+                              "Status": None})
+            statics.append({"mmsi": mmsi, "ship_name": "FISCHER 7", "vessel_type": "Fishing", "length_m": 15.0,
+                            "beam_m": 6.0})
+    return ("\r\n".join(lines) + "\r\n").encode("ascii"), positions, statics
+
+
+def _matches(record: Dict, expected: Dict) -> bool:
+    return all(record.get(key) == value for key, value in expected.items())
+
+
+def verify(count: int) -> bool:
+    ok = True
+    for lines, kind, expected in KNOWN_SENTENCES:
+        positions, statics = AISDecoder().decode(("\r\n".join(lines) + "\r\n").encode("ascii"))
+        records = positions if kind == "position" else statics
+        good = len(records) == 1 and _matches(records[0], expected)
+        ok &= good
+        print(f"{'ok  ' if good else 'FAIL'} {lines[0][:48]:48s} {records[0] if not good and records else ''}")
+
+    feed, expected_positions, expected_statics = synthetic_feed(count)
+    decoder = AISDecoder()
+    positions, statics = [], []
+    # Random chunking: fragments of type 5 may arrive in different decode() calls.
+    lines = feed.split(b"\r\n")
+    rng = random.Random(1)
+    start = 0
+    while start < len(lines):
+        step = rng.randint(1, 500)
+        found = decoder.decode(b"\r\n".join(lines[start:start + step]) + b"\r\n")
+        positions += found[0]
+        statics += found[1]
+        start += step
+    # Records come out in input order, across message types and chunk boundaries.
+    round_trip = (len(positions) == len(expected_positions) and len(statics) == len(expected_statics)
+                  and all(_matches(got, want) for got, want in zip(positions, expected_positions)))
+    statics_ok = all(_matches(got, want) for got, want in zip(statics, expected_statics))
+    ok &= round_trip and statics_ok
+    print(f"{'ok  ' if round_trip and statics_ok else 'FAIL'} round trip: {len(positions)} positions, "
+          f"{len(statics)} static records from {decoder.stats['sentences']} sentences in random chunks")
+
+    payloads = frame(feed, FragmentAssembler(), {"sentences": 0, "bad_checksum": 0, "skipped": 0})
+    scalar_ok = True
+    for msg_type in (1, 2, 3, 18, 19):
+        group = [p for p in payloads if DEARMOR[p[0]] == msg_type]
+        if not group:
+            continue
+        columns = decode_positions(BitMatrix(group, TYPE_BITS[msg_type]), msg_type)
+        for i, payload in enumerate(group):
+            reference = reference_decode(payload)
+            scalar_ok &= (reference["MMSI"] == columns["mmsi"][i] and reference["Latitude"] == columns["latitude"][i]
+                          and reference["Longitude"] == columns["longitude"][i]
+                          and reference["Speed"] == columns["speed"][i] and reference["Course"] == columns["course"][i]
+                          and reference["Status"] == columns["status"][i])
+    ok &= scalar_ok
+    print(f"{'ok  ' if scalar_ok else 'FAIL'} vectorized bit matrix matches the scalar reference decoder")
+
+    corrupted = feed.replace(b",0*", b",1*", 5)
+    bad = AISDecoder()
+    bad.decode(corrupted)
+    checksum_ok = bad.stats["bad_checksum"] == 5
+    ok &= checksum_ok
+    print(f"{'ok  ' if checksum_ok else 'FAIL'} checksum: {bad.stats['bad_checksum']} corrupted sentences rejected")
+    return ok
+
+
+def benchmark(count: int, repeat: int):
+    feed, _, _ = synthetic_feed(count)
+    best = None
+    for _ in range(repeat):
+        decoder = AISDecoder()
+        start = time.perf_counter()
+        decoder.decode(feed, datetime(2025, 10, 1, tzinfo=timezone.utc))
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    stats = decoder.stats
+    print(f"{stats['sentences']:,} sentences ({len(feed) / 1e6:.1f} MB) -> {stats['positions']:,} positions, "
+          f"{stats['statics']:,} static records in {best:.2f}s: {stats['sentences'] / best:,.0f} sentences/s, "
+          f"{len(feed) / 1e6 / best:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AIVDM decoder self-check and benchmark.")
+    parser.add_argument("--verify", action="store_true", help="Known sentences, round trip and checksum checks")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--sentences", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    if args.verify:
+        raise SystemExit(0 if verify(min(args.sentences, 50000)) else 1)
+    if args.benchmark:
+        benchmark(args.sentences, args.repeat)
+    else:
+        parser.print_help()
@@ -0,0 +1,443 @@
+"""
+Rate-controlled AIVDM load generator for ListenTCP / ListenUDP -> Kafka -> Flink
+tests.
+
+The fleet of ShipSimulationRoutes (ship_routes.py) is stepped every
+--step-interval seconds; every round yields one type 1 position report per
+ship (encoded for the whole fleet at once with
+ais_nmea.encode_position_batch) and, every --static-every rounds, a
+two-sentence type 5 static/voyage message per ship.
+Sentences are checksummed "!AIVDM,...*hh\\r\\n" lines.
+
+A token bucket (rate from --rate or a --profile of DURATION:RATE steps,
+capacity --burst messages) is refilled every --tick seconds and the
+released messages are written as one slice of the encoded round buffer:
+
+- --connect HOST:PORT (x --connections): client connections, e.g. to NiFi
+  ListenTCP; batches are distributed round robin.
+- --listen HOST:PORT: server for any number of clients, every client gets
+  the full stream; clients whose send buffer exceeds --max-client-buffer are
+  dropped.
+- --udp HOST:PORT: datagrams of at most --datagram-size bytes, split at
+  sentence boundaries.
+
+At the end (and every --report-every seconds) the achieved rate, the spread
+of the per-second rates, the tick lateness (scheduling jitter) and the time
+spent waiting on TCP back pressure are printed.
+
+    python aivdm_emitter.py --connect localhost:5050 --connections 4 --rate 100000 --duration 60
+    python aivdm_emitter.py --listen 0.0.0.0:10110 --rate 20000 --profile "20:20000,5:150000"
+    python aivdm_emitter.py --self-test --rate 150000 --duration 5
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import unicodedata
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ais_nmea import AISDecoder, encode_position_batch, encode_static_voyage, sentences
+from ship_routes import initialize_ships, load_ship_state, update_ship_movements
+
+# Status vocabulary of the simulators -> AIS navigational status code.
+STATUS_CODES = {"Underway using engine": 0, "Underway": 0, "Anchored": 1, "Not under command": 2, "Moored": 5}
+
+
+def sixbit_ascii(text: str) -> str:
+    """'Klaipėda' -> 'KLAIPEDA' (the 6-bit AIS character set has no diacritics)."""
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").upper()
+
+
+class FleetSource:
+    """
+    Encoded rounds of the simulated fleet. take(k) returns the next k
+    messages as one bytes slice; a new round is built when one is used up.
+    """
+
+    def __init__(self, num_ships: int, use_state_file: bool = False, static_every: int = 60,
+                 step_interval: float = 1.0, channel: str = "A"):
+        self.ships = load_ship_state(num_ships) if use_state_file else initialize_ships(num_ships)
+        self.mmsi = np.array([ship["MMSI"] for ship in self.ships], dtype=np.int64)
+        self.static_every = static_every
+        self.step_interval = step_interval
+        self.channel = channel
+        self.rounds = 0
+        self.steps = 0
+        self.sentences = 0
+        self.build_seconds = 0.0
+        self._buffer = b""
+        self._ends = np.zeros(0, dtype=np.int64)
+        self._next = 0
+        self._positions: Optional[Tuple[float, int, bytes]] = None
+        self._statics = {}
+        self._sequence = 0
+
+    def _static_messages(self) -> List[bytes]:
+        """Type 5 per ship; re-encoded only when the destination changed."""
+        messages = []
+        for ship in self.ships:
+            mmsi, destination = ship["MMSI"], ship["Destination"]["name"]
+            cached = self._statics.get(mmsi)
+            if cached is None or cached[0] != destination:
+                payload = encode_static_voyage(mmsi, f"BALTIC {mmsi % 100000:05d}", 70, 0, f"SIM{mmsi % 10000:04d}",
+                                               120, 20, 10, 10, sixbit_ascii(destination), 6.5)
+                self._sequence += 1
+                cached = (destination, "".join(line + "\r\n" for line in sentences(*payload, "B", self._sequence))
+                          .encode("ascii"))
+                self._statics[mmsi] = cached
+            messages.append(cached[1])
+        return messages
+
+    def _position_block(self) -> bytes:
+        """
+        Position reports of the whole fleet. The simulator is stepped at most
+        once per step_interval seconds; in between, rounds repeat the current
+        positions (as a receiver sees class A reports every few seconds) and
+        the encoded block is reused while the UTC second does not change.
+        """
+        now = time.time()
+        second = int(now) % 60
+        if self._positions is None or now - self._positions[0] >= self.step_interval:
+            update_ship_movements(self.ships)
+            self.steps += 1
+            stepped_at = now
+        elif self._positions[1] == second:
+            return self._positions[2]
+        else:
+            stepped_at = self._positions[0]
+        block = encode_position_batch(
+            self.mmsi,
+            np.array([ship["Latitude"] for ship in self.ships]),
+            np.array([ship["Longitude"] for ship in self.ships]),
+            np.array([ship["Speed"] for ship in self.ships]),
+            np.array([ship["Course"] for ship in self.ships]),
+            second=np.full(len(self.ships), second),
+            status=np.array([STATUS_CODES.get(ship["Status"], 15) for ship in self.ships]),
+            channel=self.channel,
+        ).tobytes()
+        self._positions = (stepped_at, second, block)
+        return block
+
+    def _build_round(self):
+        start = time.perf_counter()
+        buffer = self._position_block()
+        ends = np.arange(1, len(self.ships) + 1, dtype=np.int64) * (len(buffer) // len(self.ships))
+        self.sentences += len(self.ships)
+        if self.static_every and self.rounds % self.static_every == 0:
+            statics = self._static_messages()
+            lengths = np.fromiter(map(len, statics), dtype=np.int64, count=len(statics))
+            ends = np.concatenate((ends, len(buffer) + np.cumsum(lengths)))
+            buffer += b"".join(statics)
+            self.sentences += 2 * len(statics)
+        self._buffer, self._ends, self._next = buffer, ends, 0
+        self.rounds += 1
+        self.build_seconds += time.perf_counter() - start
+
+    def take(self, count: int) -> Tuple[bytes, int]:
+        """(bytes, number of messages); at most count messages, fewer at the end of a round."""
+        if self._next >= len(self._ends):
+            self._build_round()
+        if count <= 0:
+            return b"", 0
+        first = self._next
+        last = min(len(self._ends), first + count)
+        start = int(self._ends[first - 1]) if first else 0
+        self._next = last
+        return self._buffer[start:int(self._ends[last - 1])], last - first
+
+
+class RateProfile:
+    """Constant rate or repeating "DURATION:RATE,DURATION:RATE" steps (seconds, messages/s)."""
+
+    def __init__(self, rate: float, profile: Optional[str] = None):
+        self.steps = [(1.0, rate)]
+        if profile:
+            self.steps = [(float(duration), float(step_rate))
+                          for duration, step_rate in (step.split(":") for step in profile.split(","))]
+        self.period = sum(duration for duration, _ in self.steps)
+
+    def rate(self, elapsed: float) -> float:
+        offset = elapsed % self.period
+        for duration, rate in self.steps:
+            if offset < duration:
+                return rate
+            offset -= duration
+        return self.steps[-1][1]
+
+    def mean(self) -> float:
+        return sum(duration * rate for duration, rate in self.steps) / self.period
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = 0.0
+        self.last = now
+
+    def refill(self, now: float) -> int:
+        self.tokens = min(self.capacity, self.tokens + self.rate * (now - self.last))
+        self.last = now
+        return int(self.tokens)
+
+
+def split_datagrams(data: bytes, size: int) -> List[bytes]:
+    """Splits at sentence ends so that no sentence spans two datagrams."""
+    out = []
+    start = 0
+    while len(data) - start > size:
+        end = data.rfind(b"\n", start, start + size) + 1
+        if end <= start:
+            end = data.find(b"\n", start) + 1 or len(data)
+        out.append(data[start:end])
+        start = end
+    if start < len(data):
+        out.append(data[start:])
+    return out
+
+
+class Sinks:
+    """TCP client connections, TCP server clients and a UDP target behind one send()."""
+
+    def __init__(self, max_client_buffer: int, datagram_size: int):
+        self.connections: List[asyncio.StreamWriter] = []
+        self.clients: List[asyncio.StreamWriter] = []
+        self.udp: Optional[asyncio.DatagramTransport] = None
+        self.max_client_buffer = max_client_buffer
+        self.datagram_size = datagram_size
+        self.dropped_clients = 0
+        self.drain_waits: List[float] = []
+        self._round_robin = 0
+
+    async def connect(self, host: str, port: int, count: int):
+        for _ in range(count):
+            _, writer = await asyncio.open_connection(host, port)
+            self.connections.append(writer)
+
+    async def listen(self, host: str, port: int) -> asyncio.AbstractServer:
+        async def on_client(reader, writer):
+            self.clients.append(writer)
+            print(f"client connected: {writer.get_extra_info('peername')}")
+
+        return await asyncio.start_server(on_client, host, port)
+
+    async def open_udp(self, host: str, port: int):
+        loop = asyncio.get_running_loop()
+        self.udp, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(host, port))
+
+    async def send(self, data: bytes):
+        if self.connections:
+            writer = self.connections[self._round_robin % len(self.connections)]
+            self._round_robin += 1
+            writer.write(data)
+            if writer.transport.get_write_buffer_size() > 1 << 20:
+                start = time.perf_counter()
+                await writer.drain()
+                self.drain_waits.append(time.perf_counter() - start)
+        for writer in list(self.clients):
+            if writer.is_closing() or writer.transport.get_write_buffer_size() > self.max_client_buffer:
+                self.clients.remove(writer)
+                self.dropped_clients += 1
+                writer.close()
+                continue
+            writer.write(data)
+        if self.udp is not None:
+            for datagram in split_datagrams(data, self.datagram_size):
+                self.udp.sendto(datagram)
+
+    async def close(self):
+        for writer in self.connections + self.clients:
+            writer.close()
+        if self.udp is not None:
+            self.udp.close()
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+class Stats:
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self.lateness: List[float] = []
+        self.per_second: List[int] = []
+        self._second_start = 0.0
+        self._second_count = 0
+
+    def record(self, now: float, messages: int, size: int):
+        if not self._second_start:
+            self._second_start = now
+        while now - self._second_start >= 1.0:
+            self.per_second.append(self._second_count)
+            self._second_count = 0
+            self._second_start += 1.0
+        self._second_count += messages
+        self.messages += messages
+        self.bytes += size
+
+    def report(self, elapsed: float, target: float, source: FleetSource, sinks: Sinks) -> dict:
+        rates = self.per_second or [self.messages]
+        lateness_ms = [value * 1000 for value in self.lateness]
+        return {
+            "seconds": round(elapsed, 2),
+            "messages": self.messages,
+            "sentences_built": source.sentences,
+            "bytes": self.bytes,
+            "target_rate": round(target),
+            "achieved_rate": round(self.messages / elapsed) if elapsed else 0,
+            "rate_per_second_min": min(rates),
+            "rate_per_second_max": max(rates),
+            "rate_per_second_stdev": round(statistics.pstdev(rates)) if len(rates) > 1 else 0,
+            "tick_lateness_ms_p50": round(percentile(lateness_ms, 50), 3),
+            "tick_lateness_ms_p99": round(percentile(lateness_ms, 99), 3),
+            "tick_lateness_ms_max": round(max(lateness_ms, default=0.0), 3),
+            "backpressure_waits": len(sinks.drain_waits),
+            "backpressure_ms_p99": round(percentile([w * 1000 for w in sinks.drain_waits], 99), 3),
+            "fleet_rounds": source.rounds,
+            "fleet_steps": source.steps,
+            "fleet_build_seconds": round(source.build_seconds, 2),
+            "dropped_clients": sinks.dropped_clients,
+        }
+
+
+async def run(source: FleetSource, sinks: Sinks, profile: RateProfile, burst: Optional[float], tick: float,
+              duration: float, report_every: float) -> dict:
+    loop = asyncio.get_running_loop()
+    # First round (with the type 5 encoding of the whole fleet) before the clock starts.
+    source.take(0)
+    start = loop.time()
+    bucket = TokenBucket(profile.rate(0), burst or profile.rate(0) * tick * 4, start)
+    stats = Stats()
+    next_tick = start
+    next_report = start + report_every if report_every else float("inf")
+    while True:
+        next_tick += tick
+        delay = next_tick - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        now = loop.time()
+        stats.lateness.append(max(0.0, now - next_tick))
+        if now - next_tick > 1.0:
+            # Far behind (e.g. the process was stopped): do not try to catch up with a huge burst.
+            next_tick = now
+        elapsed = now - start
+        if elapsed >= duration:
+            break
+        bucket.rate = profile.rate(elapsed)
+        if burst is None:
+            bucket.capacity = bucket.rate * tick * 4
+        available = bucket.refill(now)
+        while available > 0:
+            data, count = source.take(available)
+            bucket.tokens -= count
+            available -= count
+            stats.record(now, count, len(data))
+            await sinks.send(data)
+        if now >= next_report:
+            next_report += report_every
+            print(json.dumps(stats.report(elapsed, profile.mean(), source, sinks)), flush=True)
+    return stats.report(loop.time() - start, profile.mean(), source, sinks)
+
+
+def host_port(value: str) -> Tuple[str, int]:
+    host, _, port = value.rpartition(":")
+    return host or "localhost", int(port)
+
+
+async def self_test(args) -> bool:
+    """Local TCP sink counting and decoding what arrives; checks that every sent sentence is received intact."""
+    received = {"bytes": 0, "lines": 0}
+    decoder = AISDecoder()
+    sample = bytearray()
+    done = asyncio.Event()
+
+    async def on_client(reader, writer):
+        while True:
+            chunk = await reader.read(1 << 20)
+            if not chunk:
+                break
+            received["bytes"] += len(chunk)
+            received["lines"] += chunk.count(b"\n")
+            if len(sample) < 5_000_000:
+                sample.extend(chunk)
+        done.set()
+
+    server = await asyncio.start_server(on_client, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    source = FleetSource(args.ships, False, args.static_every, args.step_interval)
+    sinks = Sinks(args.max_client_buffer, args.datagram_size)
+    await sinks.connect("127.0.0.1", port, 1)
+    result = await run(source, sinks, RateProfile(args.rate, args.profile), args.burst, args.tick, args.duration, 0)
+    for writer in sinks.connections:
+        await writer.drain()
+        writer.close()
+    await asyncio.wait_for(done.wait(), 30)
+    server.close()
+
+    sample_bytes = bytes(sample[:sample.rfind(b"\n") + 1])
+    positions, statics = decoder.decode(sample_bytes)
+    fleet = {ship["MMSI"] for ship in source.ships}
+    result.update({
+        "received_bytes": received["bytes"],
+        "received_sentences": received["lines"],
+        "sample_positions": len(positions),
+        "sample_statics": len(statics),
+        "sample_bad_checksum": decoder.stats["bad_checksum"],
+    })
+    print(json.dumps(result, indent=2))
+    ok = (received["bytes"] == result["bytes"] and decoder.stats["bad_checksum"] == 0 and positions
+          and all(record["MMSI"] in fleet for record in positions))
+    print(f"self-test {'ok' if ok else 'FAILED'}: achieved {result['achieved_rate']:,} msgs/s "
+          f"of {result['target_rate']:,} target")
+    return bool(ok)
+
+
+async def main(args) -> int:
+    if args.self_test:
+        return 0 if await self_test(args) else 1
+    source = FleetSource(args.ships, args.state_file, args.static_every, args.step_interval)
+    sinks = Sinks(args.max_client_buffer, args.datagram_size)
+    server = None
+    if args.connect:
+        await sinks.connect(*host_port(args.connect), args.connections)
+    if args.listen:
+        server = await sinks.listen(*host_port(args.listen))
+        print(f"listening on {args.listen}")
+    if args.udp:
+        await sinks.open_udp(*host_port(args.udp))
+    if not (args.connect or args.listen or args.udp):
+        print("no target (--connect / --listen / --udp): dry run, messages are only generated")
+    result = await run(source, sinks, RateProfile(args.rate, args.profile), args.burst, args.tick, args.duration,
+                       args.report_every)
+    print(json.dumps(result, indent=2))
+    await sinks.close()
+    if server is not None:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rate-controlled AIVDM/TCP/UDP load generator.")
+    parser.add_argument("--connect", help="HOST:PORT to connect to (e.g. NiFi ListenTCP)")
+    parser.add_argument("--connections", type=int, default=1)
+    parser.add_argument("--listen", help="HOST:PORT to serve the stream to any number of TCP clients")
+    parser.add_argument("--udp", help="HOST:PORT to send datagrams to (e.g. NiFi ListenUDP)")
+    parser.add_argument("--rate", type=float, default=100000, help="Messages per second")
+    parser.add_argument("--profile", help='Repeating "DURATION:RATE,..." steps, e.g. "10:50000,2:300000"')
+    parser.add_argument("--burst", type=float, help="Token bucket capacity in messages (default: 4 ticks)")
+    parser.add_argument("--tick", type=float, default=0.002, help="Pacing interval in seconds")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--ships", type=int, default=2000)
+    parser.add_argument("--state-file", action="store_true", help="Start from the ShipSimulationRoutes state file")
+    parser.add_argument("--static-every", type=int, default=60, help="Type 5 for every ship every N rounds (0: never)")
+    parser.add_argument("--step-interval", type=float, default=1.0, help="Seconds between simulator steps")
+    parser.add_argument("--max-client-buffer", type=int, default=64 << 20)
+    parser.add_argument("--datagram-size", type=int, default=1400)
+    parser.add_argument("--report-every", type=float, default=5.0)
+    parser.add_argument("--self-test", action="store_true", help="Send to a local TCP sink and check what arrives")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,429 @@
+"""
+Multi-pattern entity extraction for social_media_messages (tweet) and
+maritime_surveillance_reports (message_text).
+
+An Aho-Corasick automaton is compiled from entity dictionaries - the
+german_navy_fleet / StanagMessageGenerator.full_fleet unit names,
+baltic_sea_harbours and sanctioned_vessels names - and every message is
+scanned once, character by character, independent of the number of patterns.
+Matching is case-insensitive and only accepts whole words (no "Kiel" in
+"Kielwasser"); overlapping hits are resolved leftmost-longest, so
+"FGS Sachsen-Anhalt" is not also reported as "FGS Sachsen".
+
+The goto/failure transitions are memoized into a per-state dict on first use,
+so after warm-up each character costs one dict lookup. Only characters that
+occur in some pattern are memoized (any other character leads back to the
+root), and the memo stops growing at max_memo entries, so arbitrary input
+text cannot grow it without bound.
+
+Dictionaries are read from the INSERT statements of a .sql file (the DDL in
+cdw-analyse), from JSON ({"type": ["pattern", ...]}) or from NDJSON
+({"pattern": ..., "type": ..., "entity": ...}). An EntityExtractor swaps in a
+newly compiled automaton with a single reference assignment when the file
+changes.
+
+    python entity_extraction.py --verify
+    python entity_extraction.py --benchmark --patterns 50000 --messages 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sanctions import normalize_name
+
+# Upper bound of memoized transitions per automaton (about 100 bytes each).
+MAX_MEMO = 1_000_000
+
+# Table -> (column index of the name, entity type, column index of an extra attribute or None)
+SQL_DICTIONARIES = {
+    "german_navy_fleet": (1, "naval_unit", 0),
+    "baltic_sea_harbours": (0, "harbour", 1),
+    "sanctioned_vessels": (0, "sanctioned_vessel", None),
+}
+
+_INSERT = re.compile(r"INSERT\s+INTO\s+(?:TABLE\s+)?(?:\w+\.)?(\w+)\s*(?:\(([^)']*)\))?[^;]*?"
+                     r"VALUES((?:'(?:[^']|'')*'|[^';])*)", re.I | re.S)
+_ROW = re.compile(r"\(((?:'(?:[^']|'')*'|[^()'])*)\)", re.S)
+_VALUE = re.compile(r"'((?:[^']|'')*)'|([^,\s]+)")
+
+
+def sql_column_rows(text: str) -> Iterable[Tuple[str, Optional[List[str]], List[Optional[str]]]]:
+    """
+    (table, column list or None, values) for every row of every INSERT ...
+    VALUES statement; comments are skipped.
+    """
+    text = re.sub(r"--[^\n]*", "", text)
+    for statement in _INSERT.finditer(text):
+        columns = [column.strip() for column in statement.group(2).split(",")] if statement.group(2) else None
+        for row in _ROW.finditer(statement.group(3)):
+            values = []
+            for quoted, bare in _VALUE.findall(row.group(1)):
+                values.append(quoted.replace("''", "'") if bare == "" else (None if bare.upper() == "NULL" else bare))
+            yield statement.group(1).lower(), columns, values
+
+
+def sql_rows(text: str) -> Iterable[Tuple[str, List[Optional[str]]]]:
+    """(table, values) for every row of every INSERT ... VALUES statement; comments are skipped."""
+    for table, _, values in sql_column_rows(text):
+        yield table, values
+
+
+def load_dictionary(path: str) -> List[Tuple[str, Dict]]:
+    """(pattern, metadata) pairs from .sql, .json or .ndjson."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    entries = []
+    if path.lower().endswith(".sql"):
+        for table, values in sql_rows(text):
+            if table not in SQL_DICTIONARIES:
+                continue
+            name_index, entity_type, extra_index = SQL_DICTIONARIES[table]
+            if len(values) <= name_index or not values[name_index]:
+                continue
+            meta = {"entity": values[name_index], "type": entity_type}
+            if extra_index is not None and len(values) > extra_index:
+                meta["detail"] = values[extra_index]
+            entries.append((values[name_index], meta))
+            if entity_type == "sanctioned_vessel":
+                # "M/V Angara" is mentioned as "Angara" as well
+                alias = normalize_name(values[name_index])
+                if len(alias) >= 3 and alias != values[name_index].upper():
+                    entries.append((alias, meta))
+        return entries
+    stripped = text.lstrip()
+    if stripped.startswith("{"):
+        for entity_type, patterns in json.loads(stripped).items():
+            entries += [(pattern, {"entity": pattern, "type": entity_type}) for pattern in patterns]
+        return entries
+    for line in text.splitlines():
+        if line.strip():
+            item = json.loads(line)
+            entries.append((item["pattern"], {"entity": item.get("entity", item["pattern"]), "type": item["type"]}))
+    return entries
+
+
+def _lower(text: str) -> str:
+    """str.lower() with unchanged length, so offsets stay valid ('İ'.lower() has two characters)."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class Automaton:
+    """Aho-Corasick automaton over lower-cased patterns; immutable apart from the transition memo."""
+
+    def __init__(self, entries: List[Tuple[str, Dict]], max_memo: int = MAX_MEMO):
+        self.keys: List[str] = []
+        self.metas: List[List[Dict]] = []
+        ids: Dict[str, int] = {}
+        goto: List[Dict[str, int]] = [{}]
+        for pattern, meta in entries:
+            key = _lower(pattern.strip())
+            if not key:
+                continue
+            if key in ids:
+                if meta not in self.metas[ids[key]]:
+                    self.metas[ids[key]].append(meta)
+                continue
+            ids[key] = len(self.keys)
+            self.keys.append(key)
+            self.metas.append([meta])
+            state = 0
+            for ch in key:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                state = nxt
+        self.lengths = [len(key) for key in self.keys]
+
+        ends = [()] * len(goto)
+        for pid, key in enumerate(self.keys):
+            state = 0
+            for ch in key:
+                state = goto[state][ch]
+            ends[state] = (pid,)
+
+        fail = [0] * len(goto)
+        out: List[Tuple[int, ...]] = list(ends)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0) if goto[f].get(ch, 0) != nxt else 0
+                out[nxt] = ends[nxt] + out[fail[nxt]]
+        self.goto = goto
+        self.fail = fail
+        self.out = out
+        self.delta = [dict(transitions) for transitions in goto]
+        self.alphabet = frozenset(ch for transitions in goto for ch in transitions)
+        self.max_memo = max_memo
+        self.memo = 0
+
+    @property
+    def states(self) -> int:
+        return len(self.goto)
+
+    def _transition(self, state: int, ch: str) -> int:
+        goto, fail = self.goto, self.fail
+        while state and ch not in goto[state]:
+            state = fail[state]
+        return goto[state].get(ch, 0)
+
+    def scan(self, text: str) -> List[Tuple[int, int, int]]:
+        """All (start, end, pattern id) occurrences, in order of their end offset."""
+        delta, out, lengths, alphabet = self.delta, self.out, self.lengths, self.alphabet
+        hits = []
+        state = 0
+        for i, ch in enumerate(_lower(text)):
+            nxt = delta[state].get(ch)
+            if nxt is None:
+                if ch not in alphabet:
+                    nxt = 0
+                else:
+                    nxt = self._transition(state, ch)
+                    if self.memo < self.max_memo:
+                        delta[state][ch] = nxt
+                        self.memo += 1
+            state = nxt
+            if out[state]:
+                end = i + 1
+                for pid in out[state]:
+                    hits.append((end - lengths[pid], end, pid))
+        return hits
+
+
+def whole_words(text: str, hits: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int]]:
+    length = len(text)
+    return [(start, end, pid) for start, end, pid in hits
+            if (start == 0 or not text[start - 1].isalnum()) and (end == length or not text[end].isalnum())]
+
+
+def leftmost_longest(hits: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int]]:
+    selected = []
+    position = 0
+    for start, end, pid in sorted(hits, key=lambda hit: (hit[0], -hit[1])):
+        if start >= position:
+            selected.append((start, end, pid))
+            position = end
+    return selected
+
+
+class EntityExtractor:
+    """Extracts entities with the current automaton; reload swaps the automaton atomically."""
+
+    def __init__(self, automaton: Automaton, overlapping: bool = False, version: str = ""):
+        self.automaton = automaton
+        self.overlapping = overlapping
+        self.version = version
+        self.source = None
+        self.source_mtime = None
+        self.stats = {"messages": 0, "entities": 0, "reloads": 0}
+
+    @classmethod
+    def from_file(cls, path: str, overlapping: bool = False) -> "EntityExtractor":
+        mtime = os.stat(path).st_mtime
+        extractor = cls(Automaton(load_dictionary(path)), overlapping, f"{os.path.basename(path)}@{mtime:.0f}")
+        extractor.source, extractor.source_mtime = path, mtime
+        return extractor
+
+    def reload_if_changed(self) -> bool:
+        if not self.source:
+            return False
+        mtime = os.stat(self.source).st_mtime
+        if mtime == self.source_mtime:
+            return False
+        # Compile first, then publish with one assignment.
+        automaton = Automaton(load_dictionary(self.source))
+        self.automaton = automaton
+        self.version = f"{os.path.basename(self.source)}@{mtime:.0f}"
+        self.source_mtime = mtime
+        self.stats["reloads"] += 1
+        return True
+
+    def extract(self, text: Optional[str]) -> List[Dict]:
+        if not text:
+            return []
+        automaton = self.automaton
+        hits = whole_words(text, automaton.scan(text))
+        if not self.overlapping:
+            hits = leftmost_longest(hits)
+        else:
+            hits.sort()
+        entities = []
+        for start, end, pid in hits:
+            for meta in automaton.metas[pid]:
+                entities.append(dict(meta, text=text[start:end], start=start, end=end))
+        self.stats["messages"] += 1
+        self.stats["entities"] += len(entities)
+        return entities
+
+
+TEXT_FIELDS = ["tweet", "message_text"]
+
+
+def tag_record(extractor: EntityExtractor, record: Dict, text_field: Optional[str] = None) -> Dict:
+    """Adds the entity_names and entities (JSON array as STRING) columns."""
+    field = text_field or next((name for name in TEXT_FIELDS if name in record), None)
+    entities = extractor.extract(record.get(field)) if field else []
+    record["entity_names"] = "; ".join(dict.fromkeys(entity["entity"] for entity in entities))
+    record["entities"] = json.dumps(entities, ensure_ascii=False)
+    return record
+
+
+# --- Verification and benchmark -------------------------------------------------------------------
+
+DEFAULT_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cdw-analyse", "create_db_tables_hive.sql")
+WORDS = ["vessel", "spotted", "near", "the", "harbour", "convoy", "sailing", "tanker", "container", "at", "dawn",
+         "patrol", "ship", "contact", "maintained", "kielwasser", "mainland", "#NATO", "#uboot", "⚓", "heading",
+         "to", "from", "observed", "suspicious", "anchored", "off", "coast", "grey", "warship"]
+
+
+def reference_extract(entries: List[Tuple[str, Dict]], text: str, overlapping: bool) -> List[Tuple[int, int, str]]:
+    """str.find over every pattern, for --verify."""
+    lowered = _lower(text)
+    hits = []
+    keys = list(dict.fromkeys(_lower(pattern.strip()) for pattern, _ in entries if pattern.strip()))
+    for pid, key in enumerate(keys):
+        start = lowered.find(key)
+        while start != -1:
+            hits.append((start, start + len(key), pid))
+            start = lowered.find(key, start + 1)
+    hits = whole_words(text, hits)
+    hits = sorted(hits) if overlapping else leftmost_longest(hits)
+    return [(start, end, keys[pid]) for start, end, pid in hits]
+
+
+def synthetic_patterns(count: int, seed: int = 5) -> List[Tuple[str, Dict]]:
+    rng = random.Random(seed)
+    syllables = ["an", "ga", "ra", "no", "va", "se", "ti", "ko", "ma", "lu", "pe", "dra", "star", "sea", "nord", "ost"]
+    patterns = set()
+    while len(patterns) < count:
+        name = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).capitalize()
+        if rng.random() < 0.4:
+            name = rng.choice(["MV ", "MT ", "FGS "]) + name
+        if rng.random() < 0.2:
+            name += f" {rng.randint(1, 30)}"
+        patterns.add(name)
+    return [(name, {"entity": name, "type": "watchlist"}) for name in sorted(patterns)]
+
+
+def synthetic_messages(entries: List[Tuple[str, Dict]], count: int, seed: int = 9) -> List[str]:
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 25))]
+        for _ in range(rng.randint(0, 3)):
+            name = rng.choice(entries)[0]
+            words.insert(rng.randrange(len(words) + 1), rng.choice([name, name.upper(), name.lower(), name + "s"]))
+        messages.append(" ".join(words))
+    return messages
+
+
+def verify(sql_path: str) -> bool:
+    ok = True
+    extractor = EntityExtractor(Automaton(load_dictionary(sql_path)))
+    types = {}
+    for key, metas in zip(extractor.automaton.keys, extractor.automaton.metas):
+        for meta in metas:
+            types[meta["type"]] = types.get(meta["type"], 0) + 1
+    good = all(types.get(entity_type, 0) > 0 for _, entity_type, _ in SQL_DICTIONARIES.values())
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} dictionary from {os.path.basename(sql_path)}: {types}")
+
+    cases = [
+        ("FGS Sachsen-Anhalt at LAT 54.1°N is shadowing HS ATLANTICA off Kiel.",
+         ["FGS Sachsen-Anhalt", "HS ATLANTICA", "Kiel"]),
+        ("Tanker Angara (M/V Angara) seen near Riga", ["M/V Angara", "M/V Angara", "Riga"]),
+        ("Kielwasser eines Tankers vor KIEL, U-31 getaucht", ["Kiel", "U-31"]),
+        ("Einlaufen in Świnoujście und Klaipėda #NATO ⚓", ["Świnoujście", "Klaipėda"]),
+        ("fgs baden-württemberg escorting A1443 Rhön", ["FGS Baden-Württemberg", "A1443 Rhön"]),
+        ("U-311 and FGS Bayernwald are no units", []),
+    ]
+    for text, expected in cases:
+        entities = extractor.extract(text)
+        names = [entity["entity"] for entity in entities]
+        offsets = all(_lower(text[entity["start"]:entity["end"]]) in (_lower(entity["entity"]),
+                                                                      _lower(normalize_name(entity["entity"])))
+                      for entity in entities)
+        good = names == expected and offsets
+        ok &= good
+        print(f"{'ok  ' if good else 'FAIL'} {text!r} -> {names}")
+
+    entries = load_dictionary(sql_path) + synthetic_patterns(3000)
+    automaton = Automaton(entries)
+    messages = synthetic_messages(entries, 2000)
+    for overlapping in (False, True):
+        extractor = EntityExtractor(automaton, overlapping)
+        mismatches = 0
+        for text in messages:
+            got = [(e["start"], e["end"], _lower(e["text"])) for e in extractor.extract(text)]
+            got = list(dict.fromkeys(got))
+            if got != reference_extract(entries, text, overlapping):
+                mismatches += 1
+        good = mismatches == 0
+        ok &= good
+        print(f"{'ok  ' if good else 'FAIL'} {'overlapping' if overlapping else 'leftmost-longest'}: automaton agrees "
+              f"with str.find reference on {len(messages)} messages ({mismatches} mismatches)")
+
+    # Random text over a large alphabet: the memo stays within max_memo and results do not change.
+    rng = random.Random(3)
+    noise = ["".join(chr(rng.randrange(32, 0x3000)) for _ in range(200)) + " " + text for text in messages[:500]]
+    capped = Automaton(entries, max_memo=200)
+    capped_extractor, extractor = EntityExtractor(capped), EntityExtractor(automaton)
+    same = all(capped_extractor.extract(text) == extractor.extract(text) for text in noise)
+    good = same and capped.memo == 200 and sum(map(len, capped.delta)) == sum(map(len, capped.goto)) + 200
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} memo capped at 200 transitions ({capped.memo} memoized), "
+          f"same entities on {len(noise)} noisy messages")
+    return ok
+
+
+def benchmark(sql_path: str, pattern_count: int, message_count: int):
+    entries = load_dictionary(sql_path) + synthetic_patterns(pattern_count)
+    start = time.perf_counter()
+    automaton = Automaton(entries)
+    build = time.perf_counter() - start
+    messages = synthetic_messages(entries, message_count)
+    extractor = EntityExtractor(automaton)
+    start = time.perf_counter()
+    for text in messages:
+        extractor.extract(text)
+    seconds = time.perf_counter() - start
+    characters = sum(len(text) for text in messages)
+    print(json.dumps({
+        "patterns": len(automaton.keys),
+        "states": automaton.states,
+        "build_seconds": round(build, 2),
+        "messages": message_count,
+        "entities": extractor.stats["entities"],
+        "messages_per_second": round(message_count / seconds),
+        "mb_per_second": round(characters / seconds / 1e6, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Aho-Corasick entity extraction.")
+    arg_parser.add_argument("--dictionary", default=DEFAULT_SQL, help=".sql, .json or .ndjson dictionary")
+    arg_parser.add_argument("--verify", action="store_true", help="Compare with a str.find reference")
+    arg_parser.add_argument("--benchmark", action="store_true", help="Throughput in messages/s")
+    arg_parser.add_argument("--patterns", type=int, default=50000, help="Synthetic patterns added for --benchmark")
+    arg_parser.add_argument("--messages", type=int, default=100000)
+    args = arg_parser.parse_args()
+
+    if args.verify:
+        raise SystemExit(0 if verify(args.dictionary) else 1)
+    if args.benchmark:
+        benchmark(args.dictionary, args.patterns, args.messages)
@@ -0,0 +1,446 @@
+"""
+Streaming near-duplicate detection for social_media_messages (tweet) and
+maritime_surveillance_reports (message_text).
+
+Each message is normalized (lower case, retweet prefix, @mentions and URLs
+removed), cut into character 5-gram shingles and summarized by a MinHash
+signature of num_perm values (one-permutation MinHash, see MinHasher).
+Shingling and signatures are computed for a whole batch at once with numpy.
+
+An LSH banding index (bands x rows = num_perm) maps every band of a live
+signature to the clusters that contain it. A new message is compared only with
+the clusters it shares a band with; if the estimated Jaccard similarity to one
+of them reaches the threshold it joins that cluster, otherwise it starts a new
+one. A message similar to several clusters merges them (single linkage over a
+union-find), so a family split by its first, dissimilar variants comes back
+together; records emitted after the merge carry the surviving id, records
+emitted before it keep theirs (ids are not rewritten downstream, so the
+lagebild view collapses a merged family only from the merge on). Every bucket
+keeps only the most recent member per cluster, so a storm of
+identical reposts costs one comparison per message, not one per repost.
+
+Messages leave the index when they fall out of the sliding time window (or
+when max_messages is reached), so memory is bounded by the window. Records get
+cluster_id (stable hash of the first message's normalized text) and
+duplicate_count (members of the cluster so far, 1 for the first); downstream
+reads one representative per cluster_id instead of partitioning by the full
+text.
+
+    python near_duplicates.py --verify
+    python near_duplicates.py --benchmark --messages 200000
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SHINGLE = 5
+TEXT_FIELDS = ["tweet", "message_text"]
+TIME_FIELDS = ["ts", "message_timestamp"]
+
+_RETWEET = re.compile(r"^\s*rt\s+@\w+:?\s*")
+_NOISE = re.compile(r"https?://\S+|@\w+")
+_NON_WORD = re.compile(r"[^\w#]+")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    text = (text or "").lower()
+    if text.lstrip().startswith("rt"):
+        text = _RETWEET.sub("", text)
+    if "@" in text or "http" in text:
+        text = _NOISE.sub(" ", text)
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def lsh_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """(bands, rows) with bands * rows == num_perm whose S-curve midpoint (1/b)^(1/r) is closest to threshold."""
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold))
+
+
+class MinHasher:
+    """
+    One-permutation MinHash: every shingle hash is mixed once, its upper bits pick
+    one of num_perm bins and the lower 32 bits compete for the bin minimum, so a
+    batch costs one sort of all shingles instead of num_perm hash evaluations per
+    shingle. Empty bins are filled from the next non-empty bin (rotation
+    densification) with a per-distance offset.
+    """
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.mix = np.uint64(int(rng.integers(1, 2 ** 63)) | 1)
+        self.offset = np.uint64(int(rng.integers(1, 2 ** 31)) * 2 + 1)
+        self.powers = np.array([pow(1099511628211, SHINGLE - 1 - i, 1 << 64) for i in range(SHINGLE)],
+                               dtype=np.uint64)
+
+    def shingle_hashes(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """64-bit hashes of all character shingles and the message index of each."""
+        encoded = [text.encode("utf-8").ljust(SHINGLE) for text in texts]
+        lengths = np.array([len(data) for data in encoded], dtype=np.int64)
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+        size = len(data) - SHINGLE + 1
+        with np.errstate(over="ignore"):
+            hashes = data[:size] * self.powers[0]
+            for i in range(1, SHINGLE):
+                hashes += data[i:i + size] * self.powers[i]
+        counts = lengths - SHINGLE + 1
+        message = np.repeat(np.arange(len(texts), dtype=np.uint64), counts)
+        # Only windows that lie completely inside one message
+        starts = np.r_[0, np.cumsum(lengths)[:-1]]
+        first = np.r_[0, np.cumsum(counts)[:-1]]
+        keep = np.repeat(starts - first, counts) + np.arange(counts.sum())
+        return hashes[keep], message
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), num_perm) uint32 MinHash signatures."""
+        n, bins = len(texts), self.num_perm
+        if not n:
+            return np.zeros((0, bins), dtype=np.uint32)
+        hashes, message = self.shingle_hashes(texts)
+        with np.errstate(over="ignore"):
+            mixed = hashes * self.mix
+            mixed ^= mixed >> np.uint64(29)
+            mixed *= self.mix
+        bin_of = (mixed >> np.uint64(32)) % np.uint64(bins) if bins & (bins - 1) else \
+            (mixed >> np.uint64(32)) & np.uint64(bins - 1)
+        keys = np.sort(((message * np.uint64(bins) + bin_of) << np.uint64(32)) | (mixed & np.uint64(0xFFFFFFFF)))
+        cells = keys >> np.uint64(32)
+        first = np.empty(len(cells), dtype=bool)
+        first[0] = True
+        np.not_equal(cells[1:], cells[:-1], out=first[1:])
+        filled = cells[first].astype(np.int64)
+        signature = np.full(n * bins, 0xFFFFFFFF, dtype=np.uint32)
+        signature[filled] = keys[first].astype(np.uint32)
+
+        if len(filled) < n * bins:
+            # Next filled bin to the right, wrapping around within the message's row
+            is_empty = np.ones(n * bins, dtype=bool)
+            is_empty[filled] = False
+            empty = np.flatnonzero(is_empty)
+            row_start = empty - empty % bins
+            following = np.searchsorted(filled, empty)
+            source = filled[np.minimum(following, len(filled) - 1)]
+            wrap = (following == len(filled)) | (source >= row_start + bins)
+            source[wrap] = filled[np.searchsorted(filled, row_start[wrap])]
+            distance = (source - empty) % bins
+            with np.errstate(over="ignore"):
+                signature[empty] = (signature[source] + distance.astype(np.uint32)
+                                    * np.uint32(self.offset & np.uint64(0xFFFFFFFF)))
+        return signature.reshape(n, bins)
+
+
+def parse_time(value) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        stamp = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return stamp.timestamp()
+
+
+class NearDuplicateIndex:
+    def __init__(self, window_seconds: float = 3600.0, threshold: float = 0.7, num_perm: int = 128,
+                 max_messages: int = 200000, seed: int = 1):
+        self.window_seconds = window_seconds
+        self.threshold = threshold
+        self.max_messages = max_messages
+        self.hasher = MinHasher(num_perm, seed)
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        band_seed = np.random.default_rng(seed + 1)
+        self.band_mix = band_seed.integers(1, 2 ** 63, (self.rows,), dtype=np.uint64) | np.uint64(1)
+
+        self.signatures = np.zeros((max_messages, num_perm), dtype=np.uint32)
+        self.band_keys = np.zeros((max_messages, self.bands), dtype=np.uint64)
+        self.slot_cluster: List[Optional[str]] = [None] * max_messages
+        self.free = list(range(max_messages - 1, -1, -1))
+        self.live: deque = deque()  # (time, slot) in arrival order
+        # LSH buckets of all bands in one dict; the band number is in the low byte of the key
+        self.buckets: Dict[int, Dict[str, int]] = {}
+        # cluster_id -> [duplicate_count, live members, ids merged into it]
+        self.clusters: Dict[str, list] = {}
+        self.parent: Dict[str, str] = {}
+        self.newest = float("-inf")
+        self.stats = {"messages": 0, "duplicates": 0, "evicted": 0, "comparisons": 0, "merges": 0}
+
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        bands = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        with np.errstate(over="ignore"):
+            keys = (bands * self.band_mix).sum(axis=2, dtype=np.uint64)
+        return (keys & np.uint64(~0xFF & 0xFFFFFFFFFFFFFFFF)) | np.arange(self.bands, dtype=np.uint64)
+
+    def _find(self, cluster: str) -> str:
+        parent = self.parent
+        root = cluster
+        while root in parent:
+            root = parent[root]
+        while cluster != root:
+            parent[cluster], cluster = root, parent[cluster]
+        return root
+
+    def _merge(self, target: str, others: List[str]):
+        """Single linkage: a message similar to several clusters joins them; later records carry the target id."""
+        state = self.clusters[target]
+        for other in others:
+            merged = self.clusters.pop(other)
+            state[0] += merged[0]
+            state[1] += merged[1]
+            state[2] += [other] + merged[2]
+            self.parent[other] = target
+            self.stats["merges"] += 1
+
+    def _evict(self, until: float):
+        live = self.live
+        while live and (live[0][0] < until or not self.free):
+            _, slot = live.popleft()
+            cluster = self.slot_cluster[slot]
+            buckets = self.buckets
+            for key in self.band_keys[slot].tolist():
+                members = buckets.get(key)
+                if members is not None and members.get(cluster) == slot:
+                    del members[cluster]
+                    if not members:
+                        del buckets[key]
+            root = self._find(cluster)
+            state = self.clusters[root]
+            state[1] -= 1
+            if state[1] == 0:
+                for merged in state[2]:
+                    del self.parent[merged]
+                del self.clusters[root]
+            self.slot_cluster[slot] = None
+            self.free.append(slot)
+            self.stats["evicted"] += 1
+
+    def add(self, texts: List[str], times: List[Optional[float]]) -> List[Tuple[str, int]]:
+        """(cluster_id, duplicate_count) per text; times in epoch seconds (None: newest seen)."""
+        normalized = [normalize_text(text) for text in texts]
+        signatures = self.hasher.signatures(normalized)
+        keys = self._band_keys(signatures)
+        results = []
+        buckets_get, buckets_setdefault = self.buckets.get, self.buckets.setdefault
+        for i, text in enumerate(normalized):
+            t = times[i] if times[i] is not None else self.newest
+            if t > self.newest:
+                self.newest = t
+            self._evict(self.newest - self.window_seconds)
+            if not self.free:
+                self._evict(float("inf"))
+
+            row = keys[i].tolist()
+            candidates = {}
+            for key in row:
+                members = buckets_get(key)
+                if members:
+                    candidates.update(members)
+            cluster = None
+            if candidates:
+                slots = np.fromiter(candidates.values(), dtype=np.int64, count=len(candidates))
+                similarity = np.count_nonzero(self.signatures[slots] == signatures[i], axis=1) / self.hasher.num_perm
+                self.stats["comparisons"] += len(slots)
+                order = np.argsort(-similarity, kind="stable")
+                matches = order[similarity[order] >= self.threshold]
+                if len(matches):
+                    roots = list(dict.fromkeys(self._find(self.slot_cluster[int(slots[j])]) for j in matches.tolist()))
+                    cluster = roots[0]
+                    if len(roots) > 1:
+                        self._merge(cluster, roots[1:])
+            if cluster is None:
+                cluster = self._find(hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest())
+                if cluster not in self.clusters:
+                    self.clusters[cluster] = [0, 0, []]
+            if self.clusters[cluster][0]:
+                self.stats["duplicates"] += 1
+            state = self.clusters[cluster]
+            state[0] += 1
+            state[1] += 1
+
+            slot = self.free.pop()
+            self.signatures[slot] = signatures[i]
+            self.band_keys[slot] = keys[i]
+            self.slot_cluster[slot] = cluster
+            for key in row:
+                buckets_setdefault(key, {})[cluster] = slot
+            self.live.append((t, slot))
+            self.stats["messages"] += 1
+            results.append((cluster, state[0]))
+        return results
+
+    def tag(self, records: List[Dict], text_field: Optional[str] = None) -> List[Dict]:
+        """Adds cluster_id and duplicate_count to tweet / STANAG records."""
+        texts, times = [], []
+        for record in records:
+            field = text_field or next((name for name in TEXT_FIELDS if name in record), None)
+            texts.append(record.get(field) if field else "")
+            times.append(parse_time(next((record[name] for name in TIME_FIELDS if record.get(name)), None)))
+        for record, (cluster, count) in zip(records, self.add(texts, times)):
+            record["cluster_id"] = cluster
+            record["duplicate_count"] = count
+        return records
+
+
+# --- Verification and benchmark -------------------------------------------------------------------
+
+_SYLLABLES = ["an", "ber", "ko", "la", "mar", "ne", "ost", "ri", "see", "ta", "vik", "hav", "en", "sund", "dal"]
+# Harbours, ship types and 3000 generated words, so unrelated messages share few shingles
+WORDS = ("vessel spotted near harbour convoy sailing tanker container dawn patrol ship contact grey warship "
+         "anchored coast heading suspicious lights drone frigate buoy signal cargo fishing trawler ferry "
+         "kiel rostock gdansk riga tallinn helsinki").split() + sorted({
+    "".join(random.Random(i).choice(_SYLLABLES) for _ in range(2 + i % 3)) + str(i % 7) for i in range(3000)})
+HASHTAGS = ["#suspect", "#vessel", "#container", "#uboot", "#sanctioned", "#Marine", "#NATO"]
+
+
+def synthetic_messages(count: int, families: int, seed: int = 7) -> Tuple[List[str], List[float], List[int]]:
+    """Families of near-identical texts (reposts, one word changed, other hashtags) spread over two hours."""
+    rng = random.Random(seed)
+    bases = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 25))) for _ in range(families)]
+    texts, times, labels = [], [], []
+    start = 1759305600.0
+    for i in range(count):
+        family = rng.randrange(families)
+        words = bases[family].split()
+        variant = rng.random()
+        if variant < 0.3:
+            words[rng.randrange(len(words))] = rng.choice(WORDS)
+        text = " ".join(words) + " " + " ".join(rng.sample(HASHTAGS, 2))
+        if variant > 0.7:
+            text = f"RT @user{rng.randint(1, 999)}: {text}"
+        texts.append(text)
+        times.append(start + i * 7200.0 / count)
+        labels.append(family)
+    return texts, times, labels
+
+
+def exact_jaccard(a: str, b: str) -> float:
+    sa = {a[i:i + SHINGLE] for i in range(max(1, len(a) - SHINGLE + 1))}
+    sb = {b[i:i + SHINGLE] for i in range(max(1, len(b) - SHINGLE + 1))}
+    return len(sa & sb) / len(sa | sb)
+
+
+def verify() -> bool:
+    ok = True
+    rng = random.Random(3)
+    hasher = MinHasher(128)
+    pairs = []
+    for _ in range(300):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 30))]
+        other = list(words)
+        for _ in range(rng.randint(0, 10)):
+            other[rng.randrange(len(other))] = rng.choice(WORDS)
+        pairs.append((" ".join(words), " ".join(other)))
+    signatures = hasher.signatures([text for pair in pairs for text in pair])
+    estimated = (signatures[0::2] == signatures[1::2]).mean(axis=1)
+    exact = np.array([exact_jaccard(a, b) for a, b in pairs])
+    error = float(np.abs(estimated - exact).mean())
+    good = error < 0.04
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} MinHash(128) mean absolute Jaccard error {error:.3f} on 300 pairs")
+
+    one = MinHasher(128).signatures(["same text here"] * 3 + ["ab"])
+    good = (one[0] == one[1]).all() and (one[0] == one[2]).all()
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} identical texts give identical signatures, short texts are shingled")
+
+    texts, times, labels = synthetic_messages(20000, 400)
+    index = NearDuplicateIndex(window_seconds=7200, threshold=0.7, max_messages=50000)
+    clusters = []
+    for start in range(0, len(texts), 1000):
+        clusters += [cluster for cluster, _ in index.add(texts[start:start + 1000], times[start:start + 1000])]
+    # Recall: sampled pairs of one family with exact Jaccard >= 0.8 should share a cluster, both by the id
+    # emitted with the record and after later merges. Precision: pairs sharing a cluster come from one family.
+    final = [index._find(cluster) for cluster in clusters]
+    members: Dict[int, List[int]] = {}
+    for i, family in enumerate(labels):
+        members.setdefault(family, []).append(i)
+    normalized = [normalize_text(text) for text in texts]
+    similar = emitted = merged = 0
+    for family_members in members.values():
+        for _ in range(20):
+            a, b = rng.sample(family_members, 2)
+            if exact_jaccard(normalized[a], normalized[b]) >= 0.8:
+                similar += 1
+                emitted += clusters[a] == clusters[b]
+                merged += final[a] == final[b]
+    by_cluster: Dict[str, Dict[int, int]] = {}
+    for family, cluster in zip(labels, final):
+        by_cluster.setdefault(cluster, {}).setdefault(family, 0)
+        by_cluster[cluster][family] += 1
+    cluster_pairs = sum(n * (n - 1) / 2 for n in (sum(counts.values()) for counts in by_cluster.values()))
+    family_pairs = sum(sum(n * (n - 1) / 2 for n in counts.values()) for counts in by_cluster.values())
+    precision = family_pairs / cluster_pairs
+    good = merged / similar > 0.98 and emitted / similar > 0.85 and precision > 0.99
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} 20000 messages in 400 families -> {len(by_cluster)} clusters; "
+          f"{similar} pairs with Jaccard >= 0.8: recall {emitted / similar:.3f} by emitted id, "
+          f"{merged / similar:.3f} after merges; pair precision {precision:.3f}")
+
+    counts = [count for _, count in index.add(["fresh text never seen before at all"] * 3, [None] * 3)]
+    good = counts == [1, 2, 3]
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} duplicate_count increments per cluster: {counts}")
+
+    index = NearDuplicateIndex(window_seconds=600, threshold=0.7, max_messages=50000)
+    for start in range(0, len(texts), 1000):
+        index.add(texts[start:start + 1000], times[start:start + 1000])
+    per_window = len(texts) * 600 / 7200
+    good = len(index.live) <= per_window + 1 and len(index.buckets) > 0
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} 10 min window keeps {len(index.live)} of {len(texts)} messages "
+          f"(<= {per_window:.0f}), {len(index.clusters)} live clusters")
+
+    index = NearDuplicateIndex(window_seconds=1e9, max_messages=1000)
+    index.add(texts[:5000], times[:5000])
+    good = len(index.live) == 1000 and index.stats["evicted"] == 4000
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} max_messages 1000 bounds the index ({len(index.live)} live)")
+    return ok
+
+
+def benchmark(messages: int, families: int, batch_size: int):
+    texts, times, _ = synthetic_messages(messages, families)
+    index = NearDuplicateIndex(window_seconds=3600)
+    start = time.perf_counter()
+    for offset in range(0, messages, batch_size):
+        index.add(texts[offset:offset + batch_size], times[offset:offset + batch_size])
+    seconds = time.perf_counter() - start
+    begin = time.perf_counter()
+    index.hasher.signatures([normalize_text(text) for text in texts[:20000]])
+    signature_seconds = time.perf_counter() - begin
+    print(json.dumps({
+        "messages": messages,
+        "batch_size": batch_size,
+        "bands_x_rows": f"{index.bands}x{index.rows}",
+        "messages_per_second": round(messages / seconds),
+        "signatures_per_second": round(min(messages, 20000) / signature_seconds),
+        "duplicates": index.stats["duplicates"],
+        "comparisons_per_message": round(index.stats["comparisons"] / messages, 2),
+        "live_messages": len(index.live),
+        "live_clusters": len(index.clusters),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="MinHash/LSH near-duplicate detection.")
+    arg_parser.add_argument("--verify", action="store_true", help="Estimator error, cluster quality, bounded memory")
+    arg_parser.add_argument("--benchmark", action="store_true", help="Throughput in messages/s")
+    arg_parser.add_argument("--messages", type=int, default=200000)
+    arg_parser.add_argument("--families", type=int, default=20000)
+    arg_parser.add_argument("--batch-size", type=int, default=1000)
+    args = arg_parser.parse_args()
+
+    if args.verify:
+        raise SystemExit(0 if verify() else 1)
+    if args.benchmark:
+        benchmark(args.messages, args.families, args.batch_size)
@@ -0,0 +1,494 @@
+"""
+In-stream sanctions screening for ais_events and ships records.
+
+The sanctioned_vessels list (Name, MMSI, IMO, Type, Flag, Sanction_Reason,
+Linked_To) is loaded into
+
+    - hash maps MMSI -> entry and IMO -> entry (exact matches),
+    - a character trigram inverted index over normalized names
+      ("M/V Angara", "ANGARA (ex OCEAN STAR)" -> "ANGARA") for fuzzy matching
+      with a Dice similarity threshold.
+
+Records are tagged with sanctions_match (MMSI / IMO / Name / Linked MMSI),
+sanctions_name, sanctions_score, Sanction_Reason and Linked_To. A ships record
+matched via IMO or name links its MMSI to the entry, so later ais_events
+positions of that vessel are tagged as well (entries listed with IMO only).
+
+A list is immutable after construction; Screener.reload builds a new one and
+swaps a single reference, so concurrent lookups always see either the old or
+the new list, never a half-built one. Each record is screened against one
+snapshot of that reference. Name lookups are cached per normalized name
+because the same few thousand names repeat at AIS rate; the cache and the
+MMSI links hold entry indices and therefore live on the list they refer to.
+
+Used by the SanctionsScreening NiFi processor and standalone:
+
+    python sanctions.py screen --list sanctioned_vessels.csv < ships.ndjson
+    python sanctions.py verify
+    python sanctions.py benchmark
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+GRAM = 3
+# Vessel prefixes and ship-type abbreviations that are not part of the name.
+PREFIXES = {"MV", "MT", "MS", "SS", "MY", "FV", "RV", "LNG", "LPG", "CS", "SV", "M", "V", "T", "THE"}
+EX_NAME = re.compile(r"\b(EX|F/K/A|FKA|A\.K\.A\.|AKA)\b.*$")
+NON_ALNUM = re.compile(r"[^A-Z0-9]+")
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Upper case, accents removed, prefixes and former names dropped: 'M/V Angara (ex Ocean)' -> 'ANGARA'."""
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii").upper()
+    text = re.sub(r"\(.*?\)", " ", text)
+    text = EX_NAME.sub(" ", text)
+    words = NON_ALNUM.sub(" ", text).split()
+    while len(words) > 1 and words[0] in PREFIXES:
+        words.pop(0)
+    return " ".join(words)
+
+
+def grams(name: str) -> set:
+    padded = f" {name} "
+    return {padded[i:i + GRAM] for i in range(len(padded) - GRAM + 1)}
+
+
+_MISSING = object()
+
+
+def _int(value) -> Optional[int]:
+    """Positive integer or None; IMO numbers may carry their prefix as in ships.imo_number ('IMO9179842')."""
+    if isinstance(value, str):
+        value = value.strip()
+        if value[:3].upper() == "IMO":
+            value = value[3:]
+    try:
+        number = int(float(value))
+    except (TypeError, ValueError):
+        return None
+    return number if number > 0 else None
+
+
+class SanctionsList:
+    """
+    Immutable lookup structures for one version of the sanctions list, plus the
+    name cache and MMSI links whose entry indices refer to this version.
+    """
+
+    def __init__(self, entries: List[Dict], threshold: float = 0.8, version: str = ""):
+        self.entries = entries
+        self.threshold = threshold
+        self.version = version
+        self.name_cache: OrderedDict = OrderedDict()
+        self.linked_mmsi: Dict[int, Tuple[int, str]] = {}
+        self.by_mmsi: Dict[int, int] = {}
+        self.by_imo: Dict[int, int] = {}
+        self.names: List[str] = []
+        self.gram_sets: List[frozenset] = []
+        index: Dict[str, List[int]] = {}
+        for i, entry in enumerate(entries):
+            mmsi, imo = _int(entry.get("MMSI")), _int(entry.get("IMO"))
+            if mmsi:
+                self.by_mmsi.setdefault(mmsi, i)
+            if imo:
+                self.by_imo.setdefault(imo, i)
+            name = normalize_name(entry.get("Name"))
+            self.names.append(name)
+            name_grams = frozenset(grams(name)) if name else frozenset()
+            self.gram_sets.append(name_grams)
+            for gram in name_grams:
+                index.setdefault(gram, []).append(i)
+        self.index = {gram: tuple(ids) for gram, ids in index.items()}
+
+    def match_name(self, name: str) -> Optional[Tuple[int, float]]:
+        """
+        Best entry for a normalized name with Dice similarity >= threshold.
+
+        A match shares at least ceil(t * q / (2 - t)) of the q query trigrams, so
+        candidates only need to be collected from the q - that + 1 rarest query
+        trigrams (prefix filter); their exact overlap is then computed by set
+        intersection, after a length filter on the entry's trigram count.
+        """
+        if not name:
+            return None
+        query = grams(name)
+        size = len(query)
+        t = self.threshold
+        min_shared = max(1, math.ceil(t * size / (2 - t) - 1e-9))
+        postings = sorted((self.index.get(gram, ()) for gram in query), key=len)
+        candidates = set()
+        for ids in postings[:size - min_shared + 1]:
+            candidates.update(ids)
+        low, high = t * size / (2 - t) - 1e-9, size * (2 - t) / t + 1e-9
+        best, best_score = None, t
+        for i in sorted(candidates):
+            entry_grams = self.gram_sets[i]
+            if not low <= len(entry_grams) <= high:
+                continue
+            score = 2.0 * len(query & entry_grams) / (size + len(entry_grams))
+            if score >= best_score:
+                best, best_score = i, score
+        return (best, best_score) if best is not None else None
+
+
+class Screener:
+    """Tags records against the current SanctionsList; reload swaps the list atomically."""
+
+    def __init__(self, sanctions: SanctionsList, cache_size: int = 100000):
+        self.sanctions = sanctions
+        self.cache_size = cache_size
+        self.stats = {"records": 0, "matches": 0, "reloads": 0}
+        self.source = None
+        self.source_mtime = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str, threshold: float = 0.8) -> "Screener":
+        screener = cls(load_list(path, threshold))
+        screener.source, screener.source_mtime = path, os.stat(path).st_mtime
+        return screener
+
+    def reload(self, sanctions: SanctionsList):
+        # Build happens outside; readers take self.sanctions once per record. The new
+        # list starts with an empty name cache and no MMSI links.
+        with self._lock:
+            self.sanctions = sanctions
+            self.stats["reloads"] += 1
+
+    def reload_if_changed(self, threshold: Optional[float] = None) -> bool:
+        """Reloads self.source when its mtime or the threshold changed."""
+        if not self.source:
+            return False
+        mtime = os.stat(self.source).st_mtime
+        threshold = self.sanctions.threshold if threshold is None else threshold
+        if mtime == self.source_mtime and threshold == self.sanctions.threshold:
+            return False
+        self.reload(load_list(self.source, threshold))
+        self.source_mtime = mtime
+        return True
+
+    def _name_match(self, sanctions: SanctionsList, name) -> Optional[Tuple[int, float]]:
+        normalized = normalize_name(name)
+        if not normalized:
+            return None
+        cache = sanctions.name_cache
+        result = cache.get(normalized, _MISSING)
+        if result is _MISSING:
+            result = cache[normalized] = sanctions.match_name(normalized)
+            if len(cache) > self.cache_size:
+                try:
+                    cache.popitem(last=False)
+                except KeyError:  # emptied by a concurrent reader
+                    pass
+        return result
+
+    def match(self, record: Dict, sanctions: Optional[SanctionsList] = None) -> Optional[Tuple[int, str, float]]:
+        """
+        (entry index, match type, score) for ais_events (MMSI) and ships (mmsi,
+        imo_number, ship_name) records; the index refers to sanctions (default:
+        the current list).
+        """
+        sanctions = self.sanctions if sanctions is None else sanctions
+        mmsi = _int(record.get("MMSI", record.get("mmsi")))
+        if mmsi is not None:
+            if mmsi in sanctions.by_mmsi:
+                return sanctions.by_mmsi[mmsi], "MMSI", 1.0
+        imo = _int(record.get("imo_number", record.get("IMO")))
+        if imo is not None and imo in sanctions.by_imo:
+            result = sanctions.by_imo[imo], "IMO", 1.0
+        else:
+            name = record.get("ship_name", record.get("Name"))
+            found = self._name_match(sanctions, name) if name else None
+            result = (found[0], "Name", round(found[1], 3)) if found else None
+        if mmsi is not None:
+            if result is not None:
+                sanctions.linked_mmsi[mmsi] = (result[0], result[1])
+            else:
+                linked = sanctions.linked_mmsi.get(mmsi)
+                if linked is not None:
+                    return linked[0], f"Linked MMSI ({linked[1]})", 1.0
+        return result
+
+    def tag(self, record: Dict) -> Dict:
+        sanctions = self.sanctions
+        found = self.match(record, sanctions)
+        self.stats["records"] += 1
+        if found is None:
+            record["sanctioned"] = False
+            return record
+        self.stats["matches"] += 1
+        entry = sanctions.entries[found[0]]
+        record["sanctioned"] = True
+        record["sanctions_match"] = found[1]
+        record["sanctions_score"] = found[2]
+        record["sanctions_name"] = entry.get("Name")
+        record["Sanction_Reason"] = entry.get("Sanction_Reason")
+        record["Linked_To"] = entry.get("Linked_To")
+        return record
+
+    def tag_all(self, records: Iterable[Dict]) -> List[Dict]:
+        return [self.tag(record) for record in records]
+
+
+# --- Loading --------------------------------------------------------------------------------------
+
+COLUMNS = ["Name", "MMSI", "IMO", "Type", "Flag", "Sanction_Reason", "Linked_To"]
+
+
+def _canonical(row: Dict) -> Dict:
+    keys = {column.lower(): column for column in COLUMNS}
+    return {keys.get(key.lower(), key): value for key, value in row.items()}
+
+
+def load_entries(path: str) -> List[Dict]:
+    """sanctioned_vessels as CSV (header), NDJSON/JSON array, or the INSERT statements of a .sql file."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if path.lower().endswith(".sql"):
+        # entity_extraction imports normalize_name from this module, hence the late import.
+        from entity_extraction import sql_column_rows
+
+        # Values are mapped by the statement's column list: the entries without MMSI
+        # are inserted as (Name, IMO, Type, Flag, Sanction_Reason, Linked_To).
+        rows = []
+        for table, columns, values in sql_column_rows(text):
+            if table == "sanctioned_vessels":
+                entry = dict.fromkeys(COLUMNS)
+                entry.update(_canonical(dict(zip(columns or COLUMNS, values))))
+                rows.append(entry)
+        return rows
+    if path.lower().endswith(".csv"):
+        return [_canonical(row) for row in csv.DictReader(text.splitlines())]
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        return [_canonical(row) for row in json.loads(stripped)]
+    return [_canonical(json.loads(line)) for line in text.splitlines() if line.strip()]
+
+
+def load_list(path: str, threshold: float = 0.8) -> SanctionsList:
+    return SanctionsList(load_entries(path), threshold, version=f"{os.path.basename(path)}@{os.stat(path).st_mtime:.0f}")
+
+
+# --- Verification and benchmark -------------------------------------------------------------------
+
+DEFAULT_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cdw-analyse", "create_db_tables_hive.sql")
+
+
+def reference_match(entries: List[Dict], record: Dict, threshold: float) -> Optional[Tuple[int, str, float]]:
+    """Linear scan with the same semantics as Screener.match (without MMSI linking)."""
+    mmsi = _int(record.get("MMSI", record.get("mmsi")))
+    imo = _int(record.get("imo_number"))
+    for match_type, value, column in (("MMSI", mmsi, "MMSI"), ("IMO", imo, "IMO")):
+        if value is not None:
+            for i, entry in enumerate(entries):
+                if _int(entry.get(column)) == value:
+                    return i, match_type, 1.0
+    name = normalize_name(record.get("ship_name"))
+    if not name:
+        return None
+    best, best_score = None, threshold
+    for i, entry in enumerate(entries):
+        other = normalize_name(entry.get("Name"))
+        if not other:
+            continue
+        a, b = grams(name), grams(other)
+        score = 2.0 * len(a & b) / (len(a) + len(b))
+        if score >= best_score:
+            best, best_score = i, score
+    return (best, "Name", round(best_score, 3)) if best is not None else None
+
+
+def synthetic_entries(count: int, seed: int = 3) -> List[Dict]:
+    import random
+    rng = random.Random(seed)
+    syllables = ["AN", "GA", "RA", "NO", "VA", "SE", "TI", "KO", "MA", "LU", "PE", "DRA", "STAR", "SEA", "OCE"]
+    entries = []
+    for i in range(count):
+        name = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+        if rng.random() < 0.3:
+            name += f" {rng.randint(1, 9)}"
+        entries.append({"Name": name, "MMSI": str(273000000 + i) if rng.random() < 0.5 else None,
+                        "IMO": str(9000000 + i), "Type": "Crude Oil Tanker", "Flag": "Unknown",
+                        "Sanction_Reason": "EU Regulation 833/2014 Annex XLII", "Linked_To": "synthetic"})
+    return entries
+
+
+def verify(sql_path: str) -> bool:
+    ok = True
+    cases = [("M/V Angara", "ANGARA"), ("m.v. angara", "ANGARA"), ("MT HS ATLANTICA (ex Ocean Star)", "HS ATLANTICA"),
+             ("Ángara", "ANGARA"), ("LNG  Pioneer", "PIONEER"), ("HAI II", "HAI II")]
+    for raw, expected in cases:
+        good = normalize_name(raw) == expected
+        ok &= good
+        print(f"{'ok  ' if good else 'FAIL'} normalize {raw!r} -> {normalize_name(raw)!r}")
+
+    entries = load_entries(sql_path)
+    without_mmsi = [entry for entry in entries if entry["MMSI"] is None]
+    good = len(without_mmsi) > 0 and all(entry["Name"] and _int(entry["IMO"]) and entry["Linked_To"]
+                                         for entry in entries)
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} {len(entries)} entries from {os.path.basename(sql_path)}, "
+          f"{len(without_mmsi)} listed with IMO only")
+
+    # "M/V Angara" is one of the IMO-only rows; ships.imo_number carries the "IMO" prefix.
+    screener = Screener(SanctionsList(entries, 0.8))
+    angara = next((i for i, entry in enumerate(entries) if entry["Name"] == "M/V Angara"), None)
+    imo = f"IMO{int(entries[angara]['IMO']):07d}" if angara is not None else None
+    checks = [
+        ({"mmsi": 211000001, "ship_name": "Angara", "imo_number": None}, angara, "Name"),
+        ({"mmsi": 211000002, "ship_name": "SOMETHING ELSE", "imo_number": imo}, angara, "IMO"),
+        ({"MMSI": 211000002, "Latitude": 54.3, "Longitude": 10.1}, angara, "Linked MMSI (IMO)"),
+        ({"MMSI": int(entries[0]["MMSI"]), "Latitude": 54.3}, 0, "MMSI"),
+        ({"mmsi": 211000003, "ship_name": "ANGARA RIVER EXPRESS", "imo_number": None}, None, None),
+        ({"MMSI": 211000004, "Latitude": 54.3}, None, None),
+    ]
+    for record, entry, match_type in checks:
+        found = screener.match(record)
+        good = (found is None and entry is None) or (found is not None and found[:2] == (entry, match_type))
+        ok &= good
+        print(f"{'ok  ' if good else 'FAIL'} {json.dumps(record)} -> {found}")
+
+    # Index vs. linear scan on a large synthetic list with misspelled names
+    import random
+    rng = random.Random(11)
+    entries = synthetic_entries(2000)
+    sanctions = SanctionsList(entries, 0.75)
+    mismatches = 0
+    for i in range(1000):
+        name = rng.choice(entries)["Name"]
+        if rng.random() < 0.5:
+            position = rng.randrange(len(name))
+            name = name[:position] + rng.choice("AEIOUXZ") + name[position + 1:]
+        record = {"mmsi": 219000000 + i, "ship_name": "MV " + name, "imo_number": None}
+        expected = reference_match(entries, record, 0.75)
+        found = Screener(sanctions).match(record)
+        # Equal scores may resolve to different entries; compare by score then.
+        if (expected is None) != (found is None) or (found and (found[2] != expected[2])):
+            mismatches += 1
+    good = mismatches == 0
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} inverted index agrees with linear scan on 1000 fuzzy lookups "
+          f"({mismatches} mismatches)")
+
+    # Atomic reload: lists of different sizes, so that an entry index applied to the
+    # other list fails or names a different vessel. Every tagged record must carry
+    # the entry its own name (or its MMSI's linked name) matched.
+    lists = [SanctionsList(entries[:1500], 0.8), SanctionsList(entries[1500:], 0.8)]
+    screener = Screener(lists[0])
+    errors, wrong, tagged = [], [], [0]
+    stop = threading.Event()
+    # Entry names a ship name can be tagged with, by a name match or a link, in either list.
+    allowed = {}
+    for entry in entries:
+        found = [sanctions.match_name(normalize_name(entry["Name"])) for sanctions in lists]
+        allowed[entry["Name"]] = {sanctions.entries[hit[0]]["Name"] for sanctions, hit in zip(lists, found) if hit}
+
+    def reader(offset):
+        while not stop.is_set():
+            try:
+                for i, entry in enumerate(entries[offset::7]):
+                    mmsi = 230000000 + offset * 1000 + i
+                    for record in ({"mmsi": mmsi, "ship_name": entry["Name"]}, {"MMSI": mmsi}):
+                        result = screener.tag(record)
+                        tagged[0] += 1
+                        if result["sanctioned"] and result["sanctions_name"] not in allowed[entry["Name"]]:
+                            wrong.append((entry["Name"], result["sanctions_name"]))
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=reader, args=(offset,)) for offset in range(3)]
+    for thread in threads:
+        thread.start()
+    for i in range(200):
+        screener.reload(lists[(i + 1) % 2])
+        time.sleep(0.001)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    good = not errors and not wrong and screener.stats["reloads"] == 200
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} 200 reloads between lists of 1500 / 500 entries under concurrent lookups: "
+          f"{tagged[0]} records, {len(errors)} errors, {len(wrong)} tagged with another list's entry"
+          f"{f' ({errors[0]!r})' if errors else ''}")
+    return ok
+
+
+def benchmark(entries_count: int, records_count: int, distinct_names: int):
+    import random
+    rng = random.Random(5)
+    entries = synthetic_entries(entries_count)
+    start = time.perf_counter()
+    sanctions = SanctionsList(entries, 0.8)
+    build = time.perf_counter() - start
+    screener = Screener(sanctions)
+    names = [f"{rng.choice(['MV ', 'MT ', ''])}{rng.choice(entries)['Name'] if rng.random() < 0.02 else 'VESSEL'}"
+             f" {i}" for i in range(distinct_names)]
+    positions = [{"MMSI": 211000000 + rng.randrange(distinct_names), "Latitude": 54.0, "Longitude": 10.0}
+                 for _ in range(records_count)]
+    statics = [{"mmsi": 211000000 + i, "ship_name": names[i], "imo_number": 9500000 + i}
+               for i in range(distinct_names)]
+
+    start = time.perf_counter()
+    screener.tag_all(statics)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    screener.tag_all(statics)
+    warm = time.perf_counter() - start
+    start = time.perf_counter()
+    screener.tag_all(positions)
+    position_seconds = time.perf_counter() - start
+    print(json.dumps({
+        "entries": entries_count,
+        "build_seconds": round(build, 3),
+        "static_records": distinct_names,
+        "static_us_per_record_cold": round(cold / distinct_names * 1e6, 2),
+        "static_us_per_record_cached": round(warm / distinct_names * 1e6, 2),
+        "position_records": records_count,
+        "position_us_per_record": round(position_seconds / records_count * 1e6, 2),
+        "matches": screener.stats["matches"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sanctions screening of ais_events / ships records.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    screen = sub.add_parser("screen", help="NDJSON records (files or stdin) -> tagged NDJSON")
+    screen.add_argument("files", nargs="*")
+    screen.add_argument("--list", default=DEFAULT_SQL, help="sanctioned_vessels as .csv, .ndjson/.json or .sql")
+    screen.add_argument("--threshold", type=float, default=0.8)
+    screen.add_argument("--matches-only", action="store_true")
+    check = sub.add_parser("verify")
+    check.add_argument("--list", default=DEFAULT_SQL)
+    bench = sub.add_parser("benchmark")
+    bench.add_argument("--entries", type=int, default=20000)
+    bench.add_argument("--records", type=int, default=1000000)
+    bench.add_argument("--names", type=int, default=50000)
+    args = parser.parse_args()
+
+    if args.command == "screen":
+        screen_instance = Screener.from_file(args.list, args.threshold)
+        inputs = [open(file_name, encoding="utf-8") for file_name in args.files] or [sys.stdin]
+        for stream in inputs:
+            for line in stream:
+                if line.strip():
+                    tagged = screen_instance.tag(json.loads(line))
+                    if tagged["sanctioned"] or not args.matches_only:
+                        sys.stdout.write(json.dumps(tagged, ensure_ascii=False) + "\n")
+        print(json.dumps(screen_instance.stats), file=sys.stderr)
+    elif args.command == "verify":
+        raise SystemExit(0 if verify(args.list) else 1)
+    else:
+        benchmark(args.entries, args.records, args.names)
@@ -0,0 +1,132 @@
+"""
+Fleet state of the ShipSimulationRoutes processor: ships move between Baltic
+Sea harbors and the state is persisted in STATE_FILE between triggers.
+Kept free of NiFi imports so that standalone tools (aivdm_emitter.py) can
+drive the same fleet.
+"""
+
+import os
+import json
+import random
+import math
+from datetime import datetime, timezone
+
+STATE_FILE = "/tmp/ship_state.json"
+
+HARBORS = [
+    {"name": "Stockholm", "Latitude": 59.3293, "Longitude": 18.0686},
+    {"name": "Helsinki", "Latitude": 60.1695, "Longitude": 24.9354},
+    {"name": "Tallinn", "Latitude": 59.4370, "Longitude": 24.7536},
+    {"name": "Riga", "Latitude": 56.9496, "Longitude": 24.1052},
+    {"name": "Gdynia", "Latitude": 54.5189, "Longitude": 18.5305},
+    {"name": "Klaipėda", "Latitude": 55.7033, "Longitude": 21.1443},
+    {"name": "Turku", "Latitude": 60.4518, "Longitude": 22.2666},
+    {"name": "Mariehamn", "Latitude": 60.0973, "Longitude": 19.9348},
+    {"name": "Liepāja", "Latitude": 56.5110, "Longitude": 21.0136},
+    {"name": "Ventspils", "Latitude": 57.3890, "Longitude": 21.5610},
+    {"name": "Kaliningrad", "Latitude": 54.7104, "Longitude": 20.4522},
+    {"name": "Świnoujście", "Latitude": 53.9106, "Longitude": 14.2478},
+    {"name": "Rostock", "Latitude": 54.0887, "Longitude": 12.1405},
+    {"name": "Travemünde", "Latitude": 53.9624, "Longitude": 10.8672},
+    {"name": "St. Petersburg", "Latitude": 59.9343, "Longitude": 30.3351},
+    {"name": "Karlskrona", "Latitude": 56.1612, "Longitude": 15.5869},
+    {"name": "Kiel", "Latitude": 54.3233, "Longitude": 10.1228},
+    {"name": "Wismar", "Latitude": 53.8934, "Longitude": 11.4536},
+    {"name": "Stralsund", "Latitude": 54.3091, "Longitude": 13.0810},
+    {"name": "Sassnitz", "Latitude": 54.5183, "Longitude": 13.6414},
+    {"name": "Greifswald", "Latitude": 54.0934, "Longitude": 13.3781},
+    {"name": "Nynäshamn", "Latitude": 58.9036, "Longitude": 17.9470},
+    {"name": "Ustka", "Latitude": 54.5801, "Longitude": 16.8596},
+    {"name": "Pori", "Latitude": 61.4847, "Longitude": 21.7976},
+    {"name": "Kemi", "Latitude": 65.7369, "Longitude": 24.5636},
+    {"name": "Gdańsk", "Latitude": 54.3520, "Longitude": 18.6466},
+    {"name": "Paldiski", "Latitude": 59.3567, "Longitude": 24.0539},
+    {"name": "Rønne", "Latitude": 55.1037, "Longitude": 14.7065},
+    {"name": "Visby", "Latitude": 57.6409, "Longitude": 18.2960},
+    {"name": "Bolderāja", "Latitude": 56.9950, "Longitude": 24.0500},
+    {"name": "Primorsk", "Latitude": 60.3565, "Longitude": 28.6094}
+]
+
+def generate_ais_message(ship):
+    return {
+        "MMSI": ship["MMSI"],
+        "Event_Timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+        "Latitude": round(ship["Latitude"], 5),
+        "Longitude": round(ship["Longitude"], 5),
+        "Speed": round(ship["Speed"], 1),
+        "Course": round(ship["Course"], 1),
+        "Status": ship["Status"],
+        "Destination": ship["Destination"]["name"]
+    }
+
+def load_ship_state(num_ships):
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, "r") as f:
+            ships = json.load(f)
+            for ship in ships:
+                dest_name = ship.get("Destination")
+                if isinstance(dest_name, str):
+                    ship["Destination"] = next((h for h in HARBORS if h["name"] == dest_name), random.choice(HARBORS))
+            return ships
+    else:
+        return initialize_ships(num_ships)
+
+def save_ship_state(ships):
+    serializable = []
+    for ship in ships:
+        ship_copy = ship.copy()
+        if isinstance(ship_copy["Destination"], dict):
+            ship_copy["Destination"] = ship_copy["Destination"]["name"]
+        serializable.append(ship_copy)
+    with open(STATE_FILE, "w") as f:
+        json.dump(serializable, f)
+
+def initialize_ships(num_ships):
+    ships = []
+    for i in range(num_ships):
+        destination = random.choice(HARBORS)
+        ship = {
+            "MMSI": 123456000 + i,
+            "Latitude": destination["Latitude"] + random.uniform(-1.0, 1.0),
+            "Longitude": destination["Longitude"] + random.uniform(-1.0, 1.0),
+            "Speed": random.uniform(1, 10),
+            "Course": random.uniform(0, 360),
+            "Status": random.choice([
+                "Underway using engine", "Underway", "Anchored", 
+                "Moored", "Not under command"
+            ]),
+            "Destination": destination
+        }
+        ships.append(ship)
+    return ships
+
+def move_towards(lat1, lon1, lat2, lon2, speed):
+    delta_lat = lat2 - lat1
+    delta_lon = lon2 - lon1
+    dist_deg = math.hypot(delta_lat, delta_lon)
+    if dist_deg == 0:
+        return lat2, lon2
+    move_deg = (speed / 60.0) * 0.1
+    ratio = move_deg / dist_deg
+    return lat1 + delta_lat * ratio, lon1 + delta_lon * ratio
+
+def update_ship_movements(ships):
+    for ship in ships:
+        dest = ship["Destination"]
+        new_lat, new_lon = move_towards(
+            ship["Latitude"], ship["Longitude"],
+            dest["Latitude"], dest["Longitude"],
+            ship["Speed"]
+        )
+        ship["Latitude"] = new_lat
+        ship["Longitude"] = new_lon
+        ship["Course"] = (math.degrees(math.atan2(dest["Longitude"] - new_lon, dest["Latitude"] - new_lat)) + 360) % 360
+        ship["Speed"] = max(1.0, ship["Speed"] + random.uniform(-0.5, 0.5))
+        ship["Status"] = random.choice(["Underway using engine", "Underway", "Moored"])
+
+        if abs(ship["Latitude"] - dest["Latitude"]) < 0.05 and abs(ship["Longitude"] - dest["Longitude"]) < 0.05:
+            new_dest = random.choice([h for h in HARBORS if h["name"] != dest["name"]])
+            ship["Destination"] = new_dest
+            ship["Status"] = "Moored"
+            ship["Speed"] = 0.0
+    return ships
@@ -0,0 +1,275 @@
+"""
+Incremental parser for the ZCZC ... NNNN framed STANAG-style messages emitted
+by StanagMessageGenerator (STANAGSimulator.py).
+
+The marine_messages views derive message_timestamp, message_latitude and
+message_longitude with TO_TIMESTAMP / REGEXP_EXTRACT on every query. This
+parser computes them once at ingest: bytes are framed line by line (a partial
+line or message is carried over to the next feed() call), every line is split
+once at its first "/" and DTG and position are decoded with plain string
+scanning, so each byte is looked at a constant number of times and nothing
+backtracks.
+
+    ZCZC
+    MSGID/SITREP/FGSBayern/0001
+    DTG/191230ZOCT25
+    FROM/FGS Bayern
+    TO/NAVAL COMMAND
+    SUBJ/MARITIME SURVEILLANCE REPORT
+    POSITION/LAT 54.1234°N, LON 12.3456°E
+    TXT/FGS Bayern at LAT 54.1234°N, ... Result: contact maintained.
+    NNNN
+
+Records carry the maritime_surveillance_reports columns plus
+message_timestamp ("YYYY-MM-DD HH:MM:SS", UTC), message_latitude and
+message_longitude.
+
+    python stanag_parser.py --verify --messages 20000
+    python stanag_parser.py --benchmark --messages 200000
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+MONTHS = {"JAN": 1, "FEB": 2, "MAR": 3, "APR": 4, "MAY": 5, "JUN": 6,
+          "JUL": 7, "AUG": 8, "SEP": 9, "OCT": 10, "NOV": 11, "DEC": 12}
+
+FIELDS = {
+    "MSGID": "message_id",
+    "DTG": "message_dtg",
+    "FROM": "message_from",
+    "TO": "message_to",
+    "SUBJ": "message_subject",
+    "POSITION": "message_position",
+}
+
+COLUMNS = ["message_id", "message_dtg", "message_timestamp", "message_from", "message_to", "message_subject",
+           "message_position", "message_latitude", "message_longitude", "message_text"]
+
+
+def parse_dtg(dtg: str) -> Optional[str]:
+    """'191230ZOCT25' -> '2025-10-19 12:30:00'; None if the group is malformed."""
+    if len(dtg) != 12 or dtg[6] != "Z" or not (dtg[:6].isdigit() and dtg[10:].isdigit()):
+        return None
+    month = MONTHS.get(dtg[7:10].upper())
+    if month is None:
+        return None
+    day, hour, minute, year = int(dtg[0:2]), int(dtg[2:4]), int(dtg[4:6]), 2000 + int(dtg[10:12])
+    if not (1 <= day <= 31 and hour < 24 and minute < 60):
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:00"
+
+
+def parse_coordinate(position: str, label: str) -> Optional[float]:
+    """Value after label ('LAT' / 'LON') up to the degree sign; S and W give negative values."""
+    start = position.find(label)
+    if start < 0:
+        return None
+    i = start + len(label)
+    end = len(position)
+    while i < end and position[i] == " ":
+        i += 1
+    j = i
+    while j < end and (position[j].isdigit() or position[j] in ".-"):
+        j += 1
+    if j == i:
+        return None
+    try:
+        value = float(position[i:j])
+    except ValueError:
+        return None
+    if j + 1 < end and position[j] == "°" and position[j + 1] in "SW":
+        value = -value
+    return value
+
+
+class StanagStreamParser:
+    """
+    feed() accepts arbitrary byte chunks and returns the messages completed by
+    them. Only complete lines are decoded, so multi-byte characters split
+    across chunks are safe.
+    """
+
+    def __init__(self):
+        self._carry = b""
+        self._record: Optional[Dict] = None
+        self._text: Optional[List[str]] = None
+        self.messages = 0
+        self.malformed = 0
+
+    def feed(self, data: bytes) -> List[Dict]:
+        if self._carry:
+            data = self._carry + data
+        end = data.rfind(b"\n")
+        if end < 0:
+            self._carry = data
+            return []
+        self._carry = data[end + 1:]
+        out: List[Dict] = []
+        # data[:end] ends at a line break, so it never cuts a multi-byte character.
+        for line in data[:end].decode("utf-8", "replace").split("\n"):
+            self._line(line.strip(), out)
+        return out
+
+    def flush(self) -> List[Dict]:
+        """End of stream: parses the last unterminated line; an open message without NNNN is malformed."""
+        out: List[Dict] = []
+        if self._carry:
+            self._line(self._carry.decode("utf-8", "replace").strip(), out)
+            self._carry = b""
+        if self._record is not None:
+            self.malformed += 1
+            self._record = self._text = None
+        return out
+
+    def pending_bytes(self) -> int:
+        return len(self._carry)
+
+    def _line(self, line: str, out: List[Dict]):
+        if line.endswith("ZCZC"):
+            # The generator glues its "=====" separator to the first ZCZC.
+            if self._record is not None:
+                self.malformed += 1
+            self._record = {}
+            self._text = None
+            return
+        record = self._record
+        if record is None or not line:
+            return
+        if line == "NNNN":
+            out.append(self._finish(record))
+            self._record = self._text = None
+            return
+        if self._text is not None:
+            self._text.append(line)
+            return
+        key, separator, value = line.partition("/")
+        if not separator:
+            return
+        if key == "TXT":
+            self._text = [value]
+        else:
+            column = FIELDS.get(key)
+            if column is not None:
+                record[column] = value.strip()
+
+    def _finish(self, record: Dict) -> Dict:
+        self.messages += 1
+        position = record.get("message_position")
+        dtg = record.get("message_dtg")
+        return {
+            "message_id": record.get("message_id"),
+            "message_dtg": dtg,
+            "message_timestamp": parse_dtg(dtg) if dtg else None,
+            "message_from": record.get("message_from"),
+            "message_to": record.get("message_to"),
+            "message_subject": record.get("message_subject"),
+            "message_position": position,
+            "message_latitude": parse_coordinate(position, "LAT") if position else None,
+            "message_longitude": parse_coordinate(position, "LON") if position else None,
+            "message_text": "\n".join(self._text) if self._text else None,
+        }
+
+
+def to_ndjson(records: Iterable[Dict]) -> bytes:
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+
+
+def to_columns(records: List[Dict]) -> bytes:
+    """One JSON object with one array per column (columnar batch for bulk loaders)."""
+    return json.dumps({column: [record[column] for record in records] for column in COLUMNS},
+                      ensure_ascii=False).encode("utf-8")
+
+
+# --- Self-check and benchmark ------------------------------------------------
+
+UNITS = ["FGS Brandenburg", "FGS Baden-Württemberg", "U-31", "FGS Kühlungsborn", "A1443 Rhön", "FGS Sachsen"]
+
+
+def synthetic_stream(messages: int, seed: int = 11) -> bytes:
+    """Output in the exact layout of StanagMessageGenerator.transform()."""
+    rng = random.Random(seed)
+    start = datetime(2025, 10, 1)
+    out = []
+    for i in range(messages):
+        unit = rng.choice(UNITS)
+        dtg = (start + timedelta(minutes=7 * i)).strftime("%d%H%MZ%b%y").upper()
+        position = f"LAT {round(rng.uniform(53.5, 65.8), 4)}°N, LON {round(rng.uniform(9.5, 30.2), 4)}°E"
+        subject = rng.choice(["MARITIME SURVEILLANCE REPORT", "SICK REPORT"])
+        text = f"{unit} at {position} is patrolling merchant ship. Result: contact maintained."
+        out.append(f"ZCZC\nMSGID/SITREP/{unit.replace(' ', '')}/0001\nDTG/{dtg}\nFROM/{unit}\nTO/NAVAL COMMAND\n"
+                   f"SUBJ/{subject}\n\nPOSITION/{position}\n\nTXT/{text}\n\nNNNN")
+    return ("\n\n" + ("=" * 60) + "\n\n".join(out)).encode("utf-8")
+
+
+_REFERENCE_FRAME = re.compile(r"ZCZC\n(.*?)\nNNNN", re.S)
+
+
+def reference_parse(stream: bytes) -> List[Dict]:
+    """Regex parse with the semantics of the marine_messages view, for --verify."""
+    records = []
+    for frame in _REFERENCE_FRAME.findall(stream.decode("utf-8")):
+        fields = dict(re.findall(r"^(MSGID|DTG|FROM|TO|SUBJ|POSITION)/(.*)$", frame, re.M))
+        text = re.search(r"^TXT/(.*)", frame, re.M | re.S)
+        position = fields.get("POSITION")
+        latitude = re.search(r"LAT\s+([0-9]+\.[0-9]+)°", position or "")
+        longitude = re.search(r"LON\s+([0-9]+\.[0-9]+)°", position or "")
+        records.append({
+            "message_id": fields.get("MSGID"),
+            "message_dtg": fields.get("DTG"),
+            "message_timestamp": datetime.strptime(fields["DTG"], "%d%H%MZ%b%y").strftime("%Y-%m-%d %H:%M:%S"),
+            "message_from": fields.get("FROM"),
+            "message_to": fields.get("TO"),
+            "message_subject": fields.get("SUBJ"),
+            "message_position": position,
+            "message_latitude": float(latitude[1]) if latitude else None,
+            "message_longitude": float(longitude[1]) if longitude else None,
+            "message_text": text[1].strip() if text else None,
+        })
+    return records
+
+
+def parse_chunked(stream: bytes, chunk_size: int) -> List[Dict]:
+    parser = StanagStreamParser()
+    records = []
+    for start in range(0, len(stream), chunk_size):
+        records += parser.feed(stream[start:start + chunk_size])
+    return records + parser.flush()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Streaming STANAG message parser.")
+    arg_parser.add_argument("--messages", type=int, default=20000)
+    arg_parser.add_argument("--verify", action="store_true", help="Compare with the regex reference on random chunking")
+    arg_parser.add_argument("--benchmark", action="store_true", help="Parse throughput in MB/s")
+    arg_parser.add_argument("--chunk-size", type=int, default=65536)
+    args = arg_parser.parse_args()
+    stream = synthetic_stream(args.messages)
+
+    if args.verify:
+        expected = reference_parse(stream)
+        for chunk_size in (1, 7, 333, 4096, len(stream)):
+            got = parse_chunked(stream, chunk_size)
+            print(f"chunk size {chunk_size:>9}: {len(got)} messages, "
+                  f"{'identical' if got == expected else 'DIFFERENT'}")
+    if args.benchmark:
+        megabytes = len(stream) / 1e6
+        start = time.perf_counter()
+        records = parse_chunked(stream, args.chunk_size)
+        parse_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        to_ndjson(records)
+        ndjson_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        reference_parse(stream)
+        reference_seconds = time.perf_counter() - start
+        print(f"{len(records)} messages, {megabytes:.1f} MB: parse {megabytes / parse_seconds:.1f} MB/s, "
+              f"parse + NDJSON {megabytes / (parse_seconds + ndjson_seconds):.1f} MB/s, "
+              f"regex reference {megabytes / reference_seconds:.1f} MB/s")
+    if not (args.verify or args.benchmark):
+        arg_parser.print_help()
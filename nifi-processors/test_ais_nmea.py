@@ -0,0 +1,60 @@
+import pytest
+
+from ais_nmea import (KNOWN_SENTENCES, AISDecoder, encode_position, encode_static_b, encode_static_voyage,
+                      sentences, synthetic_feed)
+
+
+def feed(lines):
+    return ("\r\n".join(lines) + "\r\n").encode("ascii")
+
+
+@pytest.mark.parametrize("lines, kind, expected", KNOWN_SENTENCES, ids=["type1", "type5", "type24"])
+def test_known_sentences(lines, kind, expected):
+    positions, statics = AISDecoder().decode(feed(lines))
+    records = positions if kind == "position" else statics
+    assert len(records) == 1
+    assert {key: records[0].get(key) for key in expected} == expected
+
+
+def test_fixed_corpus_in_input_order():
+    data, expected_positions, expected_statics = synthetic_feed(2000, seed=11)
+    positions, statics = AISDecoder().decode(data)
+
+    assert len(positions) == len(expected_positions) and len(statics) == len(expected_statics)
+    for got, want in zip(positions, expected_positions):
+        assert {key: got[key] for key in want} == want
+    for got, want in zip(statics, expected_statics):
+        assert {key: got[key] for key in want} == want
+
+
+def test_position_order_across_message_types():
+    lines = []
+    for mmsi, msg_type in [(211000001, 18), (211000002, 1), (211000003, 18), (211000004, 3)]:
+        lines += sentences(*encode_position(mmsi, 54.1, 12.1, 8.0, 90.0, None, 10, msg_type=msg_type))
+    positions, _ = AISDecoder().decode(feed(lines))
+    assert [record["MMSI"] for record in positions] == [211000001, 211000002, 211000003, 211000004]
+
+
+def test_destination_applies_to_later_positions_only():
+    mmsi = 211000005
+    position = sentences(*encode_position(mmsi, 54.1, 12.1, 8.0, 90.0, 90, 10))
+    static = sentences(*encode_static_voyage(mmsi, "OSTSEE", 80, 9123456, "DABC", 100, 20, 8, 8, "ROSTOCK", 6.0,
+                                             (10, 21, 6, 30)), "B", 1)
+    decoder = AISDecoder()
+    positions, statics = decoder.decode(feed(position + static + position))
+    assert [record["Destination"] for record in positions] == [None, "ROSTOCK"]
+    assert statics[0]["destination"] == "ROSTOCK"
+
+    # ... and to the positions of later batches.
+    positions, _ = decoder.decode(feed(position))
+    assert positions[0]["Destination"] == "ROSTOCK"
+
+
+def test_class_b_parts_split_across_batches():
+    mmsi = 211000006
+    decoder = AISDecoder()
+    assert decoder.decode(feed(sentences(*encode_static_b(mmsi, 0, name="SEGLER")))) == ([], [])
+    _, statics = decoder.decode(feed(sentences(*encode_static_b(mmsi, 1, ship_type=36, call_sign="DK1234", bow=8,
+                                                                stern=4, port=2, starboard=2))))
+    assert len(statics) == 1
+    assert (statics[0]["ship_name"], statics[0]["call_sign"], statics[0]["length_m"]) == ("SEGLER", "DK1234", 12.0)
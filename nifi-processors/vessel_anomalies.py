@@ -0,0 +1,503 @@
+"""
+Incremental per-vessel anomaly features for vessel_outliers.
+
+Every AIS update is folded into O(1) state per MMSI (last fix, Welford running
+mean/variance of SOG, EWMA speed, zig-zag counter, loitering anchor,
+destination hash, last flag time per anomaly type) and checked for:
+
+    Speed Jump                SOG far outside the vessel's running distribution
+    Impossible Position Jump  implied speed between two fixes above max_implied_knots
+    AIS Gap                   no report for more than gap_seconds
+    Loitering                 within loiter_radius_km for loiter_seconds, not moored/anchored
+    Inconsistent Maneuvering  repeated large course changes with alternating sign (zig-zag)
+    Destination Change        reported destination differs from the previous one
+
+State lives in numpy columns indexed by a slot per MMSI; capacity bounds the
+memory (about 150 bytes per vessel plus the MMSI -> slot dict, i.e. well below
+512 MB for 1M vessels). When the table is full the least recently seen
+vessels are evicted.
+
+A batch is processed vectorized: records are ordered by time and split into
+rounds in which every MMSI occurs at most once (the k-th report of each vessel
+is in round k), so the per-vessel sequential semantics are kept while each
+round is a handful of numpy operations over all vessels in it. A repeated
+anomaly of the same type is suppressed for cooldown_seconds per vessel.
+
+Used by the VesselAnomalyDetector NiFi processor and as a standalone consumer
+of ais_events NDJSON (e.g. piped from kafka-console-consumer):
+
+    kafka-console-consumer ... --topic ais_events | python vessel_anomalies.py consume > vessel_outliers.ndjson
+    python vessel_anomalies.py verify
+    python vessel_anomalies.py benchmark --vessels 1000000 --updates 5000000
+"""
+
+import argparse
+import json
+import resource
+import sys
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_NM = 1.852
+
+ANOMALIES = ["Speed Jump", "Impossible Position Jump", "AIS Gap", "Loitering", "Inconsistent Maneuvering",
+             "Destination Change"]
+SPEED_JUMP, POSITION_JUMP, AIS_GAP, LOITERING, ZIGZAG, DESTINATION_CHANGE = range(len(ANOMALIES))
+
+SEVERITY = {SPEED_JUMP: 2, POSITION_JUMP: 4, AIS_GAP: 3, LOITERING: 3, ZIGZAG: 3, DESTINATION_CHANGE: 1}
+RECOMMENDATION = {
+    SPEED_JUMP: "Compare with the vessel's class and recent reports; check for sensor errors or evasive action.",
+    POSITION_JUMP: "Possible AIS spoofing or MMSI reuse; verify the position with radar or another sensor.",
+    AIS_GAP: "Check whether the transponder was switched off and where the vessel went during the gap.",
+    LOITERING: "Check for rendezvous, ship-to-ship transfer or activity near critical infrastructure.",
+    ZIGZAG: "Observe the vessel; repeated course reversals can indicate search patterns or evasion.",
+    DESTINATION_CHANGE: "Verify the new destination against the vessel's route and cargo.",
+}
+# Statuses in which staying in one place is expected.
+STATIONARY_STATUS = {"Moored", "Anchored", "At anchor", "Aground"}
+
+STATE_FLOAT64 = ["t", "lat", "lon", "anchor_lat", "anchor_lon", "anchor_t", "mean", "m2"]
+STATE_FLOAT32 = ["sog", "cog", "ewma_sog", "turn"]
+STATE_INT32 = ["n", "sog_n", "zigzag", "dest"]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    a = (np.sin((phi2 - phi1) / 2) ** 2
+         + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def parse_timestamps(values: List[str]) -> np.ndarray:
+    """'YYYY-MM-DD HH:MM:SS.fff' / ISO 8601 (UTC) -> epoch seconds."""
+    text = np.char.rstrip(np.char.replace(np.asarray(values, dtype=str), " ", "T"), "Z")
+    return np.asarray(text, dtype="datetime64[ms]").astype(np.int64) / 1000.0
+
+
+def destination_hash(destination: Optional[str]) -> int:
+    """Stable non-zero 31-bit hash; 0 means no destination."""
+    if not destination:
+        return 0
+    return (zlib.crc32(destination.strip().upper().encode("utf-8")) & 0x7FFFFFFF) or 1
+
+
+class AnomalyEngine:
+    def __init__(self, capacity: int = 1_000_000, gap_seconds: float = 1800.0, max_implied_knots: float = 60.0,
+                 loiter_radius_km: float = 1.0, loiter_seconds: float = 7200.0, cooldown_seconds: float = 1800.0,
+                 zigzag_turns: int = 4, zigzag_degrees: float = 45.0, speed_jump_knots: float = 8.0,
+                 speed_jump_sigmas: float = 4.0, ewma_alpha: float = 0.2):
+        self.capacity = capacity
+        self.gap_seconds = gap_seconds
+        self.max_implied_knots = max_implied_knots
+        self.loiter_radius_km = loiter_radius_km
+        self.loiter_seconds = loiter_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.zigzag_turns = zigzag_turns
+        self.zigzag_degrees = zigzag_degrees
+        self.speed_jump_knots = speed_jump_knots
+        self.speed_jump_sigmas = speed_jump_sigmas
+        self.ewma_alpha = ewma_alpha
+
+        self.state: Dict[str, np.ndarray] = {}
+        for name in STATE_FLOAT64:
+            self.state[name] = np.zeros(capacity, dtype=np.float64)
+        for name in STATE_FLOAT32:
+            self.state[name] = np.zeros(capacity, dtype=np.float32)
+        for name in STATE_INT32:
+            self.state[name] = np.zeros(capacity, dtype=np.int32)
+        self.state["loiter_flagged"] = np.zeros(capacity, dtype=bool)
+        self.last_flag = np.full((capacity, len(ANOMALIES)), -np.inf, dtype=np.float64)
+        self.slot_mmsi = np.zeros(capacity, dtype=np.int64)
+        self.slots: Dict[int, int] = {}
+        self.free: List[int] = list(range(capacity - 1, -1, -1))
+        self.stats = {"updates": 0, "late": 0, "vessels_evicted": 0, "flagged": 0}
+
+    def memory_bytes(self) -> int:
+        arrays = list(self.state.values()) + [self.last_flag, self.slot_mmsi]
+        return sum(array.nbytes for array in arrays)
+
+    # --- Slots -------------------------------------------------------------------
+
+    def _evict(self, count: int, keep: List[int]):
+        """Frees the count least recently seen vessels that are not in keep (vessels of the current batch)."""
+        used = np.fromiter(self.slots.values(), dtype=np.int64, count=len(self.slots))
+        kept = [self.slots[m] for m in keep if m in self.slots]
+        used = used[~np.isin(used, kept)]
+        count = min(count, len(used))
+        oldest = used[np.argpartition(self.state["t"][used], count - 1)[:count]]
+        for slot in oldest.tolist():
+            del self.slots[int(self.slot_mmsi[slot])]
+            self.free.append(slot)
+        self.stats["vessels_evicted"] += count
+
+    def _slots_for(self, mmsi: List[int]) -> np.ndarray:
+        slots = self.slots
+        distinct = list(dict.fromkeys(mmsi))
+        missing = [m for m in distinct if m not in slots]
+        if len(missing) > len(self.free):
+            self._evict(max(len(missing) - len(self.free), self.capacity // 100), distinct)
+        for m in missing:
+            slot = self.free.pop()
+            slots[m] = slot
+            self.slot_mmsi[slot] = m
+            for name in ("n", "sog_n", "zigzag", "dest"):
+                self.state[name][slot] = 0
+            self.state["loiter_flagged"][slot] = False
+            self.last_flag[slot] = -np.inf
+        return np.fromiter((slots[m] for m in mmsi), dtype=np.int64, count=len(mmsi))
+
+    # --- Processing -----------------------------------------------------------------
+
+    def process(self, records: List[Dict]) -> List[Dict]:
+        """Folds a batch of ais_events records into the state; returns vessel_outliers rows."""
+        records = [record for record in records
+                   if record.get("Latitude") is not None and record.get("Longitude") is not None]
+        if not records:
+            return []
+        if len(records) > self.capacity and len({int(record["MMSI"]) for record in records}) > self.capacity:
+            # More vessels in the batch than slots: split, so every part fits into the table.
+            return [row for start in range(0, len(records), self.capacity)
+                    for row in self.process(records[start:start + self.capacity])]
+        t = parse_timestamps([record["Event_Timestamp"] for record in records])
+        order = np.argsort(t, kind="stable")
+        records = [records[i] for i in order.tolist()]
+        t = t[order]
+        mmsi = [int(record["MMSI"]) for record in records]
+        columns = {
+            "t": t,
+            "lat": np.array([record["Latitude"] for record in records], dtype=np.float64),
+            "lon": np.array([record["Longitude"] for record in records], dtype=np.float64),
+            "sog": np.array([record.get("Speed") for record in records], dtype=np.float64),
+            "cog": np.array([record.get("Course") for record in records], dtype=np.float64),
+            "dest": np.array([destination_hash(record.get("Destination")) for record in records], dtype=np.int32),
+            "stationary": np.array([record.get("Status") in STATIONARY_STATUS for record in records]),
+        }
+        slots = self._slots_for(mmsi)
+
+        # Round k holds the k-th report of every vessel in this batch (time order within the vessel).
+        by_slot = np.argsort(slots, kind="stable")
+        sorted_slots = slots[by_slot]
+        group_start = np.r_[0, np.flatnonzero(np.diff(sorted_slots)) + 1]
+        rank = np.arange(len(slots)) - np.repeat(group_start, np.diff(np.r_[group_start, len(slots)]))
+        rounds = np.empty(len(slots), dtype=np.int64)
+        rounds[by_slot] = rank
+
+        flags = []
+        for k in range(int(rounds.max()) + 1):
+            rows = np.flatnonzero(rounds == k)
+            flags += self._round(slots[rows], rows, columns)
+        self.stats["updates"] += len(records)
+        self.stats["flagged"] += len(flags)
+        return [self._row(records[i], kind, reason) for i, kind, reason in sorted(flags, key=lambda flag: flag[0])]
+
+    def _round(self, slots: np.ndarray, rows: np.ndarray, columns: Dict[str, np.ndarray]) -> List[tuple]:
+        s = self.state
+        t, lat, lon = columns["t"][rows], columns["lat"][rows], columns["lon"][rows]
+        sog, cog = columns["sog"][rows], columns["cog"][rows]
+        dest, stationary = columns["dest"][rows], columns["stationary"][rows]
+        n, sog_n = s["n"][slots], s["sog_n"][slots]
+
+        known = n > 0
+        late = known & (t <= s["t"][slots])
+        self.stats["late"] += int(late.sum())
+        update = ~late
+        seen = known & update
+        dt = np.where(seen, t - s["t"][slots], 0.0)
+
+        distance = np.where(seen, haversine_km(s["lat"][slots], s["lon"][slots], lat, lon), 0.0)
+        implied_knots = np.where(dt > 0, distance / KM_PER_NM / np.maximum(dt, 1e-9) * 3600.0, 0.0)
+        has_sog = ~np.isnan(sog)
+        has_cog = ~np.isnan(cog)
+
+        candidates = np.zeros((len(slots), len(ANOMALIES)), dtype=bool)
+        # AIS gap
+        candidates[:, AIS_GAP] = seen & (dt > self.gap_seconds)
+        # Impossible jump (1 km minimum against GPS noise on closely spaced fixes)
+        candidates[:, POSITION_JUMP] = seen & (distance > 1.0) & (implied_knots > self.max_implied_knots)
+        # Speed jump against EWMA and Welford standard deviation
+        std = np.sqrt(np.where(sog_n > 1, s["m2"][slots] / np.maximum(sog_n - 1, 1), 0.0))
+        deviation = np.abs(sog - s["ewma_sog"][slots])
+        candidates[:, SPEED_JUMP] = (seen & has_sog & (sog_n >= 10)
+                                     & (deviation > np.maximum(self.speed_jump_knots, self.speed_jump_sigmas * std)))
+        # Zig-zag: large turns with alternating sign
+        turn = ((cog - s["cog"][slots] + 180.0) % 360.0) - 180.0
+        big = seen & has_cog & (np.abs(turn) > self.zigzag_degrees) & (np.nan_to_num(sog) > 2.0)
+        alternating = big & (np.sign(turn) != np.sign(s["turn"][slots])) & (s["turn"][slots] != 0)
+        zigzag = np.where(alternating, s["zigzag"][slots] + 1, np.where(big, 1, 0))
+        candidates[:, ZIGZAG] = zigzag >= self.zigzag_turns
+        zigzag = np.where(candidates[:, ZIGZAG], 0, zigzag)
+        # Loitering around an anchor point
+        anchor_distance = haversine_km(s["anchor_lat"][slots], s["anchor_lon"][slots], lat, lon)
+        moved = ~seen | (anchor_distance > self.loiter_radius_km)
+        loiter_flagged = np.where(moved, False, s["loiter_flagged"][slots])
+        candidates[:, LOITERING] = (~moved & ~loiter_flagged & ~stationary
+                                    & (t - s["anchor_t"][slots] > self.loiter_seconds))
+        loiter_flagged |= candidates[:, LOITERING]
+        # Destination change
+        old_dest = s["dest"][slots]
+        candidates[:, DESTINATION_CHANGE] = seen & (dest != 0) & (old_dest != 0) & (dest != old_dest)
+
+        # Cooldown per vessel and anomaly type
+        recent = (t[:, None] - self.last_flag[slots]) < self.cooldown_seconds
+        flagged = candidates & ~recent
+        hit_rows, hit_kinds = np.nonzero(flagged)
+        if len(hit_rows):
+            self.last_flag[slots[hit_rows], hit_kinds] = t[hit_rows]
+
+        flags = []
+        for i, kind in zip(hit_rows.tolist(), hit_kinds.tolist()):
+            flags.append((int(rows[i]), kind, self._reason(kind, i, dt, distance, implied_knots, sog, std, slots, t)))
+
+        # State update (late reports only count as seen, they do not move the state back in time)
+        u = slots[update]
+        sog_u = sog[update]
+        valid_sog = ~np.isnan(sog_u)
+        # SOG statistics count only reports with a SOG; the EWMA starts at the first one.
+        sog_n_new = sog_n[update] + valid_sog
+        delta = np.where(valid_sog, sog_u - s["mean"][u], 0.0)
+        mean = s["mean"][u] + np.where(valid_sog, delta / np.maximum(sog_n_new, 1), 0.0)
+        s["m2"][u] += np.where(valid_sog, delta * (sog_u - mean), 0.0)
+        s["mean"][u] = mean
+        first_sog = valid_sog & (sog_n[update] == 0)
+        ewma = s["ewma_sog"][u]
+        s["ewma_sog"][u] = np.where(~valid_sog, ewma,
+                                    np.where(first_sog, sog_u, ewma + self.ewma_alpha * (sog_u - ewma)))
+        s["sog_n"][u] = sog_n_new
+        s["n"][u] = n[update] + 1
+        s["t"][u], s["lat"][u], s["lon"][u] = t[update], lat[update], lon[update]
+        s["sog"][u] = np.nan_to_num(sog_u)
+        s["cog"][u] = np.where(has_cog[update], cog[update], s["cog"][u])
+        s["turn"][u] = np.where(big[update], turn[update], np.where(has_cog[update], 0.0, s["turn"][u]))
+        s["zigzag"][u] = zigzag[update]
+        reset = moved[update]
+        s["anchor_lat"][u] = np.where(reset, lat[update], s["anchor_lat"][u])
+        s["anchor_lon"][u] = np.where(reset, lon[update], s["anchor_lon"][u])
+        s["anchor_t"][u] = np.where(reset, t[update], s["anchor_t"][u])
+        s["loiter_flagged"][u] = loiter_flagged[update]
+        s["dest"][u] = np.where(dest[update] != 0, dest[update], old_dest[update])
+        return flags
+
+    def _reason(self, kind, i, dt, distance, implied_knots, sog, std, slots, t) -> str:
+        s = self.state
+        slot = slots[i]
+        if kind == AIS_GAP:
+            return f"No AIS report for {dt[i] / 60:.0f} min; moved {distance[i]:.1f} km during the gap."
+        if kind == POSITION_JUMP:
+            return (f"Position jumped {distance[i]:.1f} km in {dt[i]:.0f} s (implied {implied_knots[i]:.0f} kn, "
+                    f"limit {self.max_implied_knots:.0f} kn).")
+        if kind == SPEED_JUMP:
+            return (f"SOG {sog[i]:.1f} kn vs. running average {s['ewma_sog'][slot]:.1f} kn "
+                    f"(std {std[i]:.1f} kn over {s['sog_n'][slot]} reports).")
+        if kind == LOITERING:
+            return (f"Stayed within {self.loiter_radius_km:g} km for {(t[i] - s['anchor_t'][slot]) / 3600:.1f} h "
+                    f"without moored/anchored status.")
+        if kind == ZIGZAG:
+            return f"{self.zigzag_turns} consecutive course reversals over {self.zigzag_degrees:g} degrees."
+        return "Reported destination changed."
+
+    @staticmethod
+    def _row(record: Dict, kind: int, reason: str) -> Dict:
+        return {
+            "MMSI": int(record["MMSI"]),
+            "Event_Timestamp": record["Event_Timestamp"],
+            "Latitude": record["Latitude"],
+            "Longitude": record["Longitude"],
+            "Speed": record.get("Speed"),
+            "Course": record.get("Course"),
+            "Status": record.get("Status"),
+            "Destination": record.get("Destination"),
+            "Outlier_Type": ANOMALIES[kind],
+            "Reason": reason if kind != DESTINATION_CHANGE else f"Reported destination changed to {record.get('Destination')}.",
+            "Recommendation": RECOMMENDATION[kind],
+            "Severity_Level": SEVERITY[kind],
+        }
+
+
+def normalize_record(record: Dict) -> Dict:
+    """ais_events_ice column names (lower case) -> simulator keys."""
+    if "MMSI" in record:
+        return record
+    keys = {"mmsi": "MMSI", "event_timestamp": "Event_Timestamp", "latitude": "Latitude", "longitude": "Longitude",
+            "speed": "Speed", "course": "Course", "status": "Status", "destination": "Destination"}
+    return {keys.get(key.lower(), key): value for key, value in record.items()}
+
+
+def consume(lines: Iterable[str], engine: AnomalyEngine, batch_size: int, out=sys.stdout):
+    batch = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        batch.append(normalize_record(json.loads(line)))
+        if len(batch) >= batch_size:
+            for row in engine.process(batch):
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            out.flush()
+            batch = []
+    for row in engine.process(batch):
+        out.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+# --- Verification and benchmark -------------------------------------------------------
+
+def synthetic_updates(vessels: int, updates: int, seed: int = 17, inject: bool = True):
+    """
+    Vessels on straight courses reporting every ~10 s. With inject, vessel i
+    (i < 6 * 10) gets anomaly i % 6 once. Returns (records, {mmsi: anomaly}).
+    """
+    rng = np.random.default_rng(seed)
+    per_vessel = max(1, updates // vessels)
+    start = 1759305600.0
+    mmsi = 211000000 + np.arange(vessels)
+    lat0, lon0 = rng.uniform(54, 60, vessels), rng.uniform(10, 28, vessels)
+    speed = rng.uniform(5, 15, vessels)
+    course = rng.uniform(0, 360, vessels)
+    k = np.arange(per_vessel)
+    t = start + rng.uniform(0, 10, vessels)[:, None] + k[None, :] * 10.0
+    step_deg = speed[:, None] * 10.0 / 3600.0 / 60.0
+    lat = lat0[:, None] + np.cos(np.radians(course))[:, None] * step_deg * k
+    lon = lon0[:, None] + np.sin(np.radians(course))[:, None] * step_deg * k / 0.55
+    sog = speed[:, None] + rng.normal(0, 0.3, (vessels, per_vessel))
+    cog = course[:, None] + rng.normal(0, 2.0, (vessels, per_vessel))
+    destination = np.array(["KIEL", "ROSTOCK", "GDANSK", "RIGA"], dtype=object)[rng.integers(0, 4, vessels)]
+    destinations = np.repeat(destination[:, None], per_vessel, axis=1)
+    status = np.full((vessels, per_vessel), "Underway using engine", dtype=object)
+    expected = {}
+    if inject:
+        mid = per_vessel // 2
+        for v in range(min(vessels, 60)):
+            kind = v % len(ANOMALIES)
+            expected[int(mmsi[v])] = ANOMALIES[kind]
+            if kind == SPEED_JUMP:
+                sog[v, mid] = speed[v] + 25
+            elif kind == POSITION_JUMP:
+                lat[v, mid:] += 0.5
+            elif kind == AIS_GAP:
+                t[v, mid:] += 3600
+            elif kind == LOITERING:
+                lat[v, :] = lat[v, 0]
+                lon[v, :] = lon[v, 0]
+                sog[v, :] = 0.2
+            elif kind == ZIGZAG:
+                cog[v, mid:mid + 6] = course[v] + np.array([60, -60, 60, -60, 60, -60])
+            else:
+                destinations[v, mid:] = "TALLINN" if destination[v] != "TALLINN" else "KIEL"
+    stamps = (t * 1000).astype("int64").astype("datetime64[ms]").astype(str)
+    records = [{"MMSI": int(m), "Event_Timestamp": ts.replace("T", " "), "Latitude": float(a), "Longitude": float(b),
+                "Speed": float(c), "Course": float(d % 360), "Status": st, "Destination": de}
+               for m, ts, a, b, c, d, st, de in zip(np.repeat(mmsi, per_vessel), stamps.ravel(), lat.ravel(),
+                                                    lon.ravel(), sog.ravel(), cog.ravel(), status.ravel(),
+                                                    destinations.ravel())]
+    # Interleave vessels in time order, as on the topic.
+    records.sort(key=lambda record: record["Event_Timestamp"])
+    return records, expected
+
+
+def verify() -> bool:
+    # Loitering needs more than loiter_seconds of reports: 1000 reports x 10 s.
+    records, expected = synthetic_updates(300, 300000)
+    ok = True
+    results = {}
+    for label, batch_size in (("batch 50000", 50000), ("batch 997", 997)):
+        engine = AnomalyEngine(capacity=1000)
+        rows = []
+        for start in range(0, len(records), batch_size):
+            rows += engine.process(records[start:start + batch_size])
+        results[label] = sorted((row["MMSI"], row["Event_Timestamp"], row["Outlier_Type"]) for row in rows)
+        found = {(row["MMSI"], row["Outlier_Type"]) for row in rows}
+        missed = [(m, kind) for m, kind in expected.items() if (m, kind) not in found]
+        false_positives = [row for row in rows if row["MMSI"] not in expected]
+        good = not missed and not false_positives
+        ok &= good
+        print(f"{'ok  ' if good else 'FAIL'} {label:12s} {len(rows)} flags, {len(expected)} injected anomalies, "
+              f"missed {missed[:5]}, {len(false_positives)} on normal vessels")
+    same = results["batch 50000"] == results["batch 997"]
+    ok &= same
+    print(f"{'ok  ' if same else 'FAIL'} batch sizes give identical flags")
+
+    # One record per batch is the purely sequential reference (smaller fleet, same anomalies).
+    small, _ = synthetic_updates(12, 12000)
+    sequential, batched = AnomalyEngine(capacity=100), AnomalyEngine(capacity=100)
+    one_by_one = [row for record in small for row in sequential.process([record])]
+    at_once = batched.process(small)
+    same = (len(one_by_one) == 12
+            and sorted(map(json.dumps, one_by_one)) == sorted(map(json.dumps, at_once)))
+    ok &= same
+    print(f"{'ok  ' if same else 'FAIL'} one record per batch gives the same {len(one_by_one)} rows as one batch")
+
+    # Reports without SOG count as seen but not for the SOG statistics: first report without SOG, then 10 at 10 kn.
+    engine = AnomalyEngine(capacity=10)
+    engine.process([{"MMSI": 211999999, "Event_Timestamp": f"2025-10-01 12:00:{second:02d}", "Latitude": 54.0,
+                     "Longitude": 12.0, "Speed": None if second == 0 else 10.0} for second in range(0, 55, 5)])
+    slot = engine.slots[211999999]
+    stats = (engine.state["n"][slot], engine.state["sog_n"][slot], engine.state["mean"][slot],
+             engine.state["ewma_sog"][slot], engine.state["m2"][slot])
+    good = stats == (11, 10, 10.0, 10.0, 0.0)
+    ok &= good
+    print(f"{'ok  ' if good else 'FAIL'} SOG statistics skip reports without SOG: n, sog_n, mean, EWMA, m2 = "
+          f"{tuple(float(value) for value in stats)}")
+
+    engine = AnomalyEngine(capacity=100)
+    engine.process(records[:20000])
+    bounded = len(engine.slots) <= 100 and engine.stats["vessels_evicted"] > 0
+    ok &= bounded
+    print(f"{'ok  ' if bounded else 'FAIL'} capacity 100: {len(engine.slots)} vessels kept, "
+          f"{engine.stats['vessels_evicted']} evicted")
+    return ok
+
+
+def benchmark(vessels: int, updates: int, batch_size: int):
+    engine = AnomalyEngine(capacity=vessels)
+    per_vessel = max(1, updates // vessels)
+    records, _ = synthetic_updates(vessels, vessels * per_vessel, inject=False)
+    start = time.perf_counter()
+    flagged = 0
+    for offset in range(0, len(records), batch_size):
+        flagged += len(engine.process(records[offset:offset + batch_size]))
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        "vessels": vessels,
+        "updates": len(records),
+        "batch_size": batch_size,
+        "seconds": round(seconds, 2),
+        "updates_per_second": round(len(records) / seconds),
+        "flagged": flagged,
+        "state_megabytes": round(engine.memory_bytes() / 2 ** 20, 1),
+        "max_rss_megabytes": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental per-vessel anomaly features for vessel_outliers.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    consumer = sub.add_parser("consume", help="ais_events NDJSON (files or stdin) -> vessel_outliers NDJSON")
+    consumer.add_argument("files", nargs="*")
+    consumer.add_argument("--batch-size", type=int, default=10000)
+    consumer.add_argument("--capacity", type=int, default=1_000_000)
+    consumer.add_argument("--gap-minutes", type=float, default=30.0)
+    consumer.add_argument("--loiter-minutes", type=float, default=120.0)
+    sub.add_parser("verify", help="Injected anomalies, batch-size invariance, bounded capacity")
+    bench = sub.add_parser("benchmark")
+    bench.add_argument("--vessels", type=int, default=1_000_000)
+    bench.add_argument("--updates", type=int, default=5_000_000)
+    bench.add_argument("--batch-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    if args.command == "consume":
+        anomaly_engine = AnomalyEngine(capacity=args.capacity, gap_seconds=args.gap_minutes * 60,
+                                       loiter_seconds=args.loiter_minutes * 60)
+        if args.files:
+            for file_name in args.files:
+                with open(file_name, encoding="utf-8") as f:
+                    consume(f, anomaly_engine, args.batch_size)
+        else:
+            consume(sys.stdin, anomaly_engine, args.batch_size)
+        print(json.dumps(anomaly_engine.stats), file=sys.stderr)
+    elif args.command == "verify":
+        raise SystemExit(0 if verify() else 1)
+    else:
+        benchmark(args.vessels, args.updates, args.batch_size)